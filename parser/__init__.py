@@ -5,11 +5,22 @@
 
 Поддерживает подключение неограниченного числа поставщиков
 через индивидуальные адаптеры.
+
+Экспорты загружаются лениво (PEP 562): `import parser.main` или
+`from parser.config import ...` не тянут core (requests) и адаптеры.
 """
 
-from .base_adapter import SupplierAdapter, MaterialData, ParseResult
-from .config import config_manager
-from .core import ParserCore
+import importlib
+
+# Имя экспорта → модуль пакета, из которого он берётся
+_LAZY_EXPORTS = {
+    'SupplierAdapter': '.base_adapter',
+    'MaterialData': '.base_adapter',
+    'ParseResult': '.base_adapter',
+    'config_manager': '.config',
+    'ParserCore': '.core',
+    'adapter_registry': '.adapter_registry',
+}
 
 __all__ = [
     'SupplierAdapter',
@@ -17,4 +28,18 @@ __all__ = [
     'ParseResult',
     'config_manager',
     'ParserCore',
+    'adapter_registry',
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,166 @@
+# parser/adapter_registry.py
+
+"""
+Ленивый реестр адаптеров поставщиков.
+
+Реестр знает соответствие «поставщик → класс адаптера» (поле adapter_class
+в configs/<supplier>.json), но модуль адаптера импортирует только при первом
+запросе класса — вместе с его тяжёлыми зависимостями. Импортированные классы
+кешируются, время импорта каждого модуля записывается в import_timings.
+
+Описание поставщиков (--list-suppliers) читается из JSON без валидации и
+без построения SupplierProfile: для списка нужны только имя, display_name и
+флаг enabled.
+"""
+
+import importlib
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+# Поддержка запуска как модуля и как скрипта (collect_urls.py)
+try:
+    from . import log_pipeline as plog
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from parser import log_pipeline as plog
+
+# Модули, которые заметно замедляют старт (для отчёта о времени загрузки)
+HEAVY_MODULES = ('requests', 'aiohttp', 'playwright', 'PIL')
+
+
+class AdapterEntry(NamedTuple):
+    """Точка входа адаптера, записанная без импорта модуля."""
+    supplier: str
+    adapter_class: str  # "suppliers.skm_mebel.SkmMebelAdapter"
+    display_name: str
+    enabled: bool
+
+
+def heavy_modules_loaded() -> List[str]:
+    """Какие из тяжёлых зависимостей уже импортированы в процессе."""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+class AdapterRegistry:
+    """Реестр адаптеров с отложенным импортом."""
+
+    def __init__(self, config_dir: Optional[Path] = None, package: Optional[str] = 'parser'):
+        """
+        Args:
+            config_dir: Директория с конфигурациями (по умолчанию parser/configs/)
+            package: Пакет, относительно которого импортируется adapter_class
+                     (None — как модуль верхнего уровня, для запуска скриптом)
+        """
+        self.config_dir = config_dir or Path(__file__).parent / "configs"
+        self.package = package
+        self.import_timings: Dict[str, float] = {}
+        self._entries: Dict[str, AdapterEntry] = {}
+        self._signatures: Dict[str, tuple] = {}
+        self._classes: Dict[str, type] = {}
+        self._lock = threading.Lock()
+
+    def register(self, supplier: str, adapter_class: str, display_name: Optional[str] = None, enabled: bool = True) -> AdapterEntry:
+        """Явно регистрирует адаптер (без импорта)."""
+        entry = AdapterEntry(supplier, adapter_class, display_name or supplier, enabled)
+        with self._lock:
+            self._entries[supplier] = entry
+            self._signatures[supplier] = ()
+        return entry
+
+    def _read_entry(self, path: Path) -> Optional[AdapterEntry]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        supplier = path.stem
+        with self._lock:
+            entry = self._entries.get(supplier)
+            if entry is not None and self._signatures.get(supplier) in (signature, ()):
+                return entry
+        try:
+            data = json.loads(path.read_bytes())
+        except (OSError, ValueError) as e:
+            plog.warning(f"[REGISTRY] Пропускаю {path.name}: {e}")
+            return None
+        entry = AdapterEntry(
+            supplier=supplier,
+            adapter_class=str(data.get('adapter_class', '')),
+            display_name=str(data.get('display_name', supplier)),
+            enabled=bool(data.get('enabled', True)),
+        )
+        with self._lock:
+            self._entries[supplier] = entry
+            self._signatures[supplier] = signature
+        return entry
+
+    def entries(self) -> List[AdapterEntry]:
+        """Все поставщики из директории конфигураций (без импорта адаптеров)."""
+        result = []
+        for path in sorted(self.config_dir.glob("*.json")):
+            entry = self._read_entry(path)
+            if entry is not None:
+                result.append(entry)
+        return result
+
+    def entry(self, supplier: str) -> AdapterEntry:
+        """
+        Точка входа адаптера поставщика.
+
+        Raises:
+            FileNotFoundError: Если конфигурация не найдена
+        """
+        with self._lock:
+            entry = self._entries.get(supplier)
+            if entry is not None and self._signatures.get(supplier) == ():
+                return entry
+        path = self.config_dir / f"{supplier}.json"
+        entry = self._read_entry(path)
+        if entry is None:
+            raise FileNotFoundError(f"Конфигурация для '{supplier}' не найдена: {path}")
+        return entry
+
+    def load_class(self, adapter_class: str) -> type:
+        """
+        Импортирует (один раз) и возвращает класс адаптера по пути
+        "suppliers.<module>.<Class>".
+
+        Raises:
+            ImportError: Если модуль не импортируется
+            AttributeError: Если в модуле нет такого класса
+        """
+        cls = self._classes.get(adapter_class)
+        if cls is not None:
+            return cls
+
+        module_path, class_name = adapter_class.rsplit('.', 1)
+        t0 = time.perf_counter()
+        before = set(heavy_modules_loaded())
+        if self.package:
+            module = importlib.import_module('.' + module_path, package=self.package)
+        else:
+            module = importlib.import_module(module_path)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        cls = getattr(module, class_name)
+
+        with self._lock:
+            self._classes[adapter_class] = cls
+            self.import_timings[module_path] = elapsed_ms
+        pulled = [name for name in heavy_modules_loaded() if name not in before]
+        plog.info(
+            f"[REGISTRY] Импорт {module_path}: {elapsed_ms:.0f}ms"
+            + (f" (загружены: {', '.join(pulled)})" if pulled else ""),
+        )
+        return cls
+
+    def get(self, supplier: str) -> type:
+        """Класс адаптера поставщика (импорт при первом обращении)."""
+        return self.load_class(self.entry(supplier).adapter_class)
+
+
+# Глобальный реестр (импорт адаптеров относительно пакета parser)
+adapter_registry = AdapterRegistry()
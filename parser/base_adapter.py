@@ -1,14 +1,27 @@
 # parser/base_adapter.py
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 from dataclasses import dataclass, field
 from datetime import datetime
-from urllib.parse import urljoin, urlparse, parse_qs, urlencode
-import hashlib
-import sys
+from queue import Queue, Empty
+from urllib.parse import urljoin
+import threading
 import time
 
+try:
+    from .url_classifier import UrlClassifier
+    from .url_dedup import UrlDedupSet, url_hash64
+    from .url_normalizer import normalize
+    from .supplier_profile import SupplierProfile
+    from . import log_pipeline as plog
+except ImportError:
+    from parser.url_classifier import UrlClassifier
+    from parser.url_dedup import UrlDedupSet, url_hash64
+    from parser.url_normalizer import normalize
+    from parser.supplier_profile import SupplierProfile
+    from parser import log_pipeline as plog
+
 
 @dataclass
 class MaterialData:
@@ -67,6 +80,153 @@ class ParseResult:
     items_count: int
 
 
+class DiscoveryState:
+    """
+    Общее состояние сбора URL для всех обходов (в т.ч. параллельных по категориям).
+
+    Лимиты max_urls / max_time, дедупликация товаров и посещённых страниц и
+    статистика по категориям разделяются между воркерами и меняются только под
+    lock, поэтому параллельный обход не превышает общих лимитов и не дублирует
+    URL. callback и check_limits вызываются после освобождения lock — отправка
+    chunk'а из них не останавливает остальных воркеров, поэтому оба должны
+    быть потокобезопасными (UrlCollector.add_url, check_limits_and_handle).
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[str], object],
+        max_urls: int,
+        max_time_seconds: Optional[float],
+        start_time: float,
+        soft_exit_seconds: float = 10,
+        max_pages_per_category: Optional[int] = None,
+        check_limits: Optional[Callable[[], Optional[str]]] = None,
+    ):
+        self.callback = callback
+        self.max_urls = max_urls
+        self.max_time_seconds = max_time_seconds
+        self.start_time = start_time
+        self.soft_exit_seconds = soft_exit_seconds
+        self.max_pages_per_category = max_pages_per_category
+        self.check_limits = check_limits
+
+        self.lock = threading.RLock()
+        self.seen_products = UrlDedupSet()
+        self.visited_pages = UrlDedupSet()
+        self.urls_accepted = 0
+        self.page_duplicates_dropped = 0
+        self.global_duplicates_dropped = 0
+        self.stop_reason: Optional[str] = None       # глобальная остановка (все воркеры)
+        self.last_stop_reason: Optional[str] = None  # последняя причина (в т.ч. по категории)
+        self.category_stats: Dict[str, Dict[str, Any]] = {}
+
+    def elapsed(self) -> float:
+        return time.time() - self.start_time
+
+    def time_stop_reason(self) -> Optional[str]:
+        """TIME_LIMIT_REACHED / SOFT_EXIT_TIME_LIMIT или None."""
+        if self.max_time_seconds is None:
+            return None
+        elapsed = self.elapsed()
+        if elapsed >= self.max_time_seconds:
+            return 'TIME_LIMIT_REACHED'
+        if self.max_time_seconds - elapsed <= self.soft_exit_seconds:
+            return 'SOFT_EXIT_TIME_LIMIT'
+        return None
+
+    def urls_full(self) -> bool:
+        return self.urls_accepted >= self.max_urls
+
+    def urls_remaining(self) -> int:
+        return max(0, self.max_urls - self.urls_accepted)
+
+    def should_stop(self) -> bool:
+        return self.stop_reason is not None or self.urls_full()
+
+    def stop(self, reason: str) -> None:
+        with self.lock:
+            if self.stop_reason is None:
+                self.stop_reason = reason
+            self.last_stop_reason = reason
+
+    def visit(self, url: str) -> bool:
+        """Отмечает страницу посещённой. False если её уже обходили."""
+        with self.lock:
+            return self.visited_pages.add(url)
+
+    def is_visited(self, url: str) -> bool:
+        with self.lock:
+            return url in self.visited_pages
+
+    def _category(self, category_key: str) -> Dict[str, Any]:
+        stats = self.category_stats.get(category_key)
+        if stats is None:
+            stats = {'pages': 0, 'uniques': 0, 'stop_reason': None, 'elapsed_seconds': 0.0}
+            self.category_stats[category_key] = stats
+        return stats
+
+    def category_page_limit_reached(self, category_key: str) -> bool:
+        if not self.max_pages_per_category:
+            return False
+        with self.lock:
+            stats = self._category(category_key)
+            if stats['pages'] < self.max_pages_per_category:
+                return False
+            if stats['stop_reason'] is None:
+                stats['stop_reason'] = 'MAX_PAGES_PER_CATEGORY'
+            return True
+
+    def add_products(self, urls: List[str], category_key: str, page_dupes: int = 0, count_duplicates: bool = True) -> int:
+        """
+        Добавляет найденные на странице URL (уже уникальные в пределах страницы).
+
+        Returns:
+            int: Сколько URL оказались новыми глобально (до проверки лимита)
+        """
+        accepted: List[str] = []
+        with self.lock:
+            self.page_duplicates_dropped += page_dupes
+            new_urls = [u for u in urls if u not in self.seen_products]
+            if count_duplicates:
+                self.global_duplicates_dropped += len(urls) - len(new_urls)
+            stats = self._category(category_key)
+            for url in new_urls:
+                if self.urls_full():
+                    break
+                if self.seen_products.add(url):
+                    self.urls_accepted += 1
+                    stats['uniques'] += 1
+                    accepted.append(url)
+        # Вне lock: callback может синхронно отправить chunk (chunk_send_window=0)
+        for url in accepted:
+            self.callback(url)
+        return len(new_urls)
+
+    def record_page(self, category_key: str) -> None:
+        with self.lock:
+            stats = self._category(category_key)
+            stats['pages'] += 1
+            stats['elapsed_seconds'] = round(self.elapsed(), 1)
+
+    def stop_category(self, category_key: str, reason: str) -> None:
+        with self.lock:
+            self._category(category_key)['stop_reason'] = reason
+            self.last_stop_reason = reason
+
+    def poll_external_limits(self) -> None:
+        """Проверяет внешние лимиты (UrlCollector.check_limits_and_handle)."""
+        if self.check_limits is None:
+            return
+        # Вне lock: при срабатывании лимита check_limits делает финальный flush chunk'а
+        reason = self.check_limits()
+        if reason:
+            self.stop(reason)
+
+    def category_stats_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            return {key: dict(value) for key, value in self.category_stats.items()}
+
+
 class SupplierAdapter(ABC):
     """
     Абстрактный базовый класс для адаптеров поставщиков.
@@ -81,6 +241,8 @@ class SupplierAdapter(ABC):
             config: Конфигурация поставщика из JSON файла
         """
         self.config = config
+        # Скомпилированный профиль: типизированные значения для горячих путей
+        self.profile = SupplierProfile.from_config(config)
         self.supplier_name = config.get('name', 'unknown')
         self.base_url = config.get('base_url', '')
         self.selectors = config.get('selectors', {})
@@ -100,6 +262,48 @@ class SupplierAdapter(ABC):
         self._filter_debug_samples = 0
         self._last_filter_reason = None
         self._last_filter_keyword = None
+        self.url_classifier = self.profile.url_classifier
+        self._classifier_keywords = self.profile.url_collection.filter_keywords
+        # Горячая перезагрузка: (config, profile), ожидающие применения между URL
+        self._pending_config: Optional[tuple] = None
+        self._pending_config_lock = threading.Lock()
+
+    def apply_config(self, config: dict, profile: Optional[SupplierProfile] = None) -> None:
+        """
+        Подменяет конфигурацию работающего адаптера (браузер не перезапускается).
+
+        Вызывать только между URL: все производные значения заменяются
+        вместе, незавершённый парсинг страницы не видит смешанного состояния.
+        """
+        profile = profile or SupplierProfile.from_config(config)
+        self.config = config
+        self.profile = profile
+        self.base_url = config.get('base_url', '')
+        self.selectors = config.get('selectors', {})
+        self.delays = config.get('delays', {})
+        self.use_proxy = config.get('use_proxy', False)
+        self.url_classifier = profile.url_classifier
+        self._classifier_keywords = profile.url_collection.filter_keywords
+
+    def on_config_reloaded(self, config: dict, profile: SupplierProfile) -> None:
+        """Подписчик ConfigManager.subscribe: запоминает новую конфигурацию (любой поток)."""
+        with self._pending_config_lock:
+            self._pending_config = (config, profile)
+
+    def apply_pending_config(self) -> bool:
+        """
+        Применяет конфигурацию, пришедшую через on_config_reloaded.
+
+        Returns:
+            bool: True если конфигурация была заменена
+        """
+        with self._pending_config_lock:
+            pending, self._pending_config = self._pending_config, None
+        if pending is None:
+            return False
+        self.apply_config(*pending)
+        plog.info(f"[CONFIG] {self.supplier_name}: адаптер переключён на новую конфигурацию")
+        return True
 
     def _emit_log(self, level: str, message: str, details: Optional[dict] = None) -> None:
         callback = getattr(self, 'log_callback', None)
@@ -131,315 +335,432 @@ class SupplierAdapter(ABC):
         - Пагинация по товарам
         - Фильтрация по ключевым словам
         - Поддержка infinite scroll
+        - Параллельный обход категорий (url_collection.discovery_workers > 1)
         
         Returns:
             List[str]: Список URL товаров
         """
+        url_config = self.profile.url_collection
+        product_urls: List[str] = []
+        self._run_discovery(
+            callback=product_urls.append,
+            max_urls=url_config.max_urls,
+            max_time_seconds=url_config.max_collect_time_seconds,
+            start_time=time.time(),
+        )
+        plog.info(f"[COLLECT] Собрано {len(product_urls)} URL товаров")
+        self.product_urls = product_urls
+        return self.product_urls
+
+    def collect_urls_with_callback(
+        self,
+        callback: Callable[[str], object],
+        max_pages: Optional[int] = None,
+        max_urls: Optional[int] = None,
+        max_time: Optional[float] = None,
+        start_time: Optional[float] = None,
+        check_limits: Optional[Callable[[], Optional[str]]] = None,
+    ) -> int:
+        """
+        Собирает URL товаров, передавая каждый новый URL в callback сразу
+        после обнаружения (используется UrlCollector для потоковой отправки).
+
+        Args:
+            callback: Вызывается для каждого нового URL (вызовы сериализованы)
+            max_pages: Макс. страниц на категорию
+            max_urls: Общий лимит URL (по умолчанию url_collection.max_urls)
+            max_time: Общий лимит времени сбора, сек
+            start_time: Момент старта сбора (time.time())
+            check_limits: Внешняя проверка лимитов; непустой результат останавливает сбор
+
+        Returns:
+            int: Количество переданных в callback URL
+        """
+        url_config = self.profile.url_collection
+        # Как и в collect_urls: лимит адаптера (url_collection.max_urls) тоже действует
+        adapter_max_urls = url_config.max_urls
+        state = self._run_discovery(
+            callback=callback,
+            max_urls=min(max_urls, adapter_max_urls) if max_urls is not None else adapter_max_urls,
+            max_time_seconds=max_time if max_time is not None else url_config.max_collect_time_seconds,
+            start_time=start_time or time.time(),
+            max_pages=max_pages,
+            check_limits=check_limits,
+        )
+        accepted = state.urls_accepted if state else 0
+        plog.info(f"[COLLECT] Собрано {accepted} URL товаров")
+        return accepted
+
+    def _run_discovery(
+        self,
+        callback: Callable[[str], object],
+        max_urls: int,
+        max_time_seconds: Optional[float],
+        start_time: float,
+        max_pages: Optional[int] = None,
+        check_limits: Optional[Callable[[], Optional[str]]] = None,
+    ) -> Optional['DiscoveryState']:
+        """Общая часть collect_urls / collect_urls_with_callback."""
         if not self.config.get('collect_urls', False):
-            return []
+            return None
         
         url_config = self.config.get('url_collection', {})
         if not url_config:
-            return []
+            return None
         
-        catalog_url = self.config.get('catalog_base_url', '')
+        catalog_url = self.profile.catalog_base_url
         if not catalog_url:
-            print(f"[COLLECT] ERROR: catalog_base_url не установлен в конфиге", file=sys.stderr, flush=True)
-            return []
-        
-        product_urls = set()
-        max_urls = url_config.get('max_urls', 500)
-        max_depth = url_config.get('max_depth', 2)
-        filter_keywords = url_config.get('filter_keywords', [])
-        exclude_keywords = url_config.get('exclude_keywords', [])
-        request_delay = url_config.get('request_delay', 2.0)
-        timeout = url_config.get('timeout', 30)
-        infinite_scroll = url_config.get('infinite_scroll', False)
-        max_time_seconds = url_config.get('max_collect_time_seconds')
-        soft_exit_seconds = url_config.get('soft_exit_seconds', 10)
-
-        start_time = time.time()
-        page_fingerprints = {}
-        page_fingerprint_repeats = {}
-        zero_unique_streak = {}
+            plog.error(f"[COLLECT] ERROR: catalog_base_url не установлен в конфиге")
+            return None
+
+        uc = self.profile.url_collection
+        filter_keywords = list(uc.filter_keywords)
+        exclude_keywords = list(uc.exclude_keywords)
+        discovery_workers = uc.discovery_workers
+
+        state = DiscoveryState(
+            callback=callback,
+            max_urls=max_urls,
+            max_time_seconds=max_time_seconds,
+            start_time=start_time,
+            soft_exit_seconds=uc.soft_exit_seconds,
+            max_pages_per_category=max_pages,
+            check_limits=check_limits,
+        )
+        self.discovery_state = state
 
         if not hasattr(self, 'page_duplicates_dropped'):
             self.page_duplicates_dropped = 0
         if not hasattr(self, 'global_duplicates_dropped'):
             self.global_duplicates_dropped = 0
 
-        def _normalize_for_fingerprint(url: str) -> str:
-            try:
-                parsed = urlparse(url)
-                params_to_remove = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_term',
-                                   'utm_content', 'fbclid', 'gclid', 'yclid', '_ga'}
-                if parsed.query:
-                    params = parse_qs(parsed.query, keep_blank_values=True)
-                    filtered_params = {k: v for k, v in params.items()
-                                       if k.lower() not in params_to_remove}
-                    new_query = urlencode(filtered_params, doseq=True) if filtered_params else ''
-                else:
-                    new_query = ''
-                path = parsed.path.rstrip('/') if parsed.path != '/' else '/'
-                normalized = f"{parsed.scheme}://{parsed.netloc}{path}"
-                if new_query:
-                    normalized += f"?{new_query}"
-                return normalized
-            except Exception:
-                return url
-
-        def _category_key(url: str) -> str:
-            try:
-                parsed = urlparse(url)
-                params = parse_qs(parsed.query, keep_blank_values=True)
-                pagination_param = url_config.get('pagination_param')
-                if pagination_param and pagination_param in params:
-                    params.pop(pagination_param, None)
-                new_query = urlencode(params, doseq=True) if params else ''
-                base = f"{parsed.scheme}://{parsed.netloc}{parsed.path}".rstrip('/')
-                return f"{base}?{new_query}" if new_query else base
-            except Exception:
-                return url
-        
-        queue = [(catalog_url, 0)]  # (url, depth)
-        visited_pages = set()
-        
-        print(f"[COLLECT] Начинаю сбор URL с {catalog_url}", file=sys.stderr, flush=True)
-        print(
+        plog.info(f"[COLLECT] Начинаю сбор URL с {catalog_url}")
+        plog.info(
             f"[COLLECT] URL фильтры: filter_keywords={filter_keywords or []} exclude_keywords={exclude_keywords or []}",
-            file=sys.stderr,
-            flush=True,
         )
         self._emit_log('info', 'Collect URLs started', {
             'catalog_url': catalog_url,
             'filter_keywords': filter_keywords or [],
             'exclude_keywords': exclude_keywords or [],
             'max_urls': max_urls,
-            'max_depth': max_depth,
-            'timeout': timeout,
-            'infinite_scroll': bool(infinite_scroll),
+            'max_depth': uc.max_depth,
+            'timeout': uc.timeout,
+            'infinite_scroll': uc.infinite_scroll,
+            'discovery_workers': discovery_workers,
         })
-        
+
         try:
-            while queue and len(product_urls) < max_urls:
-                current_url, current_depth = queue.pop(0)
-                
-                if current_url in visited_pages or current_depth > max_depth:
-                    continue
-                
-                visited_pages.add(current_url)
+            if discovery_workers <= 1:
+                self._crawl_pages([(catalog_url, 0)], state)
+            else:
+                # Корень каталога обходится здесь; найденные категории — шарды
+                # для параллельных воркеров
+                category_seeds: List[tuple] = []
+                self._crawl_pages([(catalog_url, 0)], state, category_sink=category_seeds)
+                self._crawl_categories_parallel(category_seeds, state, discovery_workers)
+        except Exception as e:
+            plog.error(f"[COLLECT] Критическая ошибка сбора: {e}", exc_info=True)
+
+        self.page_duplicates_dropped += state.page_duplicates_dropped
+        self.global_duplicates_dropped += state.global_duplicates_dropped
+        if state.last_stop_reason:
+            self.collect_stop_reason = state.last_stop_reason
+        self.collect_category_stats = state.category_stats_snapshot()
+        return state
+
+    def _crawl_categories_parallel(self, seeds: List[tuple], state: 'DiscoveryState', workers: int) -> None:
+        """
+        Обходит категории (шарды) параллельно.
+
+        Каждый воркер — отдельный экземпляр адаптера со своим браузером
+        (sync Playwright нельзя делить между потоками). Воркеры берут
+        категории из общей очереди, поэтому медленная категория занимает
+        только один воркер и не задерживает остальные. Текущий адаптер
+        (браузер уже запущен) работает как один из воркеров.
+        """
+        if not seeds:
+            return
+
+        shard_queue: Queue = Queue()
+        for seed in seeds:
+            shard_queue.put(seed)
+        workers = min(workers, len(seeds))
+        plog.info(f"[COLLECT] Параллельный обход: categories={len(seeds)} workers={workers}")
+
+        def drain(adapter: 'SupplierAdapter') -> None:
+            while not state.should_stop():
+                try:
+                    seed = shard_queue.get_nowait()
+                except Empty:
+                    return
+                adapter._crawl_pages([seed], state)
+
+        def worker_main(index: int) -> None:
+            adapter = type(self)(self.config)
+            adapter.log_callback = self.log_callback
+            try:
+                adapter.setup()
+                drain(adapter)
+            except Exception as e:
+                plog.error(f"[COLLECT] Ошибка воркера discovery-{index}: {e}")
+            finally:
+                try:
+                    adapter.teardown()
+                except Exception:
+                    pass
+
+        threads = [
+            threading.Thread(target=worker_main, args=(i,), name=f'discovery-{i}', daemon=True)
+            for i in range(1, workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            drain(self)
+        finally:
+            for thread in threads:
+                thread.join()
+
+    def _crawl_pages(
+        self,
+        queue: List[tuple],
+        state: 'DiscoveryState',
+        category_sink: Optional[List[tuple]] = None,
+    ) -> None:
+        """
+        BFS-обход страниц каталога из queue с общим состоянием state.
+
+        Args:
+            queue: Начальная очередь [(url, depth)]
+            state: Общие лимиты, дедупликация и статистика
+            category_sink: Если задан, найденные подкатегории не обходятся, а
+                складываются сюда (шарды для параллельного обхода)
+        """
+        profile = self.profile
+        url_config = profile.url_collection
+        max_depth = url_config.max_depth
+        filter_keywords = url_config.filter_keywords
+        request_delay = url_config.request_delay
+        timeout = url_config.timeout
+        infinite_scroll = url_config.infinite_scroll
+        pagination_param = url_config.pagination_param or None
+        product_selector = url_config.product_selector or None
+
+        # Детекторы зацикливания пагинации — по категориям, внутри обхода
+        page_fingerprints = {}
+        page_fingerprint_repeats = {}
+        zero_unique_streak = {}
+
+        def category_of(url: str) -> str:
+            return normalize(url, pagination_param).category_key
+
+        while queue and not state.urls_full():
+            current_url, current_depth = queue.pop(0)
+            
+            if current_depth > max_depth or not state.visit(current_url):
+                continue
+
+            category_key = category_of(current_url)
+            if state.category_page_limit_reached(category_key):
+                continue
+            
+            try:
+                time_stop = state.time_stop_reason()
+                if time_stop == 'TIME_LIMIT_REACHED':
+                    plog.warning(f"[COLLECT] TIME_LIMIT_REACHED before request ({int(state.elapsed())}s >= {state.max_time_seconds}s)")
+                    state.stop(time_stop)
+                    break
+                if time_stop == 'SOFT_EXIT_TIME_LIMIT':
+                    plog.warning(f"[COLLECT] SOFT_EXIT: remaining {state.max_time_seconds - state.elapsed():.1f}s")
+                    state.stop(time_stop)
+                    break
+                if state.should_stop():
+                    break
+
+                # Переходим на страницу
+                plog.info(f"[COLLECT] Загружаю (depth={current_depth}): {current_url}")
+                self._goto_page(current_url, timeout)
+                time.sleep(request_delay)
                 
+                # Даём странице время загрузиться и JavaScript выполниться
                 try:
-                    if max_time_seconds is not None:
-                        elapsed = time.time() - start_time
-                        if elapsed >= max_time_seconds:
-                            print(f"[COLLECT] TIME_LIMIT_REACHED before request ({int(elapsed)}s >= {max_time_seconds}s)", file=sys.stderr, flush=True)
-                            self.collect_stop_reason = 'TIME_LIMIT_REACHED'
-                            break
-                        if max_time_seconds - elapsed <= soft_exit_seconds:
-                            print(f"[COLLECT] SOFT_EXIT: remaining {max_time_seconds - elapsed:.1f}s", file=sys.stderr, flush=True)
-                            self.collect_stop_reason = 'SOFT_EXIT_TIME_LIMIT'
-                            break
-
-                    # Переходим на страницу
-                    print(f"[COLLECT] Загружаю (depth={current_depth}): {current_url}", file=sys.stderr, flush=True)
-                    self._goto_page(current_url, timeout)
-                    time.sleep(request_delay)
+                    self._page.wait_for_selector(product_selector, timeout=5000)
+                except:
+                    plog.warning(f"[COLLECT] Product selector not found in time, continuing anyway")
+                
+                # Собираем товары с этой страницы
+                plog.info(f"[COLLECT] Looking for products with selector: {product_selector}")
+                products_found_on_page = 0
+                unique_added = 0
+                base_url = profile.resolve_base(current_url)
+                if product_selector:
+                    page_products = self._collect_elements(product_selector)
+                    products_found_on_page = len(page_products)
+                    plog.info(f"[COLLECT] Found {products_found_on_page} products")
                     
-                    # Даём странице время загрузиться и JavaScript выполниться
-                    try:
-                        self._page.wait_for_selector(url_config.get('product_selector'), timeout=5000)
-                    except:
-                        print(f"[COLLECT] Product selector not found in time, continuing anyway", file=sys.stderr, flush=True)
+                    # Если страница пустая - прекращаем пагинацию
+                    if products_found_on_page == 0:
+                        plog.info(f"[COLLECT] Страница пустая, пропускаем дальнейшую пагинацию")
+                        # Удаляем из очереди все остальные страницы этой категории
+                        if pagination_param:
+                            base_url_without_params = current_url.split('?')[0]
+                            queue[:] = [(url, depth) for url, depth in queue if base_url_without_params not in url]
                     
-                    # Собираем товары с этой страницы
-                    product_selector = url_config.get('product_selector')
-                    print(f"[COLLECT] Looking for products with selector: {product_selector}", file=sys.stderr, flush=True)
-                    products_found_on_page = 0
-                    if product_selector:
-                        page_products = self._collect_elements(product_selector)
-                        products_found_on_page = len(page_products)
-                        print(f"[COLLECT] Found {products_found_on_page} products", file=sys.stderr, flush=True)
-                        
-                        # Если страница пустая - прекращаем пагинацию
-                        if products_found_on_page == 0:
-                            print(f"[COLLECT] Страница пустая, пропускаем дальнейшую пагинацию", file=sys.stderr, flush=True)
-                            # Удаляем из очереди все остальные страницы этой категории
-                            pagination_param = url_config.get('pagination_param')
-                            if pagination_param:
-                                base_url_without_params = current_url.split('?')[0]
-                                queue = [(url, depth) for url, depth in queue if base_url_without_params not in url]
+                    page_urls = []
+                    page_filter_passed = 0
+                    page_filter_no_keywords = 0
+                    page_filter_excluded = 0
+                    page_filter_no_match = 0
+                    for product_element in page_products:
+                        try:
+                            href = product_element.get_attribute('href')
+                            if href:
+                                abs_url = urljoin(base_url, href)
+                                if self._filter_url(abs_url, filter_keywords):
+                                    page_urls.append(normalize(abs_url).url)
+                                    if self._last_filter_reason == 'no_keywords':
+                                        page_filter_no_keywords += 1
+                                    else:
+                                        page_filter_passed += 1
+                                else:
+                                    if self._last_filter_reason == 'excluded':
+                                        page_filter_excluded += 1
+                                    else:
+                                        page_filter_no_match += 1
+                        except Exception as e:
+                            plog.error(f"[COLLECT] Ошибка извлечения href: {e}")
+                    if products_found_on_page > 0:
+                        plog.info(
+                            f"[COLLECT] Фильтрация на странице: passed={page_filter_passed + page_filter_no_keywords} "
+                            f"(matched={page_filter_passed}, no_keywords={page_filter_no_keywords}), "
+                            f"excluded={page_filter_excluded}, no_match={page_filter_no_match}",
+                        )
+                        self._emit_log('info', 'Filter summary for page', {
+                            'page_url': current_url,
+                            'products_found': products_found_on_page,
+                            'passed_total': page_filter_passed + page_filter_no_keywords,
+                            'passed_matched': page_filter_passed,
+                            'passed_no_keywords': page_filter_no_keywords,
+                            'excluded': page_filter_excluded,
+                            'no_match': page_filter_no_match,
+                        })
+
+                    # Dedup within page and against global set (shared between workers)
+                    page_urls_unique = list(dict.fromkeys(page_urls))
+                    page_dupes = len(page_urls) - len(page_urls_unique)
+                    if page_dupes > 0:
+                        plog.info(f"[COLLECT] Page duplicates dropped: {page_dupes}")
+                    unique_added = state.add_products(page_urls_unique, category_key, page_dupes=page_dupes)
+
+                    # Pagination loop detection by fingerprint
+                    fingerprint_source = sorted(page_urls_unique)
+                    payload = "\n".join(fingerprint_source[:200])
+                    fingerprint = url_hash64(payload)
+                    page_fingerprints.setdefault(category_key, set())
+
+                    if fingerprint in page_fingerprints[category_key]:
+                        repeat_key = (category_key, fingerprint)
+                        page_fingerprint_repeats[repeat_key] = page_fingerprint_repeats.get(repeat_key, 0) + 1
+                        if page_fingerprint_repeats[repeat_key] >= 3:
+                            plog.warning(f"[COLLECT] PAGINATION_LOOP_DETECTED for {category_key}")
+                            state.stop_category(category_key, 'PAGINATION_LOOP_DETECTED')
+                            # Remove queued pages of same category
+                            queue[:] = [(url, depth) for url, depth in queue if category_of(url) != category_key]
+                            state.record_page(category_key)
+                            continue
+                    else:
+                        page_fingerprints[category_key].add(fingerprint)
+
+                    # Stop if no new uniques twice in a row
+                    zero_unique_streak.setdefault(category_key, 0)
+                    if unique_added == 0:
+                        zero_unique_streak[category_key] += 1
+                        if zero_unique_streak[category_key] >= 2:
+                            plog.info(f"[COLLECT] Stop category: 2x0 unique подряд (page={current_url})")
+                            state.stop_category(category_key, 'NO_NEW_UNIQUE_URLS')
+                            queue[:] = [(url, depth) for url, depth in queue if category_of(url) != category_key]
+                    else:
+                        zero_unique_streak[category_key] = 0
+                
+                # Собираем подкатегории (если есть и depth < max_depth)
+                if current_depth < max_depth:
+                    subcategory_selector = url_config.subcategory_selector
+                    if subcategory_selector:
+                        subcategories = self._collect_elements(subcategory_selector)
+                        allowed_categories = profile.allowed_categories
                         
-                        page_urls = []
-                        page_filter_passed = 0
-                        page_filter_no_keywords = 0
-                        page_filter_excluded = 0
-                        page_filter_no_match = 0
-                        for product_element in page_products:
+                        for subcat_element in subcategories:
                             try:
-                                href = product_element.get_attribute('href')
+                                href = subcat_element.get_attribute('href')
                                 if href:
-                                    abs_url = urljoin(self.config.get('base_url', current_url), href)
-                                    if self._filter_url(abs_url, filter_keywords):
-                                        page_urls.append(_normalize_for_fingerprint(abs_url))
-                                        if self._last_filter_reason == 'no_keywords':
-                                            page_filter_no_keywords += 1
+                                    abs_url = urljoin(base_url, href)
+                                    
+                                    # Фильтруем по списку разрешенных категорий
+                                    if allowed_categories:
+                                        # Извлекаем имя категории из URL: /category/category_name/
+                                        match = abs_url.split('/category/')
+                                        if len(match) > 1:
+                                            category_name = match[1].split('/')[0]
+                                            if category_name not in allowed_categories:
+                                                plog.warning(f"[COLLECT] Пропускаю категорию (не в allowed_categories): {category_name}")
+                                                continue
                                         else:
-                                            page_filter_passed += 1
-                                    else:
-                                        if self._last_filter_reason == 'excluded':
-                                            page_filter_excluded += 1
+                                            # Если это не категория, пропускаем
+                                            continue
+                                    
+                                    if not state.is_visited(abs_url):
+                                        if category_sink is not None:
+                                            if (abs_url, current_depth + 1) not in category_sink:
+                                                category_sink.append((abs_url, current_depth + 1))
                                         else:
-                                            page_filter_no_match += 1
+                                            queue.append((abs_url, current_depth + 1))
                             except Exception as e:
-                                print(f"[COLLECT] Ошибка извлечения href: {e}", file=sys.stderr, flush=True)
-                        if products_found_on_page > 0:
-                            print(
-                                f"[COLLECT] Фильтрация на странице: passed={page_filter_passed + page_filter_no_keywords} "
-                                f"(matched={page_filter_passed}, no_keywords={page_filter_no_keywords}), "
-                                f"excluded={page_filter_excluded}, no_match={page_filter_no_match}",
-                                file=sys.stderr,
-                                flush=True,
-                            )
-                            self._emit_log('info', 'Filter summary for page', {
-                                'page_url': current_url,
-                                'products_found': products_found_on_page,
-                                'passed_total': page_filter_passed + page_filter_no_keywords,
-                                'passed_matched': page_filter_passed,
-                                'passed_no_keywords': page_filter_no_keywords,
-                                'excluded': page_filter_excluded,
-                                'no_match': page_filter_no_match,
-                            })
-
-                        # Dedup within page and against global set
-                        page_urls_unique = list(dict.fromkeys(page_urls))
-                        new_urls = [u for u in page_urls_unique if u not in product_urls]
-                        page_dupes = len(page_urls) - len(page_urls_unique)
-                        global_dupes = len(page_urls_unique) - len(new_urls)
-
-                        if page_dupes > 0:
-                            self.page_duplicates_dropped += page_dupes
-                            print(f"[COLLECT] Page duplicates dropped: {page_dupes}", file=sys.stderr, flush=True)
-
-                        if global_dupes > 0:
-                            self.global_duplicates_dropped += global_dupes
-
-                        for abs_url in new_urls:
-                            product_urls.add(abs_url)
-                            if len(product_urls) >= max_urls:
-                                break
+                                plog.error(f"[COLLECT] Ошибка извлечения подкатегории: {e}")
+                
+                # Обработка infinite scroll
+                if infinite_scroll and not state.urls_full():
+                    plog.info(f"[COLLECT] Обработка infinite scroll...")
+                    scrolled = self._scroll_and_collect(product_selector, filter_keywords, state.urls_remaining())
+                    state.add_products(list(scrolled), category_key, count_duplicates=False)
 
-                        # Pagination loop detection by fingerprint
-                        category_key = _category_key(current_url)
-                        fingerprint_source = sorted(page_urls_unique)
-                        payload = "\n".join(fingerprint_source[:200])
-                        fingerprint = hashlib.sha1(payload.encode("utf-8")).hexdigest()
-                        page_fingerprints.setdefault(category_key, set())
-
-                        if fingerprint in page_fingerprints[category_key]:
-                            repeat_key = (category_key, fingerprint)
-                            page_fingerprint_repeats[repeat_key] = page_fingerprint_repeats.get(repeat_key, 0) + 1
-                            if page_fingerprint_repeats[repeat_key] >= 3:
-                                print(f"[COLLECT] PAGINATION_LOOP_DETECTED for {category_key}", file=sys.stderr, flush=True)
-                                self.collect_stop_reason = 'PAGINATION_LOOP_DETECTED'
-                                # Remove queued pages of same category
-                                queue = [(url, depth) for url, depth in queue if _category_key(url) != category_key]
-                                continue
-                        else:
-                            page_fingerprints[category_key].add(fingerprint)
-
-                        # Stop if no new uniques twice in a row
-                        unique_added = len(new_urls)
-                        zero_unique_streak.setdefault(category_key, 0)
-                        if unique_added == 0:
-                            zero_unique_streak[category_key] += 1
-                            if zero_unique_streak[category_key] >= 2:
-                                print(f"[COLLECT] Stop category: 2x0 unique подряд (page={current_url})", file=sys.stderr, flush=True)
-                                self.collect_stop_reason = 'NO_NEW_UNIQUE_URLS'
-                                queue = [(url, depth) for url, depth in queue if _category_key(url) != category_key]
-                        else:
-                            zero_unique_streak[category_key] = 0
-                    
-                    # Собираем подкатегории (если есть и depth < max_depth)
-                    if current_depth < max_depth:
-                        subcategory_selector = url_config.get('subcategory_selector')
-                        if subcategory_selector:
-                            subcategories = self._collect_elements(subcategory_selector)
-                            allowed_categories = self.config.get('allowed_categories', [])
-                            
-                            for subcat_element in subcategories:
-                                try:
-                                    href = subcat_element.get_attribute('href')
-                                    if href:
-                                        abs_url = urljoin(self.config.get('base_url', current_url), href)
-                                        
-                                        # Фильтруем по списку разрешенных категорий
-                                        if allowed_categories:
-                                            # Извлекаем имя категории из URL: /category/category_name/
-                                            match = abs_url.split('/category/')
-                                            if len(match) > 1:
-                                                category_name = match[1].split('/')[0]
-                                                if category_name not in allowed_categories:
-                                                    print(f"[COLLECT] Пропускаю категорию (не в allowed_categories): {category_name}", file=sys.stderr, flush=True)
-                                                    continue
-                                            else:
-                                                # Если это не категория, пропускаем
-                                                continue
-                                        
-                                        if abs_url not in visited_pages:
-                                            queue.append((abs_url, current_depth + 1))
-                                except Exception as e:
-                                    print(f"[COLLECT] Ошибка извлечения подкатегории: {e}", file=sys.stderr, flush=True)
-                    
-                    # Обработка infinite scroll
-                    if infinite_scroll and len(product_urls) < max_urls:
-                        print(f"[COLLECT] Обработка infinite scroll...", file=sys.stderr, flush=True)
-                        product_urls.update(self._scroll_and_collect(product_selector, filter_keywords, max_urls - len(product_urls)))
-                    
-                    # URL-based пагинация (PAGEN_1=2, PAGEN_1=3 и т.д.)
-                    pagination_param = url_config.get('pagination_param')
-                    pagination_max_pages = url_config.get('pagination_max_pages', 10)
-                    if pagination_param and len(product_urls) < max_urls:
-                        # Проверяем, какая текущая страница
-                        if pagination_param in current_url:
-                            # Уже не первая страница, пропускаем
-                            pass
-                        else:
-                            # Первая страница - добавляем в очередь страницы 2, 3, 4...
-                            print(f"[COLLECT] Добавляю страницы пагинации (param={pagination_param}, max={pagination_max_pages})", file=sys.stderr, flush=True)
-                            for page_num in range(2, pagination_max_pages + 1):
-                                if len(product_urls) >= max_urls:
-                                    break
-                                separator = '&' if '?' in current_url else '?'
-                                next_page_url = f"{current_url}{separator}{pagination_param}={page_num}"
-                                if next_page_url not in visited_pages:
-                                    queue.append((next_page_url, current_depth))
-                    
-                    # Переход на следующую страницу (пагинация через кнопку)
-                    next_selector = url_config.get('pagination_next_selector')
-                    if next_selector and len(product_urls) < max_urls and not pagination_param:
-                        try:
-                            next_button = self._find_element(next_selector)
-                            if next_button:
-                                next_href = next_button.get_attribute('href')
-                                if next_href:
-                                    next_url = urljoin(self.config.get('base_url', current_url), next_href)
-                                    if next_url not in visited_pages:
-                                        queue.append((next_url, current_depth))
-                        except Exception as e:
-                            print(f"[COLLECT] Пагинация не найдена: {e}", file=sys.stderr, flush=True)
+                state.record_page(category_key)
                 
-                except Exception as e:
-                    print(f"[COLLECT] Ошибка загрузки {current_url}: {e}", file=sys.stderr, flush=True)
-        
-        except Exception as e:
-            print(f"[COLLECT] Критическая ошибка сбора: {e}", file=sys.stderr, flush=True)
-            import traceback
-            traceback.print_exc(file=sys.stderr)
-        
-        print(f"[COLLECT] Собрано {len(product_urls)} URL товаров", file=sys.stderr, flush=True)
-        self.product_urls = list(product_urls)
-        return self.product_urls
+                # URL-based пагинация (PAGEN_1=2, PAGEN_1=3 и т.д.)
+                pagination_max_pages = url_config.pagination_max_pages
+                if pagination_param and not state.urls_full():
+                    # Проверяем, какая текущая страница
+                    if pagination_param in current_url:
+                        # Уже не первая страница, пропускаем
+                        pass
+                    else:
+                        # Первая страница - добавляем в очередь страницы 2, 3, 4...
+                        plog.info(f"[COLLECT] Добавляю страницы пагинации (param={pagination_param}, max={pagination_max_pages})")
+                        for page_num in range(2, pagination_max_pages + 1):
+                            if state.urls_full():
+                                break
+                            separator = '&' if '?' in current_url else '?'
+                            next_page_url = f"{current_url}{separator}{pagination_param}={page_num}"
+                            if not state.is_visited(next_page_url):
+                                queue.append((next_page_url, current_depth))
+                
+                # Переход на следующую страницу (пагинация через кнопку)
+                next_selector = url_config.pagination_next_selector
+                if next_selector and not state.urls_full() and not pagination_param:
+                    try:
+                        next_button = self._find_element(next_selector)
+                        if next_button:
+                            next_href = next_button.get_attribute('href')
+                            if next_href:
+                                next_url = urljoin(base_url, next_href)
+                                if not state.is_visited(next_url):
+                                    queue.append((next_url, current_depth))
+                    except Exception as e:
+                        plog.warning(f"[COLLECT] Пагинация не найдена: {e}")
+
+                state.poll_external_limits()
+            
+            except Exception as e:
+                plog.error(f"[COLLECT] Ошибка загрузки {current_url}: {e}")
     
     def get_collected_urls(self) -> List[str]:
         """
@@ -473,43 +794,35 @@ class SupplierAdapter(ABC):
         Returns:
             bool: True если URL проходит фильтр
         """
-        url_lower = url.lower()
-
         self.filter_stats['checked'] += 1
-        self._last_filter_reason = None
-        self._last_filter_keyword = None
 
-        # Сначала проверяем exclude_keywords
-        exclude_keywords = self.config.get('url_collection', {}).get('exclude_keywords', [])
-        if exclude_keywords:
-            for keyword in exclude_keywords:
-                if keyword.lower() in url_lower:
-                    self.filter_stats['excluded'] += 1
-                    self._last_filter_reason = 'excluded'
-                    self._last_filter_keyword = keyword
-                    self._maybe_log_filter_sample(url, passed=False)
-                    return False
+        classifier = self.url_classifier
+        if keywords is not self._classifier_keywords:
+            classifier = UrlClassifier.from_config(self.config, filter_keywords=keywords)
+        classification = classifier.classify(url)
+
+        self._last_filter_reason = classification.reason
+        self._last_filter_keyword = classification.matched_keyword
+
+        if classification.excluded:
+            self.filter_stats['excluded'] += 1
+            self._maybe_log_filter_sample(url, passed=False)
+            return False
 
         # Если нет keywords, пропускаем все
-        if not keywords:
+        if not classification.has_filter_keywords:
             self.filter_stats['passed'] += 1
             self.filter_stats['no_keywords'] += 1
-            self._last_filter_reason = 'no_keywords'
             self._maybe_log_filter_sample(url, passed=True)
             return True
 
-        # Проверяем наличие хотя бы одного keyword
-        for keyword in keywords:
-            if keyword.lower() in url_lower:
-                self.filter_stats['passed'] += 1
-                self.filter_stats['matched_keyword'] += 1
-                self._last_filter_reason = 'matched'
-                self._last_filter_keyword = keyword
-                self._maybe_log_filter_sample(url, passed=True)
-                return True
+        if classification.filter_keyword is not None:
+            self.filter_stats['passed'] += 1
+            self.filter_stats['matched_keyword'] += 1
+            self._maybe_log_filter_sample(url, passed=True)
+            return True
 
         self.filter_stats['no_match'] += 1
-        self._last_filter_reason = 'no_match'
         self._maybe_log_filter_sample(url, passed=False)
         return False
 
@@ -519,10 +832,8 @@ class SupplierAdapter(ABC):
         keyword = self._last_filter_keyword or ''
 
         if self._filter_debug_samples < self.filter_debug_sample_limit:
-            print(
+            plog.info(
                 f"[COLLECT] FILTER sample: passed={passed} reason={reason} keyword={keyword} url={url}",
-                file=sys.stderr,
-                flush=True,
             )
             self._emit_log('info', 'Filter sample', {
                 'passed': passed,
@@ -534,13 +845,11 @@ class SupplierAdapter(ABC):
             return
 
         if self.filter_stats['checked'] % self.filter_debug_log_every == 0:
-            print(
+            plog.info(
                 "[COLLECT] FILTER summary: "
                 f"checked={self.filter_stats['checked']} passed={self.filter_stats['passed']} "
                 f"excluded={self.filter_stats['excluded']} no_keywords={self.filter_stats['no_keywords']} "
                 f"matched={self.filter_stats['matched_keyword']} no_match={self.filter_stats['no_match']}",
-                file=sys.stderr,
-                flush=True,
             )
             self._emit_log('info', 'Filter summary', {
                 'checked': self.filter_stats['checked'],
@@ -584,13 +893,13 @@ class SupplierAdapter(ABC):
                     try:
                         href = elem.get_attribute('href')
                         if href:
-                            abs_url = urljoin(self.config.get('base_url'), href)
+                            abs_url = urljoin(self.profile.base_url, href)
                             if self._filter_url(abs_url, filter_keywords):
                                 products.add(abs_url)
                     except:
                         pass
         except Exception as e:
-            print(f"[COLLECT] Ошибка infinite scroll: {e}", file=sys.stderr, flush=True)
+            plog.error(f"[COLLECT] Ошибка infinite scroll: {e}")
         
         return products
     
@@ -0,0 +1,17 @@
+# parser/benchmarks/__init__.py
+
+"""
+Офлайн-бенчмарки извлечения данных со страниц товаров.
+
+Страницы записываются в HAR-корпус (corpus.py) и воспроизводятся без сети:
+браузерные движки получают ответы через context.route_from_har, HTTP-first
+движок (raw_html) разбирает тела документов из HAR напрямую. Запуск:
+
+    python -m parser.benchmarks.replay --sample 50
+    python -m parser.benchmarks.replay --har corpus.har --engine all
+
+Сквозная пропускная способность очереди (воркер + API) измеряется против
+локальной замены Laravel API (api_standin.py):
+
+    python -m parser.benchmarks.queue_e2e --urls 200 --concurrency 3
+"""
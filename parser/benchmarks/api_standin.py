@@ -0,0 +1,360 @@
+# parser/benchmarks/api_standin.py
+
+"""
+Локальная замена Laravel API для нагрузочных прогонов AsyncQueueWorker.
+
+Реализует эндпоинты, от которых зависит воркер:
+
+    POST /api/parser/urls/claim          — выдача пачки URL с арендой (lease)
+    POST /api/parser/urls/report         — статусы URL (done/failed/blocked)
+    POST /api/parser/urls/release        — снятие аренды воркера
+    POST /api/parser/materials/batch     — сохранение материалов
+    POST /api/internal/parser/callback   — события сессии (progress/finish/...)
+
+и отдаёт сами страницы товаров (GET /catalog/ldsp/<id>/, разметка как в
+синтетическом корпусе corpus.py), так что прогон не выходит в сеть.
+
+Семантика аренды повторяет UrlQueueController: claim атомарно переводит
+pending → processing (locked_by, locked_at); аренда старше lease_ttl_s
+считается зависшей и возвращается в pending перед выдачей; release
+возвращает в pending только URL этого воркера.
+
+На эндпоинты управления можно добавить задержку (latency_ms ± jitter_ms) и
+ошибки: 5xx, 401, 422 и «таймаут» (ответ после timeout_s). Счётчики запросов,
+байтов и статусов по эндпоинтам — в stats().
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from .corpus import product_html
+
+CONTROL_ENDPOINTS = {
+    '/api/parser/urls/claim': 'claim',
+    '/api/parser/urls/report': 'report',
+    '/api/parser/urls/release': 'release',
+    '/api/parser/materials/batch': 'materials_batch',
+    '/api/internal/parser/callback': 'callback',
+}
+
+URL_STATUSES = ('done', 'failed', 'blocked')
+# Предел пачки storeBatch (materials max:200)
+MATERIALS_BATCH_MAX = 200
+
+
+@dataclass
+class FaultConfig:
+    """Задержки и ошибки, добавляемые к эндпоинтам управления."""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0       # доля ответов error_status
+    error_status: int = 503
+    auth_error_rate: float = 0.0  # доля ответов 401
+    invalid_rate: float = 0.0     # доля ответов 422
+    timeout_rate: float = 0.0     # доля запросов, отвечающих через timeout_s
+    timeout_s: float = 35.0
+    endpoints: Optional[frozenset] = None  # None — все эндпоинты управления
+
+
+class LaravelStandIn:
+    """In-memory очередь URL и эндпоинты API парсера."""
+
+    def __init__(
+        self,
+        pages: int = 100,
+        supplier_name: str = 'skm_mebel',
+        faults: Optional[FaultConfig] = None,
+        lease_ttl_s: float = 1800.0,
+        token: Optional[str] = None,
+        seed: int = 1,
+    ):
+        self.supplier_name = supplier_name
+        self.faults = faults or FaultConfig()
+        self.lease_ttl_s = lease_ttl_s
+        self.token = token
+        self._rng = random.Random(seed)
+        self._page_seed = seed
+        self.pages = pages
+        self.base_url = ''  # заполняется в start()
+
+        self.urls: Dict[int, Dict[str, Any]] = {}
+        self.materials_saved = 0
+        self.finish_summary: Optional[Dict[str, Any]] = None
+        self.stale_reports = 0
+        self.leases_expired = 0
+
+        self.requests: Dict[str, int] = {}
+        self.bytes_in: Dict[str, int] = {}
+        self.bytes_out: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[int, int]] = {}
+        self.injected: Dict[str, Dict[str, int]] = {}
+        self.first_claim_at: Optional[float] = None
+        self.last_report_at: Optional[float] = None
+
+        self._runner: Optional[web.AppRunner] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # === Очередь ===
+
+    def _seed_urls(self) -> None:
+        self.urls = {
+            i: {
+                'id': i,
+                'url': f"{self.base_url}/catalog/ldsp/{i}/",
+                'status': 'pending',
+                'locked_by': None,
+                'locked_at': None,
+                'attempts': 0,
+            }
+            for i in range(1, self.pages + 1)
+        }
+
+    def _expire_leases(self) -> None:
+        cutoff = time.monotonic() - self.lease_ttl_s
+        for record in self.urls.values():
+            if record['status'] == 'processing' and record['locked_at'] < cutoff:
+                record.update(status='pending', locked_by=None, locked_at=None)
+                self.leases_expired += 1
+
+    # === Эндпоинты ===
+
+    async def claim(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        batch_size = data.get('batch_size')
+        if not data.get('supplier_name') or not data.get('worker_id') or not isinstance(batch_size, int) or not 1 <= batch_size <= 100:
+            return web.json_response({'success': False, 'errors': {'batch_size': ['invalid']}}, status=422)
+
+        self._expire_leases()
+        now = time.monotonic()
+        if self.first_claim_at is None:
+            self.first_claim_at = now
+        claimed = []
+        for record in self.urls.values():
+            if len(claimed) >= batch_size:
+                break
+            if record['status'] != 'pending':
+                continue
+            record.update(status='processing', locked_by=data['worker_id'], locked_at=now)
+            record['attempts'] += 1
+            claimed.append({
+                'supplier_url_id': record['id'],
+                'url': record['url'],
+                'supplier_name': self.supplier_name,
+                'material_type': None,
+            })
+        return web.json_response({'success': True, 'urls': claimed, 'count': len(claimed)})
+
+    async def report(self, request: web.Request) -> web.Response:
+        results = (await request.json()).get('results')
+        if not results or any(r.get('supplier_url_id') not in self.urls or r.get('status') not in URL_STATUSES for r in results):
+            return web.json_response({'success': False, 'errors': {'results': ['invalid']}}, status=422)
+
+        processed = {'done': 0, 'failed': 0, 'blocked': 0, 'errors': 0}
+        for result in results:
+            record = self.urls[result['supplier_url_id']]
+            if record['status'] != 'processing':
+                # Аренда истекла и URL выдан заново — отчёт пришёл поздно
+                self.stale_reports += 1
+            record.update(status=result['status'], locked_by=None, locked_at=None)
+            processed[result['status']] += 1
+        self.last_report_at = time.monotonic()
+        return web.json_response({'success': True, 'processed': processed})
+
+    async def release(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        worker_id = data.get('worker_id')
+        if not worker_id:
+            return web.json_response({'success': False, 'errors': {'worker_id': ['required']}}, status=422)
+        count = 0
+        for record in self.urls.values():
+            if record['status'] == 'processing' and record['locked_by'] == worker_id:
+                record.update(status='pending', locked_by=None, locked_at=None)
+                count += 1
+        return web.json_response({'success': True, 'released_count': count})
+
+    async def materials_batch(self, request: web.Request) -> web.Response:
+        materials = (await request.json()).get('materials')
+        # Как storeBatch: 'materials' => 'required|array|min:1|max:200'
+        if not isinstance(materials, list) or not materials:
+            return web.json_response({'success': False, 'errors': {'materials': ['The materials field is required.']}}, status=422)
+        if len(materials) > MATERIALS_BATCH_MAX:
+            return web.json_response({
+                'success': False,
+                'errors': {'materials': [f'The materials field must not have more than {MATERIALS_BATCH_MAX} items.']},
+            }, status=422)
+        self.materials_saved += len(materials)
+        return web.json_response({
+            'success': True,
+            'results': [{'success': True, 'article': m.get('article')} for m in materials],
+            'summary': {'total': len(materials), 'success': len(materials), 'failed': 0},
+        })
+
+    async def callback(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        if data.get('type') == 'finish':
+            self.finish_summary = (data.get('payload') or {}).get('summary')
+        return web.json_response({'success': True, 'command': None})
+
+    async def product_page(self, request: web.Request) -> web.Response:
+        product_id = int(request.match_info['product_id'])
+        rng = random.Random(self._page_seed * 100003 + product_id)
+        return web.Response(text=product_html(product_id, rng, with_meta_price=True), content_type='text/html')
+
+    # === Счётчики и ошибки ===
+
+    def _inject(self, endpoint: str) -> Optional[str]:
+        faults = self.faults
+        if faults.endpoints is not None and endpoint not in faults.endpoints:
+            return None
+        roll = self._rng.random()
+        for kind, rate in (
+            ('timeout', faults.timeout_rate),
+            ('error', faults.error_rate),
+            ('auth', faults.auth_error_rate),
+            ('invalid', faults.invalid_rate),
+        ):
+            if roll < rate:
+                return kind
+            roll -= rate
+        return None
+
+    def _authorized(self, request: web.Request, endpoint: str, body: bytes) -> bool:
+        if not self.token:
+            return True
+        if endpoint == 'callback':
+            try:
+                candidate = json.loads(body).get('token')
+            except ValueError:
+                candidate = None
+            return self.token in (candidate, request.headers.get('Authorization', '').removeprefix('Bearer '))
+        return request.headers.get('X-Parser-Token') == self.token
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        endpoint = CONTROL_ENDPOINTS.get(request.path)
+        if endpoint is None:
+            return await handler(request)
+
+        body = await request.read()
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        self.bytes_in[endpoint] = self.bytes_in.get(endpoint, 0) + len(body)
+
+        faults = self.faults
+        if faults.latency_ms or faults.jitter_ms:
+            delay_ms = max(0.0, faults.latency_ms + self._rng.uniform(-faults.jitter_ms, faults.jitter_ms))
+            await asyncio.sleep(delay_ms / 1000)
+
+        kind = self._inject(endpoint)
+        if kind is not None:
+            injected = self.injected.setdefault(endpoint, {})
+            injected[kind] = injected.get(kind, 0) + 1
+        if kind == 'timeout':
+            await asyncio.sleep(faults.timeout_s)
+            response = web.json_response({'success': False, 'message': 'Gateway Timeout'}, status=504)
+        elif kind == 'error':
+            response = web.json_response({'success': False, 'message': 'Injected server error'}, status=faults.error_status)
+        elif kind == 'auth' or not self._authorized(request, endpoint, body):
+            response = web.json_response({'success': False, 'message': 'Invalid token'}, status=401)
+        elif kind == 'invalid':
+            # Сохранение отклоняет строку пачки (как валидация materials.*), прочие эндпоинты — запрос
+            field = 'materials.0.price_per_unit' if endpoint == 'materials_batch' else 'injected'
+            response = web.json_response({'success': False, 'errors': {field: ['invalid']}}, status=422)
+        else:
+            response = await handler(request)
+
+        by_status = self.statuses.setdefault(endpoint, {})
+        by_status[response.status] = by_status.get(response.status, 0) + 1
+        self.bytes_out[endpoint] = self.bytes_out.get(endpoint, 0) + len(response.body or b'')
+        return response
+
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware], client_max_size=64 * 1024 * 1024)
+        app.router.add_post('/api/parser/urls/claim', self.claim)
+        app.router.add_post('/api/parser/urls/report', self.report)
+        app.router.add_post('/api/parser/urls/release', self.release)
+        app.router.add_post('/api/parser/materials/batch', self.materials_batch)
+        app.router.add_post('/api/internal/parser/callback', self.callback)
+        app.router.add_get('/catalog/ldsp/{product_id:\\d+}/', self.product_page)
+        return app
+
+    def queue_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for record in self.urls.values():
+            counts[record['status']] = counts.get(record['status'], 0) + 1
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'requests': dict(self.requests),
+            'bytes_in': dict(self.bytes_in),
+            'bytes_out': dict(self.bytes_out),
+            'statuses': {k: dict(v) for k, v in self.statuses.items()},
+            'injected': {k: dict(v) for k, v in self.injected.items()},
+            'queue': self.queue_counts(),
+            'materials_saved': self.materials_saved,
+            'leases_expired': self.leases_expired,
+            'stale_reports': self.stale_reports,
+            'active_window_s': (
+                self.last_report_at - self.first_claim_at
+                if self.first_claim_at is not None and self.last_report_at is not None else 0.0
+            ),
+        }
+
+    # === Запуск ===
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Запускает сервер в текущем цикле событий. Возвращает базовый URL."""
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{bound_port}"
+        self._seed_urls()
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Запускает сервер в отдельном потоке со своим циклом событий."""
+        started = threading.Event()
+        result: List[Any] = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            self._loop = loop
+            asyncio.set_event_loop(loop)
+            try:
+                result.append(loop.run_until_complete(self.start(host, port)))
+            except Exception as e:
+                result.append(e)
+                started.set()
+                return
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.stop())
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name='laravel-standin', daemon=True)
+        self._thread.start()
+        started.wait()
+        if isinstance(result[0], Exception):
+            raise result[0]
+        return result[0]
+
+    def stop_thread(self) -> None:
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+            self._thread = None
@@ -0,0 +1,214 @@
+# parser/benchmarks/corpus.py
+
+"""
+HAR-корпус страниц для офлайн-бенчмарков.
+
+- record_corpus: обходит живые URL и пишет HAR (record_har_path Playwright);
+  изображения, шрифты и медиа не загружаются, как в адаптерах.
+- build_sample_har: синтетический корпус в разметке skm-mebel.ru
+  (товары + листинг) — для CI без сети и без записанного корпуса.
+- load_documents: HTML-документы из HAR (url, content-type, тело).
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional
+
+SAMPLE_BASE_URL = 'https://skm-mebel.ru'
+
+
+class HarDocument(NamedTuple):
+    url: str
+    content_type: Optional[str]
+    body: bytes
+
+
+def load_documents(har_path: Path) -> List[HarDocument]:
+    """HTML-документы (status 200, text/html) из HAR в порядке записи."""
+    har = json.loads(Path(har_path).read_bytes())
+    documents = []
+    for entry in har.get('log', {}).get('entries', []):
+        response = entry.get('response', {})
+        content = response.get('content', {})
+        mime = content.get('mimeType') or ''
+        if response.get('status') != 200 or 'html' not in mime:
+            continue
+        text = content.get('text')
+        if text is None:
+            # record_har_content='attach' — тело в отдельном файле рядом с HAR
+            file_name = content.get('_file')
+            if not file_name:
+                continue
+            body = (Path(har_path).parent / file_name).read_bytes()
+        elif content.get('encoding') == 'base64':
+            body = base64.b64decode(text)
+        else:
+            body = text.encode('utf-8')
+        documents.append(HarDocument(entry['request']['url'], mime, body))
+    return documents
+
+
+def _har_entry(url: str, mime: str, body: str) -> dict:
+    size = len(body.encode('utf-8'))
+    return {
+        'startedDateTime': datetime.now(timezone.utc).isoformat(),
+        'time': 0,
+        'request': {
+            'method': 'GET',
+            'url': url,
+            'httpVersion': 'HTTP/1.1',
+            'cookies': [],
+            'headers': [],
+            'queryString': [],
+            'headersSize': -1,
+            'bodySize': 0,
+        },
+        'response': {
+            'status': 200,
+            'statusText': 'OK',
+            'httpVersion': 'HTTP/1.1',
+            'cookies': [],
+            'headers': [
+                {'name': 'Content-Type', 'value': mime},
+                {'name': 'Content-Length', 'value': str(size)},
+            ],
+            'content': {'size': size, 'mimeType': mime, 'text': body},
+            'redirectURL': '',
+            'headersSize': -1,
+            'bodySize': size,
+        },
+        'cache': {},
+        'timings': {'send': 0, 'wait': 0, 'receive': 0},
+    }
+
+
+def product_html(product_id: int, rng: random.Random, with_meta_price: bool) -> str:
+    price = rng.randint(300, 25000)
+    thickness = rng.choice((16, 18, 22, 25))
+    name = f"ЛДСП Egger W{1000 + product_id} {thickness} мм"
+    # Шум, как на реальной странице: меню, описание, скрипты
+    menu = ''.join(f'<li class="menu__item"><a href="/catalog/section-{i}/">Раздел {i}</a></li>' for i in range(40))
+    props = ''.join(f'<tr><td>Свойство {i}</td><td>{rng.randint(1, 999)}</td></tr>' for i in range(25))
+    price_meta = f'<meta itemprop="price" content="{price}">' if with_meta_price else ''
+    price_text = f"{price:,}".replace(',', ' ')
+    return f"""<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8">
+<title>{name} — купить</title>
+<meta property="og:title" content="{name}">
+<script>window.dataLayer = window.dataLayer || []; dataLayer.push({{"ecommerce": {{"id": {product_id}}}}});</script>
+</head><body>
+<header><ul class="menu">{menu}</ul></header>
+<div class="catalog-detail" itemscope itemtype="http://schema.org/Product">
+  <meta itemprop="name" content="{name}">
+  <h1 class="catalog-detail__title">{name}</h1>
+  <div class="catalog-detail__article js-copy-article" data-article="W{1000 + product_id}">Артикул: W{1000 + product_id}</div>
+  <div itemprop="offers" itemscope itemtype="http://schema.org/Offer">{price_meta}
+    <div class="catalog-detail__price">{price_text} ₽</div>
+  </div>
+  <div class="catalog-detail__buy"><button class="btn btn-default to-cart">В корзину</button></div>
+  <table class="props">{props}</table>
+</div>
+<footer>© SKM</footer>
+</body></html>"""
+
+
+def listing_html(product_ids: Iterable[int]) -> str:
+    items = ''.join(
+        f'<div class="catalog-block__item"><a class="dark_link" href="/catalog/ldsp/{pid}/">Товар {pid}</a></div>'
+        for pid in product_ids
+    )
+    return f"""<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>ЛДСП</title></head>
+<body><div class="catalog-block">{items}</div>
+<div class="module-pagination"><a class="next" href="/catalog/ldsp/?PAGEN_1=2">Далее</a></div>
+</body></html>"""
+
+
+def build_sample_har(har_path: Path, pages: int = 50, seed: int = 1) -> List[str]:
+    """
+    Пишет синтетический HAR: pages страниц товаров и страницу листинга.
+    Каждая пятая страница без meta-цены (цена только в видимом тексте).
+
+    Returns:
+        URL страниц товаров
+    """
+    rng = random.Random(seed)
+    product_ids = list(range(1, pages + 1))
+    urls = [f"{SAMPLE_BASE_URL}/catalog/ldsp/{pid}/" for pid in product_ids]
+    entries = [
+        _har_entry(url, 'text/html; charset=utf-8', product_html(pid, rng, with_meta_price=pid % 5 != 0))
+        for pid, url in zip(product_ids, urls)
+    ]
+    entries.append(_har_entry(f"{SAMPLE_BASE_URL}/catalog/ldsp/", 'text/html; charset=utf-8', listing_html(product_ids)))
+    har = {
+        'log': {
+            'version': '1.2',
+            'creator': {'name': 'parser.benchmarks', 'version': '1.0'},
+            'pages': [],
+            'entries': entries,
+        }
+    }
+    Path(har_path).write_text(json.dumps(har, ensure_ascii=False), encoding='utf-8')
+    return urls
+
+
+async def record_corpus(urls: List[str], har_path: Path, timeout_ms: int = 30000) -> int:
+    """
+    Записывает живые страницы в HAR (нужны сеть и Playwright).
+
+    Returns:
+        Количество успешно загруженных страниц
+    """
+    from playwright.async_api import async_playwright
+
+    async def block_heavy(route, request):
+        if request.resource_type in ('image', 'font', 'media'):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    loaded = 0
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=['--disable-dev-shm-usage', '--no-sandbox', '--disable-gpu'])
+        context = await browser.new_context(record_har_path=str(har_path), record_har_content='embed')
+        await context.route('**/*', block_heavy)
+        page = await context.new_page()
+        for url in urls:
+            try:
+                await page.goto(url, wait_until='load', timeout=timeout_ms)
+                loaded += 1
+                print(f"[BENCH] Записано: {url}", file=sys.stderr, flush=True)
+            except Exception as e:
+                print(f"[BENCH] Не удалось записать {url}: {e}", file=sys.stderr, flush=True)
+        # HAR сохраняется при закрытии контекста
+        await context.close()
+        await browser.close()
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Запись HAR-корпуса для офлайн-бенчмарков')
+    parser.add_argument('--out', required=True, help='Путь к HAR-файлу')
+    parser.add_argument('--urls', help='Файл со списком URL (по одному в строке)')
+    parser.add_argument('--sample', type=int, help='Вместо записи — синтетический корпус из N страниц')
+    args = parser.parse_args()
+
+    if args.sample:
+        urls = build_sample_har(Path(args.out), args.sample)
+        print(f"[BENCH] Синтетический корпус: {len(urls)} страниц → {args.out}", file=sys.stderr, flush=True)
+        return
+    if not args.urls:
+        parser.error('нужен --urls или --sample')
+    urls = [line.strip() for line in Path(args.urls).read_text(encoding='utf-8').splitlines() if line.strip()]
+    loaded = asyncio.run(record_corpus(urls, Path(args.out)))
+    print(f"[BENCH] Записано {loaded}/{len(urls)} страниц → {args.out}", file=sys.stderr, flush=True)
+
+
+if __name__ == '__main__':
+    main()
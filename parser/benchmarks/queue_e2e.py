@@ -0,0 +1,153 @@
+# parser/benchmarks/queue_e2e.py
+
+"""
+Сквозной прогон очереди: run_queue_worker_async против LaravelStandIn.
+
+Стенд поднимается в отдельном потоке (свой цикл событий, чтобы не делить
+цикл с воркером), воркер получает api_callback на стенд — базовый URL API
+выводится из него, как в проде. Страницы товаров отдаёт тот же стенд.
+
+Отчёт: URLs/min (по активному окну — от первого claim до последнего
+report, без хвоста пустых claim перед выходом воркера, и по полному
+времени), число запросов к API по эндпоинтам и байты управления на URL.
+
+    python -m parser.benchmarks.queue_e2e --urls 200 --concurrency 3
+    python -m parser.benchmarks.queue_e2e --urls 100 --latency-ms 50 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+from .api_standin import CONTROL_ENDPOINTS, FaultConfig, LaravelStandIn
+
+try:
+    from ..queue_worker_async import run_queue_worker_async
+except ImportError:
+    from parser.queue_worker_async import run_queue_worker_async
+
+
+def build_report(standin: LaravelStandIn, wall_s: float) -> dict:
+    stats = standin.stats()
+    queue = stats['queue']
+    processed = sum(queue.get(status, 0) for status in ('done', 'failed', 'blocked'))
+    control_bytes = sum(stats['bytes_in'].values()) + sum(stats['bytes_out'].values())
+    active_s = stats['active_window_s']
+    return {
+        'urls_total': standin.pages,
+        'urls_processed': processed,
+        'wall_s': wall_s,
+        'active_window_s': active_s,
+        'urls_per_min': processed / (active_s / 60) if active_s > 0 else 0.0,
+        'urls_per_min_wall': processed / (wall_s / 60) if wall_s > 0 else 0.0,
+        'control_requests': stats['requests'],
+        'control_requests_total': sum(stats['requests'].values()),
+        'control_bytes_per_url': control_bytes / processed if processed else 0.0,
+        'worker_summary': standin.finish_summary,
+        **stats,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"[BENCH] urls processed={report['urls_processed']}/{report['urls_total']} queue={report['queue']} "
+        f"materials_saved={report['materials_saved']}",
+        file=sys.stderr,
+        flush=True,
+    )
+    print(
+        f"[BENCH] urls/min={report['urls_per_min']:.1f} (active {report['active_window_s']:.1f}s) "
+        f"urls/min_wall={report['urls_per_min_wall']:.1f} (wall {report['wall_s']:.1f}s)",
+        file=sys.stderr,
+        flush=True,
+    )
+    for endpoint in CONTROL_ENDPOINTS.values():
+        if endpoint not in report['requests']:
+            continue
+        print(
+            f"[BENCH]   {endpoint}: requests={report['requests'][endpoint]} statuses={report['statuses'].get(endpoint, {})} "
+            f"bytes_in={report['bytes_in'].get(endpoint, 0)} bytes_out={report['bytes_out'].get(endpoint, 0)} "
+            f"injected={report['injected'].get(endpoint, {})}",
+            file=sys.stderr,
+            flush=True,
+        )
+    print(
+        f"[BENCH] control_requests={report['control_requests_total']} control_bytes_per_url={report['control_bytes_per_url']:.0f} "
+        f"leases_expired={report['leases_expired']} stale_reports={report['stale_reports']}",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сквозной бенчмарк очереди против локальной замены Laravel API')
+    parser.add_argument('--urls', type=int, default=100, help='Размер очереди (страниц товаров)')
+    parser.add_argument('--supplier', default='skm_mebel')
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=3)
+    parser.add_argument('--lease-ttl', type=float, default=1800.0, help='TTL аренды URL, сек')
+    parser.add_argument('--token', default='bench-token', help='Токен парсера (X-Parser-Token / callback)')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 5xx')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--auth-error-rate', type=float, default=0.0, help='Доля ответов 401')
+    parser.add_argument('--invalid-rate', type=float, default=0.0, help='Доля ответов 422')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='Доля запросов с ответом через --timeout-s')
+    parser.add_argument('--timeout-s', type=float, default=35.0)
+    parser.add_argument('--fault-endpoints', help='Эндпоинты для ошибок через запятую (claim,report,release,materials_batch,callback)')
+    parser.add_argument('--metrics-port', type=int, help='Порт /metrics воркера на время прогона')
+    parser.add_argument('--trace-file', help='Файл трассировки по URL (OTLP/JSON)')
+    parser.add_argument('--outbox-dir', help='Каталог outbox воркера (материалы до подтверждения API)')
+    parser.add_argument('--json', help='Куда записать отчёт в JSON')
+    args = parser.parse_args()
+
+    faults = FaultConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        auth_error_rate=args.auth_error_rate,
+        invalid_rate=args.invalid_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_s=args.timeout_s,
+        endpoints=frozenset(args.fault_endpoints.split(',')) if args.fault_endpoints else None,
+    )
+    standin = LaravelStandIn(
+        pages=args.urls,
+        supplier_name=args.supplier,
+        faults=faults,
+        lease_ttl_s=args.lease_ttl,
+        token=args.token,
+    )
+    base_url = standin.start_in_thread()
+    print(f"[BENCH] Стенд API: {base_url} ({args.urls} URL)", file=sys.stderr, flush=True)
+
+    t0 = time.perf_counter()
+    try:
+        asyncio.run(run_queue_worker_async(
+            supplier_name=args.supplier,
+            batch_size=args.batch_size,
+            api_callback=f"{base_url}/api/internal/parser/callback",
+            api_token=args.token,
+            session_id=1,
+            concurrency=args.concurrency,
+            metrics_port=args.metrics_port,
+            trace_file=args.trace_file,
+            outbox_dir=args.outbox_dir,
+        ))
+    finally:
+        wall_s = time.perf_counter() - t0
+        standin.stop_thread()
+
+    report = build_report(standin, wall_s)
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2, default=str), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+# parser/benchmarks/replay.py
+
+"""
+Воспроизведение HAR-корпуса через движки извлечения без сети.
+
+Движки:
+- raw_html  — HTTP-first: тела документов из HAR разбираются
+              AsyncQueueWorker._extract_from_html (без браузера);
+- async     — AsyncQueueWorker.parse_product_page, ответы из
+              context.route_from_har (not_found='abort');
+- skm       — SkmMebelAdapter.parse_product_page (sync Playwright), так же.
+
+Для каждого движка: pages/sec, p50/p95/p99 времени извлечения и
+поэтапные тайминги (last_parse_timings адаптеров: goto, name, article,
+price, availability). Отчёт — текстом в stderr и JSON (--json).
+
+    python -m parser.benchmarks.replay --sample 50 --engine raw_html
+    python -m parser.benchmarks.replay --har corpus.har --engine all --json out.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .corpus import HarDocument, build_sample_har, load_documents
+
+try:
+    from ..metrics import LatencyHistogram
+except ImportError:
+    from parser.metrics import LatencyHistogram
+
+ENGINES = ('raw_html', 'async', 'skm')
+
+
+class EngineRun:
+    """Замеры одного движка."""
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self.extract_ms = LatencyHistogram()
+        self.fields: Dict[str, LatencyHistogram] = {}
+        self.failed: Dict[str, str] = {}
+        self.wall_s = 0.0
+
+    def record(self, elapsed_ms: float, timings: Optional[Dict[str, float]]) -> None:
+        self.extract_ms.record(elapsed_ms)
+        for field, ms in (timings or {}).items():
+            self.fields.setdefault(field, LatencyHistogram()).record(ms)
+
+    def report(self) -> dict:
+        pages = self.extract_ms.count
+        return {
+            'engine': self.engine,
+            'pages': pages,
+            'failed': len(self.failed),
+            'pages_per_sec': pages / self.wall_s if self.wall_s > 0 else 0.0,
+            'extract_ms_p50': self.extract_ms.percentile(50),
+            'extract_ms_p95': self.extract_ms.percentile(95),
+            'extract_ms_p99': self.extract_ms.percentile(99),
+            'fields_ms': {field: hist.summary() for field, hist in self.fields.items()},
+        }
+
+
+def _new_worker(supplier: str):
+    try:
+        from ..queue_worker_async import AsyncQueueWorker
+    except ImportError:
+        from parser.queue_worker_async import AsyncQueueWorker
+    return AsyncQueueWorker(supplier, concurrency=1)
+
+
+def run_raw_html(supplier: str, documents: List[HarDocument], iterations: int) -> EngineRun:
+    worker = _new_worker(supplier)
+    run = EngineRun('raw_html')
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        for doc in documents:
+            t_start = time.perf_counter()
+            material = worker._extract_from_html(doc.body, doc.content_type, doc.url, worker.profile)
+            elapsed = (time.perf_counter() - t_start) * 1000
+            if material is None:
+                run.failed[doc.url] = 'raw_html miss'
+                continue
+            run.record(elapsed, {'total': elapsed})
+    run.wall_s = time.perf_counter() - t0
+    return run
+
+
+async def _run_async(supplier: str, har_path: Path, urls: List[str], iterations: int) -> EngineRun:
+    worker = _new_worker(supplier)
+    run = EngineRun('async')
+    await worker.setup()
+    try:
+        await worker.context.route_from_har(str(har_path), not_found='abort')
+        page = worker.pages[0]
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            for url in urls:
+                t_start = time.perf_counter()
+                try:
+                    await worker.parse_product_page(page, url)
+                except Exception as e:
+                    run.failed[url] = str(e)[:200]
+                    continue
+                run.record((time.perf_counter() - t_start) * 1000, worker.last_parse_timings)
+        run.wall_s = time.perf_counter() - t0
+    finally:
+        await worker.teardown()
+    return run
+
+
+def run_async(supplier: str, har_path: Path, urls: List[str], iterations: int) -> EngineRun:
+    return asyncio.run(_run_async(supplier, har_path, urls, iterations))
+
+
+def run_skm(supplier: str, har_path: Path, urls: List[str], iterations: int) -> EngineRun:
+    try:
+        from ..config import config_manager
+        from ..suppliers.skm_mebel import SkmMebelAdapter
+    except ImportError:
+        from parser.config import config_manager
+        from parser.suppliers.skm_mebel import SkmMebelAdapter
+
+    adapter = SkmMebelAdapter(config_manager.load_supplier_config(supplier))
+    run = EngineRun('skm')
+    adapter.setup()
+    try:
+        adapter._context.route_from_har(str(har_path), not_found='abort')
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            for url in urls:
+                t_start = time.perf_counter()
+                try:
+                    adapter.parse_product_page(url, take_screenshot=False)
+                except Exception as e:
+                    run.failed[url] = str(e)[:200]
+                    continue
+                run.record((time.perf_counter() - t_start) * 1000, adapter.last_parse_timings)
+        run.wall_s = time.perf_counter() - t0
+    finally:
+        adapter.teardown()
+    return run
+
+
+def product_documents(documents: List[HarDocument]) -> List[HarDocument]:
+    """Страницы товаров корпуса (по признакам товара в исходном HTML)."""
+    try:
+        from ..html_extract import HtmlDocument
+        from ..queue_worker_async import AsyncQueueWorker
+    except ImportError:
+        from parser.html_extract import HtmlDocument
+        from parser.queue_worker_async import AsyncQueueWorker
+
+    products = []
+    for doc in documents:
+        try:
+            html = HtmlDocument.from_bytes(doc.body, doc.content_type)
+        except ValueError:
+            continue
+        if any(html.query_selector(s) for s in AsyncQueueWorker.PRODUCT_INDICATORS):
+            products.append(doc)
+    return products
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"[BENCH] {report['engine']}: pages={report['pages']} failed={report['failed']} "
+        f"pages/sec={report['pages_per_sec']:.1f} extract_ms p50={report['extract_ms_p50']:.1f} "
+        f"p95={report['extract_ms_p95']:.1f} p99={report['extract_ms_p99']:.1f}",
+        file=sys.stderr,
+        flush=True,
+    )
+    for field, stats in report['fields_ms'].items():
+        print(
+            f"[BENCH]   {field}: p50={stats['p50']:.1f} p95={stats['p95']:.1f} p99={stats['p99']:.1f}",
+            file=sys.stderr,
+            flush=True,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Офлайн-бенчмарк извлечения данных по HAR-корпусу')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--har', help='HAR-корпус (python -m parser.benchmarks.corpus)')
+    source.add_argument('--sample', type=int, help='Синтетический корпус из N страниц товаров')
+    parser.add_argument('--supplier', default='skm_mebel', help='Поставщик (профиль и селекторы)')
+    parser.add_argument('--engine', choices=ENGINES + ('all',), default='raw_html')
+    parser.add_argument('--iterations', type=int, default=1, help='Повторов корпуса на движок')
+    parser.add_argument('--json', help='Куда записать отчёт в JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.sample:
+            har_path = Path(tmp) / 'sample.har'
+            build_sample_har(har_path, args.sample)
+        else:
+            har_path = Path(args.har)
+
+        documents = product_documents(load_documents(har_path))
+        if not documents:
+            print(f"[BENCH] В корпусе {har_path} нет страниц товаров", file=sys.stderr, flush=True)
+            sys.exit(1)
+        urls = [doc.url for doc in documents]
+        print(f"[BENCH] Корпус: {len(documents)} страниц товаров ({har_path})", file=sys.stderr, flush=True)
+
+        engines = ENGINES if args.engine == 'all' else (args.engine,)
+        reports = []
+        for engine in engines:
+            if engine == 'raw_html':
+                run = run_raw_html(args.supplier, documents, args.iterations)
+            elif engine == 'async':
+                run = run_async(args.supplier, har_path, urls, args.iterations)
+            else:
+                run = run_skm(args.supplier, har_path, urls, args.iterations)
+            for url, error in list(run.failed.items())[:5]:
+                print(f"[BENCH] {engine}: ✗ {url}: {error}", file=sys.stderr, flush=True)
+            report = run.report()
+            print_report(report)
+            reports.append(report)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
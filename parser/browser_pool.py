@@ -0,0 +1,521 @@
+# parser/browser_pool.py
+
+"""
+Демон пула прогретых браузеров, общий для запусков парсера.
+
+Laravel запускает много коротких задач (--queue --max-batches, --url,
+collect), и каждая поднимает Chromium с нуля. Демон держит N запущенных
+Chromium с открытым remote debugging портом и выдаёт воркерам CDP-адреса
+через управляющий Unix-сокет; воркер подключается через
+chromium.connect_over_cdp(endpoint), создаёт свой контекст и при закрытии
+только отключается — браузер остаётся прогретым для следующей задачи.
+
+Запуск:
+    python -m parser.browser_pool --size 2 --max-pages 500 --max-rss-mb 1500
+
+Воркеры используют пул, если задана переменная окружения PARSER_BROWSER_POOL
+(путь к сокету); если демон недоступен — запускают браузер сами, как раньше.
+
+Протокол сокета — JSON по строке на запрос/ответ:
+    {"op": "acquire", "wait": 30}   → {"ok": true, "lease_id": "...", "endpoint": "http://127.0.0.1:PORT", ...}
+    {"op": "release", "lease_id": "...", "pages": 120} → {"ok": true}
+    {"op": "status"}                → {"ok": true, "browsers": [...], "recycles": {...}}
+Аренда привязана к соединению: если воркер умер, не вернув её, аренда
+снимается при закрытии соединения.
+
+Браузер перезапускается (recycle), когда:
+  - не отвечает /json/version или процесс завершился (health check);
+  - через него прошло max_pages страниц (по отчётам release);
+  - RSS дерева процессов Chromium (из /proc) превысил max_rss_mb.
+Для двух последних браузер сначала перестаёт выдаваться и перезапускается,
+когда вернули все аренды.
+
+Маршруты (route для блокировки ресурсов) — клиентская сущность Playwright:
+их нельзя установить заранее в демоне, воркер ставит их на свой контекст
+после подключения.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+DEFAULT_SOCKET_PATH = '/tmp/parser-browser-pool.sock'
+POOL_SOCKET_ENV = 'PARSER_BROWSER_POOL'
+
+CHROMIUM_ARGS = [
+    '--headless=new',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-gpu',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--remote-debugging-address=127.0.0.1',
+    '--remote-debugging-port=0',
+]
+
+STARTUP_TIMEOUT_SECONDS = 30.0
+_DEVTOOLS_RE = re.compile(r'DevTools listening on (ws://[^\s]+)')
+
+
+def find_chromium_executable() -> str:
+    """Путь к Chromium: PARSER_CHROMIUM_PATH или браузер, установленный Playwright."""
+    path = os.getenv('PARSER_CHROMIUM_PATH')
+    if path:
+        return path
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        return p.chromium.executable_path
+
+
+def process_tree_rss_bytes(root_pid: int) -> int:
+    """Суммарный RSS процесса и всех его потомков (по /proc, только Linux)."""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # comm в скобках может содержать пробелы — поля считаем после последней ')'
+        fields = stat[stat.rfind(b')') + 2:].split()
+        children.setdefault(int(fields[1]), []).append(int(entry))
+
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            with open(f'/proc/{pid}/statm', 'rb') as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+        stack.extend(children.get(pid, ()))
+    return total
+
+
+class PooledBrowser:
+    """Один Chromium с remote debugging портом."""
+
+    def __init__(self, slot: int, executable: str):
+        self.slot = slot
+        self.executable = executable
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.endpoint: Optional[str] = None
+        self.ws_endpoint: Optional[str] = None
+        self.user_data_dir: Optional[str] = None
+        self.leases: Set[str] = set()
+        self.pages_served = 0
+        self.launched_at = 0.0
+        self.draining: Optional[str] = None  # причина предстоящего recycle
+        self.rss_bytes = 0
+        self.recycling = False
+        self._stderr_task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    async def start(self) -> None:
+        self.user_data_dir = tempfile.mkdtemp(prefix=f'parser-pool-{self.slot}-')
+        self.proc = await asyncio.create_subprocess_exec(
+            self.executable,
+            *CHROMIUM_ARGS,
+            f'--user-data-dir={self.user_data_dir}',
+            'about:blank',
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"Chromium slot={self.slot} не открыл DevTools за {STARTUP_TIMEOUT_SECONDS:.0f}s")
+            line = await asyncio.wait_for(self.proc.stderr.readline(), timeout=remaining)
+            if not line:
+                raise RuntimeError(f"Chromium slot={self.slot} завершился при запуске (code={self.proc.returncode})")
+            match = _DEVTOOLS_RE.search(line.decode('utf-8', 'replace'))
+            if match:
+                self.ws_endpoint = match.group(1)
+                break
+        port = self.ws_endpoint.split('://', 1)[1].split('/', 1)[0].rsplit(':', 1)[1]
+        self.endpoint = f'http://127.0.0.1:{port}'
+        # stderr нужно вычитывать, иначе Chromium заблокируется на полном пайпе
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+        self.leases.clear()
+        self.pages_served = 0
+        self.draining = None
+        self.launched_at = time.time()
+        print(f"[POOL] slot={self.slot} Chromium pid={self.proc.pid} {self.endpoint}", file=sys.stderr, flush=True)
+
+    async def _drain_stderr(self) -> None:
+        try:
+            while await self.proc.stderr.readline():
+                pass
+        except Exception:
+            pass
+
+    async def healthy(self, timeout: float = 5.0) -> bool:
+        """GET /json/version на DevTools-порт."""
+        if not self.alive or not self.endpoint:
+            return False
+        host, port = self.endpoint.rsplit('/', 1)[-1].rsplit(':', 1)
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), timeout)
+            try:
+                writer.write(f'GET /json/version HTTP/1.0\r\nHost: {host}\r\n\r\n'.encode())
+                await writer.drain()
+                status_line = await asyncio.wait_for(reader.readline(), timeout)
+            finally:
+                writer.close()
+            return b' 200 ' in status_line
+        except (OSError, asyncio.TimeoutError):
+            return False
+
+    async def stop(self) -> None:
+        if self.proc is not None and self.proc.returncode is None:
+            self.proc.terminate()
+            try:
+                await asyncio.wait_for(self.proc.wait(), 5.0)
+            except asyncio.TimeoutError:
+                self.proc.kill()
+                await self.proc.wait()
+        if self._stderr_task is not None:
+            self._stderr_task.cancel()
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+            self.user_data_dir = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'slot': self.slot,
+            'pid': self.proc.pid if self.proc else None,
+            'alive': self.alive,
+            'endpoint': self.endpoint,
+            'leases': len(self.leases),
+            'pages_served': self.pages_served,
+            'rss_mb': round(self.rss_bytes / 1024 / 1024, 1),
+            'uptime_s': round(time.time() - self.launched_at, 1) if self.launched_at else 0,
+            'draining': self.draining,
+        }
+
+
+class BrowserPoolDaemon:
+    """Управляющий сокет + обслуживание браузеров пула."""
+
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        size: int = 2,
+        max_pages: int = 500,
+        max_rss_mb: Optional[float] = 1500,
+        max_leases: int = 4,
+        health_interval: float = 10.0,
+        executable: Optional[str] = None,
+    ):
+        self.socket_path = socket_path
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_rss_bytes = int(max_rss_mb * 1024 * 1024) if max_rss_mb else None
+        self.max_leases = max(1, max_leases)
+        self.health_interval = health_interval
+        self.executable = executable
+        self.browsers: List[PooledBrowser] = []
+        self.lease_owner: Dict[str, PooledBrowser] = {}
+        self.recycles: Dict[str, int] = {}
+        self.leases_granted = 0
+        self._changed: Optional[asyncio.Condition] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._background: Set[asyncio.Task] = set()
+
+    # ---------- выдача аренды ----------
+
+    def _pick(self) -> Optional[PooledBrowser]:
+        candidates = [
+            b for b in self.browsers
+            if b.alive and not b.draining and len(b.leases) < self.max_leases
+        ]
+        return min(candidates, key=lambda b: (len(b.leases), b.pages_served)) if candidates else None
+
+    async def acquire(self, wait: float) -> Dict[str, Any]:
+        deadline = time.monotonic() + max(0.0, wait)
+        async with self._changed:
+            while True:
+                browser = self._pick()
+                if browser is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return {'ok': False, 'error': 'NO_BROWSER_AVAILABLE'}
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return {'ok': False, 'error': 'NO_BROWSER_AVAILABLE'}
+            lease_id = uuid.uuid4().hex[:12]
+            browser.leases.add(lease_id)
+            self.lease_owner[lease_id] = browser
+            self.leases_granted += 1
+        return {
+            'ok': True,
+            'lease_id': lease_id,
+            'endpoint': browser.endpoint,
+            'ws_endpoint': browser.ws_endpoint,
+            'slot': browser.slot,
+        }
+
+    async def release(self, lease_id: str, pages: int = 0) -> Dict[str, Any]:
+        async with self._changed:
+            browser = self.lease_owner.pop(lease_id, None)
+            if browser is None:
+                return {'ok': False, 'error': 'UNKNOWN_LEASE'}
+            browser.leases.discard(lease_id)
+            browser.pages_served += max(0, int(pages or 0))
+            if self.max_pages and browser.pages_served >= self.max_pages and not browser.draining:
+                browser.draining = 'max_pages'
+            self._changed.notify_all()
+        if browser.draining and not browser.leases:
+            # Перезапуск в фоне: клиенту не нужно ждать старта нового Chromium
+            task = asyncio.create_task(self._recycle(browser, browser.draining))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        return {'ok': True}
+
+    # ---------- обслуживание ----------
+
+    async def _recycle(self, browser: PooledBrowser, reason: str) -> None:
+        if browser.recycling:
+            return
+        browser.recycling = True
+        browser.draining = reason
+        print(f"[POOL] slot={browser.slot} recycle: {reason} (pages={browser.pages_served}, rss={browser.rss_bytes // 1024 // 1024}MB)", file=sys.stderr, flush=True)
+        async with self._changed:
+            for lease_id in list(browser.leases):
+                self.lease_owner.pop(lease_id, None)
+            browser.leases.clear()
+        self.recycles[reason] = self.recycles.get(reason, 0) + 1
+        await browser.stop()
+        try:
+            await browser.start()
+        except Exception as e:
+            # Слот остаётся мёртвым; следующий health check попробует снова
+            print(f"[POOL] slot={browser.slot} не удалось перезапустить Chromium: {e}", file=sys.stderr, flush=True)
+        finally:
+            browser.recycling = False
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _maintenance_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.health_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            for browser in self.browsers:
+                if browser.recycling:
+                    continue
+                if not await browser.healthy():
+                    await self._recycle(browser, 'unhealthy')
+                    continue
+                try:
+                    browser.rss_bytes = process_tree_rss_bytes(browser.proc.pid)
+                except OSError:
+                    browser.rss_bytes = 0
+                if self.max_rss_bytes and browser.rss_bytes > self.max_rss_bytes and not browser.draining:
+                    browser.draining = 'max_rss'
+                if browser.draining and not browser.leases:
+                    await self._recycle(browser, browser.draining)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'ok': True,
+            'browsers': [b.describe() for b in self.browsers],
+            'leases_active': len(self.lease_owner),
+            'leases_granted': self.leases_granted,
+            'recycles': dict(self.recycles),
+        }
+
+    # ---------- управляющий сокет ----------
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        owned: Set[str] = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    op = request.get('op')
+                    if op == 'acquire':
+                        response = await self.acquire(float(request.get('wait', 30)))
+                        if response.get('ok'):
+                            owned.add(response['lease_id'])
+                    elif op == 'release':
+                        lease_id = str(request.get('lease_id', ''))
+                        response = await self.release(lease_id, request.get('pages', 0))
+                        owned.discard(lease_id)
+                    elif op == 'status':
+                        response = self.status()
+                    else:
+                        response = {'ok': False, 'error': f'UNKNOWN_OP: {op}'}
+                except (ValueError, TypeError, AttributeError) as e:
+                    response = {'ok': False, 'error': f'BAD_REQUEST: {e}'}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            # Клиент отключился, не вернув аренду — возвращаем сами
+            for lease_id in owned:
+                await self.release(lease_id)
+            writer.close()
+
+    async def run(self) -> None:
+        self._changed = asyncio.Condition()
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._stopping.set)
+
+        executable = self.executable or await asyncio.to_thread(find_chromium_executable)
+        self.browsers = [PooledBrowser(slot, executable) for slot in range(self.size)]
+        await asyncio.gather(*(b.start() for b in self.browsers))
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        print(f"[POOL] Готов: socket={self.socket_path} size={self.size} max_pages={self.max_pages} max_rss={self.max_rss_bytes}", file=sys.stderr, flush=True)
+
+        maintenance = asyncio.create_task(self._maintenance_loop())
+        try:
+            await self._stopping.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            maintenance.cancel()
+            await asyncio.gather(*(b.stop() for b in self.browsers), return_exceptions=True)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            print(f"[POOL] Остановлен. recycles={self.recycles} leases_granted={self.leases_granted}", file=sys.stderr, flush=True)
+
+
+# ==================== Клиент ====================
+
+class BrowserPoolLease(NamedTuple):
+    lease_id: str
+    endpoint: str      # http://127.0.0.1:PORT — для connect_over_cdp
+    ws_endpoint: str
+    slot: int
+
+
+class BrowserPoolClient:
+    """
+    Синхронный клиент управляющего сокета.
+
+    Соединение держится открытым всё время аренды: если процесс воркера
+    упадёт, демон вернёт аренду сам.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: float = 5.0):
+        self.socket_path = socket_path or os.getenv(POOL_SOCKET_ENV) or DEFAULT_SOCKET_PATH
+        self.timeout = timeout
+        self.lease: Optional[BrowserPoolLease] = None
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+
+    def _request(self, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(self.timeout)
+            self._sock.connect(self.socket_path)
+            self._file = self._sock.makefile('rb')
+        self._sock.settimeout(timeout)
+        self._sock.sendall(json.dumps(payload).encode() + b'\n')
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("browser pool closed the connection")
+        return json.loads(line)
+
+    def acquire(self, wait: float = 30.0) -> Optional[BrowserPoolLease]:
+        """Арендует браузер. None — демон недоступен или свободных браузеров нет."""
+        try:
+            response = self._request({'op': 'acquire', 'wait': wait}, timeout=wait + self.timeout)
+        except (OSError, ValueError) as e:
+            print(f"[POOL] Пул браузеров недоступен ({self.socket_path}): {e}", file=sys.stderr, flush=True)
+            self.close()
+            return None
+        if not response.get('ok'):
+            print(f"[POOL] Аренда не выдана: {response.get('error')}", file=sys.stderr, flush=True)
+            self.close()
+            return None
+        self.lease = BrowserPoolLease(response['lease_id'], response['endpoint'], response['ws_endpoint'], response['slot'])
+        return self.lease
+
+    def release(self, pages: int = 0) -> None:
+        """Возвращает аренду, сообщая число открытых через браузер страниц."""
+        if self.lease is not None:
+            try:
+                self._request({'op': 'release', 'lease_id': self.lease.lease_id, 'pages': int(pages)}, timeout=self.timeout)
+            except (OSError, ValueError) as e:
+                print(f"[POOL] Не удалось вернуть аренду {self.lease.lease_id}: {e}", file=sys.stderr, flush=True)
+            self.lease = None
+        self.close()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+def pool_client_from_env() -> Optional[BrowserPoolClient]:
+    """Клиент пула, если задана PARSER_BROWSER_POOL, иначе None."""
+    socket_path = os.getenv(POOL_SOCKET_ENV)
+    if not socket_path or not Path(socket_path).exists():
+        return None
+    return BrowserPoolClient(socket_path)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description='Пул прогретых браузеров для парсера', prog='python -m parser.browser_pool')
+    arg_parser.add_argument('--socket', default=os.getenv(POOL_SOCKET_ENV, DEFAULT_SOCKET_PATH), help='Путь к управляющему Unix-сокету')
+    arg_parser.add_argument('--size', type=int, default=2, help='Число браузеров в пуле')
+    arg_parser.add_argument('--max-pages', type=int, default=500, help='Перезапуск браузера после N страниц (0 — без ограничения)')
+    arg_parser.add_argument('--max-rss-mb', type=float, default=1500, help='Перезапуск при RSS дерева процессов выше порога (0 — без ограничения)')
+    arg_parser.add_argument('--max-leases', type=int, default=4, help='Одновременных аренд на браузер')
+    arg_parser.add_argument('--health-interval', type=float, default=10.0, help='Период health check, сек')
+    arg_parser.add_argument('--executable', help='Путь к Chromium (по умолчанию из Playwright / PARSER_CHROMIUM_PATH)')
+    args = arg_parser.parse_args()
+
+    daemon = BrowserPoolDaemon(
+        socket_path=args.socket,
+        size=args.size,
+        max_pages=args.max_pages,
+        max_rss_mb=args.max_rss_mb,
+        max_leases=args.max_leases,
+        health_interval=args.health_interval,
+        executable=args.executable,
+    )
+    asyncio.run(daemon.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -18,31 +18,44 @@ CHUNKED SEND:
 - Chunk size: 300 URLs (configurable)
 - Or every 60 seconds
 - Cursor saved to API after each chunk
+- Chunks are uploaded by a background sender (url_collection.chunk_send_window,
+  default 2 chunks in flight; 0 = synchronous send)
 
 Usage:
-    python3 collect_urls.py --supplier skm_mebel --hmac-secret your-secret [--session 123]
+    python3 collect_urls.py --supplier skm_mebel --hmac-secret your-secret [--session 123] [--metrics-port 9101]
 """
 
 import argparse
 import sys
 import os
-import importlib
 import time
 import requests
 import json
 import base64
 import json
 import base64
+import threading
+from collections import deque
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Set
+from typing import List, Dict, Any, Optional, Callable
 from datetime import datetime
-from urllib.parse import urljoin, urlparse, parse_qs, urlencode
 
 # Добавляем путь к парсеру
 parser_path = Path(__file__).parent
 sys.path.insert(0, str(parser_path))
 
 from config import config_manager
+from url_classifier import UrlClassifier
+from url_dedup import UrlDedupSet
+from url_normalizer import normalize
+from signed_payload import build_signed_body
+from adapter_registry import AdapterRegistry
+
+# Общий реестр серверов метрик с воркером, если импортированы как пакет (main.py)
+try:
+    from . import metrics_server
+except ImportError:
+    import metrics_server
 
 
 # ==================== HARD LIMITS (ANTI-LOOP) ====================
@@ -53,6 +66,230 @@ DEFAULT_MAX_COLLECT_TIME_SECONDS = 600  # 10 minutes
 # ==================== CHUNKED SEND SETTINGS ====================
 DEFAULT_CHUNK_SIZE = 300  # URLs per chunk
 DEFAULT_CHUNK_INTERVAL_SECONDS = 60  # Send chunk every N seconds
+DEFAULT_CHUNK_SEND_WINDOW = 2  # Max chunks queued/in flight in background sender
+
+# ==================== LOG SHIPPING SETTINGS ====================
+DEFAULT_LOG_BATCH_SIZE = 50  # Send logs when N are buffered
+DEFAULT_LOG_FLUSH_INTERVAL_SECONDS = 2.0  # Or every N seconds
+LOG_BUFFER_LIMIT = 5000  # Drop oldest logs beyond this (API down)
+
+
+class ChunkSender:
+    """
+    Фоновая отправка chunk'ов URL, чтобы браузер не простаивал во время POST.
+
+    Chunk'и отправляются одним потоком строго по порядку. Окно (window)
+    ограничивает число chunk'ов в очереди + в полёте: при заполненном окне
+    submit() блокируется до освобождения слота (back-pressure).
+
+    При ошибке chunk не теряется: он и все chunk'и, стоящие за ним в очереди,
+    откладываются (без попытки отправки) в список requeue. Сборщик забирает их
+    через take_failed() и возвращает в начало pending_chunk — та же семантика
+    retry-by-requeue, что и при синхронной отправке.
+    """
+
+    def __init__(self, send_fn: Callable[[List[Dict[str, Any]]], bool], window: int = DEFAULT_CHUNK_SEND_WINDOW):
+        """
+        Args:
+            send_fn: Синхронная отправка одного chunk (True при успехе)
+            window: Макс. число chunk'ов в очереди + в полёте
+        """
+        self._send_fn = send_fn
+        self.window = max(1, int(window))
+        self._queue: deque = deque()
+        self._in_flight = 0
+        self._requeue: List[Dict[str, Any]] = []
+        self._failed = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='collect-chunk-sender', daemon=True)
+            self._thread.start()
+
+    def submit(self, chunk: List[Dict[str, Any]]) -> None:
+        """Ставит chunk в очередь (блокируется, если окно заполнено)."""
+        with self._cond:
+            self._ensure_thread()
+            while len(self._queue) + self._in_flight >= self.window:
+                self._cond.wait()
+            self._queue.append(chunk)
+            self._cond.notify_all()
+
+    def wait_idle(self) -> None:
+        """Ждёт, пока все поставленные chunk'и будут отправлены или отложены."""
+        with self._cond:
+            while self._queue or self._in_flight:
+                self._cond.wait()
+
+    @property
+    def backlog(self) -> int:
+        """Chunk'и в очереди + в полёте."""
+        with self._cond:
+            return len(self._queue) + self._in_flight
+
+    @property
+    def has_failed(self) -> bool:
+        with self._cond:
+            return self._failed
+
+    def take_failed(self) -> List[Dict[str, Any]]:
+        """
+        Забирает отложенные после ошибки URL (в исходном порядке).
+        Сначала дожидается опустошения очереди, чтобы более поздние chunk'и
+        не обогнали неотправленные.
+        """
+        with self._cond:
+            while self._queue or self._in_flight:
+                self._cond.wait()
+            failed = self._requeue
+            self._requeue = []
+            self._failed = False
+            return failed
+
+    def close(self) -> None:
+        """Дожидается отправки очереди и останавливает поток."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                chunk = self._queue.popleft()
+                if self._failed:
+                    # Не обгоняем неотправленный chunk — откладываем следом за ним
+                    self._requeue.extend(chunk)
+                    self._cond.notify_all()
+                    continue
+                self._in_flight += 1
+
+            try:
+                success = self._send_fn(chunk)
+            except Exception as e:
+                print(f"[COLLECT] chunk sender error: {e}", file=sys.stderr, flush=True)
+                success = False
+
+            with self._cond:
+                self._in_flight -= 1
+                if not success:
+                    self._failed = True
+                    self._requeue.extend(chunk)
+                self._cond.notify_all()
+
+
+class LogShipper:
+    """
+    Пакетная отправка логов сбора в Laravel (callback type=log).
+
+    Логи копятся в буфере и уходят одним запросом со списком
+    {level, message, details} — handleLog принимает такой батч. Отправка идёт
+    из фонового потока по таймеру или при заполнении буфера через общий
+    requests.Session (keep-alive), поэтому время сбора не зависит от
+    количества логов. Ошибки и critical отправляются без ожидания таймера.
+    """
+
+    def __init__(
+        self,
+        callback_url: str,
+        session_id: int,
+        token: str,
+        batch_size: int = DEFAULT_LOG_BATCH_SIZE,
+        flush_interval: float = DEFAULT_LOG_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.callback_url = callback_url
+        self.session_id = session_id
+        self.token = token
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.1, float(flush_interval))
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._urgent = False
+        self._closed = False
+        self._seq = 0
+        self._dropped = 0
+        self._http = requests.Session()
+        self._http.headers.update({
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {token}',
+        })
+        self._thread = threading.Thread(target=self._run, name='collect-log-shipper', daemon=True)
+        self._thread.start()
+
+    def add(self, level: str, message: str, details: Optional[dict] = None) -> None:
+        entry = {'level': level, 'message': message}
+        if details is not None:
+            entry['details'] = details
+        with self._cond:
+            self._buffer.append(entry)
+            if len(self._buffer) > LOG_BUFFER_LIMIT:
+                overflow = len(self._buffer) - LOG_BUFFER_LIMIT
+                del self._buffer[:overflow]
+                self._dropped += overflow
+            if len(self._buffer) >= self.batch_size or level in ('error', 'critical'):
+                self._urgent = True
+                self._cond.notify_all()
+
+    def flush(self) -> None:
+        """Синхронно отправляет всё, что накопилось в буфере."""
+        with self._send_lock:
+            with self._cond:
+                batch = self._buffer
+                self._buffer = []
+                self._urgent = False
+            self._send(batch)
+
+    def close(self) -> None:
+        """Отправляет остаток и останавливает поток."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=15)
+        self.flush()
+        self._http.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._urgent and not self._closed:
+                    self._cond.wait(timeout=self.flush_interval)
+                closed = self._closed
+            if closed:
+                return
+            self.flush()
+
+    def _send(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        self._seq += 1
+        data = {
+            'session_id': self.session_id,
+            'token': self.token,
+            'type': 'log',
+            'timestamp': int(time.time()),
+            'event_id': f"log_batch_{self._seq}_{int(time.time() * 1000)}",
+            'payload': batch,
+        }
+        try:
+            response = self._http.post(self.callback_url, json=data, timeout=5)
+            if response.status_code != 200:
+                print(f"[COLLECT] Warning: log callback HTTP {response.status_code}: {response.text[:200]}", file=sys.stderr, flush=True)
+        except Exception as e:
+            print(f"[COLLECT] Warning: log callback failed ({len(batch)} logs): {e}", file=sys.stderr, flush=True)
+        if self._dropped:
+            print(f"[COLLECT] Warning: log buffer overflow, dropped={self._dropped}", file=sys.stderr, flush=True)
+            self._dropped = 0
 
 
 class UrlCollector:
@@ -68,6 +305,7 @@ class UrlCollector:
         max_time_seconds: int = None,
         chunk_size: int = None,
         api_url_base: str = None,
+        metrics_port: int = None,
     ):
         """
         Инициализация сборщика URL.
@@ -80,14 +318,17 @@ class UrlCollector:
             max_urls: Макс. URL всего (override) 
             max_time_seconds: Макс. время сбора в секундах (override)
             chunk_size: Размер chunk для отправки (override)
+            metrics_port: Порт эндпоинта /metrics (None — выключен)
         """
         self.supplier_name = supplier_name
         self.hmac_secret = hmac_secret
         self.session_id = session_id
         self.config = None
         self.adapter = None
+        self.url_classifier: Optional[UrlClassifier] = None
         self.config_override: Optional[Dict[str, Any]] = None
         self.api_url_base = api_url_base
+        self.metrics_port = metrics_port
         
         # HARD LIMITS
         self.max_pages = max_pages or DEFAULT_MAX_PAGES_PER_CATEGORY
@@ -112,9 +353,16 @@ class UrlCollector:
             'chunk_send_last_status_code': None,
         }
         
-        # URL deduplication
-        self.seen_urls: Set[str] = set()
+        # URL deduplication (64-битные хэши вместо строк)
+        self.seen_urls = UrlDedupSet()
         self.pending_chunk: List[Dict] = []
+        self.chunk_send_window = DEFAULT_CHUNK_SEND_WINDOW
+        self.chunk_sender: Optional[ChunkSender] = None
+        self._stats_lock = threading.Lock()
+        # add_url вызывается воркерами discovery параллельно: seen_urls, pending_chunk
+        # и счётчики URL меняются под этим lock, отправка chunk'а — вне его
+        self._chunk_lock = threading.Lock()
+        self.log_shipper: Optional[LogShipper] = None
         
         # Tracking
         self.start_time = None
@@ -122,7 +370,6 @@ class UrlCollector:
         self.pages_collected = 0
         self.stop_reason = None
         self.last_skip_log_at = 0.0
-        self._log_seq = 0
     
     def log(self, message: str, level: str = 'info') -> None:
         """
@@ -169,6 +416,18 @@ class UrlCollector:
             url_collection['max_total_urls'] = self.max_urls
             url_collection['max_collect_time_seconds'] = self.max_time_seconds
             self.config['url_collection'] = url_collection
+            self.url_classifier = UrlClassifier.from_config(self.config)
+            self.chunk_send_window = int(url_collection.get('chunk_send_window', DEFAULT_CHUNK_SEND_WINDOW))
+
+            # Опциональный on-disk Bloom-фильтр для очень больших сборов
+            bloom_path = url_collection.get('dedup_bloom_path')
+            if bloom_path and not len(self.seen_urls):
+                self.seen_urls = UrlDedupSet(
+                    capacity=min(self.max_urls, 1_000_000),
+                    bloom_path=bloom_path,
+                    bloom_capacity=self.max_urls,
+                )
+                self.log(f"Dedup Bloom filter enabled: {bloom_path}")
 
             self.log(
                 f"url_collection settings: "
@@ -224,92 +483,118 @@ class UrlCollector:
         """
         Normalize URL by removing tracking params, anchors, trailing slashes.
         """
-        try:
-            parsed = urlparse(url)
-            
-            # Remove tracking parameters (utm_*, fbclid, etc.)
-            params_to_remove = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 
-                               'utm_content', 'fbclid', 'gclid', 'yclid', '_ga'}
-            
-            if parsed.query:
-                params = parse_qs(parsed.query, keep_blank_values=True)
-                filtered_params = {k: v for k, v in params.items() 
-                                 if k.lower() not in params_to_remove}
-                new_query = urlencode(filtered_params, doseq=True) if filtered_params else ''
-            else:
-                new_query = ''
-            
-            # Remove anchor
-            # Normalize path (remove trailing slash unless it's root)
-            path = parsed.path.rstrip('/') if parsed.path != '/' else '/'
-            
-            # Rebuild URL
-            normalized = f"{parsed.scheme}://{parsed.netloc}{path}"
-            if new_query:
-                normalized += f"?{new_query}"
-            
-            return normalized
-        except Exception:
-            return url
+        return normalize(url).url
 
     def add_url(self, url: str) -> bool:
         """
         Add URL to collection with deduplication.
         Returns True if URL was added (new), False if duplicate.
         """
-        self.stats['urls_found_total'] += 1
-        
-        # Normalize URL
-        normalized = self.normalize_url(url)
-        
-        # Check for duplicate
-        if normalized in self.seen_urls:
-            self.stats['global_duplicates_dropped'] += 1
-            self.stats['duplicates_dropped'] = (
-                self.stats['page_duplicates_dropped'] + self.stats['global_duplicates_dropped']
+        # Normalize URL (cached, hash computed once)
+        normalized_url = normalize(url)
+        normalized = normalized_url.url
+
+        with self._chunk_lock:
+            self.stats['urls_found_total'] += 1
+
+            # Check for duplicate (add returns False for already seen URL)
+            if not self.seen_urls.add_hash(normalized_url.url_hash):
+                self.stats['global_duplicates_dropped'] += 1
+                self.stats['duplicates_dropped'] = (
+                    self.stats['page_duplicates_dropped'] + self.stats['global_duplicates_dropped']
+                )
+                return False
+
+            self.stats['urls_unique_total'] += 1
+
+            # Add to pending chunk
+            self.pending_chunk.append({
+                'url': normalized,
+                'is_valid': True,
+                'material_type': self.determine_material_type(normalized),
+                'validation_error': None,
+            })
+
+            # Check if should send chunk
+            should_send = (
+                len(self.pending_chunk) >= self.chunk_size or
+                (self.last_chunk_time and time.time() - self.last_chunk_time >= DEFAULT_CHUNK_INTERVAL_SECONDS)
             )
-            return False
-        
-        # Add to seen set
-        self.seen_urls.add(normalized)
-        self.stats['urls_unique_total'] += 1
-        
-        # Determine material type
-        material_type = self.determine_material_type(normalized)
-        
-        # Add to pending chunk
-        self.pending_chunk.append({
-            'url': normalized,
-            'is_valid': True,
-            'material_type': material_type,
-            'validation_error': None,
-        })
-        
-        # Check if should send chunk
-        should_send = (
-            len(self.pending_chunk) >= self.chunk_size or
-            (self.last_chunk_time and time.time() - self.last_chunk_time >= DEFAULT_CHUNK_INTERVAL_SECONDS)
-        )
-        
+
         if should_send:
             # Timer-based or size-based flush (non-final)
             self.flush_pending_chunk(reason="timer_or_size", final=False)
         
         return True
 
-    def send_chunk(self) -> bool:
+    def send_chunk(self, wait: bool = False) -> bool:
         """
-        Send current pending chunk to API.
+        Send current pending chunk to API via background sender.
+
+        Args:
+            wait: Дождаться отправки всех chunk'ов (final flush). Порядок
+                отправки сохраняется; при ошибке неотправленные URL
+                возвращаются в pending_chunk.
+
+        Returns:
+            bool: True если chunk поставлен в очередь (wait=False) или
+                все chunk'и успешно отправлены (wait=True)
         """
-        if not self.pending_chunk:
+        if self.chunk_send_window <= 0:
+            return self._send_chunk_sync()
+
+        with self._chunk_lock:
+            if self.chunk_sender is None:
+                self.chunk_sender = ChunkSender(self._send_chunk_payload, window=self.chunk_send_window)
+
+        # Сначала вернуть URL неудачных отправок (retry-by-requeue)
+        if self.chunk_sender.has_failed:
+            self._restore_pending(self.chunk_sender.take_failed())
+
+        chunk_to_send = self._take_pending()
+        if chunk_to_send:
+            self.chunk_sender.submit(chunk_to_send)
+
+        if not wait:
             return True
-        
-        chunk_to_send = self.pending_chunk[:]
-        self.pending_chunk = []
 
-        self.stats['chunk_send_attempted'] += 1
+        failed = self.chunk_sender.take_failed()
+        if failed:
+            self._restore_pending(failed)
+            return False
+        return True
+
+    def _take_pending(self) -> List[Dict[str, Any]]:
+        """Забирает pending chunk целиком (отправка — уже без lock)."""
+        with self._chunk_lock:
+            chunk, self.pending_chunk = self.pending_chunk, []
+        return chunk
+
+    def _restore_pending(self, chunk: List[Dict[str, Any]]) -> None:
+        """Возвращает неотправленные URL в начало pending chunk."""
+        if chunk:
+            with self._chunk_lock:
+                self.pending_chunk = chunk + self.pending_chunk
+
+    def _send_chunk_sync(self) -> bool:
+        """Синхронная отправка pending chunk (chunk_send_window=0)."""
+        chunk_to_send = self._take_pending()
+        if not chunk_to_send:
+            return True
+
+        success = self._send_chunk_payload(chunk_to_send)
+        if not success:
+            # On failure, restore chunk for retry
+            self._restore_pending(chunk_to_send)
+        return success
+
+    def _send_chunk_payload(self, chunk_to_send: List[Dict[str, Any]]) -> bool:
+        """Отправляет один chunk и обновляет статистику (вызывается из потока отправки)."""
+        with self._stats_lock:
+            self.stats['chunk_send_attempted'] += 1
+            attempt = self.stats['chunk_send_attempted']
         print(
-            f"[COLLECT] chunk_send_attempted={self.stats['chunk_send_attempted']} count={len(chunk_to_send)}",
+            f"[COLLECT] chunk_send_attempted={attempt} count={len(chunk_to_send)}",
             file=sys.stderr,
             flush=True,
         )
@@ -317,12 +602,13 @@ class UrlCollector:
         success, status_code, error_text = self.send_to_api(chunk_to_send)
 
         if success:
-            self.stats['urls_sent_total'] += len(chunk_to_send)
-            self.stats['chunks_sent'] += 1
-            self.stats['chunk_send_success'] += 1
-            self.last_chunk_time = time.time()
-            self.stats['chunk_send_last_status_code'] = status_code
-            self.stats['chunk_send_last_error'] = None
+            with self._stats_lock:
+                self.stats['urls_sent_total'] += len(chunk_to_send)
+                self.stats['chunks_sent'] += 1
+                self.stats['chunk_send_success'] += 1
+                self.last_chunk_time = time.time()
+                self.stats['chunk_send_last_status_code'] = status_code
+                self.stats['chunk_send_last_error'] = None
             
             # Log progress
             elapsed = time.time() - self.start_time if self.start_time else 0
@@ -333,11 +619,10 @@ class UrlCollector:
             # Send phase progress callback
             self.send_phase_progress()
         else:
-            # On failure, restore chunk for retry
-            self.pending_chunk = chunk_to_send + self.pending_chunk
-            self.stats['chunk_send_failed'] += 1
-            self.stats['chunk_send_last_status_code'] = status_code
-            self.stats['chunk_send_last_error'] = error_text
+            with self._stats_lock:
+                self.stats['chunk_send_failed'] += 1
+                self.stats['chunk_send_last_status_code'] = status_code
+                self.stats['chunk_send_last_error'] = error_text
             print(
                 f"[COLLECT] chunk_send_failed status={status_code} error={error_text}",
                 file=sys.stderr,
@@ -348,6 +633,16 @@ class UrlCollector:
 
     def flush_pending_chunk(self, reason: str = "flush", final: bool = False): 
         """Flush pending chunk on stop/error/finish."""
+        if final and self.chunk_sender is not None:
+            # Даже без новых URL дождаться chunk'ов в полёте и забрать неудачные
+            if not self.pending_chunk:
+                self.chunk_sender.wait_idle()
+                if not self.chunk_sender.has_failed:
+                    self.log(f"{reason}: no pending chunk to flush")
+                    return True
+            self.log(f"{reason}: flushing pending chunk size={len(self.pending_chunk)} (final)")
+            return self.send_chunk(wait=True)
+
         if not self.pending_chunk:
             self.log(f"{reason}: no pending chunk to flush")
             return True
@@ -364,7 +659,7 @@ class UrlCollector:
             return True
 
         self.log(f"{reason}: flushing pending chunk size={len(self.pending_chunk)}")
-        return self.send_chunk()
+        return self.send_chunk(wait=final)
 
     def send_phase_progress(self):
         """Send phase_progress callback to Laravel."""
@@ -413,10 +708,8 @@ class UrlCollector:
         self.log("Creating adapter...")
         
         try:
-            adapter_class_path = self.config['adapter_class']
-            module_path, class_name = adapter_class_path.rsplit('.', 1)
-            module = importlib.import_module(module_path)
-            adapter_class = getattr(module, class_name)
+            # parser/ в sys.path: suppliers.* импортируется как пакет верхнего уровня
+            adapter_class = AdapterRegistry(package=None).load_class(self.config['adapter_class'])
             self.adapter = adapter_class(self.config)
 
             # Attach log callback for adapter-level debug
@@ -533,20 +826,9 @@ class UrlCollector:
         Returns:
             str: Тип материала (e.g., 'лдсп', 'мдф') или None
         """
-        url_lower = url.lower()
-        material_types = self.config.get('material_types', [])
-        
-        for material in material_types:
-            if material.lower() in url_lower:
-                return material
-        
-        # Fallback на filter_keywords
-        filter_keywords = self.config.get('url_collection', {}).get('filter_keywords', [])
-        for keyword in filter_keywords:
-            if keyword.lower() in url_lower:
-                return keyword
-        
-        return None
+        if self.url_classifier is None:
+            self.url_classifier = UrlClassifier.from_config(self.config)
+        return self.url_classifier.classify(url).material_tag
     
     def send_to_api(self, validated_urls: List[Dict[str, Any]]):
         """
@@ -555,44 +837,39 @@ class UrlCollector:
         Args:
             validated_urls: Список валидированных URL
         """
-        import requests
-        import hmac
-        import hashlib
-        import json
-        
         api_base = self._get_api_base()
         api_url = f"{api_base}/parsing/save-urls"
         
-        # Формируем payload
-        payload = {
-            'supplier_name': self.supplier_name,
-            'urls': validated_urls,
-            'collected_at': datetime.utcnow().isoformat() + 'Z'
-        }
-        
-        # Сначала преобразуем в JSON - это будет отправлено запросом
-        body_str = json.dumps(payload, separators=(',', ':'), sort_keys=True)
-        
-        # Генерируем HMAC на основе точного JSON который отправляем
-        token = hmac.new(
-            self.hmac_secret.encode(),
-            body_str.encode(),
-            hashlib.sha256
-        ).hexdigest()
+        # Тело и HMAC собираются за один проход: каждая запись URL
+        # сериализуется один раз (orjson, ключи отсортированы), подпись —
+        # по точным байтам тела (по сжатым, если включён gzip)
+        url_collection = (self.config or {}).get('url_collection', {}) or {}
+        signed = build_signed_body(
+            self.hmac_secret,
+            {
+                'supplier_name': self.supplier_name,
+                'collected_at': datetime.utcnow().isoformat() + 'Z',
+            },
+            stream_key='urls',
+            records=validated_urls,
+            compress_level=6 if url_collection.get('gzip_chunks') else None,
+        )
         
         headers = {
             'Content-Type': 'application/json',
-            'X-HMAC-Signature': token,
+            'X-HMAC-Signature': signed.signature,
             'X-Parser-Token': os.environ.get('PARSER_CALLBACK_TOKEN', 'test-secret-parser-token'),
         }
+        if signed.content_encoding:
+            headers['Content-Encoding'] = signed.content_encoding
         
         try:
             print(f"[COLLECT] chunk_send_attempted: sending {len(validated_urls)} URLs to API...", file=sys.stderr, flush=True)
             
-            # Отправляем точно строку которую использовали для подписи
+            # Отправляем точно те байты, которые использовали для подписи
             response = requests.post(
                 api_url,
-                data=body_str,  # Используем data с точным JSON, не json параметр
+                data=signed.body,  # Точные байты, по которым считалась подпись
                 headers=headers,
                 timeout=30
             )
@@ -621,6 +898,8 @@ class UrlCollector:
         
         # Start timer early to avoid zero stats on early exit
         self.start_time = time.time()
+        if self.metrics_port is not None:
+            metrics_server.register(self.metrics_port, self.metrics_families)
 
         try:
             # Send phase_started callback
@@ -637,6 +916,8 @@ class UrlCollector:
         finally:
             # Always flush pending chunk and send final stats
             self.flush_pending_chunk(reason="finally", final=True)
+            if self.chunk_sender is not None:
+                self.chunk_sender.close()
 
             final_stats = {
                 'urls_found_total': self.stats['urls_found_total'],
@@ -653,7 +934,10 @@ class UrlCollector:
                 'chunk_send_last_error': self.stats['chunk_send_last_error'],
                 'stop_reason': self.stop_reason or 'completed',
                 'elapsed_seconds': time.time() - self.start_time if self.start_time else 0,
+                'dedup_memory_bytes': self.seen_urls.memory_bytes,
+                'categories': getattr(self.adapter, 'collect_category_stats', None) or {},
             }
+            self.seen_urls.close()
 
             result = 'success' if self.stats['urls_sent_total'] > 0 else 'failed'
             self.send_phase_callback('phase_finished', {
@@ -674,16 +958,53 @@ class UrlCollector:
             self.log(f"chunk_send_success: {self.stats['chunk_send_success']}")
             self.log(f"chunk_send_failed: {self.stats['chunk_send_failed']}")
             self.log(f"stop_reason: {self.stop_reason or 'completed'}")
+            for category_key, category_stats in final_stats['categories'].items():
+                self.log(
+                    f"category {category_key}: pages={category_stats.get('pages')} "
+                    f"uniques={category_stats.get('uniques')} stop_reason={category_stats.get('stop_reason') or 'completed'}"
+                )
+
+            if self.log_shipper is not None:
+                self.log_shipper.close()
+            if self.metrics_port is not None:
+                metrics_server.unregister(self.metrics_port, self.metrics_families)
 
         # Return 0 if any URLs were sent (even partial success)
         return 0 if self.stats['urls_sent_total'] > 0 else 1
 
+    def metrics_families(self) -> List[metrics_server.MetricFamily]:
+        """Живые метрики сбора для /metrics (вызывается из потока сервера)."""
+        m = metrics_server
+        with self._stats_lock:
+            stats = dict(self.stats)
+        elapsed_min = (time.time() - self.start_time) / 60 if self.start_time else 0
+        chunk_sender = self.chunk_sender
+        log_shipper = self.log_shipper
+        return [
+            m.labeled('parser_collect_info', 'gauge', 'Сборщик URL', 'supplier', {self.supplier_name: 1}),
+            m.counter('parser_collect_urls_found', 'Найдено URL до фильтрации', stats['urls_found_total']),
+            m.counter('parser_collect_urls_unique', 'Уникальных URL', stats['urls_unique_total']),
+            m.counter('parser_collect_urls_sent', 'Отправлено URL в API', stats['urls_sent_total']),
+            m.counter('parser_collect_duplicates_dropped', 'Отброшено дубликатов', stats['duplicates_dropped']),
+            m.counter('parser_collect_chunks_sent', 'Отправлено chunk\'ов', stats['chunk_send_success']),
+            m.counter('parser_collect_chunk_send_failed', 'Неудачные отправки chunk\'ов', stats['chunk_send_failed']),
+            m.gauge('parser_collect_pending_chunk_urls', 'URL в незавершённом chunk', len(self.pending_chunk)),
+            m.gauge('parser_collect_chunk_send_backlog', 'Chunk\'и в очереди и в полёте', chunk_sender.backlog if chunk_sender else 0),
+            m.gauge('parser_collect_log_buffer', 'Логи в буфере отправки', len(log_shipper._buffer) if log_shipper else 0),
+            m.gauge('parser_collect_dedup_memory_bytes', 'Память множества дедупликации', self.seen_urls.memory_bytes),
+            m.gauge('parser_collect_urls_per_minute', 'Средняя скорость сбора уникальных URL', stats['urls_unique_total'] / elapsed_min if elapsed_min > 0 else 0),
+        ]
+
     def send_phase_callback(self, callback_type: str, payload: dict):
         """Send phase callback to Laravel."""
         if not self.session_id:
             return
         
         try:
+            # Логи, накопленные до события фазы, должны прийти раньше него
+            if self.log_shipper is not None:
+                self.log_shipper.flush()
+
             api_base = self._get_api_base()
             callback_url = f"{api_base}/internal/parser/callback"
             token = os.environ.get('PARSER_CALLBACK_TOKEN', 'test-secret-parser-token')
@@ -708,40 +1029,19 @@ class UrlCollector:
             print(f"[COLLECT] Warning: {callback_type} callback failed: {e}", file=sys.stderr, flush=True)
 
     def send_log(self, level: str, message: str, details: Optional[dict] = None) -> None:
-        """Send log callback to Laravel."""
+        """Buffer log for batched callback to Laravel (see LogShipper)."""
         if not self.session_id:
             return
 
         try:
-            api_base = self._get_api_base()
-            callback_url = f"{api_base}/internal/parser/callback"
-            token = os.environ.get('PARSER_CALLBACK_TOKEN', 'test-secret-parser-token')
-
-            self._log_seq += 1
-            payload = {
-                'level': level,
-                'message': message,
-            }
-            if details is not None:
-                payload['details'] = details
-
-            data = {
-                'session_id': self.session_id,
-                'token': token,
-                'type': 'log',
-                'timestamp': int(time.time()),
-                'event_id': f"log_{self._log_seq}_{int(time.time() * 1000)}",
-                'payload': payload,
-            }
-
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {token}',
-            }
-
-            response = requests.post(callback_url, json=data, headers=headers, timeout=5)
-            if response.status_code != 200:
-                print(f"[COLLECT] Warning: log callback HTTP {response.status_code}: {response.text[:200]}", file=sys.stderr, flush=True)
+            if self.log_shipper is None:
+                api_base = self._get_api_base()
+                self.log_shipper = LogShipper(
+                    callback_url=f"{api_base}/internal/parser/callback",
+                    session_id=self.session_id,
+                    token=os.environ.get('PARSER_CALLBACK_TOKEN', 'test-secret-parser-token'),
+                )
+            self.log_shipper.add(level, message, details)
         except Exception as e:
             print(f"[COLLECT] Warning: log callback failed: {e}", file=sys.stderr, flush=True)
 
@@ -785,6 +1085,12 @@ def main():
         default=None,
         help='Base API URL (e.g., http://localhost/api)'
     )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=None,
+        help='Port for the Prometheus /metrics endpoint (optional)'
+    )
     parser.add_argument(
         '--config-override-base64',
         default=None,
@@ -798,7 +1104,8 @@ def main():
         supplier_name=args.supplier,
         hmac_secret=args.hmac_secret,
         session_id=args.session,
-        api_url_base=args.api_url
+        api_url_base=args.api_url,
+        metrics_port=args.metrics_port,
     )
 
     if args.config_override_base64:
@@ -1,8 +1,150 @@
 # parser/config.py
 
+import ctypes
+import ctypes.util
+import hashlib
 import json
+import os
+import select
+import struct
+import sys
+import threading
 from pathlib import Path
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+# Поддержка запуска как модуля и как скрипта (collect_urls.py)
+try:
+	from . import log_pipeline as plog
+except ImportError:
+	sys.path.insert(0, str(Path(__file__).parent.parent))
+	from parser import log_pipeline as plog
+
+if TYPE_CHECKING:
+	from .supplier_profile import SupplierProfile
+
+
+class ConfigWatcher:
+	"""
+	Фоновое наблюдение за директорией конфигураций.
+
+	На Linux используется inotify (через ctypes, без зависимостей): события
+	IN_CLOSE_WRITE/IN_MOVED_TO покрывают и запись на месте, и атомарную
+	замену файла (rename). Если inotify недоступен (другая ОС, исчерпан
+	лимит watch'ей), работает опрос mtime/size раз в poll_interval секунд.
+	Пачка событий схлопывается (debounce), on_change получает имя поставщика.
+	"""
+
+	IN_CLOSE_WRITE = 0x00000008
+	IN_MOVED_TO = 0x00000080
+	IN_CREATE = 0x00000100
+	DEBOUNCE_SECONDS = 0.2
+
+	def __init__(self, config_dir: Path, on_change: Callable[[str], None], poll_interval: float = 2.0):
+		self.config_dir = config_dir
+		self.on_change = on_change
+		self.poll_interval = max(0.1, float(poll_interval))
+		self.mode: Optional[str] = None
+		self._stop = threading.Event()
+		self._thread: Optional[threading.Thread] = None
+		self._inotify_fd: Optional[int] = None
+
+	def start(self) -> 'ConfigWatcher':
+		self._inotify_fd = self._init_inotify()
+		self.mode = 'inotify' if self._inotify_fd is not None else 'mtime'
+		target = self._run_inotify if self._inotify_fd is not None else self._run_polling
+		self._thread = threading.Thread(target=target, name='config-watcher', daemon=True)
+		self._thread.start()
+		plog.info(f"[CONFIG] Наблюдение за {self.config_dir} (mode={self.mode})")
+		return self
+
+	def stop(self, timeout: float = 2.0) -> None:
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join(timeout)
+		if self._inotify_fd is not None:
+			try:
+				os.close(self._inotify_fd)
+			except OSError:
+				pass
+			self._inotify_fd = None
+
+	def _init_inotify(self) -> Optional[int]:
+		if not sys.platform.startswith('linux'):
+			return None
+		try:
+			libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+			fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+			if fd < 0:
+				return None
+			mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+			if libc.inotify_add_watch(fd, os.fsencode(str(self.config_dir)), mask) < 0:
+				os.close(fd)
+				return None
+			return fd
+		except (OSError, AttributeError):
+			return None
+
+	def _emit(self, supplier_names) -> None:
+		for name in sorted(supplier_names):
+			try:
+				self.on_change(name)
+			except Exception as e:
+				plog.error(f"[CONFIG] Ошибка обработки изменения {name}: {e}")
+
+	def _read_inotify(self) -> set:
+		"""Читает накопленные события, возвращает имена изменённых поставщиков."""
+		names = set()
+		while True:
+			try:
+				data = os.read(self._inotify_fd, 64 * 1024)
+			except BlockingIOError:
+				return names
+			if not data:
+				return names
+			offset = 0
+			while offset + 16 <= len(data):
+				# struct inotify_event { int wd; uint32 mask, cookie, len; char name[len]; }
+				_wd, _mask, _cookie, length = struct.unpack_from('iIII', data, offset)
+				raw_name = data[offset + 16:offset + 16 + length].split(b'\0', 1)[0]
+				offset += 16 + length
+				name = os.fsdecode(raw_name)
+				if name.endswith('.json'):
+					names.add(name[:-5])
+
+	def _run_inotify(self) -> None:
+		fd = self._inotify_fd
+		while not self._stop.is_set():
+			try:
+				ready, _, _ = select.select([fd], [], [], 1.0)
+			except (OSError, ValueError):
+				return
+			if not ready:
+				continue
+			names = self._read_inotify()
+			# Редакторы пишут файл в несколько приёмов — ждём, пока запись утихнет
+			if self._stop.wait(self.DEBOUNCE_SECONDS):
+				return
+			names |= self._read_inotify()
+			self._emit(names)
+
+	def _snapshot(self) -> Dict[str, tuple]:
+		snapshot = {}
+		for path in self.config_dir.glob('*.json'):
+			try:
+				st = path.stat()
+			except OSError:
+				continue
+			snapshot[path.stem] = (st.st_mtime_ns, st.st_size)
+		return snapshot
+
+	def _run_polling(self) -> None:
+		previous = self._snapshot()
+		while not self._stop.wait(self.poll_interval):
+			current = self._snapshot()
+			changed = {name for name, sig in current.items() if previous.get(name) != sig}
+			previous = current
+			if changed:
+				self._emit(changed)
 
 
 class ConfigManager:
@@ -23,6 +165,13 @@ class ConfigManager:
             
 		self.config_dir.mkdir(exist_ok=True)
 		self._configs_cache: Dict[str, dict] = {}
+		self._profiles_cache: Dict[str, 'SupplierProfile'] = {}
+		# Горячая перезагрузка: подписчики, хэши файлов и поколения
+		self._lock = threading.RLock()
+		self._listeners: Dict[str, List[Callable[[dict, 'SupplierProfile'], None]]] = {}
+		self._digests: Dict[str, bytes] = {}
+		self._generations: Dict[str, int] = {}
+		self._watcher: Optional[ConfigWatcher] = None
     
 	def load_supplier_config(self, supplier_name: str) -> dict:
 		"""
@@ -49,17 +198,44 @@ class ConfigManager:
 				f"Конфигурация для '{supplier_name}' не найдена: {config_file}"
 			)
         
-		with open(config_file, 'r', encoding='utf-8') as f:
-			config = json.load(f)
+		raw = config_file.read_bytes()
+		config = json.loads(raw)
         
 		# Валидация обязательных полей
 		self._validate_config(config, supplier_name)
         
 		# Кешируем
 		self._configs_cache[supplier_name] = config
+		self._digests[supplier_name] = hashlib.blake2b(raw, digest_size=16).digest()
         
 		return config
     
+	def load_supplier_profile(self, supplier_name: str) -> 'SupplierProfile':
+		"""
+		Возвращает скомпилированный профиль поставщика (SupplierProfile).
+        
+		Профиль строится из того же конфига, что и load_supplier_config,
+		один раз и кешируется до reload_config/save_supplier_config.
+        
+		Args:
+			supplier_name: Имя поставщика
+            
+		Returns:
+			SupplierProfile: Неизменяемый профиль
+            
+		Raises:
+			ValueError: Если значения в конфиге имеют неверный тип
+		"""
+		profile = self._profiles_cache.get(supplier_name)
+		if profile is None:
+			try:
+				from .supplier_profile import SupplierProfile
+			except ImportError:
+				from supplier_profile import SupplierProfile
+			profile = SupplierProfile.from_config(self.load_supplier_config(supplier_name))
+			self._profiles_cache[supplier_name] = profile
+		return profile
+    
 	def reload_config(self, supplier_name: str) -> dict:
 		"""
 		Перезагружает конфигурацию поставщика (сбрасывает кеш).
@@ -72,9 +248,110 @@ class ConfigManager:
 		"""
 		if supplier_name in self._configs_cache:
 			del self._configs_cache[supplier_name]
+		self._profiles_cache.pop(supplier_name, None)
         
 		return self.load_supplier_config(supplier_name)
     
+	def subscribe(self, supplier_name: str, callback: Callable[[dict, 'SupplierProfile'], None]) -> None:
+		"""
+		Подписывает callback на перезагрузку конфигурации поставщика.
+
+		callback(config, profile) вызывается из потока наблюдателя после того,
+		как новая конфигурация прошла валидацию и уже лежит в кеше. Получатель
+		должен только запомнить пару и применить её сам, между URL.
+		"""
+		with self._lock:
+			self._listeners.setdefault(supplier_name, []).append(callback)
+
+	def unsubscribe(self, supplier_name: str, callback: Callable[[dict, 'SupplierProfile'], None]) -> None:
+		"""Отписывает callback, добавленный через subscribe."""
+		with self._lock:
+			listeners = self._listeners.get(supplier_name, [])
+			if callback in listeners:
+				listeners.remove(callback)
+
+	def watch(self, poll_interval: float = 2.0) -> 'ConfigWatcher':
+		"""
+		Запускает наблюдение за директорией конфигураций (идемпотентно).
+
+		Args:
+			poll_interval: Период опроса mtime, если inotify недоступен
+
+		Returns:
+			ConfigWatcher: Запущенный наблюдатель
+		"""
+		with self._lock:
+			if self._watcher is None:
+				self._watcher = ConfigWatcher(self.config_dir, self._on_file_changed, poll_interval).start()
+			return self._watcher
+
+	def stop_watching(self) -> None:
+		"""Останавливает наблюдение, запущенное через watch()."""
+		with self._lock:
+			watcher, self._watcher = self._watcher, None
+		if watcher is not None:
+			watcher.stop()
+
+	def _on_file_changed(self, supplier_name: str) -> bool:
+		"""
+		Перечитывает изменившийся файл и публикует новую конфигурацию.
+
+		Невалидный файл (битый JSON, нет обязательных полей, неверные типы)
+		не трогает кеш: процесс продолжает работать на прежней конфигурации.
+
+		Returns:
+			bool: True если конфигурация заменена
+		"""
+		with self._lock:
+			listeners = list(self._listeners.get(supplier_name, []))
+			known = supplier_name in self._configs_cache
+		if not listeners and not known:
+			return False
+
+		config_file = self.config_dir / f"{supplier_name}.json"
+		try:
+			raw = config_file.read_bytes()
+		except OSError:
+			# Файл удалён или переименован — остаёмся на прежней конфигурации
+			return False
+		digest = hashlib.blake2b(raw, digest_size=16).digest()
+		if self._digests.get(supplier_name) == digest:
+			return False
+
+		try:
+			from .supplier_profile import SupplierProfile
+		except ImportError:
+			from supplier_profile import SupplierProfile
+		try:
+			config = json.loads(raw)
+			self._validate_config(config, supplier_name)
+			profile = SupplierProfile.from_config(config)
+		except ValueError as e:
+			# json.JSONDecodeError — подкласс ValueError
+			plog.warning(f"[CONFIG] {supplier_name}: новая конфигурация отклонена, работаем на прежней: {e}")
+			return False
+
+		# Новые объекты целиком заменяют старые: держатели прежнего dict/профиля
+		# видят согласованное состояние до тех пор, пока сами не переключатся
+		with self._lock:
+			self._configs_cache[supplier_name] = config
+			self._profiles_cache[supplier_name] = profile
+			self._digests[supplier_name] = digest
+			self._generations[supplier_name] = self._generations.get(supplier_name, 0) + 1
+			generation = self._generations[supplier_name]
+		plog.info(f"[CONFIG] {supplier_name}: конфигурация перезагружена (generation={generation})")
+
+		for callback in listeners:
+			try:
+				callback(config, profile)
+			except Exception as e:
+				plog.error(f"[CONFIG] Ошибка подписчика {supplier_name}: {e}")
+		return True
+
+	def generation(self, supplier_name: str) -> int:
+		"""Номер поколения конфигурации (растёт при каждой горячей перезагрузке)."""
+		return self._generations.get(supplier_name, 0)
+    
 	def list_suppliers(self) -> list[str]:
 		"""
 		Возвращает список всех доступных поставщиков.
@@ -121,6 +398,7 @@ class ConfigManager:
         
 		# Обновляем кеш
 		self._configs_cache[supplier_name] = config
+		self._profiles_cache.pop(supplier_name, None)
 
 
 # Глобальный экземпляр менеджера конфигураций
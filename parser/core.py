@@ -2,9 +2,8 @@
 
 import logging
 import requests
-from typing import List, Optional, Dict, Any, Callable
+from typing import List, Optional, Dict, Any, Callable, Tuple
 from datetime import datetime
-import importlib
 import sys
 from pathlib import Path
 import threading
@@ -16,10 +15,18 @@ import time
 try:
     from .base_adapter import SupplierAdapter, MaterialData
     from .config import config_manager
+    from .adapter_registry import adapter_registry
+    from . import log_pipeline as plog
+    from .outbox import CHANNEL_CORE, KIND_MATERIAL, Outbox, OutboxDrainer, OutboxEntry, open_outbox
+    from .save_retry import SAVE_OK, SAVE_RETRY, classify_save_status
 except ImportError:
     sys.path.insert(0, str(Path(__file__).parent.parent))
     from parser.base_adapter import SupplierAdapter, MaterialData
     from parser.config import config_manager
+    from parser.adapter_registry import adapter_registry
+    from parser import log_pipeline as plog
+    from parser.outbox import CHANNEL_CORE, KIND_MATERIAL, Outbox, OutboxDrainer, OutboxEntry, open_outbox
+    from parser.save_retry import SAVE_OK, SAVE_RETRY, classify_save_status
 
 
 logger = logging.getLogger(__name__)
@@ -29,16 +36,22 @@ class MaterialBatcher:
     """
     Буферизирует материалы для batch-сохранения.
     Thread-safe для использования с параллельным парсингом.
+
+    С outbox материал сначала пишется на диск; строка подтверждается после
+    доставки пачки, иначе остаётся для повтора (OutboxDrainer, следующий запуск).
     """
     
     BATCH_SIZE = 50  # Размер буфера материалов
     
-    def __init__(self, flush_callback: Callable[[List[MaterialData]], Dict[str, Any]]):
+    def __init__(self, flush_callback: Callable[[List[MaterialData]], Dict[str, Any]], outbox: Optional[Outbox] = None):
         """
         Args:
             flush_callback: Функция для отправки batch (принимает List[MaterialData])
+            outbox: Локальный outbox (None — буфер только в памяти)
         """
         self._buffer: List[MaterialData] = []
+        self._outbox = outbox
+        self._outbox_ids: List[int] = []
         self._lock = threading.Lock()
         self._flush_callback = flush_callback
         self._stats = {
@@ -56,6 +69,8 @@ class MaterialBatcher:
             dict или None: Результат flush если был выполнен
         """
         with self._lock:
+            if self._outbox is not None:
+                self._outbox_ids.extend(self._outbox.append(KIND_MATERIAL, [{'material': material.to_dict()}]))
             self._buffer.append(material)
             self._stats['total_added'] += 1
             
@@ -76,8 +91,14 @@ class MaterialBatcher:
         
         materials_to_send = self._buffer.copy()
         self._buffer.clear()
+        outbox_ids, self._outbox_ids = self._outbox_ids, []
         
         result = self._flush_callback(materials_to_send)
+        if self._outbox is not None:
+            if result.get('delivered'):
+                self._outbox.ack(outbox_ids)
+            else:
+                self._outbox.release(outbox_ids, result.get('error'))
         
         self._stats['total_flushed'] += len(materials_to_send)
         self._stats['success_count'] += result.get('success_count', 0)
@@ -360,8 +381,7 @@ class CallbackHandler:
         for attempt, backoff in enumerate(self.CALLBACK_BACKOFFS, 1):
             try:
                 if not nonblocking:
-                    print(f"[CALLBACK] Отправляю {data.get('type')}...", file=sys.stderr, flush=True)
-                    sys.stderr.flush()
+                    plog.info(f"[CALLBACK] Отправляю {data.get('type')}...")
 
                 response = requests.post(
                     self.url,
@@ -372,7 +392,7 @@ class CallbackHandler:
 
                 if response.status_code in (401, 422):
                     if not self._callback_fatal_logged:
-                        print(f"[CALLBACK_FATAL] {response.status_code}: {response.text[:200]}", file=sys.stderr, flush=True)
+                        plog.error(f"[CALLBACK_FATAL] {response.status_code}: {response.text[:200]}")
                         self._callback_fatal_logged = True
                     self._callback_disabled = True
                     return {'success': False, 'command': None}
@@ -388,8 +408,7 @@ class CallbackHandler:
                     return response.json()
 
                 if not nonblocking:
-                    print(f"[CALLBACK] API ошибка: {response.status_code} - {response.text[:200]}", file=sys.stderr, flush=True)
-                    sys.stderr.flush()
+                    plog.error(f"[CALLBACK] API ошибка: {response.status_code} - {response.text[:200]}")
                 return {'success': False, 'command': None}
 
             except requests.exceptions.Timeout as e:
@@ -468,7 +487,9 @@ class ParserCore:
         api_url: str = "http://host.docker.internal:8000/api/parser",
         api_callback: Optional[str] = None,
         api_token: Optional[str] = None,
-        session_id: Optional[int] = None
+        session_id: Optional[int] = None,
+        watch_config: bool = False,
+        outbox_dir: Optional[str] = None
     ):
         """
         Инициализация ядра парсера.
@@ -478,8 +499,12 @@ class ParserCore:
             api_callback: URL эндпоинта Laravel для callback'ов
             api_token: Токен безопасности для callback'ов
             session_id: ID сессии парсинга из Laravel
+            watch_config: Подхватывать изменения конфигурации поставщика на лету
+            outbox_dir: Каталог локального outbox (None — PARSER_OUTBOX_DIR или без outbox)
         """
         self.api_url = api_url
+        self.watch_config = watch_config
+        self.outbox_dir = outbox_dir
         self.session_id = session_id
         self.should_stop = False
         self.callback_handler: Optional[CallbackHandler] = None
@@ -516,17 +541,9 @@ class ParserCore:
         # Загружаем конфигурацию
         config = config_manager.load_supplier_config(supplier_name)
         
-        # Получаем класс адаптера
+        # Получаем класс адаптера (модуль импортируется один раз, при первом вызове)
         adapter_class_path = config['adapter_class']  # например, "suppliers.skm_mebel.SkmMebelAdapter"
-        
-        # Разделяем на модуль и класс
-        module_path, class_name = adapter_class_path.rsplit('.', 1)
-        
-        # Импортируем модуль с относительным путём
-        module = importlib.import_module('.' + module_path, package='parser')
-        
-        # Получаем класс
-        adapter_class = getattr(module, class_name)
+        adapter_class = adapter_registry.load_class(adapter_class_path)
         
         # Создаём экземпляр
         adapter = adapter_class(config)
@@ -554,21 +571,17 @@ class ParserCore:
             )
             
             if response.status_code in (200, 201):
-                print(
+                plog.info(
                     f"[MATERIAL] ✓ Сохранено: {material.article} — {material.price_per_unit} ₽ [{material.availability_status}]",
-                    file=sys.stderr, flush=True
                 )
-                sys.stderr.flush()
                 return True
             else:
-                print(f"[MATERIAL] API ошибка {response.status_code}: {response.text}", file=sys.stderr, flush=True)
-                sys.stderr.flush()
+                plog.error(f"[MATERIAL] API ошибка {response.status_code}: {response.text}")
                 self._log_parsing_error(material.source_url, f"API error: {response.status_code}")
                 return False
                 
         except Exception as e:
-            print(f"[MATERIAL] Ошибка при сохранении {material.article}: {e}", file=sys.stderr, flush=True)
-            sys.stderr.flush()
+            plog.error(f"[MATERIAL] Ошибка при сохранении {material.article}: {e}")
             self._log_parsing_error(material.source_url, str(e))
             return False
     
@@ -582,12 +595,23 @@ class ParserCore:
         Returns:
             dict: {success_count, failed_count, results}
         """
+        return self.post_materials_batch([m.to_dict() for m in materials])
+
+    def post_materials_batch(self, materials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        POST уже сериализованных материалов (пачка буфера или повтор из outbox).
+
+        Returns:
+            dict: {success_count, failed_count, results, delivered, outcome[, error]};
+            delivered — API принял пачку (построчные ошибки не повторяются),
+            outcome — класс ответа save_retry (ok / split / retry / fatal)
+        """
         if not materials:
-            return {'success_count': 0, 'failed_count': 0, 'results': []}
+            return {'success_count': 0, 'failed_count': 0, 'results': [], 'delivered': True, 'outcome': SAVE_OK}
         
         try:
             payload = {
-                'materials': [m.to_dict() for m in materials]
+                'materials': materials
             }
             
             response = requests.post(
@@ -603,34 +627,43 @@ class ParserCore:
                 success_count = sum(1 for r in results if r.get('success'))
                 failed_count = len(results) - success_count
                 
-                print(
+                plog.info(
                     f"[BATCH] ✓ Сохранено {success_count}/{len(materials)} материалов",
-                    file=sys.stderr, flush=True
                 )
-                sys.stderr.flush()
                 
                 return {
                     'success_count': success_count,
                     'failed_count': failed_count,
-                    'results': results
+                    'results': results,
+                    'delivered': True,
+                    'outcome': SAVE_OK,
                 }
             else:
-                print(f"[BATCH] API ошибка {response.status_code}: {response.text[:200]}", file=sys.stderr, flush=True)
-                sys.stderr.flush()
+                plog.error(f"[BATCH] API ошибка {response.status_code}: {response.text[:200]}")
                 return {
                     'success_count': 0,
                     'failed_count': len(materials),
-                    'results': []
+                    'results': [],
+                    'delivered': False,
+                    'outcome': classify_save_status(response.status_code, response.text),
+                    'error': f"HTTP {response.status_code}: {response.text[:200]}",
                 }
                 
         except Exception as e:
-            print(f"[BATCH] Ошибка при batch сохранении: {e}", file=sys.stderr, flush=True)
-            sys.stderr.flush()
+            plog.error(f"[BATCH] Ошибка при batch сохранении: {e}")
             return {
                 'success_count': 0,
                 'failed_count': len(materials),
-                'results': []
+                'results': [],
+                'delivered': False,
+                'outcome': SAVE_RETRY,
+                'error': str(e),
             }
+
+    def _upload_outbox(self, entries: List[OutboxEntry]) -> Tuple[str, Optional[str]]:
+        """Повтор материалов из outbox (OutboxDrainer выдаёт только KIND_MATERIAL); (исход, ошибка)."""
+        result = self.post_materials_batch([entry.payload['material'] for entry in entries])
+        return result['outcome'], result.get('error')
     
     def get_existing_material(self, article: str) -> Optional[dict]:
         """
@@ -655,8 +688,7 @@ class ParserCore:
             return None
             
         except Exception as e:
-            print(f"[MATERIAL] Не удалось получить существующий материал {article}: {e}", file=sys.stderr, flush=True)
-            sys.stderr.flush()
+            plog.warning(f"[MATERIAL] Не удалось получить существующий материал {article}: {e}")
             return None
     
     def get_urls_from_api(self, supplier_name: str, material_type: Optional[str] = None) -> List[str]:
@@ -681,8 +713,7 @@ class ParserCore:
             if material_type:
                 params['material_type'] = material_type
             
-            print(f"[GET_URLS] Fetching URLs from API: {api_url}", file=sys.stderr, flush=True)
-            sys.stderr.flush()
+            plog.info(f"[GET_URLS] Fetching URLs from API: {api_url}")
             
             headers = {"Accept": "application/json"}
             if self.api_token:
@@ -706,24 +737,19 @@ class ParserCore:
                     for mat_type, urls in urls_by_type.items():
                         all_urls.extend(urls)
                     
-                    print(f"[GET_URLS] ✓ Loaded {len(all_urls)} URLs from API", file=sys.stderr, flush=True)
-                    sys.stderr.flush()
+                    plog.info(f"[GET_URLS] ✓ Loaded {len(all_urls)} URLs from API")
                     
                     return all_urls
                 else:
-                    print(f"[GET_URLS] API returned success=false", file=sys.stderr, flush=True)
-                    sys.stderr.flush()
+                    plog.warning(f"[GET_URLS] API returned success=false")
                     return []
             else:
-                print(f"[GET_URLS] API error: {response.status_code}", file=sys.stderr, flush=True)
-                sys.stderr.flush()
+                plog.error(f"[GET_URLS] API error: {response.status_code}")
                 return []
                 
         except Exception as e:
-            print(f"[GET_URLS] ERROR fetching URLs from API: {e}", file=sys.stderr, flush=True)
-            sys.stderr.flush()
-            import traceback
-            traceback.print_exc(file=sys.stderr)
+            # Трейсбек — через ту же очередь, чтобы не обогнать строку ошибки
+            plog.error(f"[GET_URLS] ERROR fetching URLs from API: {e}", exc_info=True)
             return []
     
     def parse_urls(
@@ -750,23 +776,20 @@ class ParserCore:
         Returns:
             dict: Статистика парсинга
         """
-        print(f"[PARSE_URLS] Starting with {len(urls) if urls else 0} URLs", file=sys.stderr, flush=True)
-        sys.stderr.flush()
+        plog.info(f"[PARSE_URLS] Starting with {len(urls) if urls else 0} URLs")
         
         # Создаём сессию парсинга
         self._start_session(supplier_name)
         
         # Получаем адаптер
-        print(f"[PARSE_URLS] Getting adapter for {supplier_name}...", file=sys.stderr, flush=True)
-        sys.stderr.flush()
+        plog.info(f"[PARSE_URLS] Getting adapter for {supplier_name}...")
         adapter = self.get_adapter(supplier_name)
         
         # Инициализируем адаптер
         try:
             adapter.setup()
         except Exception as e:
-            print(f"[PARSE_URLS] adapter.setup() FAILED: {e}", file=sys.stderr, flush=True)
-            sys.stderr.flush()
+            plog.error(f"[PARSE_URLS] adapter.setup() FAILED: {e}")
             return {
                 'total': 0,
                 'success': 0,
@@ -775,6 +798,10 @@ class ParserCore:
                 'screenshots_reused': 0
             }
         
+        if self.watch_config:
+            config_manager.subscribe(supplier_name, adapter.on_config_reloaded)
+            config_manager.watch()
+
         # Получаем URL для парсинга
         config = adapter.config
         use_db_urls = config.get('url_collection_frequency') is not None
@@ -785,13 +812,11 @@ class ParserCore:
         # - Если URLs не переданы и включен DB-режим, берем из API/БД
         # - Автосбор URL внутри parsing запрещён
         if not urls_provided and use_db_urls:
-            print(f"[PARSE_URLS] Fetching URLs from DB...", file=sys.stderr, flush=True)
-            sys.stderr.flush()
+            plog.info(f"[PARSE_URLS] Fetching URLs from DB...")
             urls = self.get_urls_from_api(supplier_name)
         
         if not urls:
-            print(f"[PARSE_URLS] ERROR: No URLs to parse!", file=sys.stderr, flush=True)
-            sys.stderr.flush()
+            plog.error(f"[PARSE_URLS] ERROR: No URLs to parse!")
             adapter.teardown()
             return {
                 'total': 0,
@@ -805,8 +830,20 @@ class ParserCore:
         if self.callback_handler:
             self.callback_handler.send_total_urls(len(urls))
         
+        # Outbox: материалы на диске до подтверждения API, недоставленное с прошлых запусков — повтор
+        outbox = open_outbox(
+            self.outbox_dir, supplier_name, f"{supplier_name}_core_{os.getpid()}_{os.urandom(4).hex()}", CHANNEL_CORE,
+        )
+        drainer = None
+        if outbox is not None:
+            replayed = outbox.adopt_orphans()
+            if replayed:
+                plog.info(f"[OUTBOX] К повторной отправке с прошлых запусков: {replayed}")
+            drainer = OutboxDrainer(outbox, self._upload_outbox)
+            drainer.start()
+
         # Инициализируем batch сохранение
-        material_batcher = MaterialBatcher(self.process_materials_batch)
+        material_batcher = MaterialBatcher(self.process_materials_batch, outbox=outbox)
         
         stats = {
             'total': len(urls),
@@ -821,17 +858,18 @@ class ParserCore:
             for i, url in enumerate(urls, 1):
                 # Проверяем stop
                 if self.should_stop:
-                    print("[PARSE_URLS] Парсинг остановлен по команде сервера", file=sys.stderr, flush=True)
-                    sys.stderr.flush()
+                    plog.info("[PARSE_URLS] Парсинг остановлен по команде сервера")
                     break
                 
                 # Log progress каждые 10 товаров (показываем processed+1 = текущий)
                 if stats['processed'] % 10 == 0:
-                    print(f"[PARSE_URLS] [{stats['processed']+1}/{len(urls)}] Processing {url[:60]}...", file=sys.stderr, flush=True)
-                    sys.stderr.flush()
+                    plog.info(f"[PARSE_URLS] [{stats['processed']+1}/{len(urls)}] Processing {url[:60]}...")
 
                 if self.request_delay > 0:
                     time.sleep(self.request_delay)
+
+                # Новая конфигурация (watch_config) применяется между URL
+                adapter.apply_pending_config()
                 
                 try:
                     material = adapter.parse_product_page(url, take_screenshot=False)
@@ -853,8 +891,7 @@ class ParserCore:
                         
                 except Exception as e:
                     error_msg = str(e)
-                    print(f"[PARSE_URLS] Ошибка {url}: {error_msg}", file=sys.stderr, flush=True)
-                    sys.stderr.flush()
+                    plog.error(f"[PARSE_URLS] Ошибка {url}: {error_msg}")
                     stats['errors'] += 1
                     stats['processed'] += 1
                     self._log_parsing_error(url, error_msg)
@@ -881,19 +918,30 @@ class ParserCore:
                         total=len(urls)
                     )
                     if response and response.get('command') == 'stop':
-                        print(f"[PARSE_URLS] Parser stopped by server", file=sys.stderr, flush=True)
+                        plog.info(f"[PARSE_URLS] Parser stopped by server")
                         self.should_stop = True
                         break
             
             # Финальный flush оставшихся материалов
             remaining = material_batcher.pending_count
             if remaining > 0:
-                print(f"[PARSE_URLS] Final flush of {remaining} materials...", file=sys.stderr, flush=True)
-                sys.stderr.flush()
+                plog.info(f"[PARSE_URLS] Final flush of {remaining} materials...")
                 material_batcher.flush()
             
         finally:
+            if self.watch_config:
+                config_manager.unsubscribe(supplier_name, adapter.on_config_reloaded)
             adapter.teardown()
+            if outbox is not None:
+                drainer.stop()
+                drainer.drain_once()
+                stats['outbox_delivered'] = drainer.delivered
+                stats['outbox_rejected'] = drainer.rejected
+                stats['outbox_abandoned'] = drainer.abandoned
+                undelivered = sum(outbox.counts().values())
+                if undelivered:
+                    plog.warning(f"[OUTBOX] Не доставлено: {undelivered}, повтор при следующем запуске ({outbox.path})")
+                outbox.close()
         
         # Финальный progress (force=True)
         if self.callback_handler:
@@ -919,39 +967,35 @@ class ParserCore:
                     'errors': stats['errors'],
                     'batch_success': batcher_stats['success_count'],
                     'batch_failed': batcher_stats['failed_count'],
+                    'outbox_delivered': stats.get('outbox_delivered', 0),
+                    'outbox_rejected': stats.get('outbox_rejected', 0),
+                    'outbox_abandoned': stats.get('outbox_abandoned', 0),
                     'screenshots_taken': stats['screenshots_taken']
                 }
             )
         
-        print(
+        plog.info(
             f"[PARSE_URLS] Complete. Success: {stats['success']}, "
             f"Errors: {stats['errors']}, "
-            f"Batch saved: {material_batcher.stats['success_count']}", 
-            file=sys.stderr, flush=True
+            f"Batch saved: {material_batcher.stats['success_count']}",
         )
-        sys.stderr.flush()
         
         return stats
     
     def _start_session(self, supplier_name: str):
         """Создаёт сессию парсинга в БД."""
-        print(f"[_start_session] Start", file=sys.stderr, flush=True)
-        sys.stderr.flush()
+        plog.info(f"[_start_session] Start")
         # TODO: Реализовать создание сессии через API
-        print(f"[_start_session] session_id is {self.session_id}", file=sys.stderr, flush=True)
-        sys.stderr.flush()
+        plog.info(f"[_start_session] session_id is {self.session_id}")
         self.session_id = None
-        print(f"[_start_session] End", file=sys.stderr, flush=True)
-        sys.stderr.flush()
+        plog.info(f"[_start_session] End")
     
     def _finish_session(self, stats: dict):
         """Завершает сессию парсинга."""
         # TODO: Реализовать обновление сессии через API
-        print("[SESSION] Сессия парсинга завершена", file=sys.stderr, flush=True)
-        sys.stderr.flush()
+        plog.info("[SESSION] Сессия парсинга завершена")
     
     def _log_parsing_error(self, url: str, message: str):
         """Логирует ошибку парсинга."""
         # TODO: Реализовать логирование в БД через API
-        print(f"[ERROR] {url}: {message}", file=sys.stderr, flush=True)
-        sys.stderr.flush()
+        plog.error(f"[ERROR] {url}: {message}")
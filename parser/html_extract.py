@@ -0,0 +1,115 @@
+# parser/html_extract.py
+
+"""
+Извлечение данных из сырого HTML без обращений к DOM браузера.
+
+Если данные товара есть в исходном HTML, а браузер нужен только для
+навигации (cookies, редиректы, антибот), каждый query_selector/get_attribute
+стоит round-trip в Chromium — около 15 на страницу. В режиме raw_html воркер
+забирает тело основного документа из ответа навигации и разбирает его здесь,
+в потоке, пока страница уже переходит к следующему URL.
+
+HtmlDocument повторяет нужную часть API Playwright (query_selector,
+get_attribute, inner_text) поверх lxml.html; селекторы переводятся в XPath
+через cssselect. Селектор, который cssselect не поддерживает (например,
+псевдоклассы Playwright вроде :has-text), — ValueError, и вызывающий код
+уходит на обычный DOM-путь.
+"""
+
+import re
+from functools import lru_cache
+from typing import Optional
+
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector, SelectorError
+
+# Режимы извлечения данных со страницы товара (extraction_mode в конфиге)
+EXTRACTION_DOM = 'dom'
+EXTRACTION_RAW_HTML = 'raw_html'
+EXTRACTION_MODES = (EXTRACTION_DOM, EXTRACTION_RAW_HTML)
+
+# Текст script/style/template/noscript не попадает в inner_text
+_VISIBLE_TEXT = etree.XPath(
+    './/text()[not(ancestor::script or ancestor::style'
+    ' or ancestor::template or ancestor::noscript)]'
+)
+
+_WS_RE = re.compile(r'\s+')
+
+
+class HtmlElement:
+    """Обёртка над элементом lxml с API элемента Playwright."""
+
+    __slots__ = ('element',)
+
+    def __init__(self, element: lxml.html.HtmlElement):
+        self.element = element
+
+    @property
+    def tag(self) -> str:
+        return self.element.tag
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        return self.element.get(name)
+
+    def inner_text(self) -> str:
+        """Текст элемента с потомками; пробелы схлопнуты (приближение innerText)."""
+        return _WS_RE.sub(' ', ''.join(_VISIBLE_TEXT(self.element))).strip()
+
+
+@lru_cache(maxsize=256)
+def compile_selector(selector: str) -> CSSSelector:
+    """
+    Компилирует CSS-селектор в XPath-выражение для query_selector().
+
+    Raises:
+        ValueError: Если cssselect не поддерживает селектор
+    """
+    try:
+        return CSSSelector(selector, translator='html')
+    except SelectorError as e:
+        raise ValueError(f"Неподдерживаемый селектор: {selector!r} ({e})") from e
+
+
+class HtmlDocument:
+    """Разобранный HTML-документ с query_selector по CSS."""
+
+    def __init__(self, root: lxml.html.HtmlElement):
+        self.root = root
+
+    @classmethod
+    def from_string(cls, html: str) -> 'HtmlDocument':
+        return cls._parse(html, None)
+
+    @classmethod
+    def from_bytes(cls, body: bytes, content_type: Optional[str] = None) -> 'HtmlDocument':
+        # Без charset в заголовке кодировку определяет lxml (BOM, <meta charset>)
+        return cls._parse(body, charset_from_content_type(content_type, default=None))
+
+    @classmethod
+    def _parse(cls, html, encoding: Optional[str]) -> 'HtmlDocument':
+        parser = lxml.html.HTMLParser(encoding=encoding) if encoding else None
+        try:
+            return cls(lxml.html.document_fromstring(html, parser=parser))
+        except etree.ParserError as e:
+            # Пустое тело — как неподдерживаемый селектор: пусть решает DOM-путь
+            raise ValueError(f"Не удалось разобрать HTML: {e}") from e
+
+    def query_selector(self, selector: str) -> Optional[HtmlElement]:
+        """Первый элемент в порядке документа (как document.querySelector)."""
+        found = compile_selector(selector)(self.root)
+        return HtmlElement(found[0]) if found else None
+
+
+def charset_from_content_type(content_type: Optional[str], default: Optional[str] = 'utf-8') -> Optional[str]:
+    if content_type:
+        m = re.search(r'charset\s*=\s*["\']?([\w-]+)', content_type, re.IGNORECASE)
+        if m:
+            charset = m.group(1).lower()
+            try:
+                ''.encode(charset)
+                return charset
+            except LookupError:
+                pass
+    return default
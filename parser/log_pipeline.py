@@ -0,0 +1,248 @@
+# parser/log_pipeline.py
+
+"""
+Буферизованный журнал парсера вместо print(..., file=sys.stderr, flush=True).
+
+Горячие пути (по несколько строк на URL: [QUEUE] Парсинг, [PARSE_TIMING],
+[QUEUE] ✓) писали в stderr без буфера — несколько системных вызовов на URL
+прямо в event loop. Здесь запись только кладётся в очередь
+(logging.handlers.QueueHandler), а в stderr её пишет фоновый поток
+(QueueListener).
+
+По умолчанию вывод совпадает с прежним: текст строки как есть, записи
+стандартных логгеров — в формате main.py. Настройка (CLI main.py или
+переменные окружения):
+
+- PARSER_LOG_FORMAT (--log-format) — text | json (одна JSON-строка на
+  запись: ts, level, tag, key, msg и поля вызова);
+- PARSER_LOG_LEVEL (--log-level) — минимальный уровень (INFO);
+- PARSER_LOG_SAMPLE (--log-sample) — выборка по ключу сообщения:
+  "queue.parse=0.1,parse_timing=0.01" — пишется каждая 10-я / 100-я запись.
+  Ключ — явный key= вызова или тег в квадратных скобках в нижнем регистре
+  ([PARSE_TIMING] → parse_timing). WARNING и выше не прореживаются.
+
+Вызов: log_pipeline.info(f"[QUEUE] ...", key='queue.parse', url=url).
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+FORMAT_TEXT = 'text'
+FORMAT_JSON = 'json'
+LOG_FORMATS = (FORMAT_TEXT, FORMAT_JSON)
+
+# Формат стандартных логгеров (logging.getLogger) в текстовом режиме
+STDLIB_TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+_TAG_RE = re.compile(r'^\[([A-Za-z_ ]+)\]')
+
+_logger = logging.getLogger('parser.events')
+_logger.propagate = False
+
+_lock = threading.Lock()
+_handler: Optional[logging.handlers.QueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_sink: Optional[logging.StreamHandler] = None
+_sampler: Optional['SampleFilter'] = None
+
+
+def parse_sample_spec(spec: Optional[str]) -> Dict[str, float]:
+    """'queue.parse=0.1,parse_timing=0.01' → {key: доля}."""
+    rates = {}
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        key, sep, rate = part.partition('=')
+        if not sep:
+            raise ValueError(f"log sample: ожидается key=rate, получено {part!r}")
+        rate = float(rate)
+        if not 0 <= rate <= 1:
+            raise ValueError(f"log sample: доля для {key.strip()} вне [0, 1]: {rate}")
+        rates[key.strip().lower()] = rate
+    return rates
+
+
+def _record_tag(record: logging.LogRecord) -> Optional[str]:
+    tag = getattr(record, 'tag', None)
+    if tag is None:
+        match = _TAG_RE.match(str(record.msg))
+        tag = match.group(1) if match else None
+        record.tag = tag
+    return tag
+
+
+class SampleFilter(logging.Filter):
+    """Пропускает каждую N-ю запись ключа (N = 1/доля); без случайности."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._counters: Dict[str, Any] = {}
+        self.dropped: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rates or record.levelno >= logging.WARNING:
+            return True
+        tag = _record_tag(record)
+        key = getattr(record, 'key', None)
+        for candidate in (key, tag.lower() if tag else None):
+            if candidate is not None and candidate in self.rates:
+                break
+        else:
+            return True
+        rate = self.rates[candidate]
+        every = round(1 / rate) if rate > 0 else 0
+        counter = self._counters.get(candidate)
+        if counter is None:
+            counter = self._counters.setdefault(candidate, itertools.count())
+        # next() у itertools.count атомарен под GIL — лок не нужен
+        if every and next(counter) % every == 0:
+            return True
+        self.dropped[candidate] = self.dropped.get(candidate, 0) + 1
+        return False
+
+
+class TextFormatter(logging.Formatter):
+    """Строки журнала — как есть, стандартные логгеры — в формате main.py."""
+
+    def __init__(self):
+        super().__init__(STDLIB_TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        if getattr(record, 'plain', False):
+            return record.getMessage()
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'tag': _record_tag(record),
+            'key': getattr(record, 'key', None),
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _make_formatter(fmt: str) -> logging.Formatter:
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"log format: {fmt!r}, ожидается одно из {LOG_FORMATS}")
+    return JsonFormatter() if fmt == FORMAT_JSON else TextFormatter()
+
+
+def _parse_level(level) -> int:
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"log level: неизвестный уровень {level!r}")
+    return value
+
+
+def _ensure_started() -> logging.handlers.QueueHandler:
+    global _handler, _listener, _sink, _sampler
+    with _lock:
+        if _handler is not None:
+            return _handler
+        try:
+            formatter = _make_formatter(os.getenv('PARSER_LOG_FORMAT', FORMAT_TEXT))
+            rates = parse_sample_spec(os.getenv('PARSER_LOG_SAMPLE'))
+            level = _parse_level(os.getenv('PARSER_LOG_LEVEL', 'INFO'))
+        except ValueError as e:
+            # Ошибка в окружении не должна ронять парсер — пишем как раньше
+            print(f"[LOG] Некорректная настройка журнала ({e}), используются значения по умолчанию", file=sys.stderr, flush=True)
+            formatter, rates, level = TextFormatter(), {}, logging.INFO
+        _sink = logging.StreamHandler(sys.stderr)
+        _sink.setFormatter(formatter)
+        _sampler = SampleFilter(rates)
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(log_queue)
+        # prepare() склеивает сообщение с трейсбеком; итоговый формат — у _sink
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        handler.addFilter(_sampler)
+        _listener = logging.handlers.QueueListener(log_queue, _sink)
+        _listener.start()
+        _logger.addHandler(handler)
+        _logger.setLevel(level)
+        atexit.register(shutdown)
+        _handler = handler
+        return handler
+
+
+def configure(fmt: Optional[str] = None, level=None, sample: Optional[str] = None) -> None:
+    """Переопределяет настройки окружения (вызывается из CLI до начала работы)."""
+    _ensure_started()
+    if fmt is not None:
+        _sink.setFormatter(_make_formatter(fmt))
+    if level is not None:
+        level = _parse_level(level)
+        _logger.setLevel(level)
+        if _handler in logging.getLogger().handlers:
+            logging.getLogger().setLevel(level)
+    if sample is not None:
+        _sampler.rates = parse_sample_spec(sample)
+
+
+def install_root_handler(level: int = logging.INFO) -> logging.Handler:
+    """Направляет стандартные логгеры в ту же очередь (общий порядок строк)."""
+    handler = _ensure_started()
+    logging.basicConfig(level=level, handlers=[handler])
+    return handler
+
+
+def log(level: int, message: str, key: Optional[str] = None, exc_info=None, **fields) -> None:
+    if _handler is None:
+        _ensure_started()
+    if not _logger.isEnabledFor(level):
+        return
+    _logger.log(level, message, exc_info=exc_info, extra={'plain': True, 'key': key, 'fields': fields})
+
+
+def debug(message: str, key: Optional[str] = None, **fields) -> None:
+    log(logging.DEBUG, message, key, **fields)
+
+
+def info(message: str, key: Optional[str] = None, **fields) -> None:
+    log(logging.INFO, message, key, **fields)
+
+
+def warning(message: str, key: Optional[str] = None, **fields) -> None:
+    log(logging.WARNING, message, key, **fields)
+
+
+def error(message: str, key: Optional[str] = None, exc_info=None, **fields) -> None:
+    log(logging.ERROR, message, key, exc_info=exc_info, **fields)
+
+
+def shutdown() -> None:
+    """Дописывает очередь в stderr и останавливает фоновый поток."""
+    global _handler, _listener
+    with _lock:
+        listener = _listener
+        _listener = None
+    if listener is None:
+        return
+    listener.stop()
+    if _sampler is not None and _sampler.dropped:
+        print(f"[LOG] Пропущено выборкой: {_sampler.dropped}", file=sys.stderr, flush=True)
+    with _lock:
+        if _handler is not None:
+            _logger.removeHandler(_handler)
+            logging.getLogger().removeHandler(_handler)
+            _handler = None
@@ -0,0 +1,234 @@
+# parser/loop_monitor.py
+
+"""
+Задержка event loop (loop lag) и поиск блокирующих вызовов async-воркера.
+
+Любая синхронная работа в корутине (запись в stderr, файловый I/O,
+json.dumps большой пачки, разбор HTML) задерживает все остальные задачи
+цикла. LoopLagMonitor — фоновая задача, которая раз в interval засыпает
+через asyncio.sleep и меряет, насколько позже срока проснулась: это и есть
+задержка цикла. Значения копятся в LatencyHistogram (p50/p95/max в
+[METRICS FINAL] и гистограмма parser_event_loop_lag_seconds в /metrics).
+
+Сторожевой поток (watchdog) видит, что задача замера не проснулась дольше
+порога (PARSER_LOOP_BLOCK_MS, по умолчанию 100 мс), и снимает стек потока
+event loop прямо во время блокировки — вместе с текущей asyncio-задачей.
+Место блокировки — ближайший к вершине стека кадр кода парсера; по нему
+копится сводка нарушителей (число, суммарная и максимальная задержка,
+пример стека), которая попадает в итоговую статистику воркера и
+подсказывает, что выносить в executor.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    from .metrics import LatencyHistogram
+    from . import log_pipeline as plog
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from parser.metrics import LatencyHistogram
+    from parser import log_pipeline as plog
+
+# Границы бакетов задержки цикла, секунды (мельче, чем у goto/parse)
+LOOP_LAG_BUCKETS_S = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+DEFAULT_BLOCK_THRESHOLD_MS = 100.0
+
+# Кадры в каталоге парсера — место блокировки ищется среди них
+_PARSER_DIR = str(Path(__file__).resolve().parent)
+_STACK_DEPTH = 8
+_OTHER_SITE = '<прочие>'
+
+
+def _frame_site(frame: traceback.FrameSummary) -> str:
+    return f"{frame.name} ({Path(frame.filename).name}:{frame.lineno})"
+
+
+class BlockingOffender:
+    """Место блокировки event loop: счётчики и пример стека."""
+
+    __slots__ = ('site', 'leaf', 'task', 'stack', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self, site: str, leaf: str, task: str, stack: List[str]):
+        self.site = site
+        self.leaf = leaf
+        self.task = task
+        self.stack = stack
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, blocked_ms: float) -> None:
+        self.count += 1
+        self.total_ms += blocked_ms
+        self.max_ms = max(self.max_ms, blocked_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'site': self.site,
+            'leaf': self.leaf,
+            'task': self.task,
+            'count': self.count,
+            'total_ms': round(self.total_ms, 1),
+            'max_ms': round(self.max_ms, 1),
+            'stack': self.stack,
+        }
+
+
+class LoopLagMonitor:
+    """Замер задержки event loop фоновой задачей + сторожевой поток блокировок."""
+
+    def __init__(self, interval: float = 0.1, block_threshold_ms: Optional[float] = None, max_offenders: int = 50):
+        """
+        Args:
+            interval: Период замера задержки, секунды
+            block_threshold_ms: Порог блокировки для снятия стека, мс
+                (None — PARSER_LOOP_BLOCK_MS, 0 — сторож выключен)
+            max_offenders: Предел числа отдельных мест в сводке
+        """
+        if block_threshold_ms is None:
+            try:
+                block_threshold_ms = float(os.getenv('PARSER_LOOP_BLOCK_MS', DEFAULT_BLOCK_THRESHOLD_MS))
+            except ValueError:
+                block_threshold_ms = DEFAULT_BLOCK_THRESHOLD_MS
+        self.block_threshold_ms = max(0.0, block_threshold_ms)
+        interval = max(0.001, float(interval))
+        if self.block_threshold_ms:
+            # Замер чаще порога — иначе короткие блокировки прячутся внутри sleep
+            interval = min(interval, self.block_threshold_ms / 2000)
+        self.interval = interval
+        self.max_offenders = max(1, int(max_offenders))
+        self.lag_ms = LatencyHistogram()
+        self.last_lag_ms = 0.0
+        self.blocked_count = 0
+        self.offenders: Dict[str, BlockingOffender] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._deadline: Optional[float] = None
+        # Стек, снятый сторожем в текущей блокировке: (seq, site, leaf, task, stack)
+        self._stall: Optional[tuple] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._watchdog_stop = threading.Event()
+
+    def start(self) -> None:
+        """Запускает замер в текущем (работающем) event loop."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._task = self._loop.create_task(self._run(), name='loop-lag-monitor')
+        if self.block_threshold_ms:
+            self._watchdog_stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        self._watchdog_stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            with self._lock:
+                self._seq += 1
+                deadline = self._deadline = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.monotonic() - deadline) * 1000)
+            self.last_lag_ms = lag_ms
+            self.lag_ms.record(lag_ms)
+            if self.block_threshold_ms:
+                self._on_wake(lag_ms)
+
+    def _on_wake(self, lag_ms: float) -> None:
+        with self._lock:
+            stall, self._stall = self._stall, None
+        if lag_ms < self.block_threshold_ms:
+            return
+        self.blocked_count += 1
+        if stall is None:
+            # Сторож не успел снять стек (блокировка чуть выше порога)
+            return
+        _, site, leaf, task, stack = stall
+        offender = self.offenders.get(site)
+        if offender is None:
+            if len(self.offenders) >= self.max_offenders:
+                site = _OTHER_SITE
+                offender = self.offenders.setdefault(site, BlockingOffender(site, '', '', []))
+            else:
+                offender = self.offenders[site] = BlockingOffender(site, leaf, task, stack)
+                plog.warning(
+                    f"[LOOP] Event loop заблокирован ≥{self.block_threshold_ms:.0f}ms: {site} → {leaf} (задача {task})",
+                    key='loop.blocked', site=site, leaf=leaf, task=task,
+                )
+        offender.add(lag_ms)
+
+    def _watch(self) -> None:
+        poll = max(0.005, self.block_threshold_ms / 4000)
+        while not self._watchdog_stop.wait(poll):
+            with self._lock:
+                seq, deadline, stall = self._seq, self._deadline, self._stall
+            if deadline is None or (stall is not None and stall[0] == seq):
+                continue
+            if (time.monotonic() - deadline) * 1000 < self.block_threshold_ms:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            captured = self._describe(frame)
+            del frame
+            with self._lock:
+                # Цикл мог проснуться, пока снимался стек
+                if self._seq == seq and self._stall is None:
+                    self._stall = (seq,) + captured
+
+    def _describe(self, frame) -> tuple:
+        stack = traceback.extract_stack(frame)
+        own = str(Path(__file__).resolve())
+        site_frame = stack[-1]
+        for entry in reversed(stack):
+            filename = str(Path(entry.filename).resolve())
+            if filename.startswith(_PARSER_DIR) and filename != own:
+                site_frame = entry
+                break
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        task_name = '-'
+        if task is not None:
+            coro = task.get_coro()
+            task_name = f"{task.get_name()}:{getattr(coro, '__qualname__', type(coro).__name__)}"
+        lines = [_frame_site(entry) for entry in stack[-_STACK_DEPTH:]]
+        return _frame_site(site_frame), _frame_site(stack[-1]), task_name, lines
+
+    def top_offenders(self, n: int = 5) -> List[BlockingOffender]:
+        return sorted(self.offenders.values(), key=lambda o: o.total_ms, reverse=True)[:n]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'loop_lag_ms_p50': self.lag_ms.percentile(50),
+            'loop_lag_ms_p95': self.lag_ms.percentile(95),
+            'loop_lag_ms_p99': self.lag_ms.percentile(99),
+            'loop_lag_ms_max': self.lag_ms.max_ms or 0.0,
+            'loop_blocked_count': self.blocked_count,
+            'loop_blocked_offenders': [offender.to_dict() for offender in self.top_offenders()],
+        }
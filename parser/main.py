@@ -9,6 +9,7 @@ REQUIREMENTS:
 4. collect runs ONCE per session
 5. reset runs ONCE per session (after collect_done)
 6. Crash/timeout → failed (no restart)
+7. --full-scan --stream: reset → (collect ∥ parse), each still exactly once
 
 LIFECYCLE:
 created → collecting → collect_done → parsing → completed
@@ -16,6 +17,9 @@ created → collecting → collect_done → parsing → completed
         → failed       → failed        → failed
 """
 
+import time
+_BOOT_T0 = time.perf_counter()
+
 import sys
 import os
 import asyncio
@@ -25,31 +29,29 @@ import requests
 import types
 from pathlib import Path
 
-# Поддержка запуска как модуля (python -m parser.main) и как скрипта (python main.py)
+# Поддержка запуска как модуля (python -m parser.main) и как скрипта (python main.py).
+# core и адаптеры импортируются только в тех режимах, где нужны.
 try:
-    from .core import ParserCore, CallbackHandler, HttpHandler
     from .config import config_manager
+    from .adapter_registry import adapter_registry, heavy_modules_loaded
+    from . import log_pipeline as plog
+    from . import profiling
 except ImportError:
     # Прямой запуск - добавляем родительскую директорию в path
     sys.path.insert(0, str(Path(__file__).parent.parent))
-    from parser.core import ParserCore, CallbackHandler, HttpHandler
     from parser.config import config_manager
+    from parser.adapter_registry import adapter_registry, heavy_modules_loaded
+    from parser import log_pipeline as plog
+    from parser import profiling
 
-# Логирование в stderr с flush
-class StreamHandler(logging.StreamHandler):
-    def emit(self, record):
-        super().emit(record)
-        self.flush()
-
-handler = StreamHandler(sys.stderr)
-handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
-
-logging.basicConfig(
-    level=logging.INFO,
-    handlers=[handler]
-)
+# Логирование в stderr через очередь log_pipeline (фоновый поток пишет в stderr,
+# порядок строк общий с plog.info/plog.error)
+plog.install_root_handler(logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Размер chunk save-urls в потоковом режиме: меньше — раньше URL попадают в очередь
+STREAMING_CHUNK_SIZE = 100
+
 
 def get_session_state(session_id: int, api_base_url: str, api_token: str = None) -> dict:
     """
@@ -71,20 +73,159 @@ def get_session_state(session_id: int, api_base_url: str, api_token: str = None)
             data = response.json()
             return data.get('data', {})
     except Exception as e:
-        print(f"[LIFECYCLE] WARNING: Could not fetch session state: {e}", file=sys.stderr, flush=True)
+        plog.warning(f"[LIFECYCLE] WARNING: Could not fetch session state: {e}")
     
     return None
 
 
+def post_full_scan_reset(api_base_url: str, supplier_name: str, api_token: str = None,
+                         seen_since: str = None) -> requests.Response:
+    """
+    POST /parser/urls/full-scan-reset: done/failed/blocked/stale → pending.
+
+    seen_since — только done URL, снова ставшие валидными при сборе после
+    этой отметки и не парсившиеся с тех пор (второй проход потокового режима).
+    """
+    reset_url = f"{api_base_url}/parser/urls/full-scan-reset"
+    headers = {'Content-Type': 'application/json'}
+    if api_token:
+        headers['X-Parser-Token'] = api_token
+        headers['Authorization'] = f"Bearer {api_token}"
+
+    payload = {'supplier_name': supplier_name}
+    if seen_since:
+        payload['seen_since'] = seen_since
+
+    plog.info(f"[FULL_SCAN] POST {reset_url}")
+    return requests.post(
+        reset_url,
+        json=payload,
+        headers=headers,
+        timeout=30,
+    )
+
+
+def run_streaming_full_scan(args, supplier_name: str, hmac_secret: str, api_base_url: str, min_request_interval: float) -> int:
+    """
+    Потоковый full-scan: сбор URL и парсинг идут одновременно.
+
+    1. full-scan-reset выполняется ДО сбора: существующие URL становятся
+       pending, новые URL save-urls и так создаёт в pending.
+    2. UrlCollector работает в отдельном потоке (sync Playwright) и
+       отправляет chunk'и по мере сбора. После сбора — второй reset
+       (seen_since): done URL, которые были is_valid=false во время первого
+       reset и снова стали валидными при сборе, иначе в этот скан не попадут.
+    3. AsyncQueueWorker забирает URL из очереди инкрементально; пока сборщик
+       жив, пустой claim означает «ещё не собрано», а не конец работы.
+
+    Общее время ≈ max(collect, parse) вместо collect + parse. Collect
+    выполняется ровно один раз за запуск.
+
+    Returns:
+        int: Код выхода процесса
+    """
+    import threading
+
+    try:
+        from .collect_urls import UrlCollector
+        from .queue_worker_async import run_queue_worker_async
+    except ImportError:
+        from parser.collect_urls import UrlCollector
+        from parser.queue_worker_async import run_queue_worker_async
+
+    # ==================== STEP 1: RESET statuses (before collect) ====================
+    plog.info(f"[FULL_SCAN] STEP 1 (stream): full-scan-reset started")
+    try:
+        response = post_full_scan_reset(api_base_url, supplier_name, args.api_token)
+        if response.status_code != 200:
+            logger.error(f"[FULL_SCAN] STEP 1 FAILED: HTTP {response.status_code} {response.text[:300]}")
+            return 1
+        reset_response = response.json()
+        plog.info(f"[FULL_SCAN] STEP 1 (stream): reset response: {reset_response}")
+    except Exception as e:
+        logger.error(f"[FULL_SCAN] STEP 1 ERROR: {e}", exc_info=True)
+        return 1
+
+    # ==================== STEP 2: COLLECT in background thread ====================
+    collector = UrlCollector(
+        supplier_name,
+        hmac_secret,
+        args.session_id,
+        chunk_size=STREAMING_CHUNK_SIZE,
+        metrics_port=args.metrics_port,
+    )
+    collect_result = {'code': None}
+
+    def reset_revalidated() -> int:
+        # Пока поток сбора жив, воркер ждёт новых URL — reset успевает до конца очереди
+        reset_at = reset_response.get('reset_at')
+        if not reset_at:
+            plog.warning("[FULL_SCAN] STEP 2b: API не вернул reset_at — URL, снова ставшие валидными, не сброшены")
+            return 0
+        response = post_full_scan_reset(api_base_url, supplier_name, args.api_token, seen_since=reset_at)
+        if response.status_code != 200:
+            logger.error(f"[FULL_SCAN] STEP 2b FAILED: HTTP {response.status_code} {response.text[:300]}")
+            return 1
+        plog.info(f"[FULL_SCAN] STEP 2b (stream): revalidated reset response: {response.json()}")
+        return 0
+
+    def collect():
+        try:
+            collect_result['code'] = collector.run()
+            if collect_result['code'] == 0:
+                collect_result['code'] = reset_revalidated()
+        except Exception as e:
+            logger.error(f"[FULL_SCAN] STEP 2 ERROR: {e}", exc_info=True)
+            collect_result['code'] = 1
+
+    collect_thread = threading.Thread(target=collect, name='full-scan-collect', daemon=True)
+    plog.info(f"[FULL_SCAN] STEP 2 (stream): collect_urls started in background")
+    collect_thread.start()
+
+    # ==================== STEP 3: PARSE while collecting ====================
+    plog.info(f"[FULL_SCAN] STEP 3 (stream): run_queue_worker_async started")
+    try:
+        stats = asyncio.run(
+            run_queue_worker_async(
+                supplier_name=supplier_name,
+                batch_size=args.batch_size,
+                material_type=args.material_type,
+                api_callback=args.api_callback,
+                api_token=args.api_token,
+                session_id=args.session_id,
+                reparse_days=args.reparse_days,
+                max_batches=args.max_batches,
+                concurrency=args.concurrency,
+                min_request_interval=min_request_interval,
+                full_scan=True,
+                producer_alive=collect_thread.is_alive,
+                watch_config=args.watch_config,
+                metrics_port=args.metrics_port,
+                trace_file=args.trace_file,
+                outbox_dir=args.outbox_dir,
+            )
+        )
+    finally:
+        collect_thread.join()
+
+    plog.info(f"[FULL_SCAN] collect exit code={collect_result['code']} stop_reason={collector.stop_reason or 'completed'}")
+    plog.info(f"[FULL_SCAN] ========== ЗАВЕРШЕНО (stream) ==========")
+    plog.info(f"[FULL_SCAN] Статистика: {stats}")
+    if collect_result['code'] != 0:
+        logger.error("[FULL_SCAN] collect_urls returned non-zero")
+        return 1
+    return 0
+
+
 def main():
     """Основная функция для запуска парсера."""
     # BOOT logs for runtime verification
-    print(f"[BOOT] argv={sys.argv}", file=sys.stderr, flush=True)
-    print(f"[BOOT] main.py VERSION=2026-01-21-ANTI-LOOP-DETERMINISTIC", file=sys.stderr, flush=True)
+    plog.info(f"[BOOT] argv={sys.argv}")
+    plog.info(f"[BOOT] main.py VERSION=2026-01-21-ANTI-LOOP-DETERMINISTIC")
     
-    print("=" * 60, file=sys.stderr, flush=True)
-    print("PARSER STARTED (DETERMINISTIC MODE)", file=sys.stderr, flush=True)
-    print("=" * 60, file=sys.stderr, flush=True)
+    plog.info("=" * 60)
+    plog.info("PARSER STARTED (DETERMINISTIC MODE)")
+    plog.info("=" * 60)
     
     # Парсим аргументы командной строки
     parser = argparse.ArgumentParser(
@@ -138,6 +279,11 @@ def main():
         action='store_true',
         help='Полный пересбор URL и запуск очереди'
     )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='С --full-scan: парсить URL по мере сбора (reset до сбора, collect и очередь параллельно)'
+    )
     parser.add_argument(
         '--collect-only',
         action='store_true',
@@ -181,6 +327,58 @@ def main():
         default=7,
         help='Переобходить done URL старше N дней (по умолчанию 7)'
     )
+    parser.add_argument(
+        '--watch-config',
+        action='store_true',
+        help='Подхватывать изменения configs/<supplier>.json без перезапуска (inotify, иначе опрос mtime)'
+    )
+    parser.add_argument(
+        '--log-format',
+        choices=plog.LOG_FORMATS,
+        help='Формат журнала в stderr: text (по умолчанию) или json (env PARSER_LOG_FORMAT)'
+    )
+    parser.add_argument(
+        '--log-level',
+        help='Минимальный уровень журнала: DEBUG/INFO/WARNING/ERROR (env PARSER_LOG_LEVEL)'
+    )
+    parser.add_argument(
+        '--log-sample',
+        help='Выборка строк по ключу: "queue.parse=0.1,parse_timing=0.01" (env PARSER_LOG_SAMPLE)'
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Порт эндпоинта /metrics (Prometheus) с живыми метриками воркера и сборщика'
+    )
+    parser.add_argument(
+        '--trace-file',
+        help='Файл трассировки по URL в формате OTLP/JSON (env PARSER_TRACE_FILE)'
+    )
+    parser.add_argument(
+        '--outbox-dir',
+        help='Каталог локального outbox: материалы и отчёты на диске до подтверждения API, '
+             'недоставленное отправляется при следующем запуске (env PARSER_OUTBOX_DIR)'
+    )
+    parser.add_argument(
+        '--profile',
+        choices=profiling.PROFILE_MODES,
+        help='Профилировать прогон: sample (folded-стеки для flamegraph), cprofile или yappi (.prof)'
+    )
+    parser.add_argument(
+        '--profile-dir',
+        help=f'Каталог файлов профиля (env PARSER_PROFILE_DIR, по умолчанию {profiling.DEFAULT_PROFILE_DIR})'
+    )
+    parser.add_argument(
+        '--profile-delay',
+        type=float,
+        default=0.0,
+        help='Начать профилирование через N секунд после старта'
+    )
+    parser.add_argument(
+        '--profile-duration',
+        type=float,
+        help='Профилировать N секунд (по умолчанию — до конца прогона)'
+    )
     parser.add_argument(
         '--max-batches',
         type=int,
@@ -205,6 +403,26 @@ def main():
     )
     
     args = parser.parse_args()
+    try:
+        plog.configure(fmt=args.log_format, level=args.log_level, sample=args.log_sample)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.profile:
+        try:
+            profiler = profiling.RunProfiler(
+                args.profile,
+                profile_dir=args.profile_dir,
+                session_id=args.session_id,
+                delay=args.profile_delay,
+                duration=args.profile_duration,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        # Файл пишется по окончании окна или при выходе (режимы завершаются через sys.exit)
+        profiler.start()
+    plog.info(
+        f"[BOOT] startup_ms={(time.perf_counter() - _BOOT_T0) * 1000:.0f} heavy_modules={heavy_modules_loaded()}",
+    )
 
     if os.getenv('PARSER_DEBUG') == '1':
         assert isinstance(requests, types.ModuleType), "requests must be module, not shadowed"
@@ -220,20 +438,19 @@ def main():
     #   collect → reset → parse → crash → collect (again!)
     # =============================================================================
     
-    print(f"[BOOT] ANTI-LOOP MODE: full_scan={bool(args.full_scan)} queue={bool(args.queue)} collect_only={bool(args.collect_only)} reset_only={bool(args.reset_only)}", file=sys.stderr, flush=True)
+    plog.info(f"[BOOT] ANTI-LOOP MODE: full_scan={bool(args.full_scan)} queue={bool(args.queue)} collect_only={bool(args.collect_only)} reset_only={bool(args.reset_only)}")
     
     # Warn if --queue without --max-batches (job should always set this)
     if args.queue and not args.max_batches:
-        print("[BOOT] WARNING: --queue without --max-batches, will run until exhausted", file=sys.stderr, flush=True)
+        plog.warning("[BOOT] WARNING: --queue without --max-batches, will run until exhausted")
     
     # Обработка списка поставщиков
     if args.list_suppliers:
-        suppliers = config_manager.list_suppliers()
+        # Только чтение JSON: без валидации и без импорта адаптеров
         print("\nДоступные поставщики:")
-        for supplier in suppliers:
-            config = config_manager.load_supplier_config(supplier)
-            status = "✓" if config.get('enabled', True) else "✗"
-            print(f"  {status} {supplier} — {config.get('display_name', supplier)}")
+        for entry in adapter_registry.entries():
+            status = "✓" if entry.enabled else "✗"
+            print(f"  {status} {entry.supplier} — {entry.display_name}")
         sys.exit(0)
     
     # Проверка обязательного аргумента
@@ -251,8 +468,10 @@ def main():
         print("  python -m parser.main <supplier> --queue --concurrency 3")
         print("  python -m parser.main <supplier> --queue --material-type ldsp")
         print("  python -m parser.main <supplier> --full-scan --concurrency 3")
+        print("  python -m parser.main <supplier> --full-scan --stream --concurrency 3")
         print("  python -m parser.main <supplier> --collect-only")
         print("  python -m parser.main <supplier> --reset-only")
+        print("  python -m parser.main <supplier> --queue --profile sample --profile-duration 120")
         print("\nПримеры:")
         print("  python -m parser.main skm_mebel --url https://skm-mebel.ru/product/123")
         print("  python -m parser.main skm_mebel --file suppliers/skm_ldsp_urls.txt")
@@ -274,7 +493,7 @@ def main():
 
     # ==================== COLLECT-ONLY MODE ====================
     if args.collect_only:
-        print(f"[COLLECT_ONLY] Starting URL collection for {supplier_name}", file=sys.stderr, flush=True)
+        plog.info(f"[COLLECT_ONLY] Starting URL collection for {supplier_name}")
         
         # ANTI-LOOP: Check session state before collecting
         if args.session_id:
@@ -289,16 +508,16 @@ def main():
             
             session_state = get_session_state(args.session_id, api_base_url, args.api_token)
             if session_state:
-                print(f"[COLLECT_ONLY] Session state: {session_state}", file=sys.stderr, flush=True)
+                plog.info(f"[COLLECT_ONLY] Session state: {session_state}")
                 
                 if session_state.get('has_collect_executed', False):
-                    print(f"[COLLECT_ONLY] SKIP: Collect already executed for session {args.session_id}", file=sys.stderr, flush=True)
-                    print(f"[COLLECT_ONLY] lifecycle_status={session_state.get('lifecycle_status')}", file=sys.stderr, flush=True)
+                    plog.info(f"[COLLECT_ONLY] SKIP: Collect already executed for session {args.session_id}")
+                    plog.info(f"[COLLECT_ONLY] lifecycle_status={session_state.get('lifecycle_status')}")
                     sys.exit(0)  # Success - nothing to do
                     
                 if not session_state.get('can_collect', False):
-                    print(f"[COLLECT_ONLY] BLOCKED: Session {args.session_id} cannot collect", file=sys.stderr, flush=True)
-                    print(f"[COLLECT_ONLY] lifecycle_status={session_state.get('lifecycle_status')}", file=sys.stderr, flush=True)
+                    plog.warning(f"[COLLECT_ONLY] BLOCKED: Session {args.session_id} cannot collect")
+                    plog.info(f"[COLLECT_ONLY] lifecycle_status={session_state.get('lifecycle_status')}")
                     sys.exit(1)  # Error - invalid state
         
         hmac_secret = args.hmac_secret or os.getenv('PARSER_HMAC_SECRET', 'default-hmac-secret')
@@ -309,12 +528,12 @@ def main():
             except ImportError:
                 from parser.collect_urls import UrlCollector
 
-            collector = UrlCollector(supplier_name, hmac_secret, args.session_id)
+            collector = UrlCollector(supplier_name, hmac_secret, args.session_id, metrics_port=args.metrics_port)
             result = collector.run()
             if result != 0:
                 logger.error("[COLLECT_ONLY] FAILED: collect_urls returned non-zero")
                 sys.exit(1)
-            print(f"[COLLECT_ONLY] SUCCESS", file=sys.stderr, flush=True)
+            plog.info(f"[COLLECT_ONLY] SUCCESS")
             sys.exit(0)
         except Exception as e:
             logger.error(f"[COLLECT_ONLY] ERROR: {e}", exc_info=True)
@@ -322,7 +541,7 @@ def main():
 
     # ==================== RESET-ONLY MODE ====================
     if args.reset_only:
-        print(f"[RESET_ONLY] Starting reset for {supplier_name}", file=sys.stderr, flush=True)
+        plog.info(f"[RESET_ONLY] Starting reset for {supplier_name}")
         api_callback = args.api_callback
         api_token = args.api_token
         
@@ -339,17 +558,17 @@ def main():
         if args.session_id:
             session_state = get_session_state(args.session_id, api_base_url, api_token)
             if session_state:
-                print(f"[RESET_ONLY] Session state: {session_state}", file=sys.stderr, flush=True)
+                plog.info(f"[RESET_ONLY] Session state: {session_state}")
                 
                 if session_state.get('has_parsing_started', False):
-                    print(f"[RESET_ONLY] SKIP: Parsing already started for session {args.session_id}", file=sys.stderr, flush=True)
-                    print(f"[RESET_ONLY] lifecycle_status={session_state.get('lifecycle_status')}", file=sys.stderr, flush=True)
+                    plog.info(f"[RESET_ONLY] SKIP: Parsing already started for session {args.session_id}")
+                    plog.info(f"[RESET_ONLY] lifecycle_status={session_state.get('lifecycle_status')}")
                     sys.exit(0)  # Success - nothing to do
                 
                 lifecycle_status = session_state.get('lifecycle_status', '')
                 if lifecycle_status not in ['collect_done', 'collecting']:
-                    print(f"[RESET_ONLY] BLOCKED: Session {args.session_id} not in collect_done state", file=sys.stderr, flush=True)
-                    print(f"[RESET_ONLY] lifecycle_status={lifecycle_status}", file=sys.stderr, flush=True)
+                    plog.warning(f"[RESET_ONLY] BLOCKED: Session {args.session_id} not in collect_done state")
+                    plog.info(f"[RESET_ONLY] lifecycle_status={lifecycle_status}")
                     # Allow reset only from collect_done
                     if lifecycle_status != 'collect_done':
                         sys.exit(1)
@@ -361,7 +580,7 @@ def main():
                 headers['X-Parser-Token'] = api_token
                 headers['Authorization'] = f"Bearer {api_token}"
 
-            print(f"[RESET_ONLY] POST {reset_url}", file=sys.stderr, flush=True)
+            plog.info(f"[RESET_ONLY] POST {reset_url}")
             response = requests.post(
                 reset_url,
                 json={'supplier_name': supplier_name},
@@ -373,7 +592,7 @@ def main():
                 sys.exit(1)
             
             reset_data = response.json()
-            print(f"[RESET_ONLY] SUCCESS: {reset_data}", file=sys.stderr, flush=True)
+            plog.info(f"[RESET_ONLY] SUCCESS: {reset_data}")
             sys.exit(0)
         except Exception as e:
             logger.error(f"[RESET_ONLY] ERROR: {e}", exc_info=True)
@@ -381,8 +600,8 @@ def main():
     
     # ==================== FULL-SCAN MODE (legacy, for direct CLI use) ====================
     if args.full_scan:
-        print(f"[FULL_SCAN] ========== НАЧАЛО ПОЛНОГО ПЕРЕСКАНА ==========", file=sys.stderr, flush=True)
-        print(f"[FULL_SCAN] supplier={supplier_name}", file=sys.stderr, flush=True)
+        plog.info(f"[FULL_SCAN] ========== НАЧАЛО ПОЛНОГО ПЕРЕСКАНА ==========")
+        plog.info(f"[FULL_SCAN] supplier={supplier_name}")
 
         hmac_secret = args.hmac_secret or os.getenv('PARSER_HMAC_SECRET', 'default-hmac-secret')
         api_callback = args.api_callback
@@ -397,51 +616,45 @@ def main():
             except Exception:
                 pass
 
+        if args.stream:
+            min_request_interval = args.min_request_interval
+            if min_request_interval is None:
+                min_request_interval = float(os.getenv('PARSER_REQUEST_DELAY', '0'))
+            sys.exit(run_streaming_full_scan(args, supplier_name, hmac_secret, api_base_url, min_request_interval))
+
         # ==================== STEP 1: COLLECT URLs ====================
-        print(f"[FULL_SCAN] STEP 1: collect_urls started", file=sys.stderr, flush=True)
+        plog.info(f"[FULL_SCAN] STEP 1: collect_urls started")
         try:
             try:
                 from .collect_urls import UrlCollector
             except ImportError:
                 from parser.collect_urls import UrlCollector
 
-            collector = UrlCollector(supplier_name, hmac_secret, args.session_id)
+            collector = UrlCollector(supplier_name, hmac_secret, args.session_id, metrics_port=args.metrics_port)
             result = collector.run()
             if result != 0:
                 logger.error("[FULL_SCAN] STEP 1 FAILED: collect_urls returned non-zero")
                 sys.exit(1)
-            print(f"[FULL_SCAN] STEP 1: collect finished successfully", file=sys.stderr, flush=True)
+            plog.info(f"[FULL_SCAN] STEP 1: collect finished successfully")
         except Exception as e:
             logger.error(f"[FULL_SCAN] STEP 1 ERROR: {e}", exc_info=True)
             sys.exit(1)
 
         # ==================== STEP 2: RESET statuses ====================
-        print(f"[FULL_SCAN] STEP 2: full-scan-reset started", file=sys.stderr, flush=True)
+        plog.info(f"[FULL_SCAN] STEP 2: full-scan-reset started")
         pending_count = 0
         try:
-            reset_url = f"{api_base_url}/parser/urls/full-scan-reset"
-            headers = {'Content-Type': 'application/json'}
-            if api_token:
-                headers['X-Parser-Token'] = api_token
-                headers['Authorization'] = f"Bearer {api_token}"
-
-            print(f"[FULL_SCAN] STEP 2: POST {reset_url}", file=sys.stderr, flush=True)
-            response = requests.post(
-                reset_url,
-                json={'supplier_name': supplier_name},
-                headers=headers,
-                timeout=30,
-            )
+            response = post_full_scan_reset(api_base_url, supplier_name, api_token)
             if response.status_code != 200:
                 logger.error(f"[FULL_SCAN] STEP 2 FAILED: HTTP {response.status_code} {response.text[:300]}")
                 sys.exit(1)
             
             reset_data = response.json()
-            print(f"[FULL_SCAN] STEP 2: reset response: {reset_data}", file=sys.stderr, flush=True)
+            plog.info(f"[FULL_SCAN] STEP 2: reset response: {reset_data}")
             
             # Проверяем pending после reset
             pending_count = reset_data.get('after', {}).get('pending', 0)
-            print(f"[FULL_SCAN] STEP 2: pending_count={pending_count}", file=sys.stderr, flush=True)
+            plog.info(f"[FULL_SCAN] STEP 2: pending_count={pending_count}")
             
         except Exception as e:
             logger.error(f"[FULL_SCAN] STEP 2 ERROR: {e}", exc_info=True)
@@ -452,10 +665,10 @@ def main():
             logger.error("[FULL_SCAN] FATAL: FULL_SCAN_RESET_DID_NOT_CREATE_PENDING")
             logger.error("[FULL_SCAN] После reset pending_count=0 — нечего парсить!")
             sys.exit(1)
-        print(f"[FULL_SCAN] STEP 3: verified pending_count={pending_count} > 0 ✓", file=sys.stderr, flush=True)
+        plog.info(f"[FULL_SCAN] STEP 3: verified pending_count={pending_count} > 0 ✓")
 
         # ==================== STEP 4: RUN QUEUE until exhausted ====================
-        print(f"[FULL_SCAN] STEP 4: run_queue_worker_async started", file=sys.stderr, flush=True)
+        plog.info(f"[FULL_SCAN] STEP 4: run_queue_worker_async started")
         try:
             from .queue_worker_async import run_queue_worker_async
         except ImportError:
@@ -478,15 +691,19 @@ def main():
                 concurrency=args.concurrency,
                 min_request_interval=min_request_interval,
                 full_scan=True,
+                watch_config=args.watch_config,
+                metrics_port=args.metrics_port,
+                trace_file=args.trace_file,
+                outbox_dir=args.outbox_dir,
             )
         )
 
-        print(f"[FULL_SCAN] ========== ЗАВЕРШЕНО ==========", file=sys.stderr, flush=True)
-        print(f"[FULL_SCAN] Статистика: {stats}", file=sys.stderr, flush=True)
+        plog.info(f"[FULL_SCAN] ========== ЗАВЕРШЕНО ==========")
+        plog.info(f"[FULL_SCAN] Статистика: {stats}")
         sys.exit(0)
 
     if args.queue:
-        print(f"[QUEUE] Запуск в режиме очереди для {supplier_name}", file=sys.stderr, flush=True)
+        plog.info(f"[QUEUE] Запуск в режиме очереди для {supplier_name}")
         
         try:
             from .queue_worker_async import run_queue_worker_async
@@ -510,10 +727,14 @@ def main():
                     max_batches=args.max_batches,
                     concurrency=args.concurrency,
                     min_request_interval=min_request_interval,
+                    watch_config=args.watch_config,
+                    metrics_port=args.metrics_port,
+                    trace_file=args.trace_file,
+                    outbox_dir=args.outbox_dir,
                 )
             )
             
-            print(f"[QUEUE] Завершено. Статистика: {stats}", file=sys.stderr, flush=True)
+            plog.info(f"[QUEUE] Завершено. Статистика: {stats}")
             sys.exit(0)
             
         except KeyboardInterrupt:
@@ -526,13 +747,19 @@ def main():
     # Стандартный режим парсинга (существующий код)
     
     # Создаём ядро парсера с параметрами API (если указаны)
-    print(f"[INIT] Creating ParserCore...", file=sys.stderr, flush=True)
+    plog.info(f"[INIT] Creating ParserCore...")
+    try:
+        from .core import ParserCore
+    except ImportError:
+        from parser.core import ParserCore
     parser_core = ParserCore(
         api_callback=args.api_callback,
         api_token=args.api_token,
-        session_id=args.session_id
+        session_id=args.session_id,
+        watch_config=args.watch_config,
+        outbox_dir=args.outbox_dir,
     )
-    print(f"[INIT] ParserCore created successfully", file=sys.stderr, flush=True)
+    plog.info(f"[INIT] ParserCore created successfully")
     
     try:
         # Получаем список URL для парсинга
@@ -543,7 +770,7 @@ def main():
             logger.info(f"Парсинг одного товара: {args.url}")
         
         elif args.file:
-            print(f"[INIT] Loading URLs from file: {args.file}", file=sys.stderr, flush=True)
+            plog.info(f"[INIT] Loading URLs from file: {args.file}")
             # Поиск файла относительно папки parser
             file_path = Path(__file__).parent / args.file
             if not file_path.exists():
@@ -574,7 +801,7 @@ def main():
             logger.error("Не указан источник URL (используйте --url, --file или --queue)")
             sys.exit(1)
         
-        print(f"[INIT] Starting parse_urls with {len(urls)} URLs...", file=sys.stderr, flush=True)
+        plog.info(f"[INIT] Starting parse_urls with {len(urls)} URLs...")
         # Запускаем парсинг
         stats = parser_core.parse_urls(supplier_name, urls, smart_screenshot=False)
         
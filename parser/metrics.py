@@ -0,0 +1,192 @@
+# parser/metrics.py
+
+"""
+Метрики длительностей с фиксированной памятью.
+
+Раньше каждый воркер копил тайминги списком (float на URL), а в конце
+сортировал его ради p50/p95 — на full-scan в 10^5+ URL это память и
+сортировка при завершении. Здесь:
+
+- LatencyHistogram — лог-линейная гистограмма в духе HDR: значения в
+  микросекундах раскладываются по бакетам с относительной погрешностью
+  не хуже 1/SUB_BUCKET_HALF (~1.6%); число бакетов ограничено (~2 тыс.
+  до часа), min/max/сумма — точные.
+- TopK — K самых медленных URL (min-куча фиксированного размера).
+
+Оба объекта сливаются (merge) — между воркерами одного процесса — и
+сериализуются в JSON-совместимые dict (to_dict/from_dict) — между
+процессами.
+"""
+
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Точность: первые SUB_BUCKET_COUNT микросекунд — точно, дальше по
+# SUB_BUCKET_HALF бакетов на каждую степень двойки
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+
+# Значения выше часа обрезаются (на бакеты это не влияет)
+MAX_VALUE_US = 3600 * 1000 * 1000
+
+
+def _bucket_index(value_us: int) -> int:
+    if value_us < SUB_BUCKET_COUNT:
+        return value_us
+    shift = value_us.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + ((value_us >> shift) - SUB_BUCKET_HALF)
+
+
+def _bucket_bounds(index: int) -> Tuple[int, int]:
+    """Диапазон значений бакета [low, high] в микросекундах."""
+    if index < SUB_BUCKET_COUNT:
+        return index, index
+    k = index - SUB_BUCKET_COUNT
+    shift = k // SUB_BUCKET_HALF + 1
+    mantissa = k % SUB_BUCKET_HALF + SUB_BUCKET_HALF
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Гистограмма длительностей (мс) с перцентилями за O(число бакетов)."""
+
+    __slots__ = ('counts', 'count', 'total_ms', 'min_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms: Optional[float] = None
+        self.max_ms: Optional[float] = None
+
+    def record(self, value_ms: float) -> None:
+        value_ms = max(0.0, float(value_ms))
+        value_us = min(int(value_ms * 1000), MAX_VALUE_US)
+        index = _bucket_index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total_ms += value_ms
+        if self.min_ms is None or value_ms < self.min_ms:
+            self.min_ms = value_ms
+        if self.max_ms is None or value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Перцентиль p (0–100) в мс; 0.0 для пустой гистограммы."""
+        if not self.count:
+            return 0.0
+        if p >= 100:
+            return self.max_ms
+        # Ранг как у nearest-rank: ceil(p/100 * count), минимум 1
+        rank = max(1, -(-int(p * self.count) // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = _bucket_bounds(index)
+                value = (low + high) / 2 / 1000
+                return min(max(value, self.min_ms), self.max_ms)
+        return self.max_ms
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total_ms += other.total_ms
+        if other.min_ms is not None and (self.min_ms is None or other.min_ms < self.min_ms):
+            self.min_ms = other.min_ms
+        if other.max_ms is not None and (self.max_ms is None or other.max_ms > self.max_ms):
+            self.max_ms = other.max_ms
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'counts': {str(index): n for index, n in self.counts.items()},
+            'count': self.count,
+            'total_ms': self.total_ms,
+            'min_ms': self.min_ms,
+            'max_ms': self.max_ms,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LatencyHistogram':
+        hist = cls()
+        hist.counts = {int(index): int(n) for index, n in data.get('counts', {}).items()}
+        hist.count = int(data.get('count', 0))
+        hist.total_ms = float(data.get('total_ms', 0.0))
+        hist.min_ms = data.get('min_ms')
+        hist.max_ms = data.get('max_ms')
+        return hist
+
+    def cumulative_counts(self, bounds_ms: Iterable[float]) -> List[int]:
+        """
+        Число значений <= каждой границы (мс) — бакеты le= для Prometheus.
+
+        Бакет гистограммы относится к границе по нижнему краю, поэтому
+        погрешность та же, что у перцентилей (~1.6%). Безопасно вызывать из
+        другого потока: счётчики копируются до обхода.
+        """
+        counts = sorted(dict(self.counts).items())
+        result = []
+        seen = 0
+        pos = 0
+        for bound_ms in bounds_ms:
+            bound_us = bound_ms * 1000
+            while pos < len(counts) and _bucket_bounds(counts[pos][0])[0] <= bound_us:
+                seen += counts[pos][1]
+                pos += 1
+            result.append(seen)
+        return result
+
+    def summary(self, percentiles: Iterable[float] = (50, 95, 99)) -> Dict[str, float]:
+        result = {f'p{p:g}': self.percentile(p) for p in percentiles}
+        result['count'] = self.count
+        result['max'] = self.max_ms or 0.0
+        return result
+
+
+class TopK:
+    """K наибольших значений с метками (самые медленные URL)."""
+
+    __slots__ = ('k', '_heap')
+
+    def __init__(self, k: int = 10):
+        self.k = max(1, int(k))
+        self._heap: List[Tuple[float, str]] = []
+
+    def add(self, value_ms: float, label: str) -> None:
+        item = (float(value_ms), label)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        elif item[0] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def items(self) -> List[Tuple[float, str]]:
+        """Пары (мс, метка) по убыванию."""
+        return sorted(self._heap, key=lambda item: item[0], reverse=True)
+
+    def merge(self, other: 'TopK') -> 'TopK':
+        for value_ms, label in other._heap:
+            self.add(value_ms, label)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'k': self.k, 'items': [[value, label] for value, label in self.items()]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TopK':
+        top = cls(data.get('k', 10))
+        for value_ms, label in data.get('items', []):
+            top.add(value_ms, label)
+        return top
@@ -0,0 +1,225 @@
+# parser/metrics_server.py
+
+"""
+Встроенный HTTP-эндпоинт метрик (--metrics-port) в формате Prometheus.
+
+Итоговые метрики воркеров печатаются только в [METRICS FINAL] по
+завершении; эндпоинт отдаёт их же во время прогона — чтобы подбирать
+concurrency и задержки, не дожидаясь конца full-scan.
+
+Сервер — http.server.ThreadingHTTPServer в daemon-потоке, без внешних
+зависимостей. Источники метрик (AsyncQueueWorker, QueueWorker, UrlCollector)
+регистрируют функцию, возвращающую список MetricFamily; функция вызывается
+из потока сервера на каждый scrape, поэтому читает только простые поля и
+копии словарей. Один порт на процесс: в потоковом full-scan сборщик и
+воркер регистрируются на одном сервере (у них разные префиксы имён).
+
+    GET /metrics — text/plain; version=0.0.4 (Prometheus)
+                   или application/openmetrics-text (по заголовку Accept)
+"""
+
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Поддержка запуска как модуля и как скрипта (collect_urls.py)
+try:
+    from .metrics import LatencyHistogram
+    from . import log_pipeline as plog
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from parser.metrics import LatencyHistogram
+    from parser import log_pipeline as plog
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# Границы бакетов гистограмм длительностей, секунды (goto/parse страницы)
+LATENCY_BUCKETS_S = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class MetricFamily(NamedTuple):
+    """Метрика для экспозиции: samples — (суффикс имени, метки, значение)."""
+    name: str
+    type: str  # counter / gauge / histogram
+    help: str
+    samples: List[Tuple[str, Dict[str, str], float]]
+
+
+Collector = Callable[[], List[MetricFamily]]
+
+
+def counter(name: str, help_text: str, value: float) -> MetricFamily:
+    """Счётчик; name без суффикса _total."""
+    return MetricFamily(name, 'counter', help_text, [('_total', {}, value)])
+
+
+def gauge(name: str, help_text: str, value: Optional[float]) -> MetricFamily:
+    return MetricFamily(name, 'gauge', help_text, [('', {}, value or 0)])
+
+
+def labeled(name: str, metric_type: str, help_text: str, label: str, values: Dict[str, float]) -> MetricFamily:
+    """Семейство с одной меткой (например, ошибки по коду)."""
+    suffix = '_total' if metric_type == 'counter' else ''
+    samples = [(suffix, {label: str(key)}, value) for key, value in sorted(dict(values).items())]
+    return MetricFamily(name, metric_type, help_text, samples)
+
+
+def histogram(name: str, help_text: str, hist: LatencyHistogram,
+              buckets_s: Iterable[float] = LATENCY_BUCKETS_S) -> MetricFamily:
+    """LatencyHistogram (мс) как гистограмма Prometheus в секундах."""
+    buckets_s = tuple(buckets_s)
+    count = hist.count
+    total_s = hist.total_ms / 1000
+    cumulative = hist.cumulative_counts(b * 1000 for b in buckets_s)
+    samples = [
+        ('_bucket', {'le': _format_value(bound)}, min(n, count))
+        for bound, n in zip(buckets_s, cumulative)
+    ]
+    samples.append(('_bucket', {'le': '+Inf'}, count))
+    samples.append(('_sum', {}, total_s))
+    samples.append(('_count', {}, count))
+    return MetricFamily(name, 'histogram', help_text, samples)
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render(families: Iterable[MetricFamily], openmetrics: bool = False) -> str:
+    """Текстовая экспозиция: Prometheus 0.0.4 или OpenMetrics 1.0."""
+    lines = []
+    for family in families:
+        # В Prometheus TYPE у счётчика — с _total, в OpenMetrics — без
+        type_name = family.name if openmetrics or family.type != 'counter' else family.name + '_total'
+        lines.append(f"# HELP {type_name} {family.help}")
+        lines.append(f"# TYPE {type_name} {family.type}")
+        for suffix, labels, value in family.samples:
+            label_str = ''
+            if labels:
+                label_str = '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + '}'
+            lines.append(f"{family.name}{suffix}{label_str} {_format_value(value)}")
+    if openmetrics:
+        lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """HTTP-сервер /metrics в фоновом потоке."""
+
+    def __init__(self, port: int, host: str = '0.0.0.0'):
+        self.host = host
+        self.port = port
+        self.collectors: List[Collector] = []
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, collect: Collector) -> None:
+        with self._lock:
+            self.collectors.append(collect)
+
+    def remove(self, collect: Collector) -> None:
+        with self._lock:
+            if collect in self.collectors:
+                self.collectors.remove(collect)
+
+    def collect(self) -> List[MetricFamily]:
+        with self._lock:
+            collectors = list(self.collectors)
+        families = []
+        for collect in collectors:
+            families.extend(collect())
+        return families
+
+    def start(self) -> bool:
+        """Поднимает сервер; False, если порт занят (прогон продолжается без метрик)."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+                try:
+                    body = render(server.collect(), openmetrics=openmetrics).encode('utf-8')
+                except Exception as e:
+                    plog.error(f"[METRICS] Ошибка сбора метрик: {e}")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrape каждые N секунд не должен засорять stderr
+                pass
+
+        try:
+            self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            plog.error(f"[METRICS] Не удалось открыть порт {self.port}: {e}")
+            return False
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+        plog.info(f"[METRICS] Эндпоинт метрик: http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self) -> None:
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._httpd = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# Серверы процесса по запрошенному порту (сборщик и воркер делят один)
+_servers: Dict[int, MetricsServer] = {}
+_servers_lock = threading.Lock()
+
+
+def register(port: int, collect: Collector) -> Optional[MetricsServer]:
+    """Регистрирует источник метрик, при необходимости поднимая сервер на port."""
+    with _servers_lock:
+        server = _servers.get(port)
+        if server is None:
+            server = MetricsServer(port)
+            if not server.start():
+                return None
+            _servers[port] = server
+        server.add(collect)
+        return server
+
+
+def unregister(port: int, collect: Collector) -> None:
+    """Снимает источник; сервер останавливается, когда источников не осталось."""
+    with _servers_lock:
+        server = _servers.get(port)
+        if server is None:
+            return
+        server.remove(collect)
+        if not server.collectors:
+            server.stop()
+            del _servers[port]
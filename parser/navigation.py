@@ -0,0 +1,75 @@
+# parser/navigation.py
+
+"""
+Переход на страницу товара с ранней остановкой загрузки.
+
+В режиме domcontentloaded goto ждёт разбора всего HTML, включая синхронные
+сторонние скрипты (счётчики, чаты, виджеты), хотя meta-теги с ценой и
+названием приходят в первых килобайтах документа. В режиме early_abort
+goto возвращается сразу после получения ответа (wait_until='commit'),
+затем страница опрашивается, пока документ ещё грузится: как только все
+критические селекторы профиля (все селекторы, которые читает разбор)
+присутствуют в DOM, загрузка прерывается через window.stop(). Если DOMContentLoaded наступил раньше, чем нашлись
+селекторы, поведение совпадает с обычным режимом — дальше работают
+штатные проверки страницы товара.
+"""
+
+import time
+from typing import Any, Sequence, Tuple
+
+NAV_MODE_DOMCONTENTLOADED = 'domcontentloaded'
+NAV_MODE_EARLY_ABORT = 'early_abort'
+NAV_MODES = (NAV_MODE_DOMCONTENTLOADED, NAV_MODE_EARLY_ABORT)
+
+# Исход ожидания в режиме early_abort
+OUTCOME_SELECTORS = 'selectors'  # селекторы найдены, загрузка остановлена
+OUTCOME_DCL = 'dcl'              # документ разобран раньше, чем нашлись селекторы
+
+# Критерий готовности: все селекторы найдены ИЛИ документ уже разобран
+_READY_JS = """(selectors) => {
+    if (selectors.every((s) => document.querySelector(s) !== null)) return 'selectors';
+    if (document.readyState !== 'loading') return 'dcl';
+    return false;
+}"""
+
+_STOP_JS = "() => window.stop()"
+
+
+def _remaining_ms(t0: float, timeout_ms: int) -> int:
+    return max(1, int(timeout_ms - (time.perf_counter() - t0) * 1000))
+
+
+async def goto_early_abort_async(page, url: str, selectors: Sequence[str], timeout_ms: int) -> Tuple[Any, str]:
+    """
+    Переход с ранней остановкой (async API).
+
+    Returns:
+        (response, outcome) — outcome: OUTCOME_SELECTORS или OUTCOME_DCL
+
+    Raises:
+        PlaywrightTimeoutError: Если ответ или готовность не получены за timeout_ms
+    """
+    t0 = time.perf_counter()
+    response = await page.goto(url, wait_until='commit', timeout=timeout_ms)
+    handle = await page.wait_for_function(_READY_JS, arg=list(selectors), timeout=_remaining_ms(t0, timeout_ms))
+    outcome = await handle.json_value()
+    if outcome == OUTCOME_SELECTORS:
+        try:
+            await page.evaluate(_STOP_JS)
+        except Exception:
+            pass
+    return response, outcome
+
+
+def goto_early_abort_sync(page, url: str, selectors: Sequence[str], timeout_ms: int) -> Tuple[Any, str]:
+    """Переход с ранней остановкой (sync API), см. goto_early_abort_async."""
+    t0 = time.perf_counter()
+    response = page.goto(url, wait_until='commit', timeout=timeout_ms)
+    handle = page.wait_for_function(_READY_JS, arg=list(selectors), timeout=_remaining_ms(t0, timeout_ms))
+    outcome = handle.json_value()
+    if outcome == OUTCOME_SELECTORS:
+        try:
+            page.evaluate(_STOP_JS)
+        except Exception:
+            pass
+    return response, outcome
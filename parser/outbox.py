@@ -0,0 +1,319 @@
+# parser/outbox.py
+
+"""
+Локальный outbox материалов и отчётов (SQLite в режиме WAL).
+
+Разобранные материалы жили только в памяти (MaterialBatcher._buffer,
+AsyncQueueWorker.results_buffer): падение процесса или ошибка сохранения
+теряли данные, и URL приходилось парсить заново. С outbox
+(--outbox-dir / PARSER_OUTBOX_DIR) каждая запись сначала пишется в файл
+<каталог>/<поставщик>.<канал>.sqlite3 и только потом уходит в API; строка
+удаляется после подтверждения (ack). Доставка — at-least-once: повторное
+сохранение материала и повторный отчёт для Laravel безвредны.
+
+Канал — режим, который пишет файл: core (ParserCore, материалы без URL
+очереди) или queue (AsyncQueueWorker, материалы с supplier_url_id и отчёты
+по URL). Форматы строк у режимов разные, поэтому брошенные строки одного
+режима другим не забираются.
+
+Состояния строк:
+- buffered — в буфере живого прогона, отправку ведёт его обычный flush;
+- retry    — отправка не удалась (или строка осталась от прошлого
+             процесса): её забирает фоновый drainer с экспоненциальной
+             задержкой и джиттером.
+
+Владелец строк — воркер (owner), живые владельцы обновляют heartbeat.
+Строки владельца, чей heartbeat устарел (процесс упал или завершился, не
+отправив всё), при следующем запуске переходят к новому воркеру и
+отправляются заново (replay).
+
+journal_mode=WAL + synchronous=NORMAL: запись переживает падение процесса
+(не отключение питания) и не требует fsync на каждую строку.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from . import log_pipeline as plog
+    from .save_retry import SAVE_OK, SAVE_RETRY, SAVE_SPLIT
+except ImportError:
+    from parser import log_pipeline as plog
+    from parser.save_retry import SAVE_OK, SAVE_RETRY, SAVE_SPLIT
+
+KIND_MATERIAL = 'material'
+KIND_REPORT = 'report'
+
+CHANNEL_CORE = 'core'
+CHANNEL_QUEUE = 'queue'
+
+# После стольких неудачных попыток drainer перестаёт повторять строку
+OUTBOX_MAX_ATTEMPTS = 10
+
+STATE_BUFFERED = 'buffered'
+STATE_RETRY = 'retry'
+
+DEFAULT_OUTBOX_DIR_ENV = 'PARSER_OUTBOX_DIR'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    state TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_owner_state ON outbox (owner, state, next_attempt_at);
+CREATE TABLE IF NOT EXISTS owners (
+    owner TEXT PRIMARY KEY,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+
+def backoff_delay(attempt: int, base: float = 2.0, cap: float = 300.0) -> float:
+    """Экспоненциальная задержка попытки attempt (с 1) с джиттером 50–100%."""
+    delay = min(cap, base * (2 ** max(0, attempt - 1)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class OutboxEntry(NamedTuple):
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+
+
+class Outbox:
+    """Журнал неподтверждённых записей одного поставщика; потокобезопасен."""
+
+    def __init__(self, path: str, owner: str, stale_after: float = 30.0,
+                 retry_base: float = 2.0, retry_cap: float = 300.0):
+        """
+        Args:
+            path: Файл SQLite
+            owner: Идентификатор воркера (worker_id)
+            stale_after: Через сколько секунд без heartbeat строки владельца
+                считаются брошенными и переходят к другому воркеру
+            retry_base, retry_cap: Задержка повторов, секунды (backoff_delay)
+        """
+        self.path = path
+        self.owner = owner
+        self.stale_after = stale_after
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+            self._heartbeat_locked()
+
+    def _heartbeat_locked(self) -> None:
+        with self._conn:
+            self._conn.execute(
+                'INSERT INTO owners (owner, heartbeat_at) VALUES (?, ?) '
+                'ON CONFLICT(owner) DO UPDATE SET heartbeat_at = excluded.heartbeat_at',
+                (self.owner, time.time()),
+            )
+
+    def append(self, kind: str, payloads: List[Dict[str, Any]]) -> List[int]:
+        """Записывает пачку в одной транзакции; id строк — для ack/release."""
+        now = time.time()
+        rows = [(kind, self.owner, STATE_BUFFERED, json.dumps(p, ensure_ascii=False, default=str), now) for p in payloads]
+        ids = []
+        with self._lock, self._conn:
+            for row in rows:
+                cursor = self._conn.execute(
+                    'INSERT INTO outbox (kind, owner, state, payload, created_at) VALUES (?, ?, ?, ?, ?)', row,
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def ack(self, ids: List[int]) -> None:
+        """Доставлено — строки удаляются."""
+        ids = [i for i in ids if i is not None]
+        if not ids:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM outbox WHERE id = ?', [(i,) for i in ids])
+
+    def release(self, ids: List[int], error: Optional[str] = None) -> None:
+        """Не доставлено — строки ждут повтора у drainer'а (attempts+1, backoff)."""
+        ids = [i for i in ids if i is not None]
+        if not ids:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            attempts = dict(self._conn.execute(
+                f"SELECT id, attempts FROM outbox WHERE id IN ({','.join('?' * len(ids))})", ids,
+            ).fetchall())
+            self._conn.executemany(
+                'UPDATE outbox SET state = ?, owner = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?',
+                [
+                    (STATE_RETRY, self.owner, attempts[i] + 1,
+                     now + backoff_delay(attempts[i] + 1, self.retry_base, self.retry_cap),
+                     (error or '')[:500] or None, i)
+                    for i in ids if i in attempts
+                ],
+            )
+
+    def adopt_orphans(self) -> int:
+        """Забирает строки владельцев без свежего heartbeat (replay после падения)."""
+        cutoff = time.time() - self.stale_after
+        with self._lock, self._conn:
+            self._heartbeat_locked()
+            cursor = self._conn.execute(
+                'UPDATE outbox SET owner = ?, state = ?, next_attempt_at = 0 '
+                'WHERE owner != ? AND owner NOT IN (SELECT owner FROM owners WHERE heartbeat_at >= ?)',
+                (self.owner, STATE_RETRY, self.owner, cutoff),
+            )
+            self._conn.execute('DELETE FROM owners WHERE heartbeat_at < ?', (cutoff,))
+            return cursor.rowcount
+
+    def take_due(self, limit: int = 50, lease: float = 60.0,
+                 kinds: Tuple[str, ...] = (KIND_MATERIAL, KIND_REPORT)) -> List[OutboxEntry]:
+        """
+        Строки retry этого владельца, чей срок повтора наступил.
+
+        Выданные строки откладываются на lease секунд — пока drainer их
+        отправляет, повторно они не выдаются. Строки других видов (kinds)
+        не выдаются и остаются неподтверждёнными. Заодно обновляет heartbeat
+        и забирает брошенные строки.
+        """
+        self.adopt_orphans()
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                'SELECT id, kind, payload, attempts FROM outbox '
+                f"WHERE owner = ? AND state = ? AND next_attempt_at <= ? AND kind IN ({','.join('?' * len(kinds))}) "
+                'ORDER BY id LIMIT ?',
+                (self.owner, STATE_RETRY, now, *kinds, limit),
+            ).fetchall()
+            self._conn.executemany(
+                'UPDATE outbox SET next_attempt_at = ? WHERE id = ?', [(now + lease, row[0]) for row in rows],
+            )
+        return [OutboxEntry(row[0], row[1], json.loads(row[2]), row[3]) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """Неподтверждённые строки этого владельца по состоянию."""
+        with self._lock:
+            return dict(self._conn.execute(
+                'SELECT state, COUNT(*) FROM outbox WHERE owner = ? GROUP BY state', (self.owner,),
+            ).fetchall())
+
+    def close(self) -> None:
+        """Снимает владельца: оставшиеся строки заберёт следующий запуск."""
+        with self._lock:
+            if self._conn is None:
+                return
+            with self._conn:
+                self._conn.execute('DELETE FROM owners WHERE owner = ?', (self.owner,))
+            self._conn.close()
+            self._conn = None
+
+
+def open_outbox(directory: Optional[str], supplier_name: str, owner: str, channel: str) -> Optional[Outbox]:
+    """Outbox поставщика и канала (CHANNEL_*) в directory или PARSER_OUTBOX_DIR; None — outbox выключен."""
+    directory = directory or os.getenv(DEFAULT_OUTBOX_DIR_ENV)
+    if not directory:
+        return None
+    return Outbox(str(Path(directory) / f"{supplier_name}.{channel}.sqlite3"), owner)
+
+
+class OutboxDrainer:
+    """
+    Фоновый поток повторной отправки для синхронных путей (ParserCore).
+
+    upload(entries) -> (исход, ошибка) отправляет пачку строк видов kinds;
+    исход — класс ответа save_retry. SAVE_SPLIT (413, построчный 422) делит
+    пачку пополам, пока отклонённой не останется одна строка — её снимают
+    с повтора, остальные доставляются. Прочие неудачи возвращают строки в
+    retry с увеличенной задержкой; строка, не доставленная за
+    OUTBOX_MAX_ATTEMPTS попыток, снимается с повтора.
+    """
+
+    def __init__(self, outbox: Outbox, upload: Callable[[List[OutboxEntry]], Tuple[str, Optional[str]]],
+                 interval: float = 5.0, batch_size: int = 50, kinds: Tuple[str, ...] = (KIND_MATERIAL,)):
+        self.outbox = outbox
+        self.upload = upload
+        self.interval = interval
+        self.batch_size = batch_size
+        self.kinds = kinds
+        self.delivered = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='outbox-drainer', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self.drain_once()
+            if self._stop.wait(self.interval):
+                return
+
+    def drain_once(self) -> int:
+        """Одна попытка по всем наступившим строкам; число доставленных."""
+        delivered_before = self.delivered
+        while True:
+            entries = self.outbox.take_due(self.batch_size, kinds=self.kinds)
+            if not entries or not self._deliver(entries):
+                break
+        return self.delivered - delivered_before
+
+    def _deliver(self, entries: List[OutboxEntry]) -> bool:
+        """Отправка пачки (с делением на SAVE_SPLIT); False — сбой, дальше не отправлять."""
+        try:
+            outcome, error = self.upload(entries)
+        except Exception as e:
+            outcome, error = SAVE_RETRY, str(e)
+        if outcome == SAVE_OK:
+            self.outbox.ack([entry.id for entry in entries])
+            self.delivered += len(entries)
+            return True
+        if outcome == SAVE_SPLIT:
+            if len(entries) == 1:
+                self.rejected += 1
+                plog.error(
+                    f"[OUTBOX] Строка отклонена API и снята с повтора: {(error or '')[:300]} | "
+                    f"{json.dumps(entries[0].payload, ensure_ascii=False, default=str)[:300]}",
+                    key='outbox.rejected',
+                )
+                self.outbox.ack([entries[0].id])
+                return True
+            mid = len(entries) // 2
+            # Вторая половина при сбое первой остаётся под lease take_due и вернётся без лишней попытки
+            return self._deliver(entries[:mid]) and self._deliver(entries[mid:])
+        exhausted = [entry.id for entry in entries if entry.attempts + 1 >= OUTBOX_MAX_ATTEMPTS]
+        if exhausted:
+            self.abandoned += len(exhausted)
+            plog.error(
+                f"[OUTBOX] Не доставлено за {OUTBOX_MAX_ATTEMPTS} попыток, сняты с повтора: {len(exhausted)} ({error})",
+                key='outbox.abandoned',
+            )
+            self.outbox.ack(exhausted)
+        exhausted_ids = set(exhausted)
+        self.outbox.release([entry.id for entry in entries if entry.id not in exhausted_ids], error or 'upload failed')
+        return False
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
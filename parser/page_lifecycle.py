@@ -0,0 +1,134 @@
+# parser/page_lifecycle.py
+
+"""
+Жизненный цикл страниц Playwright в длинных прогонах.
+
+Страница, переиспользуемая часами, копит память рендерера (JS heap,
+detached DOM, кеши скриптов) — на многочасовом full-scan это заканчивается
+OOM. PageRecycleTracker считает переходы каждой страницы и время от времени
+снимает JSHeapUsedSize через CDP Performance.getMetrics; когда страница
+превысила лимит переходов или памяти, владелец закрывает её и открывает
+новую в том же контексте (маршруты контекста переносятся автоматически).
+
+Страница пересоздаётся только между URL её владельцем (воркер очереди
+или адаптер), поэтому незавершённые задачи её не теряют.
+"""
+
+from typing import Any, Dict, Optional
+
+JS_HEAP_METRIC = 'JSHeapUsedSize'
+_MB = 1024 * 1024
+
+
+def parse_js_heap(metrics_response: Dict[str, Any]) -> Optional[int]:
+    """Достаёт JSHeapUsedSize (байты) из ответа Performance.getMetrics."""
+    for metric in metrics_response.get('metrics', ()):
+        if metric.get('name') == JS_HEAP_METRIC:
+            return int(metric.get('value', 0))
+    return None
+
+
+async def read_js_heap_async(page) -> Optional[int]:
+    """JS heap страницы через CDP (async API). None — если CDP недоступен."""
+    try:
+        session = await page.context.new_cdp_session(page)
+    except Exception:
+        return None
+    try:
+        await session.send('Performance.enable')
+        return parse_js_heap(await session.send('Performance.getMetrics'))
+    except Exception:
+        return None
+    finally:
+        try:
+            await session.detach()
+        except Exception:
+            pass
+
+
+def read_js_heap_sync(page) -> Optional[int]:
+    """JS heap страницы через CDP (sync API). None — если CDP недоступен."""
+    try:
+        session = page.context.new_cdp_session(page)
+    except Exception:
+        return None
+    try:
+        session.send('Performance.enable')
+        return parse_js_heap(session.send('Performance.getMetrics'))
+    except Exception:
+        return None
+    finally:
+        try:
+            session.detach()
+        except Exception:
+            pass
+
+
+class PageRecycleTracker:
+    """Счётчики переходов и памяти по страницам + решение о пересоздании."""
+
+    def __init__(self, max_navigations: int = 200, max_js_heap_mb: float = 512, check_every: int = 10):
+        """
+        Args:
+            max_navigations: Пересоздать страницу после N переходов (0 — без лимита)
+            max_js_heap_mb: Пересоздать при JS heap выше порога, МБ (0 — не проверять)
+            check_every: Снимать метрики памяти раз в N переходов страницы
+        """
+        self.max_navigations = max(0, int(max_navigations))
+        self.max_js_heap_bytes = int(max_js_heap_mb * _MB) if max_js_heap_mb else 0
+        self.check_every = max(1, int(check_every))
+        self._navigations: Dict[int, int] = {}
+        self.recycles_by_reason: Dict[str, int] = {}
+        self.js_heap_max_bytes = 0
+        self.navigations_max = 0
+
+    @classmethod
+    def from_profile(cls, profile) -> 'PageRecycleTracker':
+        return cls(profile.page_max_navigations, profile.page_max_js_heap_mb, profile.page_memory_check_every)
+
+    def reconfigure(self, profile) -> None:
+        """Пороги из нового профиля (горячая перезагрузка); счётчики сохраняются."""
+        self.max_navigations = max(0, int(profile.page_max_navigations))
+        self.max_js_heap_bytes = int(profile.page_max_js_heap_mb * _MB) if profile.page_max_js_heap_mb else 0
+        self.check_every = max(1, int(profile.page_memory_check_every))
+
+    def record_navigation(self, page) -> int:
+        key = id(page)
+        count = self._navigations.get(key, 0) + 1
+        self._navigations[key] = count
+        if count > self.navigations_max:
+            self.navigations_max = count
+        return count
+
+    def should_check_memory(self, page) -> bool:
+        if not self.max_js_heap_bytes:
+            return False
+        count = self._navigations.get(id(page), 0)
+        return count > 0 and count % self.check_every == 0
+
+    def recycle_reason(self, page, js_heap_bytes: Optional[int] = None) -> Optional[str]:
+        """Причина пересоздания страницы или None."""
+        if js_heap_bytes is not None:
+            if js_heap_bytes > self.js_heap_max_bytes:
+                self.js_heap_max_bytes = js_heap_bytes
+            if self.max_js_heap_bytes and js_heap_bytes > self.max_js_heap_bytes:
+                return 'js_heap'
+        if self.max_navigations and self._navigations.get(id(page), 0) >= self.max_navigations:
+            return 'navigations'
+        return None
+
+    def recycled(self, page, reason: str) -> None:
+        self._navigations.pop(id(page), None)
+        self.recycles_by_reason[reason] = self.recycles_by_reason.get(reason, 0) + 1
+
+    @property
+    def recycles(self) -> int:
+        return sum(self.recycles_by_reason.values())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'page_recycles': self.recycles,
+            'page_recycles_by_reason': dict(self.recycles_by_reason),
+            'js_heap_mb_max': round(self.js_heap_max_bytes / _MB, 1),
+            'page_navigations_max': self.navigations_max,
+        }
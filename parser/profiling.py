@@ -0,0 +1,262 @@
+# parser/profiling.py
+
+"""
+Профилирование прогона парсера (main.py --profile).
+
+Когда пропускная способность падает, по метрикам не видно, куда уходит
+время: event loop, кодирование JSON, обработка маршрутов или IPC с
+Playwright. Здесь три режима:
+
+- sample   — сэмплирующий профайлер без зависимостей: фоновый поток раз в
+             interval снимает стеки всех потоков (sys._current_frames) и
+             копит их в folded-формате (строка "кадр;кадр;... N") — вход
+             flamegraph.pl, speedscope, inferno. Накладные расходы
+             ограничены частотой выборки, код не трассируется. Ожидание
+             (select в event loop, queue.get, threading.wait) считается
+             отдельно как idle и в стеки не попадает;
+- cprofile — детерминированный cProfile главного потока (.prof для pstats,
+             snakeviz, flameprof); только на весь прогон — включить его
+             для главного потока из другого потока нельзя;
+- yappi    — yappi с wall-clock и учётом корутин asyncio (.prof в формате
+             pstat); опциональная зависимость (pip install yappi).
+
+Окно профилирования: delay — через сколько секунд начать, duration — как
+долго (None — до конца прогона). Файл пишется в каталог профилей с
+session_id в имени:
+
+    profile-sample-session42-12345-20250101-120000.folded
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    from . import log_pipeline as plog
+except ImportError:
+    from parser import log_pipeline as plog
+
+MODE_SAMPLE = 'sample'
+MODE_CPROFILE = 'cprofile'
+MODE_YAPPI = 'yappi'
+PROFILE_MODES = (MODE_SAMPLE, MODE_CPROFILE, MODE_YAPPI)
+
+DEFAULT_PROFILE_DIR = 'profiles'
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Листовые кадры ожидания: поток простаивает, а не работает
+_IDLE_LEAVES = frozenset({
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('queue.py', 'get'),
+    ('socketserver.py', 'serve_forever'),
+    ('connection.py', 'wait'),
+})
+
+
+def _frame_label(code) -> str:
+    path = Path(code.co_filename)
+    # Родительский каталог отличает parser/core.py от модулей библиотек с тем же именем
+    short = f"{path.parent.name}/{path.name}" if path.parent.name else path.name
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Сэмплирующий профайлер: стеки всех потоков в folded-формате."""
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = max(0.001, float(interval))
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle: Dict[str, int] = {}
+        self.busy: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[object, str] = {}
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                thread_name = names.get(ident, str(ident))
+                leaf = frame.f_code
+                if (Path(leaf.co_filename).name, leaf.co_name) in _IDLE_LEAVES:
+                    self.idle[thread_name] = self.idle.get(thread_name, 0) + 1
+                    continue
+                self.busy[thread_name] = self.busy.get(thread_name, 0) + 1
+                labels = []
+                while frame is not None:
+                    labels.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(thread_name)
+                self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+    def write(self, path: Path) -> Path:
+        path = path.with_suffix('.folded')
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def describe(self) -> str:
+        """Доля работы/простоя по потокам (MainThread — event loop async-режимов)."""
+        parts = []
+        for name in sorted(set(self.busy) | set(self.idle)):
+            busy, idle = self.busy.get(name, 0), self.idle.get(name, 0)
+            parts.append(f"{name}: busy={busy / max(1, busy + idle) * 100:.0f}%")
+        return f"samples={self.samples} " + ' '.join(parts)
+
+
+class CProfileProfiler:
+    """cProfile главного потока (запускается и останавливается в нём же)."""
+
+    def __init__(self):
+        import cProfile
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    def write(self, path: Path) -> Path:
+        path = path.with_suffix('.prof')
+        self._profile.dump_stats(str(path))
+        return path
+
+    def describe(self) -> str:
+        return 'cProfile (главный поток)'
+
+
+class YappiProfiler:
+    """yappi: wall-clock, все потоки, корутины asyncio."""
+
+    def __init__(self):
+        try:
+            import yappi
+        except ImportError:
+            raise ValueError("profile yappi: пакет yappi не установлен (pip install yappi)")
+        self._yappi = yappi
+
+    def start(self) -> None:
+        self._yappi.set_clock_type('wall')
+        self._yappi.start(builtins=False)
+
+    def stop(self) -> None:
+        self._yappi.stop()
+
+    def write(self, path: Path) -> Path:
+        path = path.with_suffix('.prof')
+        self._yappi.get_func_stats().save(str(path), type='pstat')
+        return path
+
+    def describe(self) -> str:
+        return f"yappi wall-clock, потоков: {len(self._yappi.get_thread_stats())}"
+
+
+class RunProfiler:
+    """
+    Профилирование прогона целиком или в окне [delay, delay + duration].
+
+    Результат пишется при остановке: по окончании окна или при выходе из
+    процесса (atexit — main.py завершает режимы через sys.exit).
+    """
+
+    def __init__(self, mode: str, profile_dir: Optional[str] = None, session_id: Optional[int] = None,
+                 delay: float = 0.0, duration: Optional[float] = None, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"profile: режим {mode!r}, ожидается одно из {PROFILE_MODES}")
+        if delay < 0 or (duration is not None and duration <= 0):
+            raise ValueError("profile: delay >= 0 и duration > 0")
+        if mode == MODE_CPROFILE and (delay or duration is not None):
+            raise ValueError("profile cprofile: окно не поддерживается (только весь прогон), используйте sample или yappi")
+        self.mode = mode
+        self.delay = float(delay)
+        self.duration = duration
+        if mode == MODE_SAMPLE:
+            self.backend = SamplingProfiler(interval)
+        elif mode == MODE_CPROFILE:
+            self.backend = CProfileProfiler()
+        else:
+            self.backend = YappiProfiler()
+        directory = Path(profile_dir or os.getenv('PARSER_PROFILE_DIR') or DEFAULT_PROFILE_DIR)
+        session = f"session{session_id}" if session_id else 'nosession'
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        self.path_base = directory / f"profile-{mode}-{session}-{os.getpid()}-{stamp}"
+        self.output: Optional[Path] = None
+        self._state = 'idle'  # idle → running → stopped
+        self._lock = threading.Lock()
+        self._timers = []
+
+    def start(self) -> None:
+        # Журнал запускается раньше регистрации stop: atexit идёт в обратном
+        # порядке, и итог профиля попадает в stderr до остановки журнала
+        plog.configure()
+        atexit.register(self.stop)
+        if self.delay:
+            self._schedule(self.delay, self._begin)
+        else:
+            self._begin()
+
+    def _schedule(self, seconds: float, fn) -> None:
+        timer = threading.Timer(seconds, fn)
+        timer.daemon = True
+        timer.start()
+        self._timers.append(timer)
+
+    def _begin(self) -> None:
+        with self._lock:
+            if self._state != 'idle':
+                return
+            self._state = 'running'
+            self.backend.start()
+        plog.info(f"[PROFILE] Профилирование {self.mode} начато", key='profile.start', mode=self.mode)
+        if self.duration is not None:
+            self._schedule(self.duration, self.stop)
+
+    def stop(self) -> Optional[Path]:
+        """Останавливает профилирование и пишет файл (повторный вызов — без действий)."""
+        with self._lock:
+            state, self._state = self._state, 'stopped'
+            if state != 'running':
+                for timer in self._timers:
+                    timer.cancel()
+                return self.output
+            self.backend.stop()
+        for timer in self._timers:
+            timer.cancel()
+        try:
+            self.path_base.parent.mkdir(parents=True, exist_ok=True)
+            self.output = self.backend.write(self.path_base)
+        except OSError as e:
+            plog.error(f"[PROFILE] Не удалось записать профиль {self.path_base}: {e}", key='profile.write_failed')
+            return None
+        plog.info(f"[PROFILE] {self.backend.describe()} → {self.output}", key='profile.written', path=str(self.output))
+        return self.output
@@ -26,11 +26,17 @@ try:
     from .base_adapter import MaterialData, SupplierAdapter
     from .config import config_manager
     from .core import ParserCore, CallbackHandler
+    from .metrics import LatencyHistogram
+    from . import metrics_server
+    from . import tracing
 except ImportError:
     sys.path.insert(0, str(Path(__file__).parent.parent))
     from parser.base_adapter import MaterialData, SupplierAdapter
     from parser.config import config_manager
     from parser.core import ParserCore, CallbackHandler
+    from parser.metrics import LatencyHistogram
+    from parser import metrics_server
+    from parser import tracing
 
 
 logger = logging.getLogger(__name__)
@@ -93,8 +99,19 @@ class QueueWorker:
         max_batches: Optional[int] = None,
         concurrency: int = 3,
         min_request_interval: float = 0.5,
+        watch_config: bool = False,
+        metrics_port: Optional[int] = None,
+        trace_file: Optional[str] = None,
     ):
         self.supplier_name = supplier_name
+        self.watch_config = watch_config
+        # Эндпоинт /metrics (metrics_server), None — выключен
+        self.metrics_port = metrics_port
+        # Трассировка по URL (tracing), файл открывается в run()
+        self.trace_file = trace_file
+        self.tracer: Optional[tracing.Tracer] = None
+        # Корни трасс URL текущей пачки (закрываются после save/report)
+        self._url_spans: Dict[int, Any] = {}
         # Если api_callback передан, используем его host как источник base_url
         if api_callback and api_base_url == "http://host.docker.internal:8000/api":
             try:
@@ -127,6 +144,9 @@ class QueueWorker:
             'blocked': 0,
             'batches_processed': 0,
         }
+        self.failed_by_code: Dict[str, int] = {}
+        self._inflight = 0
+        self._run_started: Optional[float] = None
         
         # Адаптер и ядро
         self.adapter: Optional[SupplierAdapter] = None
@@ -163,6 +183,9 @@ class QueueWorker:
         # Создаём адаптер
         self.adapter = self.core.get_adapter(self.supplier_name)
         self.adapter.setup()
+        if self.watch_config:
+            config_manager.subscribe(self.supplier_name, self.adapter.on_config_reloaded)
+            config_manager.watch()
 
         # Подготовить страницы для параллельного парсинга
         self.pages = []
@@ -205,6 +228,8 @@ class QueueWorker:
                     except Exception:
                         pass
         if self.adapter:
+            if self.watch_config:
+                config_manager.unsubscribe(self.supplier_name, self.adapter.on_config_reloaded)
             self.adapter.teardown()
         print(f"[QUEUE] Воркер {self.worker_id} остановлен", file=sys.stderr, flush=True)
     
@@ -212,8 +237,17 @@ class QueueWorker:
         """Основной цикл обработки очереди."""
         print(f"[QUEUE] Запуск обработки очереди для {self.supplier_name}", file=sys.stderr, flush=True)
         
+        self._run_started = time.perf_counter()
+        if self.metrics_port is not None:
+            metrics_server.register(self.metrics_port, self.metrics_families)
+        
         try:
             self.setup()
+            self.tracer = tracing.open_tracer(self.trace_file, **{
+                'parser.supplier': self.supplier_name,
+                'parser.session_id': self.session_id or 0,
+                'parser.worker_id': self.worker_id,
+            })
             
             empty_batches = 0
             max_empty_batches = 3  # Сколько пустых пачек до выхода
@@ -243,14 +277,18 @@ class QueueWorker:
                     if self.callback_handler:
                         self.callback_handler.send_total_urls(self.current_batch_total)
 
-                # 2. Парсинг пачки
+                # 2. Парсинг пачки (новая конфигурация применяется до неё —
+                # страницы пачки парсятся в потоках, между URL адаптер общий)
+                self.adapter.apply_pending_config()
                 results = self.process_batch(tasks)
                 
                 # 3. Сохранение материалов (batch)
-                self.save_materials_batch(results)
+                saved = [result for result in results if result.material_data]
+                self._traced_batch_call('save_batch', saved, lambda: self.save_materials_batch(results))
                 
                 # 4. Report результатов
-                self.report_results(results)
+                self._traced_batch_call('report_batch', results, lambda: self.report_results(results))
+                self._end_url_spans(results)
                 
                 # 5. Обновить статистику
                 self.stats['batches_processed'] += 1
@@ -273,6 +311,15 @@ class QueueWorker:
             raise
         finally:
             self.teardown()
+            if self.metrics_port is not None:
+                metrics_server.unregister(self.metrics_port, self.metrics_families)
+            if self.tracer is not None:
+                for span in self._url_spans.values():
+                    span.set_attribute('saved', False)
+                    span.end()
+                self._url_spans.clear()
+                self.tracer.close()
+                self.tracer = None
         
         return self.stats
 
@@ -290,6 +337,7 @@ class QueueWorker:
             if wait_for > 0:
                 time.sleep(wait_for)
             self._last_request_at[domain] = time.perf_counter()
+        tracing.record_perf('rate_limit_wait', now, time.perf_counter(), domain=domain)
 
     def _update_stats(self, result: UrlResult) -> None:
         with self._stats_lock:
@@ -303,6 +351,113 @@ class QueueWorker:
                 self.stats['failed'] += 1
             elif result.status == 'blocked':
                 self.stats['blocked'] += 1
+
+            if result.error_code:
+                self.failed_by_code[result.error_code] = self.failed_by_code.get(result.error_code, 0) + 1
+
+    def _parse_tracked(self, task: UrlTask, page=None) -> UrlResult:
+        """process_single_url с учётом URL в работе (для /metrics)."""
+        with self._stats_lock:
+            self._inflight += 1
+        try:
+            with tracing.span('parse'):
+                return self.process_single_url(task, page=page)
+        finally:
+            with self._stats_lock:
+                self._inflight -= 1
+
+    def _start_url_span(self, task: UrlTask, enqueued_ns: int):
+        """Корневой span 'url' и queue_wait; токен контекста потока или None."""
+        if self.tracer is None:
+            return None
+        now = time.time_ns()
+        span = self.tracer.start_span('url', start_ns=enqueued_ns, attributes={
+            'url': task.url,
+            'supplier_url_id': task.supplier_url_id,
+            'supplier': self.supplier_name,
+        })
+        self._url_spans[task.supplier_url_id] = span
+        self.tracer.record('queue_wait', enqueued_ns, now, parent=span)
+        return tracing.activate(span)
+
+    def _traced_batch_call(self, name: str, results: List[UrlResult], call) -> None:
+        """
+        Пачечный вызов (save/report) под собственным корнем со ссылками на URL.
+
+        Каждому URL пачки дописывается дочерний span с тем же интервалом.
+        """
+        if self.tracer is None or not results:
+            call()
+            return
+        spans = [self._url_spans.get(result.supplier_url_id) for result in results]
+        root = self.tracer.start_span(name, attributes={'batch_size': len(results)}, links=spans)
+        token = tracing.activate(root)
+        try:
+            call()
+        except Exception as e:
+            root.set_error(e)
+            raise
+        finally:
+            tracing.deactivate(token)
+            root.end()
+            child_name = name.replace('_batch', '')
+            for span in spans:
+                if span is not None:
+                    self.tracer.record(child_name, root.start_ns, root.end_ns, parent=span,
+                                       attributes={'batch.trace_id': root.trace_id})
+
+    def _end_url_spans(self, results: List[UrlResult]) -> None:
+        for result in results:
+            span = self._url_spans.pop(result.supplier_url_id, None)
+            if span is None:
+                continue
+            span.set_attribute('status', result.status)
+            span.set_attribute('error_code', result.error_code)
+            if result.status in ('failed', 'blocked'):
+                span.set_error(result.error_message or result.error_code or result.status)
+            span.end()
+
+    def metrics_families(self) -> List[metrics_server.MetricFamily]:
+        """Живые метрики для /metrics (вызывается из потока сервера, только чтение)."""
+        m = metrics_server
+        elapsed_min = (time.perf_counter() - self._run_started) / 60 if self._run_started else 0
+        processed = self.stats['total_processed']
+        families = [
+            m.labeled('parser_worker_info', 'gauge', 'Воркер очереди (sync)', 'supplier', {self.supplier_name: 1}),
+            m.counter('parser_urls_processed', 'Обработано URL', processed),
+            m.counter('parser_urls_saved', 'URL со статусом done', self.stats['successful']),
+            m.counter('parser_urls_failed', 'URL со статусом failed', self.stats['failed']),
+            m.counter('parser_urls_blocked', 'URL со статусом blocked', self.stats['blocked']),
+            m.labeled('parser_url_errors', 'counter', 'Ошибки URL по коду', 'code', self.failed_by_code),
+            m.counter('parser_batches_processed', 'Обработано пачек claim', self.stats['batches_processed']),
+            m.gauge('parser_pages_inflight', 'URL в работе', self._inflight),
+            m.gauge('parser_pages', 'Страниц браузера', len(self.pages)),
+            m.gauge('parser_concurrency', 'Параметр concurrency', self.concurrency),
+            m.gauge('parser_min_request_interval_seconds', 'Минимальный интервал между запросами к домену', self.min_request_interval),
+            m.gauge('parser_batch_total', 'URL в текущей пачке', self.current_batch_total),
+            m.gauge('parser_batch_processed', 'Обработано URL текущей пачки', self.batch_processed),
+            m.gauge('parser_throughput_urls_per_minute', 'Средняя пропускная способность с начала прогона', processed / elapsed_min if elapsed_min > 0 else 0),
+        ]
+        # Тайминги и блокировки ведёт адаптер (SkmMebelAdapter)
+        adapter = self.adapter
+        blocked = getattr(adapter, '_requests_blocked', None)
+        allowed = getattr(adapter, '_requests_allowed', None)
+        if blocked is not None and allowed is not None:
+            families += [
+                m.counter('parser_requests_blocked', 'Заблокированные запросы браузера', blocked),
+                m.counter('parser_requests_allowed', 'Пропущенные запросы браузера', allowed),
+                m.gauge('parser_block_ratio', 'Доля заблокированных запросов браузера', blocked / (blocked + allowed) if blocked + allowed else 0),
+            ]
+        if getattr(adapter, '_nav_early_aborts', None) is not None:
+            families.append(m.counter('parser_nav_early_aborts', 'Переходы, прерванные по critical_selectors', adapter._nav_early_aborts))
+        for name, attr, help_text in (
+            ('parser_goto_seconds', '_goto_ms', 'Длительность перехода на страницу'),
+            ('parser_parse_seconds', '_parse_ms', 'Длительность разбора URL целиком'),
+        ):
+            hist = getattr(adapter, attr, None)
+            if isinstance(hist, LatencyHistogram):
+                families.append(m.histogram(name, help_text, hist))
+        return families
     
     def claim_batch(self) -> List[UrlTask]:
         """Запросить пачку URL из Laravel."""
@@ -346,11 +501,17 @@ class QueueWorker:
     def process_batch(self, tasks: List[UrlTask]) -> List[UrlResult]:
         """Парсинг пачки URL."""
         results = []
+        enqueued_ns = time.time_ns()
 
         if self.concurrency <= 1:
             for task in tasks:
-                self._rate_limit(task.url)
-                result = self.process_single_url(task)
+                trace_token = self._start_url_span(task, enqueued_ns)
+                try:
+                    self._rate_limit(task.url)
+                    result = self._parse_tracked(task)
+                finally:
+                    if trace_token is not None:
+                        tracing.deactivate(trace_token)
                 results.append(result)
                 self._update_stats(result)
             return results
@@ -362,13 +523,19 @@ class QueueWorker:
 
         def worker(task: UrlTask) -> UrlResult:
             page = None
+            # Контекст у каждого потока пула свой — корень URL активируется в нём
+            trace_token = self._start_url_span(task, enqueued_ns)
             try:
+                t_wait = time.perf_counter()
                 page = self._page_pool.get()
+                tracing.record_perf('page_pool_wait', t_wait, time.perf_counter())
                 self._rate_limit(task.url)
-                return self.process_single_url(task, page=page)
+                return self._parse_tracked(task, page=page)
             finally:
                 if page is not None:
                     self._page_pool.put(page)
+                if trace_token is not None:
+                    tracing.deactivate(trace_token)
 
         with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
             future_map = {executor.submit(worker, task): task for task in tasks}
@@ -562,6 +729,9 @@ def run_queue_worker(
     max_batches: Optional[int] = None,
     concurrency: int = 3,
     min_request_interval: float = 0.5,
+    watch_config: bool = False,
+    metrics_port: Optional[int] = None,
+    trace_file: Optional[str] = None,
 ) -> dict:
     """Запуск воркера очереди."""
     worker = QueueWorker(
@@ -575,6 +745,9 @@ def run_queue_worker(
         max_batches=max_batches,
         concurrency=concurrency,
         min_request_interval=min_request_interval,
+        watch_config=watch_config,
+        metrics_port=metrics_port,
+        trace_file=trace_file,
     )
     
     return worker.run()
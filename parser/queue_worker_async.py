@@ -5,13 +5,16 @@ Async queue worker for URL parsing using Playwright async API.
 """
 
 import asyncio
-import sys
+import contextvars
+import hashlib
+import os
+import re
 import time
 import uuid
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import aiohttp
@@ -21,12 +24,46 @@ from playwright.async_api import async_playwright, Page, TimeoutError as Playwri
 try:
     from .base_adapter import MaterialData
     from .config import config_manager
+    from .supplier_profile import PRICE_DIGITS_RE
+    from .browser_pool import BrowserPoolClient, pool_client_from_env
+    from .page_lifecycle import PageRecycleTracker, read_js_heap_async
+    from .navigation import NAV_MODE_EARLY_ABORT, OUTCOME_SELECTORS, goto_early_abort_async
+    from .html_extract import EXTRACTION_RAW_HTML, HtmlDocument
+    from .metrics import LatencyHistogram, TopK
+    from . import metrics_server
+    from . import log_pipeline as plog
+    from . import tracing
+    from .loop_monitor import LOOP_LAG_BUCKETS_S, LoopLagMonitor
+    from .outbox import (
+        CHANNEL_QUEUE, KIND_MATERIAL, KIND_REPORT, OUTBOX_MAX_ATTEMPTS, Outbox, OutboxEntry, backoff_delay, open_outbox,
+    )
+    from . import save_retry
+    from .save_retry import CIRCUIT_CLOSED, SAVE_FATAL, SAVE_OK, SAVE_SPLIT, CircuitBreaker, classify_save_status
 except ImportError:
     from parser.base_adapter import MaterialData
     from parser.config import config_manager
+    from parser.supplier_profile import PRICE_DIGITS_RE
+    from parser.browser_pool import BrowserPoolClient, pool_client_from_env
+    from parser.page_lifecycle import PageRecycleTracker, read_js_heap_async
+    from parser.navigation import NAV_MODE_EARLY_ABORT, OUTCOME_SELECTORS, goto_early_abort_async
+    from parser.html_extract import EXTRACTION_RAW_HTML, HtmlDocument
+    from parser.metrics import LatencyHistogram, TopK
+    from parser import metrics_server
+    from parser import log_pipeline as plog
+    from parser import tracing
+    from parser.loop_monitor import LOOP_LAG_BUCKETS_S, LoopLagMonitor
+    from parser.outbox import (
+        CHANNEL_QUEUE, KIND_MATERIAL, KIND_REPORT, OUTBOX_MAX_ATTEMPTS, Outbox, OutboxEntry, backoff_delay, open_outbox,
+    )
+    from parser import save_retry
+    from parser.save_retry import CIRCUIT_CLOSED, SAVE_FATAL, SAVE_OK, SAVE_SPLIT, CircuitBreaker, classify_save_status
 
 logger = logging.getLogger(__name__)
 
+# Профиль, с которым начат текущий URL: горячая перезагрузка не меняет его
+# посреди разбора (задачи разбора raw_html наследуют значение через контекст)
+_url_profile: contextvars.ContextVar = contextvars.ContextVar('queue_url_profile', default=None)
+
 
 class ErrorCodes:
     NAV_TIMEOUT = 'NAV_TIMEOUT'
@@ -45,6 +82,9 @@ class UrlTask:
     url: str
     supplier_name: str
     material_type: Optional[str]
+    force_dom: bool = False  # raw_html не справился — парсить через DOM
+    enqueued_ns: int = 0  # постановка в очередь пачки (для span queue_wait)
+    span: Optional[Any] = None  # корневой span 'url' (режим трассировки)
 
 
 @dataclass
@@ -61,7 +101,39 @@ class InternalRuntimeError(Exception):
     pass
 
 
+def _article_from_url(url: str) -> str:
+    """Артикул из ID в конце URL (или хеша URL), если на странице его нет."""
+    match = re.search(r'/(\d+)/?$', url)
+    if match:
+        return f"SKM-{match.group(1)}"
+    return f"SKM-{hashlib.md5(url.encode()).hexdigest()[:8].upper()}"
+
+
 class AsyncQueueWorker:
+    STREAM_POLL_INTERVAL = 2.0  # сек между claim, пока сборщик URL ещё работает
+
+    # Признаки страницы товара и fallback-селекторы (общие для DOM и raw_html)
+    PRODUCT_INDICATORS = (
+        '[itemprop="name"]',
+        '.catalog-detail',
+        '.product-detail',
+        'h1.catalog-detail__title',
+    )
+    NAME_SELECTORS = (
+        'meta[itemprop="name"]',
+        '[itemprop="name"]',
+        'h1',
+        '.catalog-detail__title',
+        'meta[property="og:title"]',
+    )
+    ARTICLE_SELECTORS = (
+        '.catalog-detail__article.js-copy-article',
+        '.catalog-detail__article',
+        '[data-article]',
+        '.article',
+        '.sku',
+    )
+
     def __init__(
         self,
         supplier_name: str,
@@ -77,6 +149,12 @@ class AsyncQueueWorker:
         min_request_interval: float = 0.0,
         domain_limit: Optional[int] = None,
         full_scan: bool = False,
+        producer_alive: Optional[Callable[[], bool]] = None,
+        watch_config: bool = False,
+        metrics_port: Optional[int] = None,
+        trace_file: Optional[str] = None,
+        outbox_dir: Optional[str] = None,
+        max_buffered_materials: Optional[int] = None,
     ):
         self.supplier_name = supplier_name
         self.api_token = api_token
@@ -90,6 +168,42 @@ class AsyncQueueWorker:
         self.min_request_interval = max(0.0, float(min_request_interval))
         self.domain_limit = domain_limit or self.concurrency
         self.full_scan = full_scan
+        # Потоковый full-scan: пока сборщик URL жив, пустой claim — не конец очереди
+        self.producer_alive = producer_alive
+        # Горячая перезагрузка конфигурации (ConfigManager.watch)
+        self.watch_config = watch_config
+        self._pending_config: Optional[tuple] = None
+        self._inflight = 0
+        self.config_reloads = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Эндпоинт /metrics (metrics_server), None — выключен
+        self.metrics_port = metrics_port
+        self._run_started: Optional[float] = None
+        # Трассировка по URL (tracing), файл открывается в run()
+        self.trace_file = trace_file
+        self.tracer: Optional[tracing.Tracer] = None
+        # Локальный outbox (outbox.py): материалы и отчёты на диске до подтверждения API
+        self.outbox_dir = outbox_dir
+        self.outbox: Optional[Outbox] = None
+        self._outbox_drainer: Optional[asyncio.Task] = None
+        self.outbox_replayed = 0
+        self.outbox_delivered = 0
+        self.outbox_abandoned = 0
+        # Сохранение материалов (save_retry): повторы с backoff, деление пачек на 413/422,
+        # размыкатель цепи; при переполнении буфера — back-pressure на воркеры
+        self.save_breaker = CircuitBreaker()
+        self.max_buffered_materials = max(50, int(
+            max_buffered_materials or os.getenv('PARSER_MAX_BUFFERED_MATERIALS') or save_retry.DEFAULT_MAX_BUFFERED
+        ))
+        self._saving_items = 0
+        self.save_retries = 0
+        self.save_splits = 0
+        self.save_rejected = 0
+        self.save_deferred = 0
+        self.save_unsaved = 0
+        self.save_spilled = 0
+        self.backpressure_waits = 0
+        self.backpressure_s = 0.0
 
         # API base URL from callback if available
         if api_callback and api_base_url == "http://host.docker.internal:8000/api":
@@ -103,6 +217,7 @@ class AsyncQueueWorker:
         self.browser = None
         self.context = None
         self.pages: List[Page] = []
+        self.pool_client: Optional[BrowserPoolClient] = None
 
         self.worker_id = f"{supplier_name}_{uuid.uuid4().hex[:8]}"
 
@@ -119,8 +234,15 @@ class AsyncQueueWorker:
         self.batch_timeout_count: int = 0
 
         # Metrics
-        self.goto_times: List[float] = []
-        self.parse_times: List[float] = []
+        # Гистограммы фиксированного размера вместо списка таймингов на каждый URL
+        self.goto_ms = LatencyHistogram()
+        self.parse_ms = LatencyHistogram()
+        self.parse_slowest = TopK(10)
+        self.nav_early_aborts = 0
+        self.raw_html_parsed = 0
+        self.raw_html_fallbacks = 0
+        # Поэтапные тайминги последнего разобранного URL, мс (для бенчмарков)
+        self.last_parse_timings: Dict[str, float] = {}
         self.requests_blocked = 0
         self.requests_allowed = 0
         self.failed_by_code: Dict[str, int] = {}
@@ -152,21 +274,91 @@ class AsyncQueueWorker:
 
         # Config
         self.config = config_manager.load_supplier_config(supplier_name)
+        self.profile = config_manager.load_supplier_profile(supplier_name)
         self.selectors = self.config.get('selectors', {})
-        delays = self.config.get('delays', {})
-        self.nav_timeout_ms = int(delays.get('page_load_timeout', 15000))
-        self.nav_retries = int(delays.get('page_load_retries', 1))
+        self.page_tracker = PageRecycleTracker.from_profile(self.profile)
+        # Задержка event loop (блокирующая работа в корутинах)
+        self.loop_lag = LoopLagMonitor()
+
+    def _on_config_reloaded(self, config: dict, profile) -> None:
+        # Вызывается из потока наблюдателя — передаём в event loop
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._set_pending_config, config, profile)
+
+    def _set_pending_config(self, config: dict, profile) -> None:
+        self._pending_config = (config, profile)
+
+    @property
+    def profile(self):
+        """Профиль текущего URL (см. _pin_profile), вне URL — действующий профиль воркера."""
+        return _url_profile.get() or self._profile
+
+    @profile.setter
+    def profile(self, profile) -> None:
+        self._profile = profile
+
+    @property
+    def nav_timeout_ms(self) -> int:
+        return self.profile.nav_timeout_ms
+
+    @property
+    def nav_retries(self) -> int:
+        return self.profile.nav_retries
+
+    def _pin_profile(self) -> None:
+        """Закрепляет действующий профиль за URL, который воркер начинает."""
+        _url_profile.set(self._profile)
+
+    def _apply_pending_config(self) -> None:
+        """
+        Подменяет конфиг и профиль; вызывается воркером страницы перед каждым URL.
+
+        URL, уже начатые другими воркерами, доразбираются со своим
+        закреплённым профилем (_pin_profile), новые берут новый.
+        """
+        if self._pending_config is None:
+            return
+        config, profile = self._pending_config
+        self._pending_config = None
+        self.config = config
+        self.profile = profile
+        self.selectors = config.get('selectors', {})
+        self.page_tracker.reconfigure(profile)
+        self.config_reloads += 1
+        plog.info(f"[CONFIG] {self.supplier_name}: воркер переключён на новую конфигурацию (#{self.config_reloads})")
+
+    async def _connect_pooled_browser(self):
+        """Браузер из пула (PARSER_BROWSER_POOL) или None — тогда запускаем свой."""
+        client = pool_client_from_env()
+        if client is None:
+            return None
+        lease = await asyncio.to_thread(client.acquire)
+        if lease is None:
+            return None
+        try:
+            browser = await self.playwright.chromium.connect_over_cdp(lease.endpoint)
+        except Exception as e:
+            plog.warning(f"[POOL] connect_over_cdp {lease.endpoint} не удался: {e}")
+            client.release()
+            return None
+        self.pool_client = client
+        plog.info(f"[POOL] Браузер из пула: slot={lease.slot} lease={lease.lease_id}")
+        return browser
 
     async def setup(self) -> None:
         self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-gpu',
-            ],
-        )
+        self.browser = await self._connect_pooled_browser()
+        if self.browser is None:
+            self.browser = await self.playwright.chromium.launch(
+                headless=True,
+                args=[
+                    '--disable-dev-shm-usage',
+                    '--no-sandbox',
+                    '--disable-gpu',
+                ],
+            )
+        # Маршруты ставятся на свой контекст и в режиме пула: route — клиентская сторона Playwright
         self.context = await self.browser.new_context(
             viewport={"width": 1280, "height": 720},
             java_script_enabled=True,
@@ -177,6 +369,33 @@ class AsyncQueueWorker:
 
         self.pages = [await self.context.new_page() for _ in range(self.concurrency)]
 
+    async def _maybe_recycle_page(self, page: Page) -> Page:
+        """
+        Пересоздаёт страницу после max_navigations переходов или при JS heap
+        выше порога. Вызывается воркером-владельцем между URL.
+        """
+        tracker = self.page_tracker
+        tracker.record_navigation(page)
+        heap = await read_js_heap_async(page) if tracker.should_check_memory(page) else None
+        reason = tracker.recycle_reason(page, heap)
+        if reason is None:
+            return page
+
+        try:
+            new_page = await self.context.new_page()
+        except Exception as e:
+            plog.warning(f"[QUEUE] Не удалось пересоздать страницу ({reason}): {e}")
+            return page
+        tracker.recycled(page, reason)
+        self.pages[self.pages.index(page)] = new_page
+        try:
+            await page.close()
+        except Exception:
+            pass
+        heap_info = f" js_heap={heap / 1024 / 1024:.0f}MB" if heap is not None else ""
+        plog.info(f"[QUEUE] Страница пересоздана: reason={reason}{heap_info} (всего {tracker.recycles})")
+        return new_page
+
     async def teardown(self) -> None:
         try:
             for page in self.pages:
@@ -187,7 +406,11 @@ class AsyncQueueWorker:
         if self.context:
             await self.context.close()
         if self.browser:
+            # Для браузера из пула close() только отключается от CDP
             await self.browser.close()
+        if self.pool_client is not None:
+            await asyncio.to_thread(self.pool_client.release, self.stats['total_processed'])
+            self.pool_client = None
         if self.playwright:
             await self.playwright.stop()
 
@@ -228,6 +451,8 @@ class AsyncQueueWorker:
             if wait_for > 0:
                 await asyncio.sleep(wait_for)
             self.last_request_at[domain] = time.perf_counter()
+        # Ожидание включает очередь на rate_lock за другими страницами
+        tracing.record_perf('rate_limit_wait', now, time.perf_counter(), domain=domain)
 
     def _get_domain_semaphore(self, url: str) -> asyncio.Semaphore:
         domain = urlparse(url).netloc or 'default'
@@ -251,7 +476,7 @@ class AsyncQueueWorker:
         ) as resp:
             if resp.status != 200:
                 text = await resp.text()
-                print(f"[QUEUE] Ошибка claim: {resp.status} - {text[:200]}", file=sys.stderr, flush=True)
+                plog.error(f"[QUEUE] Ошибка claim: {resp.status} - {text[:200]}")
                 return []
             data = await resp.json()
 
@@ -268,17 +493,21 @@ class AsyncQueueWorker:
             for item in data['urls']
         ]
 
-    async def report_results(self, session: aiohttp.ClientSession, results: List[UrlResult]) -> None:
-        report_data = []
-        for result in results:
-            report_data.append({
-                'supplier_url_id': result.supplier_url_id,
-                'status': result.status,
-                'error_code': result.error_code,
-                'error_message': result.error_message,
-                'parsed_at': result.parsed_at.isoformat() if result.parsed_at else None,
-            })
+    @staticmethod
+    def _report_entry(result: UrlResult) -> Dict[str, Any]:
+        return {
+            'supplier_url_id': result.supplier_url_id,
+            'status': result.status,
+            'error_code': result.error_code,
+            'error_message': result.error_message,
+            'parsed_at': result.parsed_at.isoformat() if result.parsed_at else None,
+        }
+
+    async def report_results(self, session: aiohttp.ClientSession, results: List[UrlResult]) -> bool:
+        return await self._post_report(session, [self._report_entry(result) for result in results])
 
+    async def _post_report(self, session: aiohttp.ClientSession, report_data: List[Dict[str, Any]]) -> bool:
+        """POST /parser/urls/report; True — API принял отчёт."""
         async with session.post(
             f"{self.api_base_url}/parser/urls/report",
             json={'results': report_data},
@@ -287,7 +516,9 @@ class AsyncQueueWorker:
         ) as resp:
             if resp.status != 200:
                 text = await resp.text()
-                print(f"[QUEUE] Ошибка report: {resp.status} - {text[:200]}", file=sys.stderr, flush=True)
+                plog.error(f"[QUEUE] Ошибка report: {resp.status} - {text[:200]}")
+                return False
+            return True
 
     async def release_locks(self, session: aiohttp.ClientSession) -> None:
         try:
@@ -301,7 +532,7 @@ class AsyncQueueWorker:
                 timeout=10,
             )
         except Exception as e:
-            print(f"[QUEUE] Ошибка release: {e}", file=sys.stderr, flush=True)
+            plog.error(f"[QUEUE] Ошибка release: {e}")
 
     async def send_callback(self, session: aiohttp.ClientSession, payload: Dict[str, Any]) -> None:
         if self.callback_disabled:
@@ -330,7 +561,7 @@ class AsyncQueueWorker:
                     body = await resp.text()
                     if resp.status in (401, 422):
                         if not self.callback_fatal_logged:
-                            print(f"[CALLBACK_FATAL] {resp.status}: {body[:200]}", file=sys.stderr, flush=True)
+                            plog.error(f"[CALLBACK_FATAL] {resp.status}: {body[:200]}")
                             self.callback_fatal_logged = True
                         self.callback_disabled = True
                         return
@@ -341,7 +572,7 @@ class AsyncQueueWorker:
                         self.callback_disabled = True
                         return
                     if resp.status >= 400:
-                        print(f"[CALLBACK] Error {resp.status}: {body[:200]}", file=sys.stderr, flush=True)
+                        plog.error(f"[CALLBACK] Error {resp.status}: {body[:200]}")
                         return
                     return
             except asyncio.TimeoutError:
@@ -436,8 +667,8 @@ class AsyncQueueWorker:
 
     async def _extract_price(self, page: Page) -> Optional[float]:
         price = None
-        price_meta_selector = self.selectors.get('price_meta', 'meta[itemprop="price"]')
-        price_meta = await page.query_selector(price_meta_selector)
+        selectors = self.profile.selectors
+        price_meta = await page.query_selector(selectors.price_meta)
 
         if price_meta:
             price_content = await price_meta.get_attribute("content")
@@ -448,12 +679,10 @@ class AsyncQueueWorker:
                     pass
 
         if price is None:
-            price_text_selector = self.selectors.get('price_text', '.catalog-detail__price, .price')
-            price_el = await page.query_selector(price_text_selector)
+            price_el = await page.query_selector(selectors.price_text)
             if price_el:
                 text = await price_el.inner_text()
-                import re
-                match = re.search(r"[\d\s]+", text.replace('\xa0', ' ').replace(' ', ''))
+                match = PRICE_DIGITS_RE.search(text.replace('\xa0', ' ').replace(' ', ''))
                 if match:
                     try:
                         price = float(match.group())
@@ -463,11 +692,7 @@ class AsyncQueueWorker:
         return price
 
     async def _extract_availability(self, page: Page) -> str:
-        button_selector = self.selectors.get(
-            'add_to_cart_button',
-            'button.btn-default.to-cart, .catalog-detail__buy button'
-        )
-        add_to_cart_btn = await page.query_selector(button_selector)
+        add_to_cart_btn = await page.query_selector(self.profile.selectors.add_to_cart_button)
         if add_to_cart_btn:
             btn_text = (await add_to_cart_btn.inner_text()).strip().lower()
             if "корзину" in btn_text or "купить" in btn_text:
@@ -480,31 +705,35 @@ class AsyncQueueWorker:
         url_lower = url.lower()
         if 'kromka' in url_lower or 'edge' in url_lower:
             return 'edge'
-        return self.config.get('default_type', 'plate')
+        return self.profile.default_type
 
-    async def parse_product_page(self, page: Page, url: str) -> MaterialData:
-        t_start = time.perf_counter()
+    async def _navigate(self, page: Page, url: str, wait_until: Optional[str] = None):
+        """
+        Переход на URL с ретраями по таймауту (под семафором домена).
 
+        wait_until=None — режим навигации из профиля (domcontentloaded или
+        early_abort); иначе — явное событие для page.goto.
+
+        Raises:
+            RuntimeError: HTTP 403/404
+        """
         sem = self._get_domain_semaphore(url)
+        t_wait = time.perf_counter()
         async with sem:
+            tracing.record_perf('domain_semaphore_wait', t_wait, time.perf_counter())
             response = None
             last_error = None
             for attempt in range(self.nav_retries + 1):
                 try:
-                    response = await page.goto(
-                        url,
-                        wait_until='domcontentloaded',
-                        timeout=self.nav_timeout_ms,
-                    )
+                    with tracing.span('goto', attempt=attempt + 1) as goto_span:
+                        response = await self._goto_once(page, url, wait_until, goto_span)
                     last_error = None
                     break
                 except PlaywrightTimeoutError as e:
                     last_error = e
                     if attempt < self.nav_retries:
-                        print(
+                        plog.warning(
                             f"[QUEUE] Retry goto (timeout) {attempt + 1}/{self.nav_retries} for {url}",
-                            file=sys.stderr,
-                            flush=True,
                         )
                         try:
                             await page.wait_for_timeout(200)
@@ -523,18 +752,46 @@ class AsyncQueueWorker:
                 if status in (403, 404):
                     raise RuntimeError(f"HTTP {status}")
 
+        return response
+
+    async def _goto_once(self, page: Page, url: str, wait_until: Optional[str], goto_span):
+        """Одна попытка перехода в режиме профиля (или с явным wait_until)."""
+        profile = self.profile
+        if wait_until is not None:
+            goto_span.set_attribute('wait_until', wait_until)
+            response = await page.goto(url, wait_until=wait_until, timeout=self.nav_timeout_ms)
+        elif profile.navigation_mode == NAV_MODE_EARLY_ABORT:
+            response, outcome = await goto_early_abort_async(
+                page,
+                url,
+                profile.critical_selectors,
+                self.nav_timeout_ms,
+            )
+            goto_span.set_attribute('nav.outcome', outcome)
+            if outcome == OUTCOME_SELECTORS:
+                self.nav_early_aborts += 1
+        else:
+            response = await page.goto(
+                url,
+                wait_until='domcontentloaded',
+                timeout=self.nav_timeout_ms,
+            )
+        if response is not None:
+            goto_span.set_attribute('http.status', response.status)
+        return response
+
+    async def parse_product_page(self, page: Page, url: str) -> MaterialData:
+        t_start = time.perf_counter()
+
+        with tracing.span('navigate'):
+            await self._navigate(page, url)
+
         t_goto = (time.perf_counter() - t_start) * 1000
-        self.goto_times.append(t_goto)
+        self.goto_ms.record(t_goto)
 
         t_parse_start = time.perf_counter()
 
-        product_indicators = [
-            '[itemprop="name"]',
-            '.catalog-detail',
-            '.product-detail',
-            'h1.catalog-detail__title',
-        ]
-
+        product_indicators = self.PRODUCT_INDICATORS
         is_product_page = False
         for indicator in product_indicators:
             try:
@@ -554,14 +811,7 @@ class AsyncQueueWorker:
         # Name
         t_name_start = time.perf_counter()
         name = None
-        name_selectors = [
-            'meta[itemprop="name"]',
-            '[itemprop="name"]',
-            'h1',
-            '.catalog-detail__title',
-            'meta[property="og:title"]',
-        ]
-        for selector in name_selectors:
+        for selector in self.NAME_SELECTORS:
             try:
                 el = await page.query_selector(selector)
                 if el:
@@ -580,14 +830,7 @@ class AsyncQueueWorker:
         # Article
         t_article_start = time.perf_counter()
         article = None
-        article_selectors = [
-            '.catalog-detail__article.js-copy-article',
-            '.catalog-detail__article',
-            '[data-article]',
-            '.article',
-            '.sku',
-        ]
-        for selector in article_selectors:
+        for selector in self.ARTICLE_SELECTORS:
             try:
                 el = await page.query_selector(selector)
                 if el:
@@ -598,14 +841,8 @@ class AsyncQueueWorker:
                 pass
 
         if not article:
-            import hashlib
-            import re
-            match = re.search(r'/(\d+)/?$', url)
-            if match:
-                article = f"SKM-{match.group(1)}"
-            else:
-                article = f"SKM-{hashlib.md5(url.encode()).hexdigest()[:8].upper()}"
-            print(f"[PARSE] Generated article from URL: {article}", file=sys.stderr, flush=True)
+            article = _article_from_url(url)
+            plog.info(f"[PARSE] Generated article from URL: {article}")
         t_article = (time.perf_counter() - t_article_start) * 1000
 
         # Price
@@ -616,7 +853,7 @@ class AsyncQueueWorker:
             price = await self._extract_price(page)
             price_parsed_successfully = price is not None and price >= 0
         except Exception as e:
-            print(f"[PARSE] Не удалось извлечь цену: {e}", file=sys.stderr, flush=True)
+            plog.warning(f"[PARSE] Не удалось извлечь цену: {e}")
             price = None
             price_parsed_successfully = False
         t_price = (time.perf_counter() - t_price_start) * 1000
@@ -627,17 +864,33 @@ class AsyncQueueWorker:
         t_avail = (time.perf_counter() - t_avail_start) * 1000
 
         material_type = self._determine_material_type_from_url(url)
-        unit_mapping = self.config.get('material_unit_mapping', {})
-        unit = unit_mapping.get(material_type, self.config.get('default_unit', 'м²'))
+        unit = self.profile.unit_for(material_type)
 
         t_parse = (time.perf_counter() - t_parse_start) * 1000
-        self.parse_times.append(t_parse)
-
-        print(
+        self.parse_ms.record(t_parse)
+        self.parse_slowest.add(t_parse, url)
+        self.last_parse_timings = {
+            'goto': t_goto,
+            'name': t_name,
+            'article': t_article,
+            'price': t_price,
+            'availability': t_avail,
+            'total': t_parse,
+        }
+        extract_span = tracing.record_perf('extract', t_parse_start, t_parse_start + t_parse / 1000)
+        for phase, phase_start, phase_ms in (
+            ('name', t_name_start, t_name),
+            ('article', t_article_start, t_article),
+            ('price', t_price_start, t_price),
+            ('availability', t_avail_start, t_avail),
+        ):
+            tracing.record_perf(f'extract.{phase}', phase_start, phase_start + phase_ms / 1000, parent=extract_span)
+
+        plog.info(
             f"[PARSE_TIMING] {url[:80]} | name:{t_name:.0f}ms article:{t_article:.0f}ms "
             f"price:{t_price:.0f}ms availability:{t_avail:.0f}ms total:{t_parse:.0f}ms",
-            file=sys.stderr,
-            flush=True,
+            url=url,
+            **{f'{field}_ms': round(ms, 1) for field, ms in self.last_parse_timings.items()},
         )
 
         return MaterialData(
@@ -652,82 +905,596 @@ class AsyncQueueWorker:
             price_parsed_successfully=price_parsed_successfully,
         )
 
+    def _use_raw_html(self, task: UrlTask) -> bool:
+        return self.profile.extraction_mode == EXTRACTION_RAW_HTML and not task.force_dom
+
+    async def fetch_document(self, page: Page, url: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        """
+        Режим raw_html: переход до получения ответа и тело основного документа.
+
+        Страница не ждёт разбора DOM и сразу свободна для следующего URL.
+        None — тела нет (навигация внутри документа), нужен DOM-путь.
+        """
+        t_start = time.perf_counter()
+        with tracing.span('navigate'):
+            response = await self._navigate(page, url, wait_until='commit')
+        if response is None:
+            return None
+        try:
+            with tracing.span('read_body'):
+                body = await asyncio.wait_for(response.body(), timeout=self.nav_timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"Timeout {self.nav_timeout_ms}ms reading document body")
+        self.goto_ms.record((time.perf_counter() - t_start) * 1000)
+        return body, response.headers.get('content-type')
+
+    def _extract_from_html(self, body: bytes, content_type: Optional[str], url: str, profile) -> Optional[MaterialData]:
+        """
+        Разбор тела документа теми же селекторами, что и parse_product_page
+        (выполняется в потоке). None — данных нет в исходном HTML
+        (рендерятся JS), нужен DOM-путь.
+        """
+        try:
+            doc = HtmlDocument.from_bytes(body, content_type)
+            if not any(doc.query_selector(s) for s in self.PRODUCT_INDICATORS):
+                plog.info(f"[PARSE] raw_html: нет признаков товара, нужен DOM: {url}")
+                return None
+
+            name = None
+            for selector in self.NAME_SELECTORS:
+                el = doc.query_selector(selector)
+                if el:
+                    name = el.get_attribute('content') if selector.startswith('meta') else el.inner_text()
+                    if name:
+                        break
+
+            article = None
+            for selector in self.ARTICLE_SELECTORS:
+                el = doc.query_selector(selector)
+                if el:
+                    article = el.get_attribute('data-article') or el.inner_text()
+                    if article:
+                        break
+
+            price = None
+            selectors = profile.selectors
+            price_meta = doc.query_selector(selectors.price_meta)
+            if price_meta and price_meta.get_attribute('content'):
+                try:
+                    price = float(price_meta.get_attribute('content'))
+                except ValueError:
+                    pass
+            if price is None:
+                price_el = doc.query_selector(selectors.price_text)
+                if price_el:
+                    match = PRICE_DIGITS_RE.search(price_el.inner_text().replace('\xa0', ' ').replace(' ', ''))
+                    if match:
+                        try:
+                            price = float(match.group())
+                        except ValueError:
+                            pass
+
+            availability_status = 'on_order'
+            add_to_cart_btn = doc.query_selector(selectors.add_to_cart_button)
+            if add_to_cart_btn:
+                btn_text = add_to_cart_btn.inner_text().lower()
+                if "корзину" in btn_text or "купить" in btn_text:
+                    availability_status = 'in_stock'
+        except ValueError as e:
+            # Селектор не поддерживается cssselect или тело не разбирается
+            plog.info(f"[PARSE] raw_html: {e}, нужен DOM: {url}")
+            return None
+
+        if not name or price is None:
+            plog.info(f"[PARSE] raw_html: нет {'названия' if not name else 'цены'} в исходном HTML, нужен DOM: {url}")
+            return None
+        if not article:
+            article = _article_from_url(url)
+
+        material_type = self._determine_material_type_from_url(url)
+        return MaterialData(
+            article=article,
+            name=name,
+            price_per_unit=price,
+            type=material_type,
+            unit=profile.unit_for(material_type),
+            availability_status=availability_status,
+            source_url=url,
+            parsed_at=datetime.utcnow(),
+            price_parsed_successfully=price >= 0,
+        )
+
+    async def process_document(self, task: UrlTask, fetched) -> Optional[UrlResult]:
+        """
+        Результат по телу документа (или ошибке навигации) из fetch_document.
+
+        None — raw_html не справился, задачу нужно повторить через DOM.
+        """
+        if isinstance(fetched, Exception):
+            return self._result_from_error(task, fetched)
+        if fetched is None:
+            return None
+        body, content_type = fetched
+        t_parse_start = time.perf_counter()
+        try:
+            material = await asyncio.to_thread(self._extract_from_html, body, content_type, task.url, self.profile)
+        except Exception as e:
+            plog.warning(f"[PARSE] raw_html: ошибка разбора ({e}), нужен DOM: {task.url}")
+            return None
+        finally:
+            tracing.record_perf('extract_html', t_parse_start, time.perf_counter())
+        if material is None:
+            return None
+        t_parse = (time.perf_counter() - t_parse_start) * 1000
+        self.parse_ms.record(t_parse)
+        self.parse_slowest.add(t_parse, task.url)
+        self.raw_html_parsed += 1
+        self.last_parse_timings = {'total': t_parse}
+        plog.info(f"[PARSE_TIMING] {task.url[:80]} | raw_html total:{t_parse:.0f}ms", url=task.url, total_ms=round(t_parse, 1))
+        return self._result_from_material(task, material)
+
     async def _maybe_flush(self, session: aiohttp.ClientSession, force: bool = False) -> None:
         if self.fail_fast.is_set():
             return
-        batch = None
+        if not self.save_breaker.ready():
+            # Цепь разомкнута — материалы копятся в буфере до пробы
+            return
+        # Полные пачки по SAVE_BATCH_SIZE, при force — и остаток: после простоя
+        # в буфере до max_buffered_materials, а API принимает не больше 200 строк
+        size = save_retry.SAVE_BATCH_SIZE
         async with self.buffer_lock:
-            if force and self.results_buffer:
-                batch = self.results_buffer[:]
-                self.results_buffer = []
-            elif len(self.results_buffer) >= 50:
-                batch = self.results_buffer[:50]
-                self.results_buffer = self.results_buffer[50:]
-
-        if not batch:
+            take = len(self.results_buffer) if force else len(self.results_buffer) // size * size
+            taken, self.results_buffer = self.results_buffer[:take], self.results_buffer[take:]
+            self._saving_items += len(taken)
+
+        if not taken:
             return
 
-        async def do_flush(items: List[Dict[str, Any]]):
-            async with self.flush_lock:
-                materials = [item['material'].to_dict() for item in items]
-                payload = {
-                    'session_id': self.session_id,
-                    'supplier': self.supplier_name,
-                    'materials': materials,
-                }
-                async with session.post(
-                    f"{self.api_base_url}/parser/materials/batch",
-                    json=payload,
-                    headers=self._get_headers(),
-                    timeout=30,
-                ) as resp:
-                    if resp.status != 200:
-                        text = await resp.text()
-                        preview = materials[:2]
-                        print(
-                            f"[QUEUE] Batch save error {resp.status} on {self.api_base_url}/parser/materials/batch | "
-                            f"batch_size={len(materials)} body={text[:500]} preview={str(preview)[:500]}",
-                            file=sys.stderr,
-                            flush=True,
-                        )
+        async def do_flush(items: List[Dict[str, Any]]) -> List[str]:
+            try:
+                async with self.flush_lock:
+                    return await self._flush_items(session, items)
+            finally:
+                self._saving_items -= len(items)
+
+        self.flush_tasks = [t for t in self.flush_tasks if not t.done()]
+        for start in range(0, len(taken), size):
+            batch = taken[start:start + size]
+            self.flush_tasks.append(asyncio.create_task(self._traced_flush(batch, do_flush(batch))))
+
+    async def _flush_items(self, session: aiohttp.ClientSession, items: List[Dict[str, Any]]) -> List[str]:
+        """
+        Сохранение пачки и отчёты по ней; исход каждого материала:
+        saved / rejected / deferred (возвращён в буфер до следующей попытки).
+        """
+        saved, rejected, deferred = await self._save_materials(session, items)
+
+        if rejected:
+            await self._report_save_failed(session, rejected)
+
+        if saved:
+            done_results = [
+                UrlResult(
+                    supplier_url_id=item['supplier_url_id'],
+                    status='done',
+                    parsed_at=item['parsed_at'],
+                )
+                for item in saved
+            ]
+            with tracing.span('report', results=len(done_results)):
+                reported = await self.report_results(session, done_results)
+            await self._outbox_settle([item.get('outbox_id') for item in saved], reported, 'report failed')
+            # Update success stats only after successful save
+            self.stats['successful'] += len(saved)
+
+        if deferred:
+            self.save_deferred += len(deferred)
+            now_ns = time.time_ns()
+            for item in deferred:
+                item['buffered_ns'] = now_ns
+            async with self.buffer_lock:
+                # В начало буфера: следующая пачка начнётся с них
+                self.results_buffer[:0] = deferred
+
+        outcome = {id(item): 'saved' for item in saved}
+        outcome.update((id(item), 'rejected') for item in rejected)
+        return [outcome.get(id(item), 'deferred') for item in items]
+
+    async def _report_save_failed(self, session: aiohttp.ClientSession, items: List[Dict[str, Any]]) -> None:
+        """
+        Материалы, которые не будут сохранены: строки outbox снимаются, по
+        URL уходит отчёт failed SAVE_ERROR (тоже через outbox).
+        """
+        await self._outbox_settle([item.get('outbox_id') for item in items], True, '')
+        failed_results = [
+            UrlResult(
+                supplier_url_id=item['supplier_url_id'],
+                status='failed',
+                error_code='SAVE_ERROR',
+                error_message=item.get('save_error'),
+                parsed_at=item['parsed_at'],
+            )
+            for item in items
+            if item.get('supplier_url_id') is not None
+        ]
+        if not failed_results:
+            return
+        self.stats['failed'] += len(failed_results)
+        self.failed_by_code['SAVE_ERROR'] = self.failed_by_code.get('SAVE_ERROR', 0) + len(failed_results)
+        report_ids = [await self._outbox_append(KIND_REPORT, self._report_entry(r)) for r in failed_results]
+        with tracing.span('report', results=len(failed_results)):
+            reported = await self.report_results(session, failed_results)
+        await self._outbox_settle(report_ids, reported, 'report failed')
+
+    @staticmethod
+    def _material_payload(item: Dict[str, Any]) -> Dict[str, Any]:
+        """Материал для API: в буфере — MaterialData, из outbox — уже словарь."""
+        material = item['material']
+        return material if isinstance(material, dict) else material.to_dict()
+
+    async def _save_materials(
+        self, session: aiohttp.ClientSession, items: List[Dict[str, Any]],
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        POST пачки с повторами (save_retry); (сохранённые, отклонённые, отложенные).
+
+        Временный сбой повторяется до SAVE_MAX_ATTEMPTS раз с backoff, затем
+        пачка откладывается; 413 и 422 с построчными ошибками делят пачку
+        пополам, пока отклонённой не останется одна строка. 422 по самому
+        запросу прерывает прогон (fail_fast). Пока цепь разомкнута или
+        прогон прерван, пачка откладывается сразу.
+        """
+        attempt = 0
+        while True:
+            if self.fail_fast.is_set() or not self.save_breaker.allow():
+                return [], [], items
+            try:
+                status, text = await self._post_materials(session, [self._material_payload(item) for item in items])
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, text = None, f"{type(e).__name__}: {e}"
+            outcome = classify_save_status(status, text)
+
+            if outcome == SAVE_FATAL:
+                # Ошибка самого запроса (session_id, supplier): повтор и деление не помогут
+                plog.error(f"[SAVE] FATAL: запрос сохранения отклонён {status}: {text[:300]} — прогон прерывается")
+                self.internal_error_message = 'SAVE_REQUEST_INVALID'
+                self.fail_fast.set()
+                return [], [], items
+
+            if outcome != SAVE_OK and outcome != SAVE_SPLIT:
+                attempt += 1
+                opened = self.save_breaker.opened_count
+                self.save_breaker.record_failure()
+                plog.warning(
+                    f"[SAVE] Ошибка сохранения пачки ({len(items)}): {status or 'network'} {text[:300]} | "
+                    f"попытка {attempt}/{save_retry.SAVE_MAX_ATTEMPTS}",
+                    key='save.retry', status=status, batch_size=len(items),
+                )
+                if self.save_breaker.opened_count != opened:
+                    plog.error(
+                        f"[SAVE] Сохранение приостановлено на {self.save_breaker.retry_in:.0f}s "
+                        f"(ошибок подряд: {self.save_breaker.failures}), парсинг продолжается в буфер",
+                        key='save.circuit_open',
+                    )
+                if self.save_breaker.state != CIRCUIT_CLOSED or attempt >= save_retry.SAVE_MAX_ATTEMPTS:
+                    return [], [], items
+                self.save_retries += 1
+                await asyncio.sleep(backoff_delay(attempt, save_retry.SAVE_RETRY_BASE, save_retry.SAVE_RETRY_CAP))
+                continue
+
+            # API ответил по существу (в т.ч. 413/422) — цепь замкнута
+            if self.save_breaker.state != CIRCUIT_CLOSED:
+                plog.info("[SAVE] Сохранение восстановлено", key='save.circuit_closed')
+            self.save_breaker.record_success()
+            if outcome == SAVE_OK:
+                return items, [], []
+            if len(items) == 1:
+                self.save_rejected += 1
+                items[0]['save_error'] = f"Material rejected: {status} {text[:300]}"
+                plog.error(
+                    f"[SAVE] Материал отклонён {status}: {text[:300]} | {str(self._material_payload(items[0]))[:300]}",
+                    supplier_url_id=items[0].get('supplier_url_id'),
+                )
+                return [], items, []
+            self.save_splits += 1
+            mid = len(items) // 2
+            plog.warning(f"[SAVE] {status} на пачке из {len(items)}: делим {mid}+{len(items) - mid}", key='save.split')
+            first = await self._save_materials(session, items[:mid])
+            second = await self._save_materials(session, items[mid:])
+            return first[0] + second[0], first[1] + second[1], first[2] + second[2]
+
+    def _pending_materials(self) -> int:
+        """Материалы в памяти: буфер + пачки в сохранении."""
+        return len(self.results_buffer) + self._saving_items
+
+    async def _wait_for_save_capacity(self, session: aiohttp.ClientSession) -> None:
+        """Back-pressure: буфер у предела — новый URL ждёт, пока сохранение его разгрузит."""
+        if self._pending_materials() < self.max_buffered_materials:
+            return
+        if self.outbox is not None:
+            await self._spill_to_outbox()
+            return
+        self.backpressure_waits += 1
+        if self.backpressure_waits == 1 or self.backpressure_waits % 50 == 0:
+            plog.warning(
+                f"[SAVE] Буфер материалов заполнен ({self._pending_materials()}/{self.max_buffered_materials}), "
+                f"парсинг ждёт сохранения (ожиданий: {self.backpressure_waits})",
+                key='save.backpressure',
+            )
+        t_wait = time.perf_counter()
+        with tracing.span('save_backpressure_wait'):
+            while self._pending_materials() >= self.max_buffered_materials and not self.fail_fast.is_set():
+                if self.save_breaker.outage_s > save_retry.SAVE_MAX_OUTAGE:
+                    plog.error(
+                        f"[SAVE] FATAL: сохранение недоступно {self.save_breaker.outage_s:.0f}s, "
+                        f"буфер заполнен ({self._pending_materials()}) — прогон прерывается",
+                    )
+                    self.internal_error_message = 'SAVE_UNAVAILABLE'
+                    self.fail_fast.set()
+                    break
+                await self._maybe_flush(session)
+                await asyncio.sleep(min(1.0, max(0.1, self.save_breaker.retry_in)))
+        self.backpressure_s += time.perf_counter() - t_wait
 
-                        failed_results = [
-                            UrlResult(
-                                supplier_url_id=item['supplier_url_id'],
-                                status='failed',
-                                error_code='SAVE_ERROR',
-                                error_message=f"Batch save failed: {resp.status}",
-                                parsed_at=item['parsed_at'],
-                            )
-                            for item in items
-                        ]
-                        await self.report_results(session, failed_results)
-                        self.save_failed = True
-                        self.fail_fast.set()
-                        return
+    async def _spill_to_outbox(self) -> None:
+        """Буфер у предела при outbox: материалы уже на диске — в память их не держим, отправит drainer."""
+        async with self.buffer_lock:
+            items, self.results_buffer = self.results_buffer, []
+        if not items:
+            return
+        self.save_spilled += len(items)
+        plog.warning(
+            f"[SAVE] Буфер материалов заполнен, {len(items)} материалов переданы outbox-drainer'у",
+            key='save.spill',
+        )
+        await asyncio.to_thread(self.outbox.release, [item.get('outbox_id') for item in items], 'buffer spilled')
+        for item in items:
+            if item.get('span') is not None:
+                item['span'].set_attribute('status', 'outbox')
+                item['span'].end()
+
+    async def _final_save(self, session: aiohttp.ClientSession, timeout: float = save_retry.SAVE_FINAL_TIMEOUT) -> None:
+        """
+        Конец прогона: буфер сохраняется, пока не опустеет или не выйдет timeout.
+
+        Несохранённое остаётся в outbox (отправит следующий запуск) либо,
+        без outbox, получает отчёт failed SAVE_ERROR — прогон завершается failed.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            await self._maybe_flush(session, force=True)
+            if self.flush_tasks:
+                await asyncio.gather(*self.flush_tasks, return_exceptions=True)
+            remaining = deadline - time.monotonic()
+            if not self.results_buffer or remaining <= 0 or self.fail_fast.is_set():
+                break
+            await asyncio.sleep(min(remaining, max(0.5, self.save_breaker.retry_in)))
 
-                    done_results = [
-                        UrlResult(
-                            supplier_url_id=item['supplier_url_id'],
-                            status='done',
-                            parsed_at=item['parsed_at'],
-                        )
-                        for item in items
-                    ]
-                    await self.report_results(session, done_results)
+        async with self.buffer_lock:
+            items, self.results_buffer = self.results_buffer, []
+        if not items:
+            return
+        self.save_unsaved = len(items)
+        for item in items:
+            if item.get('span') is not None:
+                item['span'].set_attribute('status', 'failed')
+                item['span'].set_error('SAVE_ERROR')
+                item['span'].end()
+        if self.outbox is not None:
+            plog.error(f"[SAVE] Сохранение не восстановилось: {len(items)} материалов остаются в outbox до следующего запуска")
+            await asyncio.to_thread(self.outbox.release, [item.get('outbox_id') for item in items], 'save circuit open')
+            return
+        plog.error(f"[SAVE] Сохранение не восстановилось: {len(items)} материалов не сохранены")
+        failed_results = [
+            UrlResult(
+                supplier_url_id=item['supplier_url_id'],
+                status='failed',
+                error_code='SAVE_ERROR',
+                error_message='Batch save failed: save path did not recover',
+                parsed_at=item['parsed_at'],
+            )
+            for item in items
+        ]
+        with tracing.span('report', results=len(failed_results)):
+            await self.report_results(session, failed_results)
+        self.save_failed = True
 
-                    # Update success stats only after successful save
-                    self.stats['successful'] += len(items)
+    async def _post_materials(self, session: aiohttp.ClientSession, materials: List[Dict[str, Any]]) -> Tuple[int, str]:
+        """POST /parser/materials/batch; (HTTP-статус, тело ответа при ошибке)."""
+        payload = {
+            'session_id': self.session_id,
+            'supplier': self.supplier_name,
+            'materials': materials,
+        }
+        t_post = time.perf_counter()
+        async with session.post(
+            f"{self.api_base_url}/parser/materials/batch",
+            json=payload,
+            headers=self._get_headers(),
+            timeout=30,
+        ) as resp:
+            tracing.record_perf('materials_batch_post', t_post, time.perf_counter(),
+                                batch_size=len(materials), **{'http.status': resp.status})
+            text = await resp.text() if resp.status != 200 else ''
+            return resp.status, text
+
+    async def _outbox_append(self, kind: str, payload: Dict[str, Any]) -> Optional[int]:
+        """Запись в outbox до отправки (в потоке — SQLite не блокирует event loop)."""
+        if self.outbox is None:
+            return None
+        ids = await asyncio.to_thread(self.outbox.append, kind, [payload])
+        return ids[0]
+
+    async def _outbox_settle(self, ids: List[Optional[int]], delivered: bool, error: str) -> None:
+        if self.outbox is None:
+            return
+        if delivered:
+            await asyncio.to_thread(self.outbox.ack, ids)
+        else:
+            await asyncio.to_thread(self.outbox.release, ids, error)
+
+    @staticmethod
+    def _outbox_item(entry: OutboxEntry) -> Dict[str, Any]:
+        """Строка материала outbox в формате буфера для _save_materials."""
+        parsed_at = entry.payload.get('parsed_at')
+        return {
+            'material': entry.payload['material'],
+            'supplier_url_id': entry.payload.get('supplier_url_id'),
+            'parsed_at': datetime.fromisoformat(parsed_at) if parsed_at else None,
+            'outbox_id': entry.id,
+            'attempts': entry.attempts,
+        }
 
-        task = asyncio.create_task(do_flush(batch))
-        self.flush_tasks.append(task)
+    async def _drain_outbox_once(self, session: aiohttp.ClientSession) -> int:
+        """
+        Повторная отправка строк outbox, чей срок наступил; число доставленных.
+
+        Материалы идут через _save_materials — повторы, деление пачки на
+        413/422 и цепь сохранения те же, что у буфера: отклонённая строка не
+        держит остальные. Строка, не доставленная за OUTBOX_MAX_ATTEMPTS
+        попыток, снимается с повтора: по материалу уходит отчёт failed
+        SAVE_ERROR, недоставленный отчёт только логируется — URL вернётся
+        в очередь по истечении аренды.
+        """
+        delivered = 0
+        # Пока цепь разомкнута, строки не трогаем — попытки не расходуются
+        while self.save_breaker.ready():
+            entries = await asyncio.to_thread(self.outbox.take_due, save_retry.SAVE_BATCH_SIZE)
+            if not entries:
+                break
+            reports = [entry for entry in entries if entry.kind == KIND_REPORT]
+            items = [self._outbox_item(entry) for entry in entries if entry.kind == KIND_MATERIAL]
+            saved, rejected, deferred = await self._save_materials(session, items) if items else ([], [], [])
+
+            if rejected:
+                await self._report_save_failed(session, rejected)
+
+            if deferred:
+                exhausted = [item for item in deferred if item['attempts'] + 1 >= OUTBOX_MAX_ATTEMPTS]
+                if exhausted:
+                    self.outbox_abandoned += len(exhausted)
+                    plog.error(
+                        f"[OUTBOX] Материалы не сохранены за {OUTBOX_MAX_ATTEMPTS} попыток, сняты с повтора: {len(exhausted)}",
+                        key='outbox.abandoned',
+                    )
+                    for item in exhausted:
+                        item['save_error'] = f"Material not saved after {OUTBOX_MAX_ATTEMPTS} outbox attempts"
+                    await self._report_save_failed(session, exhausted)
+                exhausted_ids = {item['outbox_id'] for item in exhausted}
+                await asyncio.to_thread(
+                    self.outbox.release, [item['outbox_id'] for item in deferred if item['outbox_id'] not in exhausted_ids],
+                    'save failed',
+                )
+
+            # Материал без supplier_url_id (не из очереди URL) — отчитываться не о чем
+            report_data = [entry.payload for entry in reports] + [
+                self._report_entry(UrlResult(supplier_url_id=item['supplier_url_id'], status='done', parsed_at=item['parsed_at']))
+                for item in saved
+                if item['supplier_url_id'] is not None
+            ]
+            reported = True
+            if report_data:
+                try:
+                    reported = await self._post_report(session, report_data)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    plog.error(f"[OUTBOX] Ошибка report: {e}")
+                    reported = False
+            sent = [(entry.id, entry.attempts) for entry in reports] + [(item['outbox_id'], item['attempts']) for item in saved]
+            if reported:
+                await asyncio.to_thread(self.outbox.ack, [row_id for row_id, _ in sent])
+                delivered += len(sent)
+            else:
+                exhausted_ids = [row_id for row_id, attempts in sent if attempts + 1 >= OUTBOX_MAX_ATTEMPTS]
+                if exhausted_ids:
+                    self.outbox_abandoned += len(exhausted_ids)
+                    plog.error(
+                        f"[OUTBOX] Отчёт не доставлен за {OUTBOX_MAX_ATTEMPTS} попыток, строки сняты с повтора: {len(exhausted_ids)}",
+                        key='outbox.abandoned',
+                    )
+                    await asyncio.to_thread(self.outbox.ack, exhausted_ids)
+                await asyncio.to_thread(
+                    self.outbox.release, [row_id for row_id, _ in sent if row_id not in set(exhausted_ids)], 'report failed',
+                )
+            if deferred or not reported:
+                break
+        self.outbox_delivered += delivered
+        return delivered
+
+    async def _drain_outbox(self, session: aiohttp.ClientSession, interval: float = 5.0) -> None:
+        """Фоновый drainer outbox: повторы с backoff и replay строк прошлых запусков."""
+        while True:
+            try:
+                delivered = await self._drain_outbox_once(session)
+                if delivered:
+                    plog.info(f"[OUTBOX] Доставлено повторно: {delivered}")
+            except Exception as e:
+                plog.error(f"[OUTBOX] Ошибка drainer: {e}")
+            await asyncio.sleep(interval)
+
+    async def _traced_flush(self, items: List[Dict[str, Any]], flush) -> None:
+        """
+        Сохранение пачки под собственным корнем 'flush_batch'.
+
+        Пачка общая для многих URL, поэтому у неё своя трасса со ссылками
+        (links) на корни URL; каждому URL дописываются buffer_wait и save,
+        после чего его корень закрывается. Отложенные материалы (deferred)
+        остаются открытыми до следующей попытки.
+        """
+        if self.tracer is None:
+            await flush
+            return
+        url_spans = [item.get('span') for item in items]
+        buffered = [item['buffered_ns'] for item in items]
+        root = self.tracer.start_span('flush_batch', attributes={'batch_size': len(items)}, links=url_spans)
+        token = tracing.activate(root)
+        outcomes = None
+        try:
+            outcomes = await flush
+        except Exception as e:
+            root.set_error(e)
+            raise
+        finally:
+            tracing.deactivate(token)
+            root.end()
+            for idx, (buffered_ns, span) in enumerate(zip(buffered, url_spans)):
+                if span is None:
+                    continue
+                outcome = outcomes[idx] if outcomes else 'failed'
+                self.tracer.record('buffer_wait', buffered_ns, root.start_ns, parent=span)
+                self.tracer.record('save', root.start_ns, root.end_ns, parent=span,
+                                   attributes={'flush.trace_id': root.trace_id, 'saved': outcome == 'saved', 'outcome': outcome})
+                if outcome == 'deferred':
+                    continue
+                span.set_attribute('status', 'done' if outcome == 'saved' else 'failed')
+                if outcome != 'saved':
+                    span.set_error('SAVE_ERROR')
+                span.end()
 
     async def run(self) -> dict:
-        print(f"[QUEUE] Запуск обработки очереди для {self.supplier_name}", file=sys.stderr, flush=True)
+        plog.info(f"[QUEUE] Запуск обработки очереди для {self.supplier_name}")
         start_time = time.perf_counter()
+        self._run_started = start_time
 
         async with aiohttp.ClientSession() as session:
             await self.setup()
+            if self.watch_config:
+                self._loop = asyncio.get_running_loop()
+                config_manager.subscribe(self.supplier_name, self._on_config_reloaded)
+                config_manager.watch()
+            if self.metrics_port is not None:
+                metrics_server.register(self.metrics_port, self.metrics_families)
+            self.loop_lag.start()
+            self.tracer = tracing.open_tracer(self.trace_file, **{
+                'parser.supplier': self.supplier_name,
+                'parser.session_id': self.session_id or 0,
+                'parser.worker_id': self.worker_id,
+            })
+            self.outbox = open_outbox(self.outbox_dir, self.supplier_name, self.worker_id, CHANNEL_QUEUE)
+            if self.outbox is not None:
+                self.outbox_replayed = await asyncio.to_thread(self.outbox.adopt_orphans)
+                if self.outbox_replayed:
+                    plog.info(f"[OUTBOX] К повторной отправке с прошлых запусков: {self.outbox_replayed}")
+                self._outbox_drainer = asyncio.create_task(self._drain_outbox(session))
 
             empty_batches = 0
             max_empty_batches = 3
@@ -736,17 +1503,24 @@ class AsyncQueueWorker:
             try:
                 while not self.fail_fast.is_set():
                     tasks = await self.claim_batch(session)
+                    if not tasks and self.producer_alive is not None and self.producer_alive():
+                        # STREAM: URL ещё собираются — ждём следующий chunk save-urls
+                        self.stats['stream_waits'] = self.stats.get('stream_waits', 0) + 1
+                        if self.stats['stream_waits'] % 10 == 1:
+                            plog.info(f"[QUEUE] Очередь пуста, сбор URL продолжается (ожиданий: {self.stats['stream_waits']})")
+                        await asyncio.sleep(self.STREAM_POLL_INTERVAL)
+                        continue
                     if not tasks:
                         # FULL-SCAN: первый claim пустой = ошибка протокола
                         if first_claim and self.full_scan:
-                            print(f"[QUEUE] FATAL: FULL_SCAN_RESET_DID_NOT_CREATE_PENDING", file=sys.stderr, flush=True)
-                            print(f"[QUEUE] Первый claim вернул 0 URL после reset — нечего парсить!", file=sys.stderr, flush=True)
+                            plog.error(f"[QUEUE] FATAL: FULL_SCAN_RESET_DID_NOT_CREATE_PENDING")
+                            plog.error(f"[QUEUE] Первый claim вернул 0 URL после reset — нечего парсить!")
                             self.fail_fast.set()
                             self.internal_error_message = "FULL_SCAN_RESET_DID_NOT_CREATE_PENDING"
                             break
                         
                         empty_batches += 1
-                        print(f"[QUEUE] Пустая пачка #{empty_batches}", file=sys.stderr, flush=True)
+                        plog.info(f"[QUEUE] Пустая пачка #{empty_batches}")
                         if empty_batches >= max_empty_batches:
                             break
                         await asyncio.sleep(5)
@@ -760,33 +1534,86 @@ class AsyncQueueWorker:
                     await self.send_total_urls(session, self.current_batch_total)
 
                     queue_tasks: asyncio.Queue = asyncio.Queue()
+                    enqueued_ns = time.time_ns()
                     for task in tasks:
+                        task.enqueued_ns = enqueued_ns
                         await queue_tasks.put(task)
 
                     results: List[UrlResult] = []
 
+                    async def complete(task: UrlTask, result_coro):
+                        # Счётчик — внутри задачи: отменённая до старта задача разбора его не трогает
+                        self._inflight += 1
+                        try:
+                            result = await result_coro
+                            if result is None:
+                                # raw_html не справился — повтор через DOM (до task_done, чтобы join дождался)
+                                self.raw_html_fallbacks += 1
+                                queue_tasks.put_nowait(replace(task, force_dom=True, enqueued_ns=time.time_ns()))
+                                return
+                            async with self.results_lock:
+                                results.append(result)
+                            await self._after_result(session, result, task.span)
+                        except InternalRuntimeError as e:
+                            if task.span is not None:
+                                task.span.set_error(e)
+                                task.span.end()
+                            self.internal_errors_count += 1
+                            self.internal_error_message = str(e)
+                            self.fail_fast.set()
+                        finally:
+                            self._inflight -= 1
+                            queue_tasks.task_done()
+
+                    async def parse_dom(page: Page, task: UrlTask) -> UrlResult:
+                        await self._rate_limit(task.url)
+                        return await self.process_single_url(page, task)
+
                     async def worker(page: Page):
+                        # Разборы raw_html, идущие параллельно со следующими переходами страницы
+                        extracting: set = set()
                         while not self.fail_fast.is_set():
+                            # Сохранение не успевает (цепь разомкнута) — не берём новый URL, пока буфер у предела
+                            await self._wait_for_save_capacity(session)
                             try:
                                 task = queue_tasks.get_nowait()
                             except asyncio.QueueEmpty:
+                                if extracting:
+                                    # Разбор может вернуть задачу в очередь для DOM-пути
+                                    await asyncio.wait(extracting)
+                                    continue
                                 break
 
-                            try:
-                                await self._rate_limit(task.url)
-                                result = await self.process_single_url(page, task)
-                                async with self.results_lock:
-                                    results.append(result)
-                                await self._after_result(session, result)
-                            except InternalRuntimeError as e:
-                                self.internal_errors_count += 1
-                                self.internal_error_message = str(e)
-                                self.fail_fast.set()
-                            finally:
-                                queue_tasks.task_done()
+                            # Новая конфигурация применяется только между URL этого воркера
+                            self._apply_pending_config()
+                            self._pin_profile()
+                            # Корень трассы URL — текущий span на время обработки (задача разбора наследует контекст)
+                            trace_token = self._start_url_span(task)
+                            if self._use_raw_html(task):
+                                try:
+                                    await self._rate_limit(task.url)
+                                    fetched = await self.fetch_document(page, task.url)
+                                except Exception as e:
+                                    fetched = e
+                                extraction = asyncio.create_task(complete(task, self.process_document(task, fetched)))
+                                extracting.add(extraction)
+                                extraction.add_done_callback(extracting.discard)
+                            else:
+                                await complete(task, parse_dom(page, task))
+                            if trace_token is not None:
+                                tracing.deactivate(trace_token)
+                            # Страница принадлежит только этому воркеру — пересоздаём между URL
+                            page = await self._maybe_recycle_page(page)
+                        if extracting:
+                            await asyncio.gather(*extracting, return_exceptions=True)
 
                     workers = [asyncio.create_task(worker(page)) for page in self.pages]
-                    await queue_tasks.join()
+                    # fail_fast останавливает воркеры с задачами в очереди — join тогда не дождаться
+                    joined = asyncio.create_task(queue_tasks.join())
+                    aborted = asyncio.create_task(self.fail_fast.wait())
+                    await asyncio.wait({joined, aborted}, return_when=asyncio.FIRST_COMPLETED)
+                    joined.cancel()
+                    aborted.cancel()
                     for w in workers:
                         w.cancel()
                     await asyncio.gather(*workers, return_exceptions=True)
@@ -799,17 +1626,23 @@ class AsyncQueueWorker:
                         await asyncio.gather(*self.flush_tasks, return_exceptions=True)
                     await self.send_progress(session, force=True)
                     self._adjust_rate_limit_after_batch()
+                    self._apply_pending_config()
                     self.stats['batches_processed'] += 1
 
                     if self.max_batches and self.stats['batches_processed'] >= self.max_batches:
                         break
 
+                if not self.fail_fast.is_set():
+                    await self._final_save(session)
                 if self.fail_fast.is_set():
                     await self.release_locks(session)
                 if empty_batches >= max_empty_batches and not self.fail_fast.is_set() and not self.save_failed:
                     status = 'failed' if getattr(self, 'full_scan', False) else 'no_work'
                 else:
                     status = 'completed' if not (self.fail_fast.is_set() or self.save_failed) else 'failed'
+                if self.outbox is not None:
+                    # Последняя попытка доставить повторы до finish (остаток — следующему запуску)
+                    await self._drain_outbox_once(session)
                 summary = self._build_summary(start_time)
                 summary['internal_error'] = self.fail_fast.is_set()
                 await self.send_finish(session, status, summary)
@@ -817,9 +1650,47 @@ class AsyncQueueWorker:
                 return self.stats
 
             finally:
+                if self.watch_config:
+                    config_manager.unsubscribe(self.supplier_name, self._on_config_reloaded)
+                if self.metrics_port is not None:
+                    metrics_server.unregister(self.metrics_port, self.metrics_families)
+                if self.tracer is not None:
+                    # Не сохранённые до остановки URL — закрываем, чтобы трассы не потерялись
+                    for item in self.results_buffer:
+                        if item.get('span') is not None:
+                            item['span'].set_attribute('saved', False)
+                            item['span'].end()
+                    self.tracer.close()
+                    self.tracer = None
+                if self._outbox_drainer is not None:
+                    self._outbox_drainer.cancel()
+                    await asyncio.gather(self._outbox_drainer, return_exceptions=True)
+                    self._outbox_drainer = None
+                if self.outbox is not None:
+                    pending = sum(self.outbox.counts().values())
+                    if pending:
+                        plog.warning(f"[OUTBOX] Не доставлено: {pending}, повтор при следующем запуске ({self.outbox.path})")
+                    self.outbox.close()
+                    self.outbox = None
+                await self.loop_lag.stop()
                 await self.teardown()
 
-    async def _after_result(self, session: aiohttp.ClientSession, result: UrlResult) -> None:
+    def _start_url_span(self, task: UrlTask):
+        """Корневой span 'url' (при повторе через DOM — прежний) и queue_wait; токен контекста или None."""
+        if self.tracer is None:
+            return None
+        now = time.time_ns()
+        enqueued_ns = task.enqueued_ns or now
+        if task.span is None:
+            task.span = self.tracer.start_span('url', start_ns=enqueued_ns, attributes={
+                'url': task.url,
+                'supplier_url_id': task.supplier_url_id,
+                'supplier': self.supplier_name,
+            })
+        self.tracer.record('queue_wait', enqueued_ns, now, parent=task.span, attributes={'force_dom': task.force_dom})
+        return tracing.activate(task.span)
+
+    async def _after_result(self, session: aiohttp.ClientSession, result: UrlResult, span=None) -> None:
         # Update stats
         self.stats['total_processed'] += 1
         self.batch_processed += 1
@@ -834,14 +1705,32 @@ class AsyncQueueWorker:
                 self.batch_timeout_count += 1
 
         if result.material_data:
+            outbox_id = await self._outbox_append(KIND_MATERIAL, {
+                'material': result.material_data.to_dict(),
+                'supplier_url_id': result.supplier_url_id,
+                'parsed_at': result.parsed_at.isoformat() if result.parsed_at else None,
+            })
             async with self.buffer_lock:
                 self.results_buffer.append({
                     'material': result.material_data,
                     'supplier_url_id': result.supplier_url_id,
                     'parsed_at': result.parsed_at,
+                    'outbox_id': outbox_id,
+                    # Корень трассы закрывается после сохранения пачки (_traced_flush)
+                    'span': span,
+                    'buffered_ns': time.time_ns(),
                 })
         else:
-            await self.report_results(session, [result])
+            outbox_id = await self._outbox_append(KIND_REPORT, self._report_entry(result))
+            with tracing.span('report'):
+                reported = await self.report_results(session, [result])
+            await self._outbox_settle([outbox_id], reported, 'report failed')
+            if span is not None:
+                span.set_attribute('status', result.status)
+                span.set_attribute('error_code', result.error_code)
+                if result.status in ('failed', 'blocked'):
+                    span.set_error(result.error_message or result.error_code or result.status)
+                span.end()
 
         if self.fail_fast.is_set():
             return
@@ -857,31 +1746,66 @@ class AsyncQueueWorker:
 
         if timeout_rate > 0.20:
             self._dynamic_delay = min(self._dynamic_delay + 0.3, 2.0)
-            print(
+            plog.warning(
                 f"[RATE_LIMIT] High timeout_rate={timeout_rate:.0%}; "
                 f"increasing dynamic delay to {self._dynamic_delay:.1f}s",
-                file=sys.stderr,
-                flush=True,
             )
         elif timeout_rate < 0.05 and self._dynamic_delay > 0:
             self._dynamic_delay = max(self._dynamic_delay - 0.2, 0.0)
-            print(
+            plog.info(
                 f"[RATE_LIMIT] Low timeout_rate={timeout_rate:.0%}; "
                 f"decreasing dynamic delay to {self._dynamic_delay:.1f}s",
-                file=sys.stderr,
-                flush=True,
             )
 
-    def _build_summary(self, start_time: float) -> Dict[str, Any]:
-        def percentile(data: List[float], p: float) -> float:
-            if not data:
-                return 0.0
-            sorted_data = sorted(data)
-            k = (len(sorted_data) - 1) * p / 100
-            f = int(k)
-            c = f + 1 if f + 1 < len(sorted_data) else f
-            return sorted_data[f] + (sorted_data[c] - sorted_data[f]) * (k - f)
+    def metrics_families(self) -> List[metrics_server.MetricFamily]:
+        """Живые метрики для /metrics (вызывается из потока сервера, только чтение)."""
+        m = metrics_server
+        elapsed_min = (time.perf_counter() - self._run_started) / 60 if self._run_started else 0
+        processed = self.stats['total_processed']
+        requests_total = self.requests_blocked + self.requests_allowed
+        return [
+            m.labeled('parser_worker_info', 'gauge', 'Воркер очереди (async)', 'supplier', {self.supplier_name: 1}),
+            m.counter('parser_urls_processed', 'Обработано URL', processed),
+            m.counter('parser_urls_saved', 'URL с материалом, сохранённым в API', self.stats['successful']),
+            m.counter('parser_urls_failed', 'URL со статусом failed', self.stats['failed']),
+            m.counter('parser_urls_blocked', 'URL со статусом blocked', self.stats['blocked']),
+            m.labeled('parser_url_errors', 'counter', 'Ошибки URL по коду', 'code', self.failed_by_code),
+            m.counter('parser_batches_processed', 'Обработано пачек claim', self.stats['batches_processed']),
+            m.counter('parser_requests_blocked', 'Заблокированные запросы браузера', self.requests_blocked),
+            m.counter('parser_requests_allowed', 'Пропущенные запросы браузера', self.requests_allowed),
+            m.gauge('parser_block_ratio', 'Доля заблокированных запросов браузера', self.requests_blocked / requests_total if requests_total else 0),
+            m.counter('parser_nav_early_aborts', 'Переходы, прерванные по critical_selectors', self.nav_early_aborts),
+            m.counter('parser_raw_html_parsed', 'URL, разобранные без DOM (raw_html)', self.raw_html_parsed),
+            m.counter('parser_raw_html_fallbacks', 'Откаты raw_html на DOM', self.raw_html_fallbacks),
+            m.counter('parser_internal_errors', 'Внутренние ошибки (fail-fast)', self.internal_errors_count),
+            m.counter('parser_config_reloads', 'Применённые перезагрузки конфигурации', self.config_reloads),
+            m.labeled('parser_page_recycles', 'counter', 'Пересозданные страницы по причине', 'reason', self.page_tracker.recycles_by_reason),
+            m.gauge('parser_pages_inflight', 'URL в работе (страницы и разборы raw_html)', self._inflight),
+            m.gauge('parser_pages', 'Страниц браузера', len(self.pages)),
+            m.gauge('parser_concurrency', 'Параметр concurrency', self.concurrency),
+            m.gauge('parser_results_buffer_depth', 'Материалы в буфере до сохранения', len(self.results_buffer)),
+            m.gauge('parser_flush_tasks_pending', 'Незавершённые сохранения пачек', sum(1 for t in list(self.flush_tasks) if not t.done())),
+            m.gauge('parser_save_pending_materials', 'Материалы в памяти до сохранения (буфер + пачки в отправке)', self._pending_materials()),
+            m.gauge('parser_save_circuit_state', 'Цепь сохранения: 0 closed, 1 open, 2 half_open', save_retry.CIRCUIT_STATE_VALUES[self.save_breaker.state]),
+            m.counter('parser_save_circuit_opens', 'Размыкания цепи сохранения', self.save_breaker.opened_count),
+            m.counter('parser_save_retries', 'Повторы сохранения пачек', self.save_retries),
+            m.counter('parser_save_splits', 'Деления пачек на 413/422', self.save_splits),
+            m.counter('parser_save_rejected', 'Материалы, отклонённые API (422)', self.save_rejected),
+            m.counter('parser_save_deferred', 'Материалы, возвращённые в буфер после неудачного сохранения', self.save_deferred),
+            m.counter('parser_save_spilled', 'Материалы, переданы из переполненного буфера в outbox', self.save_spilled),
+            m.counter('parser_save_backpressure_waits', 'Ожидания воркеров из-за заполненного буфера', self.backpressure_waits),
+            m.gauge('parser_dynamic_delay_seconds', 'Динамическая задержка между запросами', self._dynamic_delay),
+            m.gauge('parser_batch_total', 'URL в текущей пачке', self.current_batch_total),
+            m.gauge('parser_batch_processed', 'Обработано URL текущей пачки', self.batch_processed),
+            m.gauge('parser_throughput_urls_per_minute', 'Средняя пропускная способность с начала прогона', processed / elapsed_min if elapsed_min > 0 else 0),
+            m.histogram('parser_goto_seconds', 'Длительность перехода на страницу', self.goto_ms),
+            m.histogram('parser_parse_seconds', 'Длительность разбора URL целиком', self.parse_ms),
+            m.histogram('parser_event_loop_lag_seconds', 'Задержка event loop', self.loop_lag.lag_ms, LOOP_LAG_BUCKETS_S),
+            m.gauge('parser_event_loop_lag_last_seconds', 'Последний замер задержки event loop', self.loop_lag.last_lag_ms / 1000),
+            m.counter('parser_event_loop_blocked', 'Блокировки event loop дольше порога', self.loop_lag.blocked_count),
+        ]
 
+    def _build_summary(self, start_time: float) -> Dict[str, Any]:
         wall_time_ms = (time.perf_counter() - start_time) * 1000
         throughput = (self.stats['total_processed'] / (wall_time_ms / 60000)) if wall_time_ms > 0 else 0
 
@@ -892,10 +1816,15 @@ class AsyncQueueWorker:
             'success': self.stats['successful'],
             'failed_by_code': self.failed_by_code,
             'retried_count': self.stats['failed'],
-            'goto_ms_p50': percentile(self.goto_times, 50),
-            'goto_ms_p95': percentile(self.goto_times, 95),
-            'parse_ms_p50': percentile(self.parse_times, 50),
-            'parse_ms_p95': percentile(self.parse_times, 95),
+            'goto_ms_p50': self.goto_ms.percentile(50),
+            'goto_ms_p95': self.goto_ms.percentile(95),
+            'parse_ms_p50': self.parse_ms.percentile(50),
+            'parse_ms_p95': self.parse_ms.percentile(95),
+            'nav_mode': self.profile.navigation_mode,
+            'nav_early_aborts': self.nav_early_aborts,
+            'extraction_mode': self.profile.extraction_mode,
+            'raw_html_parsed': self.raw_html_parsed,
+            'raw_html_fallbacks': self.raw_html_fallbacks,
             'wall_time_ms': wall_time_ms,
             'throughput_urls_per_min': throughput,
             'requests_blocked': self.requests_blocked,
@@ -904,91 +1833,125 @@ class AsyncQueueWorker:
             'internal_errors_count': self.internal_errors_count,
             'errors': self.stats['failed'] + self.stats['blocked'],
             'batch_total': self.current_batch_total,
+            'config_reloads': self.config_reloads,
+            **self.page_tracker.summary(),
+            **self.loop_lag.summary(),
+            'outbox_replayed': self.outbox_replayed,
+            'outbox_delivered': self.outbox_delivered,
+            'outbox_abandoned': self.outbox_abandoned,
+            'save_retries': self.save_retries,
+            'save_splits': self.save_splits,
+            'save_rejected': self.save_rejected,
+            'save_deferred': self.save_deferred,
+            'save_unsaved': self.save_unsaved,
+            'save_spilled': self.save_spilled,
+            'save_circuit_opens': self.save_breaker.opened_count,
+            'save_backpressure_waits': self.backpressure_waits,
+            'save_backpressure_s': round(self.backpressure_s, 1),
         }
 
-        print(
+        plog.info(
             f"[METRICS FINAL] concurrency={summary['concurrency']} batch_size={summary['batch_size']} claimed={summary['claimed_count']}",
-            file=sys.stderr,
-            flush=True,
         )
-        print(
+        plog.info(
             f"[METRICS FINAL] success={summary['success']} failed_by_code={summary['failed_by_code']} retried={summary['retried_count']}",
-            file=sys.stderr,
-            flush=True,
         )
-        print(
+        plog.info(
             f"[METRICS FINAL] goto_ms p50={summary['goto_ms_p50']:.0f} p95={summary['goto_ms_p95']:.0f} parse_ms p50={summary['parse_ms_p50']:.0f} p95={summary['parse_ms_p95']:.0f}",
-            file=sys.stderr,
-            flush=True,
         )
-        print(
+        plog.info(
+            f"[METRICS FINAL] nav_mode={summary['nav_mode']} nav_early_aborts={summary['nav_early_aborts']} "
+            f"extraction_mode={summary['extraction_mode']} raw_html_parsed={summary['raw_html_parsed']} "
+            f"raw_html_fallbacks={summary['raw_html_fallbacks']}",
+        )
+        for idx, (ms, url) in enumerate(self.parse_slowest.items(), 1):
+            plog.info(f"[METRICS FINAL] parse_slowest_{idx}: {ms:.0f}ms {url}")
+        plog.info(
             f"[METRICS FINAL] wall_time_ms={summary['wall_time_ms']:.0f} throughput_urls_per_min={summary['throughput_urls_per_min']:.1f}",
-            file=sys.stderr,
-            flush=True,
         )
-        print(
+        plog.info(
             f"[METRICS FINAL] requests_blocked={summary['requests_blocked']} allowed={summary['requests_allowed']} block_ratio={summary['block_ratio']:.1f}%",
-            file=sys.stderr,
-            flush=True,
         )
-        print(
+        plog.info(
+            f"[METRICS FINAL] page_recycles={summary['page_recycles']} by_reason={summary['page_recycles_by_reason']} "
+            f"js_heap_mb_max={summary['js_heap_mb_max']} page_navigations_max={summary['page_navigations_max']}",
+        )
+        plog.info(
+            f"[METRICS FINAL] loop_lag_ms p50={summary['loop_lag_ms_p50']:.1f} p95={summary['loop_lag_ms_p95']:.1f} "
+            f"p99={summary['loop_lag_ms_p99']:.1f} max={summary['loop_lag_ms_max']:.1f} blocked={summary['loop_blocked_count']}",
+        )
+        for idx, offender in enumerate(summary['loop_blocked_offenders'], 1):
+            plog.info(
+                f"[METRICS FINAL] loop_blocker_{idx}: {offender['site']} → {offender['leaf']} count={offender['count']} "
+                f"total_ms={offender['total_ms']:.0f} max_ms={offender['max_ms']:.0f} task={offender['task']}",
+            )
+        plog.info(
+            f"[METRICS FINAL] save retries={summary['save_retries']} splits={summary['save_splits']} "
+            f"rejected={summary['save_rejected']} deferred={summary['save_deferred']} unsaved={summary['save_unsaved']} "
+            f"spilled={summary['save_spilled']} "
+            f"circuit_opens={summary['save_circuit_opens']} backpressure_waits={summary['save_backpressure_waits']} "
+            f"backpressure_s={summary['save_backpressure_s']:.1f}",
+        )
+        plog.info(
             f"[METRICS FINAL] internal_errors_count={summary['internal_errors_count']}",
-            file=sys.stderr,
-            flush=True,
         )
 
         return summary
 
     async def process_single_url(self, page: Page, task: UrlTask) -> UrlResult:
-        print(f"[QUEUE] Парсинг: {task.url}", file=sys.stderr, flush=True)
+        plog.info(f"[QUEUE] Парсинг: {task.url}", key='queue.parse', url=task.url)
 
         try:
             material = await self.parse_product_page(page, task.url)
+        except Exception as e:
+            return self._result_from_error(task, e)
+        return self._result_from_material(task, material)
 
-            if material is None:
-                return UrlResult(
-                    supplier_url_id=task.supplier_url_id,
-                    status='failed',
-                    error_code=ErrorCodes.UNKNOWN,
-                    error_message='parse_product_page returned None',
-                    parsed_at=datetime.utcnow(),
-                )
-
-            if not material.price_parsed_successfully:
-                return UrlResult(
-                    supplier_url_id=task.supplier_url_id,
-                    status='failed',
-                    error_code=ErrorCodes.PRICE_PARSE_FAILED,
-                    error_message='Price not parsed',
-                    parsed_at=datetime.utcnow(),
-                    material_data=material,
-                )
-
-            print(f"[QUEUE] ✓ {material.article}: {material.price_per_unit} ₽", file=sys.stderr, flush=True)
+    def _result_from_material(self, task: UrlTask, material: Optional[MaterialData]) -> UrlResult:
+        if material is None:
+            return UrlResult(
+                supplier_url_id=task.supplier_url_id,
+                status='failed',
+                error_code=ErrorCodes.UNKNOWN,
+                error_message='parse_product_page returned None',
+                parsed_at=datetime.utcnow(),
+            )
 
+        if not material.price_parsed_successfully:
             return UrlResult(
                 supplier_url_id=task.supplier_url_id,
-                status='done',
+                status='failed',
+                error_code=ErrorCodes.PRICE_PARSE_FAILED,
+                error_message='Price not parsed',
                 parsed_at=datetime.utcnow(),
                 material_data=material,
             )
 
-        except Exception as e:
-            if self._is_internal_runtime_error(e):
-                raise InternalRuntimeError(str(e))
+        plog.info(f"[QUEUE] ✓ {material.article}: {material.price_per_unit} ₽", key='queue.done', url=task.url)
 
-            error_code, error_message = self._classify_error(e)
-            print(f"[QUEUE] ✗ Ошибка: {error_code} - {error_message}", file=sys.stderr, flush=True)
+        return UrlResult(
+            supplier_url_id=task.supplier_url_id,
+            status='done',
+            parsed_at=datetime.utcnow(),
+            material_data=material,
+        )
 
-            status = 'blocked' if error_code in (ErrorCodes.HTTP_403, ErrorCodes.HTTP_404) else 'failed'
+    def _result_from_error(self, task: UrlTask, e: Exception) -> UrlResult:
+        if self._is_internal_runtime_error(e):
+            raise InternalRuntimeError(str(e))
 
-            return UrlResult(
-                supplier_url_id=task.supplier_url_id,
-                status=status,
-                error_code=error_code,
-                error_message=error_message,
-                parsed_at=datetime.utcnow(),
-            )
+        error_code, error_message = self._classify_error(e)
+        plog.warning(f"[QUEUE] ✗ Ошибка: {error_code} - {error_message}", key='queue.failed', url=task.url, code=error_code)
+
+        status = 'blocked' if error_code in (ErrorCodes.HTTP_403, ErrorCodes.HTTP_404) else 'failed'
+
+        return UrlResult(
+            supplier_url_id=task.supplier_url_id,
+            status=status,
+            error_code=error_code,
+            error_message=error_message,
+            parsed_at=datetime.utcnow(),
+        )
 
 
 async def run_queue_worker_async(
@@ -1003,6 +1966,11 @@ async def run_queue_worker_async(
     concurrency: int = 3,
     min_request_interval: float = 0.0,
     full_scan: bool = False,
+    producer_alive: Optional[Callable[[], bool]] = None,
+    watch_config: bool = False,
+    metrics_port: Optional[int] = None,
+    trace_file: Optional[str] = None,
+    outbox_dir: Optional[str] = None,
 ) -> dict:
     worker = AsyncQueueWorker(
         supplier_name=supplier_name,
@@ -1016,5 +1984,10 @@ async def run_queue_worker_async(
         concurrency=concurrency,
         min_request_interval=min_request_interval,
         full_scan=full_scan,
+        producer_alive=producer_alive,
+        watch_config=watch_config,
+        metrics_port=metrics_port,
+        trace_file=trace_file,
+        outbox_dir=outbox_dir,
     )
     return await worker.run()
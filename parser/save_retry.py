@@ -0,0 +1,164 @@
+# parser/save_retry.py
+
+"""
+Политика повторов сохранения материалов (POST /parser/materials/batch).
+
+Раньше любой не-200 помечал всю пачку failed и останавливал прогон
+(fail_fast): один 502 Laravel посреди многочасового full-scan терял всё.
+Теперь ответ классифицируется:
+
+- 2xx      — сохранено;
+- 413, 422 — пачка делится пополам, пока плохая строка не останется одна
+             (её отклоняют, остальные сохраняются); 422 — только если
+             все ошибки построчные (errors: materials.N.*) или о размере
+             массива (errors: materials — больше SAVE_API_MAX_BATCH);
+- 422 с ошибкой запроса (session_id, supplier) — фатально: её повторит
+             любая половина и любая следующая пачка;
+- прочее   — временный сбой (5xx, 429, таймаут, обрыв соединения):
+             повтор с экспоненциальной задержкой и джиттером
+             (outbox.backoff_delay), затем пачка возвращается в буфер.
+
+CircuitBreaker защищает API и воркер от бесконечных повторов: после
+failure_threshold неудачных попыток подряд сохранение приостанавливается
+на reset_timeout (парсинг продолжается в буфер), затем одна пробная
+пачка (half-open): успех замыкает цепь, неудача снова размыкает её с
+удвоенным таймаутом (до max_reset_timeout).
+
+Пока сохранение стоит, материалы копятся в памяти до предела
+(PARSER_MAX_BUFFERED_MATERIALS), дальше воркеры не берут новые URL
+(back-pressure). С outbox переполненный буфер сбрасывается на диск — его
+доставит drainer; без outbox простой дольше SAVE_MAX_OUTAGE прерывает прогон.
+"""
+
+import json
+import re
+import time
+from typing import Optional
+
+SAVE_OK = 'ok'
+SAVE_SPLIT = 'split'
+SAVE_RETRY = 'retry'
+SAVE_FATAL = 'fatal'
+
+SPLIT_STATUSES = frozenset({413, 422})
+
+# Ключ ошибки валидации Laravel, которую снимает деление пачки: строка
+# (materials.N.*) или размер массива (materials)
+_SPLIT_ERROR_RE = re.compile(r'^materials(?:\.\d+\.|$)')
+
+# Строк в одном POST: обычная пачка и предел storeBatch (materials max:200)
+SAVE_BATCH_SIZE = 50
+SAVE_API_MAX_BATCH = 200
+
+# Попытки одной пачки до возврата в буфер и задержка между ними, секунды
+SAVE_MAX_ATTEMPTS = 4
+SAVE_RETRY_BASE = 1.0
+SAVE_RETRY_CAP = 30.0
+# Предел материалов в памяти (буфер + сохраняемые), дальше — back-pressure
+DEFAULT_MAX_BUFFERED = 2000
+# Сколько конец прогона ждёт восстановления сохранения, секунды
+SAVE_FINAL_TIMEOUT = 120.0
+# Предел простоя сохранения при заполненном буфере без outbox: дальше прогон прерывается
+SAVE_MAX_OUTAGE = 600.0
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+# Значение gauge parser_save_circuit_state
+CIRCUIT_STATE_VALUES = {CIRCUIT_CLOSED: 0, CIRCUIT_OPEN: 1, CIRCUIT_HALF_OPEN: 2}
+
+
+def splittable_errors(body: str) -> bool:
+    """Все ключи errors ответа 422 — построчные (materials.N.*) или о размере массива (materials)."""
+    try:
+        errors = json.loads(body).get('errors')
+    except (ValueError, AttributeError):
+        return False
+    return isinstance(errors, dict) and bool(errors) and all(_SPLIT_ERROR_RE.match(key) for key in errors)
+
+
+def classify_save_status(status: Optional[int], body: str = '') -> str:
+    """HTTP-статус и тело ответа сохранения (None — сетевая ошибка) → ok / split / retry / fatal."""
+    if status is not None and 200 <= status < 300:
+        return SAVE_OK
+    if status == 422 and not splittable_errors(body):
+        return SAVE_FATAL
+    if status in SPLIT_STATUSES:
+        return SAVE_SPLIT
+    return SAVE_RETRY
+
+
+class CircuitBreaker:
+    """Размыкатель цепи сохранения: closed → open → half_open → closed."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, max_reset_timeout: float = 300.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_count = 0
+        self._opened_at = 0.0
+        self._outage_started: Optional[float] = None
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Можно ли отправлять сейчас; в half_open — только одна пробная пачка."""
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        if self.state == CIRCUIT_OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = CIRCUIT_HALF_OPEN
+            self._probe_in_flight = False
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def ready(self) -> bool:
+        """Как allow(), но без захвата пробы: стоит ли запускать сохранение."""
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        if self.state == CIRCUIT_OPEN:
+            return time.monotonic() - self._opened_at >= self.reset_timeout
+        return not self._probe_in_flight
+
+    @property
+    def retry_in(self) -> float:
+        """Секунд до следующей пробы (0 — цепь не разомкнута)."""
+        if self.state != CIRCUIT_OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    @property
+    def outage_s(self) -> float:
+        """Сколько секунд цепь не замкнута (0 — замкнута)."""
+        if self._outage_started is None:
+            return 0.0
+        return time.monotonic() - self._outage_started
+
+    def record_success(self) -> None:
+        self._outage_started = None
+        self.failures = 0
+        self.state = CIRCUIT_CLOSED
+        self.reset_timeout = self.base_reset_timeout
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == CIRCUIT_HALF_OPEN:
+            # Проба не прошла — ждём дольше
+            self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            self._open()
+        elif self.state == CIRCUIT_CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = CIRCUIT_OPEN
+        self._opened_at = time.monotonic()
+        if self._outage_started is None:
+            self._outage_started = self._opened_at
+        self._probe_in_flight = False
+        self.opened_count += 1
@@ -0,0 +1,103 @@
+# parser/signed_payload.py
+
+"""
+Детерминированная сериализация + HMAC-подпись тела запроса за один проход.
+
+Laravel проверяет подпись как hash_hmac('sha256', $request->getContent(), secret),
+т.е. по сырым байтам тела. Поэтому тело не нужно собирать в str через
+json.dumps(sort_keys=True) и кодировать заново: записи сериализуются один раз
+сразу в bytes (orjson с OPT_SORT_KEYS, если установлен), а фрагменты
+одновременно пишутся в тело и в HMAC. При сжатии подпись считается по сжатым байтам — именно они
+приходят в getContent().
+"""
+
+import hashlib
+import hmac
+import json
+import zlib
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson опционален
+    orjson = None
+
+
+def dumps_sorted(obj: Any) -> bytes:
+    """Компактный JSON с отсортированными ключами (UTF-8 байты)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, separators=(',', ':'), sort_keys=True, ensure_ascii=False).encode('utf-8')
+
+
+class SignedBody(NamedTuple):
+    body: bytes
+    signature: str                   # hex HMAC-SHA256 по body
+    content_encoding: Optional[str]  # 'gzip' или None
+
+
+class _SigningWriter:
+    """Пишет фрагменты в тело и HMAC одновременно (опционально через gzip)."""
+
+    def __init__(self, secret: str, compress_level: Optional[int] = None):
+        self._mac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        self._parts: List[bytes] = []
+        # wbits=31 -> формат gzip (заголовок + CRC)
+        self._compressor = zlib.compressobj(compress_level, zlib.DEFLATED, 31) if compress_level is not None else None
+
+    def _emit(self, data: bytes) -> None:
+        if data:
+            self._mac.update(data)
+            self._parts.append(data)
+
+    def write(self, data: bytes) -> None:
+        if self._compressor is not None:
+            self._emit(self._compressor.compress(data))
+        else:
+            self._emit(data)
+
+    def finish(self) -> SignedBody:
+        encoding = None
+        if self._compressor is not None:
+            self._emit(self._compressor.flush())
+            encoding = 'gzip'
+        return SignedBody(b''.join(self._parts), self._mac.hexdigest(), encoding)
+
+
+def build_signed_body(
+    secret: str,
+    payload: Dict[str, Any],
+    stream_key: Optional[str] = None,
+    records: Iterable[Any] = (),
+    compress_level: Optional[int] = None,
+) -> SignedBody:
+    """
+    Собирает JSON-объект с отсортированными ключами и подписывает его.
+
+    Args:
+        secret: HMAC секрет
+        payload: Скалярные поля объекта
+        stream_key: Ключ массива, элементы которого сериализуются по одному
+        records: Элементы массива stream_key
+        compress_level: Уровень gzip (None — без сжатия)
+
+    Returns:
+        SignedBody(body, signature, content_encoding)
+    """
+    writer = _SigningWriter(secret, compress_level)
+    keys = sorted(set(payload) | ({stream_key} if stream_key else set()))
+
+    writer.write(b'{')
+    for i, key in enumerate(keys):
+        if i:
+            writer.write(b',')
+        writer.write(dumps_sorted(key))
+        writer.write(b':')
+        if key == stream_key:
+            # Один вызов сериализатора на весь массив: каждая запись
+            # кодируется ровно один раз, без промежуточного str
+            writer.write(dumps_sorted(list(records)))
+        else:
+            writer.write(dumps_sorted(payload[key]))
+    writer.write(b'}')
+    return writer.finish()
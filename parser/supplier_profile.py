@@ -0,0 +1,236 @@
+# parser/supplier_profile.py
+
+"""
+Скомпилированный профиль поставщика для горячих путей.
+
+JSON-конфиг остаётся источником правды (его читают Laravel, UI и сборщик с
+override), но на каждый URL/товар из него раньше доставались одни и те же
+значения через цепочки .get(...) с дефолтами. SupplierProfile строится из
+конфига один раз: значения проверены и приведены к типам, дефолты
+подставлены, ключевые слова собраны в UrlClassifier, единицы измерения —
+в неизменяемый словарь. Объект неизменяем (frozen + slots), поэтому его
+можно безопасно делить между потоками и атомарно подменять целиком.
+"""
+
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, FrozenSet, Mapping, Optional, Pattern, Tuple
+
+# Поддержка запуска как модуля и как скрипта (collect_urls.py)
+try:
+    from .url_classifier import UrlClassifier
+    from .navigation import NAV_MODES, NAV_MODE_DOMCONTENTLOADED
+    from .html_extract import EXTRACTION_MODES, EXTRACTION_DOM
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from parser.url_classifier import UrlClassifier
+    from parser.navigation import NAV_MODES, NAV_MODE_DOMCONTENTLOADED
+    from parser.html_extract import EXTRACTION_MODES, EXTRACTION_DOM
+
+
+DEFAULT_SELECTORS = {
+    'article': '.catalog-detail__article.js-copy-article',
+    'name': "meta[itemprop='name']",
+    'price_meta': 'meta[itemprop="price"]',
+    'price_text': '.catalog-detail__price, .price',
+    'add_to_cart_button': 'button.btn-default.to-cart, .catalog-detail__buy button',
+    'category_products': '',
+    'pagination_next': '',
+}
+
+# Цифры цены в видимом тексте (после удаления пробелов и nbsp)
+PRICE_DIGITS_RE: Pattern[str] = re.compile(r"[\d\s]+")
+
+
+def _str(value: Any, field_name: str, default: str = '') -> str:
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        raise ValueError(f"Поле '{field_name}' должно быть строкой, получено {type(value).__name__}")
+    return value
+
+
+def _int(value: Any, field_name: str, default: int) -> int:
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Поле '{field_name}' должно быть числом, получено {value!r}")
+
+
+def _float(value: Any, field_name: str, default: Optional[float]) -> Optional[float]:
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Поле '{field_name}' должно быть числом, получено {value!r}")
+
+
+def _str_tuple(value: Any, field_name: str) -> Tuple[str, ...]:
+    if not value:
+        return ()
+    if isinstance(value, str) or not isinstance(value, (list, tuple)):
+        raise ValueError(f"Поле '{field_name}' должно быть списком строк")
+    return tuple(str(v) for v in value)
+
+
+@dataclass(frozen=True, slots=True)
+class ProfileSelectors:
+    """CSS-селекторы страницы товара (с дефолтами, как в адаптерах)."""
+    article: str
+    name: str
+    price_meta: str
+    price_text: str
+    add_to_cart_button: str
+    category_products: str
+    pagination_next: str
+
+    @classmethod
+    def from_config(cls, selectors: Optional[dict]) -> 'ProfileSelectors':
+        selectors = selectors or {}
+        if not isinstance(selectors, dict):
+            raise ValueError("Поле 'selectors' должно быть объектом")
+        values = {}
+        for key, default in DEFAULT_SELECTORS.items():
+            value = _str(selectors.get(key), f'selectors.{key}', default).strip()
+            values[key] = value or default
+        return cls(**values)
+
+    def extracted(self) -> Tuple[str, ...]:
+        """Селекторы, которые читает разбор страницы товара."""
+        return (self.article, self.name, self.price_meta, self.price_text, self.add_to_cart_button)
+
+
+@dataclass(frozen=True, slots=True)
+class ProfileUrlCollection:
+    """Параметры сбора URL (url_collection) с дефолтами base_adapter."""
+    product_selector: str
+    subcategory_selector: str
+    pagination_param: str
+    pagination_max_pages: int
+    pagination_next_selector: str
+    max_depth: int
+    max_urls: int
+    request_delay: float
+    timeout: int
+    infinite_scroll: bool
+    soft_exit_seconds: float
+    max_collect_time_seconds: Optional[float]
+    discovery_workers: int
+    filter_keywords: Tuple[str, ...]
+    exclude_keywords: Tuple[str, ...]
+
+    @classmethod
+    def from_config(cls, url_collection: Optional[dict]) -> 'ProfileUrlCollection':
+        uc = url_collection or {}
+        if not isinstance(uc, dict):
+            raise ValueError("Поле 'url_collection' должно быть объектом")
+        return cls(
+            product_selector=_str(uc.get('product_selector'), 'url_collection.product_selector'),
+            subcategory_selector=_str(uc.get('subcategory_selector'), 'url_collection.subcategory_selector'),
+            pagination_param=_str(uc.get('pagination_param'), 'url_collection.pagination_param'),
+            pagination_max_pages=_int(uc.get('pagination_max_pages'), 'url_collection.pagination_max_pages', 10),
+            pagination_next_selector=_str(uc.get('pagination_next_selector'), 'url_collection.pagination_next_selector'),
+            max_depth=_int(uc.get('max_depth'), 'url_collection.max_depth', 2),
+            max_urls=_int(uc.get('max_urls'), 'url_collection.max_urls', 500),
+            request_delay=_float(uc.get('request_delay'), 'url_collection.request_delay', 2.0),
+            timeout=_int(uc.get('timeout'), 'url_collection.timeout', 30),
+            infinite_scroll=bool(uc.get('infinite_scroll', False)),
+            soft_exit_seconds=_float(uc.get('soft_exit_seconds'), 'url_collection.soft_exit_seconds', 10.0),
+            max_collect_time_seconds=_float(uc.get('max_collect_time_seconds'), 'url_collection.max_collect_time_seconds', None),
+            discovery_workers=max(1, _int(uc.get('discovery_workers'), 'url_collection.discovery_workers', 1)),
+            filter_keywords=_str_tuple(uc.get('filter_keywords'), 'url_collection.filter_keywords'),
+            exclude_keywords=_str_tuple(uc.get('exclude_keywords'), 'url_collection.exclude_keywords'),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class SupplierProfile:
+    """Неизменяемый профиль поставщика, построенный из JSON-конфига."""
+    name: str
+    display_name: str
+    base_url: Optional[str]
+    catalog_base_url: str
+    default_type: str
+    default_unit: str
+    unit_by_type: Mapping[str, str]
+    selectors: ProfileSelectors
+    url_collection: ProfileUrlCollection
+    allowed_categories: FrozenSet[str]
+    url_classifier: UrlClassifier
+    nav_timeout_ms: int
+    nav_retries: int
+    between_requests: float
+    page_max_navigations: int
+    page_max_js_heap_mb: float
+    page_memory_check_every: int
+    navigation_mode: str
+    critical_selectors: Tuple[str, ...]
+    extraction_mode: str
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'SupplierProfile':
+        """
+        Строит профиль из конфигурации поставщика.
+
+        Raises:
+            ValueError: Если значения в конфиге имеют неверный тип
+        """
+        mapping = config.get('material_unit_mapping', {}) or {}
+        if not isinstance(mapping, dict):
+            raise ValueError("Поле 'material_unit_mapping' должно быть объектом")
+        delays = config.get('delays', {}) or {}
+        lifecycle = config.get('page_lifecycle', {}) or {}
+        navigation = config.get('navigation', {}) or {}
+        name = _str(config.get('name'), 'name', 'unknown')
+        selectors = ProfileSelectors.from_config(config.get('selectors'))
+
+        navigation_mode = _str(navigation.get('mode'), 'navigation.mode', NAV_MODE_DOMCONTENTLOADED)
+        if navigation_mode not in NAV_MODES:
+            raise ValueError(f"Поле 'navigation.mode' должно быть одним из {NAV_MODES}, получено {navigation_mode!r}")
+        # Все селекторы, которые читает разбор, плюс заданные в конфиге: иначе
+        # window.stop() обрежет документ до артикула/кнопки, и разбор молча
+        # возьмёт артикул из URL и наличие «под заказ»
+        critical_selectors = tuple(dict.fromkeys(
+            selectors.extracted()
+            + _str_tuple(navigation.get('critical_selectors'), 'navigation.critical_selectors')
+        ))
+        extraction_mode = _str(config.get('extraction_mode'), 'extraction_mode', EXTRACTION_DOM)
+        if extraction_mode not in EXTRACTION_MODES:
+            raise ValueError(f"Поле 'extraction_mode' должно быть одним из {EXTRACTION_MODES}, получено {extraction_mode!r}")
+
+        return cls(
+            name=name,
+            display_name=_str(config.get('display_name'), 'display_name', name),
+            base_url=config.get('base_url'),
+            catalog_base_url=_str(config.get('catalog_base_url'), 'catalog_base_url'),
+            default_type=_str(config.get('default_type'), 'default_type', 'plate'),
+            default_unit=_str(config.get('default_unit'), 'default_unit', 'м²'),
+            unit_by_type=MappingProxyType({str(k): str(v) for k, v in mapping.items()}),
+            selectors=selectors,
+            url_collection=ProfileUrlCollection.from_config(config.get('url_collection')),
+            allowed_categories=frozenset(_str_tuple(config.get('allowed_categories'), 'allowed_categories')),
+            url_classifier=UrlClassifier.from_config(config),
+            nav_timeout_ms=_int(delays.get('page_load_timeout'), 'delays.page_load_timeout', 15000),
+            nav_retries=_int(delays.get('page_load_retries'), 'delays.page_load_retries', 1),
+            between_requests=_float(delays.get('between_requests'), 'delays.between_requests', 0.0),
+            page_max_navigations=_int(lifecycle.get('max_navigations'), 'page_lifecycle.max_navigations', 200),
+            page_max_js_heap_mb=_float(lifecycle.get('max_js_heap_mb'), 'page_lifecycle.max_js_heap_mb', 512.0),
+            page_memory_check_every=_int(lifecycle.get('memory_check_every'), 'page_lifecycle.memory_check_every', 10),
+            navigation_mode=navigation_mode,
+            critical_selectors=critical_selectors,
+            extraction_mode=extraction_mode,
+        )
+
+    def unit_for(self, material_type: str) -> str:
+        """Единица измерения для типа материала (material_unit_mapping → default_unit)."""
+        return self.unit_by_type.get(material_type, self.default_unit)
+
+    def resolve_base(self, current_url: str) -> str:
+        """База для urljoin ссылок со страницы (как config.get('base_url', current_url))."""
+        return self.base_url if self.base_url is not None else current_url
@@ -5,17 +5,32 @@ import sys
 import hashlib
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
-from playwright.sync_api import sync_playwright, Page
-from PIL import Image
+from typing import TYPE_CHECKING, List, Optional
 import time
 
+# Playwright и PIL импортируются при первом использовании (setup/скриншот):
+# реестр адаптеров и async-режим очереди не платят за их загрузку
+if TYPE_CHECKING:
+    from playwright.sync_api import Page
+
 # Поддержка запуска как модуля и как скрипта
 try:
     from ..base_adapter import SupplierAdapter, MaterialData
+    from ..browser_pool import pool_client_from_env
+    from ..page_lifecycle import PageRecycleTracker, read_js_heap_sync
+    from ..metrics import LatencyHistogram, TopK
+    from ..navigation import NAV_MODE_EARLY_ABORT, OUTCOME_SELECTORS, goto_early_abort_sync
+    from .. import log_pipeline as plog
+    from .. import tracing
 except ImportError:
     sys.path.insert(0, str(Path(__file__).parent.parent.parent))
     from parser.base_adapter import SupplierAdapter, MaterialData
+    from parser.browser_pool import pool_client_from_env
+    from parser.page_lifecycle import PageRecycleTracker, read_js_heap_sync
+    from parser.metrics import LatencyHistogram, TopK
+    from parser.navigation import NAV_MODE_EARLY_ABORT, OUTCOME_SELECTORS, goto_early_abort_sync
+    from parser import log_pipeline as plog
+    from parser import tracing
 
 
 class SkmMebelAdapter(SupplierAdapter):
@@ -27,17 +42,26 @@ class SkmMebelAdapter(SupplierAdapter):
         self._browser = None
         self._page = None
         self._context = None
+        self._pool_client = None
+        self._page_tracker = PageRecycleTracker.from_profile(self.profile)
         
         # Metrics for diagnostics
         self._requests_blocked = 0
         self._requests_allowed = 0
         self._urls_parsed = 0
         self._success_count = 0
-        self._goto_times = []  # for percentiles
-        self._parse_times = []
+        self._goto_ms = LatencyHistogram()  # for percentiles (fixed memory)
+        self._parse_ms = LatencyHistogram()
+        self._nav_early_aborts = 0
         self._errors_by_code = {}  # {'TIMEOUT': 3, 'NOT_PRODUCT': 5, ...}
-        self._parse_slowest = []  # [(parse_ms, url), ...]
+        self._parse_slowest = TopK(10)  # (parse_ms, url), top-10
+        # Поэтапные тайминги последнего разобранного URL, мс (для бенчмарков)
+        self.last_parse_timings = {}
     
+    def apply_config(self, config: dict, profile=None) -> None:
+        super().apply_config(config, profile)
+        self._page_tracker.reconfigure(self.profile)
+
     def _handle_route(self, route):
         """Block heavy resources (images, fonts, media, trackers). NOT stylesheets."""
         url = route.request.url.lower()
@@ -72,15 +96,19 @@ class SkmMebelAdapter(SupplierAdapter):
     
     def setup(self):
         """Инициализирует браузер перед парсингом."""
+        from playwright.sync_api import sync_playwright
+
         self._playwright = sync_playwright().start()
-        self._browser = self._playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-gpu',
-            ]
-        )
+        self._browser = self._connect_pooled_browser()
+        if self._browser is None:
+            self._browser = self._playwright.chromium.launch(
+                headless=True,
+                args=[
+                    '--disable-dev-shm-usage',
+                    '--no-sandbox',
+                    '--disable-gpu',
+                ]
+            )
         
         # Create context - route will be set on context level
         self._context = self._browser.new_context(
@@ -94,36 +122,74 @@ class SkmMebelAdapter(SupplierAdapter):
         
         self._page = self._context.new_page()
     
+    def _recycle_own_page(self) -> None:
+        """
+        Учитывает переход собственной страницы (self._page) и пересоздаёт её
+        после max_navigations переходов или при JS heap выше порога.
+        Страницы, переданные снаружи (QueueWorker), не трогаем — ими владеет вызывающий.
+        """
+        page = self._page
+        if page is None or self._context is None:
+            return
+        tracker = self._page_tracker
+        heap = read_js_heap_sync(page) if tracker.should_check_memory(page) else None
+        reason = tracker.recycle_reason(page, heap)
+        if reason is None:
+            return
+        try:
+            new_page = self._context.new_page()
+        except Exception as e:
+            plog.warning(f"[PARSE] Не удалось пересоздать страницу ({reason}): {e}")
+            return
+        tracker.recycled(page, reason)
+        self._page = new_page
+        try:
+            page.close()
+        except Exception:
+            pass
+        heap_info = f" js_heap={heap / 1024 / 1024:.0f}MB" if heap is not None else ""
+        plog.info(f"[PARSE] Страница пересоздана: reason={reason}{heap_info} (всего {tracker.recycles})")
+
+    def _connect_pooled_browser(self):
+        """Браузер из пула (PARSER_BROWSER_POOL) или None — тогда запускаем свой."""
+        client = pool_client_from_env()
+        if client is None:
+            return None
+        lease = client.acquire()
+        if lease is None:
+            return None
+        try:
+            browser = self._playwright.chromium.connect_over_cdp(lease.endpoint)
+        except Exception as e:
+            plog.warning(f"[POOL] connect_over_cdp {lease.endpoint} не удался: {e}")
+            client.release()
+            return None
+        self._pool_client = client
+        plog.info(f"[POOL] Браузер из пула: slot={lease.slot} lease={lease.lease_id}")
+        return browser
+
     def teardown(self):
         """Закрывает браузер после завершения парсинга."""
         # Final metrics
         total_requests = self._requests_blocked + self._requests_allowed
         block_ratio = (self._requests_blocked / total_requests * 100) if total_requests > 0 else 0
         
-        # Calculate percentiles
-        def percentile(data, p):
-            if not data:
-                return 0
-            sorted_data = sorted(data)
-            k = (len(sorted_data) - 1) * p / 100
-            f = int(k)
-            c = f + 1 if f + 1 < len(sorted_data) else f
-            return sorted_data[f] + (sorted_data[c] - sorted_data[f]) * (k - f)
-        
-        print(f"[METRICS FINAL] URLs: parsed={self._urls_parsed} success={self._success_count}", file=sys.stderr, flush=True)
-        print(f"[METRICS FINAL] Errors by code: {self._errors_by_code}", file=sys.stderr, flush=True)
-        print(f"[METRICS FINAL] Requests: blocked={self._requests_blocked} allowed={self._requests_allowed} block_ratio={block_ratio:.1f}%", 
-              file=sys.stderr, flush=True)
-        if self._goto_times:
-            print(f"[METRICS FINAL] goto_ms: median={percentile(self._goto_times, 50):.0f} p95={percentile(self._goto_times, 95):.0f}", 
-                  file=sys.stderr, flush=True)
-        if self._parse_times:
-            print(f"[METRICS FINAL] parse_ms: median={percentile(self._parse_times, 50):.0f} p95={percentile(self._parse_times, 95):.0f}", 
-                  file=sys.stderr, flush=True)
+        plog.info(f"[METRICS FINAL] URLs: parsed={self._urls_parsed} success={self._success_count}")
+        plog.info(f"[METRICS FINAL] Errors by code: {self._errors_by_code}")
+        plog.info(f"[METRICS FINAL] Requests: blocked={self._requests_blocked} allowed={self._requests_allowed} block_ratio={block_ratio:.1f}%")
+        if self._goto_ms.count:
+            plog.info(f"[METRICS FINAL] goto_ms: median={self._goto_ms.percentile(50):.0f} p95={self._goto_ms.percentile(95):.0f} "
+                      f"nav_mode={self.profile.navigation_mode} early_aborts={self._nav_early_aborts}")
+        if self._parse_ms.count:
+            plog.info(f"[METRICS FINAL] parse_ms: median={self._parse_ms.percentile(50):.0f} p95={self._parse_ms.percentile(95):.0f}")
         if self._parse_slowest:
-            top_slowest = sorted(self._parse_slowest, key=lambda x: x[0], reverse=True)[:10]
-            for idx, (ms, url) in enumerate(top_slowest, 1):
-                print(f"[METRICS FINAL] parse_slowest_{idx}: {ms:.0f}ms {url}", file=sys.stderr, flush=True)
+            for idx, (ms, url) in enumerate(self._parse_slowest.items(), 1):
+                plog.info(f"[METRICS FINAL] parse_slowest_{idx}: {ms:.0f}ms {url}")
+        lifecycle = self._page_tracker.summary()
+        plog.info(
+            f"[METRICS FINAL] page_recycles={lifecycle['page_recycles']} by_reason={lifecycle['page_recycles_by_reason']} "
+            f"js_heap_mb_max={lifecycle['js_heap_mb_max']} page_navigations_max={lifecycle['page_navigations_max']}",
+        )
         
         if self._page:
             self._page.close()
@@ -131,6 +197,9 @@ class SkmMebelAdapter(SupplierAdapter):
             self._context.close()
         if self._browser:
             self._browser.close()
+        if self._pool_client is not None:
+            self._pool_client.release(pages=self._urls_parsed)
+            self._pool_client = None
         if self._playwright:
             self._playwright.stop()
     
@@ -138,7 +207,7 @@ class SkmMebelAdapter(SupplierAdapter):
         """Record error by code for metrics."""
         self._errors_by_code[error_code] = self._errors_by_code.get(error_code, 0) + 1
     
-    def parse_product_page(self, url: str, take_screenshot: bool = True, page: Optional[Page] = None) -> MaterialData:
+    def parse_product_page(self, url: str, take_screenshot: bool = True, page: Optional['Page'] = None) -> MaterialData:
         """
         Извлекает данные с одной страницы товара SKM-Mebel.
         With timing metrics for diagnostics.
@@ -149,19 +218,29 @@ class SkmMebelAdapter(SupplierAdapter):
         if not page:
             if not self._page:
                 raise RuntimeError("Browser not initialized. Call setup() first.")
+            self._recycle_own_page()
             page = self._page
+            self._page_tracker.record_navigation(page)
         parsed_at = datetime.utcnow()
         self._urls_parsed += 1
         
         # === TIMING: page.goto ===
         t_start = time_module.perf_counter()
         try:
-            page.goto(url, timeout=10000, wait_until='domcontentloaded')
+            if self.profile.navigation_mode == NAV_MODE_EARLY_ABORT:
+                # Загрузка останавливается, как только в DOM есть критические селекторы
+                _, outcome = goto_early_abort_sync(page, url, self.profile.critical_selectors, 10000)
+                if outcome == OUTCOME_SELECTORS:
+                    self._nav_early_aborts += 1
+            else:
+                page.goto(url, timeout=10000, wait_until='domcontentloaded')
         except Exception as e:
             self._record_error('GOTO_TIMEOUT')
+            tracing.record_perf('goto', t_start, time_module.perf_counter()).set_error(e)
             raise RuntimeError(f"Failed to load page {url}: {e}")
         t_goto = (time_module.perf_counter() - t_start) * 1000  # ms
-        self._goto_times.append(t_goto)
+        self._goto_ms.record(t_goto)
+        tracing.record_perf('goto', t_start, t_start + t_goto / 1000, mode=self.profile.navigation_mode)
         
         # === TIMING: parse start ===
         t_parse_start = time_module.perf_counter()
@@ -247,14 +326,13 @@ class SkmMebelAdapter(SupplierAdapter):
         # Fallback: extract from URL or generate hash
         if not article:
             # Try to extract from URL
-            import re
             match = re.search(r'/(\d+)/?$', url)
             if match:
                 article = f"SKM-{match.group(1)}"
             else:
                 # Generate from URL hash
                 article = f"SKM-{hashlib.md5(url.encode()).hexdigest()[:8].upper()}"
-            print(f"[PARSE] Generated article from URL: {article}", file=sys.stderr, flush=True)
+            plog.info(f"[PARSE] Generated article from URL: {article}")
         t_article = (time_module.perf_counter() - t_article_start) * 1000
 
         # === 3. Цена (может не распарситься) ===
@@ -265,7 +343,7 @@ class SkmMebelAdapter(SupplierAdapter):
             price = self._extract_price(page)
             price_parsed_successfully = price is not None and price >= 0
         except (ValueError, Exception) as e:
-            print(f"[PARSE] Не удалось извлечь цену: {e}", file=sys.stderr, flush=True)
+            plog.warning(f"[PARSE] Не удалось извлечь цену: {e}")
             price = None
             price_parsed_successfully = False
         t_price = (time_module.perf_counter() - t_price_start) * 1000
@@ -277,8 +355,7 @@ class SkmMebelAdapter(SupplierAdapter):
 
         # === 5. Тип и единица (из конфига или по умолчанию) ===
         material_type = self._determine_material_type_from_url(url)
-        unit_mapping = self.config.get('material_unit_mapping', {})
-        unit = unit_mapping.get(material_type, self.config.get('default_unit', 'м²'))
+        unit = self.profile.unit_for(material_type)
 
         # === 6. Скриншот ===
         screenshot_path = None
@@ -287,22 +364,37 @@ class SkmMebelAdapter(SupplierAdapter):
 
         # === TIMING END ===
         t_parse = (time_module.perf_counter() - t_parse_start) * 1000  # ms
-        self._parse_times.append(t_parse)
+        self._parse_ms.record(t_parse)
         self._success_count += 1
-        self._parse_slowest.append((t_parse, url))
+        self._parse_slowest.add(t_parse, url)
+        self.last_parse_timings = {
+            'goto': t_goto,
+            'name': t_name,
+            'article': t_article,
+            'price': t_price,
+            'availability': t_avail,
+            'total': t_parse,
+        }
+        extract_span = tracing.record_perf('extract', t_parse_start, t_parse_start + t_parse / 1000)
+        for phase, phase_start, phase_ms in (
+            ('name', t_name_start, t_name),
+            ('article', t_article_start, t_article),
+            ('price', t_price_start, t_price),
+            ('availability', t_avail_start, t_avail),
+        ):
+            tracing.record_perf(f'extract.{phase}', phase_start, phase_start + phase_ms / 1000, parent=extract_span)
 
-        print(
+        plog.info(
             f"[PARSE_TIMING] {url[:80]} | name:{t_name:.0f}ms article:{t_article:.0f}ms "
             f"price:{t_price:.0f}ms availability:{t_avail:.0f}ms total:{t_parse:.0f}ms",
-            file=sys.stderr,
-            flush=True,
+            url=url,
+            **{f'{field}_ms': round(ms, 1) for field, ms in self.last_parse_timings.items()},
         )
         
         # Log metrics every 10 URLs
         if self._urls_parsed % 10 == 0:
             success_rate = (self._success_count / self._urls_parsed * 100) if self._urls_parsed > 0 else 0
-            print(f"[METRICS] URLs:{self._urls_parsed} success:{self._success_count} ({success_rate:.0f}%) | goto:{t_goto:.0f}ms parse:{t_parse:.0f}ms", 
-                  file=sys.stderr, flush=True)
+            plog.info(f"[METRICS] URLs:{self._urls_parsed} success:{self._success_count} ({success_rate:.0f}%) | goto:{t_goto:.0f}ms parse:{t_parse:.0f}ms")
 
         return MaterialData(
             article=article,
@@ -331,7 +423,7 @@ class SkmMebelAdapter(SupplierAdapter):
         # Пока возвращаем пустой список
         return []
     
-    def extract_availability_status(self, page: Page) -> str:
+    def extract_availability_status(self, page: 'Page') -> str:
         """
         Определяет статус наличия товара.
         
@@ -341,11 +433,7 @@ class SkmMebelAdapter(SupplierAdapter):
         Returns:
             str: Статус наличия
         """
-        button_selector = self.selectors.get(
-            'add_to_cart_button',
-            'button.btn-default.to-cart, .catalog-detail__buy button'
-        )
-        add_to_cart_btn = page.query_selector(button_selector)
+        add_to_cart_btn = page.query_selector(self.profile.selectors.add_to_cart_button)
         
         if add_to_cart_btn:
             btn_text = add_to_cart_btn.inner_text().strip().lower()
@@ -357,7 +445,7 @@ class SkmMebelAdapter(SupplierAdapter):
         
         return "on_order"
     
-    def _extract_price(self, page: Page) -> Optional[float]:
+    def _extract_price(self, page: 'Page') -> Optional[float]:
         """
         Извлекает цену со страницы.
         
@@ -367,8 +455,8 @@ class SkmMebelAdapter(SupplierAdapter):
         price = None
         
         # Сначала пробуем meta-тег
-        price_meta_selector = self.selectors.get('price_meta', 'meta[itemprop="price"]')
-        price_meta = page.query_selector(price_meta_selector)
+        selectors = self.profile.selectors
+        price_meta = page.query_selector(selectors.price_meta)
         
         if price_meta and (price_content := price_meta.get_attribute("content")):
             try:
@@ -378,8 +466,7 @@ class SkmMebelAdapter(SupplierAdapter):
         
         # Fallback: парсим из видимого текста
         if price is None:
-            price_text_selector = self.selectors.get('price_text', '.catalog-detail__price, .price')
-            price_el = page.query_selector(price_text_selector)
+            price_el = page.query_selector(selectors.price_text)
             
             if price_el:
                 text = price_el.inner_text()
@@ -393,8 +480,10 @@ class SkmMebelAdapter(SupplierAdapter):
         # Возвращаем None вместо исключения — API обработает это корректно
         return price
     
-    def _take_screenshot(self, page: Page, url: str) -> str:
+    def _take_screenshot(self, page: 'Page', url: str) -> str:
         """Создаёт скриншот страницы и возвращает путь к файлу."""
+        from PIL import Image
+
         url_hash = hashlib.md5(url.encode()).hexdigest()[:12]
         date_str = datetime.now().strftime("%Y-%m-%d")
         timestamp = datetime.now().strftime("%H%M%S")
@@ -429,6 +518,8 @@ class SkmMebelAdapter(SupplierAdapter):
         """Переходит на страницу в браузере."""
         if not self._page:
             raise RuntimeError("Browser not initialized. Call setup() first.")
+        self._recycle_own_page()
+        self._page_tracker.record_navigation(self._page)
         try:
             self._page.goto(url, timeout=timeout * 1000, wait_until='domcontentloaded')
         except Exception as e:
@@ -441,7 +532,7 @@ class SkmMebelAdapter(SupplierAdapter):
         try:
             return self._page.query_selector_all(selector)
         except Exception as e:
-            print(f"[COLLECT] Error collecting elements {selector}: {e}", file=sys.stderr, flush=True)
+            plog.warning(f"[COLLECT] Error collecting elements {selector}: {e}")
             return []
     
     def _find_element(self, selector: str):
@@ -451,7 +542,7 @@ class SkmMebelAdapter(SupplierAdapter):
         try:
             return self._page.query_selector(selector)
         except Exception as e:
-            print(f"[COLLECT] Error finding element {selector}: {e}", file=sys.stderr, flush=True)
+            plog.warning(f"[COLLECT] Error finding element {selector}: {e}")
             return None
     
     def _scroll_to_bottom(self):
@@ -461,7 +552,7 @@ class SkmMebelAdapter(SupplierAdapter):
         try:
             self._page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
         except Exception as e:
-            print(f"[COLLECT] Error scrolling: {e}", file=sys.stderr, flush=True)
+            plog.warning(f"[COLLECT] Error scrolling: {e}")
 
     def _determine_material_type_from_url(self, url: str) -> str:
         """
@@ -473,15 +564,4 @@ class SkmMebelAdapter(SupplierAdapter):
         Returns:
             str: Тип материала из mapping или default_type
         """
-        url_lower = url.lower()
-        material_types = self.config.get('material_types', [])
-        material_type_mapping = self.config.get('material_type_mapping', {})
-        
-        # Ищем ключевое слово материала в URL
-        for material in material_types:
-            if material.lower() in url_lower:
-                # Если есть mapping, используем его, иначе используем сам материал
-                return material_type_mapping.get(material.lower(), self.config.get('default_type', 'plate'))
-        
-        # По умолчанию plate
-        return self.config.get('default_type', 'plate')
\ No newline at end of file
+        return self.url_classifier.classify(url).material_type
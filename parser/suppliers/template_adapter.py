@@ -16,9 +16,12 @@ import sys
 import hashlib
 from datetime import datetime
 from pathlib import Path
-from typing import List
-from playwright.sync_api import sync_playwright, Page
-from PIL import Image
+from typing import TYPE_CHECKING, List
+
+# Тяжёлые зависимости (Playwright, PIL) импортируйте внутри методов:
+# реестр адаптеров загружает модуль без запуска браузера
+if TYPE_CHECKING:
+    from playwright.sync_api import Page
 
 # Поддержка запуска как модуля и как скрипта
 try:
@@ -49,6 +52,8 @@ class TemplateAdapter(SupplierAdapter):
         Raises:
             ValueError: Если не удалось извлечь обязательные данные
         """
+        from playwright.sync_api import sync_playwright
+
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True)
             page = browser.new_page()
@@ -116,6 +121,8 @@ class TemplateAdapter(SupplierAdapter):
         
         urls = []
         
+        from playwright.sync_api import sync_playwright
+
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True)
             page = browser.new_page()
@@ -126,7 +133,7 @@ class TemplateAdapter(SupplierAdapter):
         
         return urls
     
-    def extract_availability_status(self, page: Page) -> str:
+    def extract_availability_status(self, page: 'Page') -> str:
         """
         Определяет статус наличия товара.
         
@@ -155,7 +162,7 @@ class TemplateAdapter(SupplierAdapter):
         
         return "out_of_stock"
     
-    def _extract_article(self, page: Page) -> str:
+    def _extract_article(self, page: 'Page') -> str:
         """Извлекает артикул товара."""
         # TODO: Реализуйте извлечение артикула
         selector = self.selectors.get('article', '.product-article')
@@ -171,7 +178,7 @@ class TemplateAdapter(SupplierAdapter):
         
         return article
     
-    def _extract_name(self, page: Page) -> str:
+    def _extract_name(self, page: 'Page') -> str:
         """Извлекает название товара."""
         # TODO: Реализуйте извлечение названия
         selector = self.selectors.get('name', 'h1.product-name')
@@ -187,7 +194,7 @@ class TemplateAdapter(SupplierAdapter):
         
         return "Без названия"
     
-    def _extract_price(self, page: Page) -> float:
+    def _extract_price(self, page: 'Page') -> float:
         """Извлекает цену товара."""
         # TODO: Реализуйте извлечение цены
         price = None
@@ -223,8 +230,10 @@ class TemplateAdapter(SupplierAdapter):
         
         return price
     
-    def _take_screenshot(self, page: Page, url: str) -> str:
+    def _take_screenshot(self, page: 'Page', url: str) -> str:
         """Создаёт скриншот страницы и возвращает путь к файлу."""
+        from PIL import Image
+
         url_hash = hashlib.md5(url.encode()).hexdigest()[:12]
         date_str = datetime.now().strftime("%Y-%m-%d")
         timestamp = datetime.now().strftime("%H%M%S")
@@ -0,0 +1,307 @@
+# parser/tracing.py
+
+"""
+Трассировка обработки URL: дерево span'ов на каждый URL в локальный файл.
+
+Тайминги goto/name/article/price/availability раньше только печатались, а
+ожидания (очередь, rate limit, семафор домена, пул страниц) и сохранение
+не измерялись вовсе. В режиме трассировки (--trace-file / PARSER_TRACE_FILE)
+воркер открывает корневой span 'url' на каждую задачу, а этапы внутри
+становятся дочерними span'ами — хвост задержек видно без живых сервисов.
+
+Формат — OTLP/JSON: каждая строка файла — ExportTraceServiceRequest
+(resourceSpans → scopeSpans → spans), как у file-экспортёра OpenTelemetry
+Collector; файл читается otlpjsonfile-ресивером или любым OTLP-совместимым
+инструментом (Jaeger, Tempo через Collector).
+
+Текущий span хранится в contextvars: asyncio-задачи наследуют его при
+создании, поэтому tracing.span() внутри корня не требует передавать span
+явно. Вне корня span() ничего не делает — без трассировки накладные
+расходы сводятся к чтению ContextVar.
+
+    tracer = Tracer('trace.jsonl')
+    root = tracer.start_span('url', attributes={'url': url})
+    token = tracing.activate(root)
+    with tracing.span('navigate'):
+        ...
+    tracing.deactivate(token)
+    root.end()
+    tracer.close()
+"""
+
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    from . import log_pipeline as plog
+except ImportError:
+    from parser import log_pipeline as plog
+
+SERVICE_NAME = 'smeta-parser'
+SCOPE_NAME = 'parser'
+
+# OTLP: SPAN_KIND_INTERNAL, STATUS_CODE_ERROR
+_SPAN_KIND_INTERNAL = 1
+_STATUS_ERROR = 2
+
+_current: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('parser_trace_span', default=None)
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class Span:
+    """Span трассировки; end() передаёт его трассировщику на запись."""
+
+    __slots__ = ('tracer', 'name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'links', 'error')
+
+    def __init__(self, tracer: 'Tracer', name: str, trace_id: str, parent_id: Optional[str],
+                 start_ns: int, attributes: Optional[Dict[str, Any]] = None, links: Optional[List['Span']] = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.links = [(link.trace_id, link.span_id) for link in links or () if isinstance(link, Span)]
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, error: Any) -> None:
+        self.error = str(error)[:500] or type(error).__name__
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns if end_ns is not None else time.time_ns()
+        self.tracer._export(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': _SPAN_KIND_INTERNAL,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': k, 'value': _attribute_value(v)} for k, v in self.attributes.items()],
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.links:
+            span['links'] = [{'traceId': trace_id, 'spanId': span_id} for trace_id, span_id in self.links]
+        if self.error is not None:
+            span['status'] = {'code': _STATUS_ERROR, 'message': self.error}
+        return span
+
+
+class _NoopSpan:
+    """Заглушка вне трассировки: тот же интерфейс, без записи."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, error: Any) -> None:
+        pass
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# Сигнал потоку записи Tracer: очередь пуста, файл можно закрывать
+_STOP = object()
+
+
+class Tracer:
+    """
+    Пишет завершённые span'ы пачками в OTLP/JSON-файл (одна строка на пачку).
+
+    Сериализация и запись пачки — в фоновом потоке: end() вызывается из
+    event loop, и json.dumps на 512 span'ов с записью в файл не должны его
+    задерживать.
+    """
+
+    def __init__(self, path: str, service_name: str = SERVICE_NAME, batch_size: int = 512,
+                 resource_attributes: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self.spans_written = 0
+        attributes = {'service.name': service_name, 'process.pid': os.getpid()}
+        attributes.update(resource_attributes or {})
+        self._resource = {'attributes': [{'key': k, 'value': _attribute_value(v)} for k, v in attributes.items()]}
+        # perf_counter → unix-время: этапы, измеренные через perf_counter, пишутся задним числом
+        self._epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._file = open(path, 'a', encoding='utf-8')
+        # Пачки span'ов, метки flush (Event) и _STOP для потока записи
+        self._pending: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, name='trace-writer', daemon=True)
+        self._writer.start()
+
+    def start_span(self, name: str, parent: Optional[Span] = None, start_ns: Optional[int] = None,
+                   attributes: Optional[Dict[str, Any]] = None, links: Optional[List[Span]] = None) -> Span:
+        """Span без привязки к контексту; parent=None — корень новой трассы."""
+        if isinstance(parent, Span):
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+        return Span(self, name, trace_id, parent_id, start_ns if start_ns is not None else time.time_ns(), attributes, links)
+
+    def record(self, name: str, start_ns: int, end_ns: int, parent: Optional[Span] = None,
+               attributes: Optional[Dict[str, Any]] = None) -> Span:
+        """Уже завершённый span (интервал измерен заранее)."""
+        span = self.start_span(name, parent=parent, start_ns=start_ns, attributes=attributes)
+        span.end(max(end_ns, start_ns))
+        return span
+
+    def perf_to_ns(self, perf_seconds: float) -> int:
+        """Отметка time.perf_counter() → unix-время в наносекундах."""
+        return int(perf_seconds * 1_000_000_000) + self._epoch_offset_ns
+
+    def _export(self, span: Span) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._buffer.append(span)
+            if len(self._buffer) >= self.batch_size:
+                self._handoff_locked()
+
+    def _handoff_locked(self) -> None:
+        if self._buffer:
+            spans, self._buffer = self._buffer, []
+            self._pending.put(spans)
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._pending.get()
+            if item is _STOP:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            self._write(item)
+
+    def _write(self, spans: List[Span]) -> None:
+        request = {
+            'resourceSpans': [{
+                'resource': self._resource,
+                'scopeSpans': [{'scope': {'name': SCOPE_NAME}, 'spans': [s.to_otlp() for s in spans]}],
+            }],
+        }
+        try:
+            self._file.write(json.dumps(request, ensure_ascii=False) + '\n')
+            self._file.flush()
+            self.spans_written += len(spans)
+        except (OSError, ValueError) as e:
+            plog.error(f"[TRACE] Не удалось записать span'ы в {self.path}: {e}", key='trace.write_failed')
+
+    def flush(self) -> None:
+        """Передаёт буфер потоку записи и ждёт, пока всё записанное ранее окажется в файле."""
+        written = threading.Event()
+        with self._lock:
+            if self._closed:
+                return
+            self._handoff_locked()
+            self._pending.put(written)
+        written.wait()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._handoff_locked()
+            self._pending.put(_STOP)
+        self._writer.join()
+        self._file.close()
+        plog.info(f"[TRACE] Записано span'ов: {self.spans_written} → {self.path}", key='trace.summary',
+                  spans=self.spans_written)
+
+
+def open_tracer(path: Optional[str] = None, **resource_attributes) -> Optional[Tracer]:
+    """Трассировщик для path или PARSER_TRACE_FILE; None — трассировка выключена."""
+    path = path or os.getenv('PARSER_TRACE_FILE')
+    if not path:
+        return None
+    return Tracer(path, resource_attributes=resource_attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def activate(span: Optional[Span]) -> contextvars.Token:
+    """Делает span текущим; вернуть прежний — deactivate(token)."""
+    return _current.set(span)
+
+
+def deactivate(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+class span:
+    """
+    Дочерний span текущего контекста на время блока (with / async with-код).
+
+    Исключение внутри блока помечает span ошибкой и пробрасывается дальше.
+    """
+
+    __slots__ = ('name', 'attributes', '_span', '_token')
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self._span: Optional[Span] = None
+
+    def __enter__(self):
+        parent = _current.get()
+        if parent is None:
+            return NOOP_SPAN
+        self._span = parent.tracer.start_span(self.name, parent=parent, attributes=self.attributes)
+        self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._span is None:
+            return False
+        _current.reset(self._token)
+        if exc is not None:
+            self._span.set_error(exc)
+        self._span.end()
+        return False
+
+
+def record_perf(name: str, perf_start: float, perf_end: float, parent: Optional[Span] = None, **attributes):
+    """
+    Завершённый дочерний span по отметкам time.perf_counter().
+
+    Для этапов, которые уже замеряются (тайминги парсинга), — без переписывания
+    кода блоками with. Вне трассировки возвращает NOOP_SPAN.
+    """
+    parent = parent if parent is not None else _current.get()
+    if not isinstance(parent, Span):
+        return NOOP_SPAN
+    tracer = parent.tracer
+    return tracer.record(name, tracer.perf_to_ns(perf_start), tracer.perf_to_ns(perf_end), parent=parent, attributes=attributes)
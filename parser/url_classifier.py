@@ -0,0 +1,243 @@
+# parser/url_classifier.py
+
+"""
+Классификатор URL по ключевым словам поставщика.
+
+Строится один раз из filter_keywords, exclude_keywords, material_types и
+material_type_mapping и за один проход по URL отвечает на все вопросы сразу:
+исключён ли URL, прошёл ли он фильтр, какой у него тип материала и какое
+ключевое слово сработало.
+
+Используется и при сборе URL (base_adapter._filter_url,
+UrlCollector.determine_material_type), и при парсинге
+(SkmMebelAdapter._determine_material_type_from_url).
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+
+# Начиная с этого числа уникальных ключевых слов один регулярный проход по URL
+# дешевле, чем проверка каждого слова через `in` (замер на URL ~80 символов).
+REGEX_MIN_KEYWORDS = 96
+
+
+class UrlClassification(NamedTuple):
+    """Результат классификации одного URL."""
+    exclude_keyword: Optional[str]   # первое сработавшее exclude_keywords
+    filter_keyword: Optional[str]    # первое сработавшее filter_keywords
+    material_keyword: Optional[str]  # первое сработавшее material_types
+    material_type: str               # тип из material_type_mapping или default_type
+    has_filter_keywords: bool
+
+    @property
+    def excluded(self) -> bool:
+        return self.exclude_keyword is not None
+
+    @property
+    def included(self) -> bool:
+        """True если URL проходит фильтр (семантика _filter_url)."""
+        if self.exclude_keyword is not None:
+            return False
+        if not self.has_filter_keywords:
+            return True
+        return self.filter_keyword is not None
+
+    @property
+    def reason(self) -> str:
+        """Причина решения фильтра: excluded / no_keywords / matched / no_match."""
+        if self.exclude_keyword is not None:
+            return 'excluded'
+        if not self.has_filter_keywords:
+            return 'no_keywords'
+        if self.filter_keyword is not None:
+            return 'matched'
+        return 'no_match'
+
+    @property
+    def matched_keyword(self) -> Optional[str]:
+        """Ключевое слово, определившее решение фильтра."""
+        if self.exclude_keyword is not None:
+            return self.exclude_keyword
+        return self.filter_keyword
+
+    @property
+    def material_tag(self) -> Optional[str]:
+        """Тег материала для save-urls: material_types, затем fallback на filter_keywords."""
+        if self.material_keyword is not None:
+            return self.material_keyword
+        return self.filter_keyword
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Строит регулярное выражение-префиксное дерево (длинные ветки пробуются первыми)."""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        is_end = '' in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != '']
+        if not branches:
+            return ''
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')' + ('?' if is_end else '')
+
+    return build(trie)
+
+
+class UrlClassifier:
+    """
+    Предкомпилированный классификатор URL.
+
+    Все списки ключевых слов сводятся в одно множество уникальных слов в нижнем
+    регистре. URL приводится к нижнему регистру один раз, затем за один проход
+    находится множество всех встречающихся слов, и по нему для каждого списка
+    выбирается первое слово в порядке конфига (как в прежних циклах).
+
+    Для небольших словарей проход — это `in` по каждому слову (поиск подстроки
+    на C). Для больших (REGEX_MIN_KEYWORDS и более) используется одно
+    регулярное выражение (?=(trie)): на каждой позиции URL находится самое
+    длинное слово, а все слова, являющиеся его подстроками, добавляются из
+    заранее посчитанной таблицы.
+    """
+
+    def __init__(
+        self,
+        filter_keywords: Iterable[str] = (),
+        exclude_keywords: Iterable[str] = (),
+        material_types: Iterable[str] = (),
+        material_type_mapping: Optional[Dict[str, str]] = None,
+        default_type: str = 'plate',
+    ):
+        self.filter_keywords: Tuple[str, ...] = self._as_tuple(filter_keywords)
+        self.exclude_keywords: Tuple[str, ...] = self._as_tuple(exclude_keywords)
+        self.material_types: Tuple[str, ...] = self._as_tuple(material_types)
+        self.material_type_mapping: Dict[str, str] = dict(material_type_mapping or {})
+        self.default_type = default_type
+        self.has_filter_keywords = bool(self.filter_keywords)
+
+        # lower -> (позиция в списке, исходное слово); берём первое вхождение
+        self._filter_rank = self._rank(self.filter_keywords)
+        self._exclude_rank = self._rank(self.exclude_keywords)
+        self._material_rank = self._rank(self.material_types)
+
+        # Тип материала по lower-ключу, как раньше: mapping.get(material.lower(), default)
+        self._material_type_by_lower = {
+            lower: self.material_type_mapping.get(lower, default_type)
+            for lower in self._material_rank
+        }
+
+        all_keywords = set(self._filter_rank) | set(self._exclude_rank) | set(self._material_rank)
+        self._always: FrozenSet[str] = frozenset(k for k in all_keywords if k == '')
+        self._words: Tuple[str, ...] = tuple(sorted((k for k in all_keywords if k), key=lambda k: (-len(k), k)))
+
+        self._pattern = None
+        self._implied: Dict[str, FrozenSet[str]] = {}
+        if len(self._words) >= REGEX_MIN_KEYWORDS:
+            self._pattern = re.compile(f"(?=({_trie_pattern(self._words)}))")
+            # Для каждого слова — все слова, которые в нём содержатся (включая его самого)
+            self._implied = {
+                w: frozenset(other for other in self._words if other in w)
+                for w in self._words
+            }
+
+    @staticmethod
+    def _as_tuple(keywords: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        if not keywords:
+            return ()
+        return tuple(str(k) for k in keywords)
+
+    @staticmethod
+    def _rank(keywords: Tuple[str, ...]) -> Dict[str, Tuple[int, str]]:
+        rank: Dict[str, Tuple[int, str]] = {}
+        for idx, keyword in enumerate(keywords):
+            rank.setdefault(keyword.lower(), (idx, keyword))
+        return rank
+
+    @classmethod
+    def from_config(cls, config: dict, filter_keywords: Optional[List[str]] = None) -> 'UrlClassifier':
+        """
+        Возвращает (общий, закешированный) классификатор для конфига поставщика.
+
+        Args:
+            config: Конфигурация поставщика
+            filter_keywords: Явный список filter_keywords (по умолчанию из url_collection)
+        """
+        url_collection = config.get('url_collection', {}) or {}
+        if filter_keywords is None:
+            filter_keywords = url_collection.get('filter_keywords', [])
+        mapping = config.get('material_type_mapping', {}) or {}
+        return _build_classifier(
+            tuple(str(k) for k in (filter_keywords or ())),
+            tuple(str(k) for k in (url_collection.get('exclude_keywords', []) or ())),
+            tuple(str(k) for k in (config.get('material_types', []) or ())),
+            tuple(sorted((str(k), str(v)) for k, v in mapping.items())),
+            config.get('default_type', 'plate'),
+        )
+
+    def find_keywords(self, url: str) -> FrozenSet[str]:
+        """Возвращает множество всех (lower) ключевых слов, встречающихся в URL."""
+        url_lower = url.lower()
+        if self._pattern is None:
+            found = [w for w in self._words if w in url_lower]
+            if not found:
+                return self._always
+            return self._always.union(found)
+
+        found_set = set(self._always)
+        implied = self._implied
+        for word in self._pattern.findall(url_lower):
+            found_set |= implied[word]
+        return frozenset(found_set)
+
+    def classify(self, url: str) -> UrlClassification:
+        """Классифицирует URL за один проход."""
+        found = self.find_keywords(url)
+        if not found:
+            return UrlClassification(None, None, None, self.default_type, self.has_filter_keywords)
+
+        material_keyword = self._first(self._material_rank, found)
+        if material_keyword is not None:
+            material_type = self._material_type_by_lower[material_keyword.lower()]
+        else:
+            material_type = self.default_type
+
+        return UrlClassification(
+            self._first(self._exclude_rank, found),
+            self._first(self._filter_rank, found),
+            material_keyword,
+            material_type,
+            self.has_filter_keywords,
+        )
+
+    @staticmethod
+    def _first(rank: Dict[str, Tuple[int, str]], found: FrozenSet[str]) -> Optional[str]:
+        best = None
+        for word in found:
+            hit = rank.get(word)
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit
+        return best[1] if best is not None else None
+
+
+@lru_cache(maxsize=64)
+def _build_classifier(
+    filter_keywords: Tuple[str, ...],
+    exclude_keywords: Tuple[str, ...],
+    material_types: Tuple[str, ...],
+    mapping_items: Tuple[Tuple[str, str], ...],
+    default_type: str,
+) -> UrlClassifier:
+    return UrlClassifier(
+        filter_keywords=filter_keywords,
+        exclude_keywords=exclude_keywords,
+        material_types=material_types,
+        material_type_mapping=dict(mapping_items),
+        default_type=default_type,
+    )
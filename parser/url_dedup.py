@@ -0,0 +1,218 @@
+# parser/url_dedup.py
+
+"""
+Компактная дедупликация URL для больших каталогов.
+
+Вместо множества полных строк URL хранятся 64-битные хэши в open-addressing
+таблице на array('Q') (~16 байт на URL при заполнении <= 50%, против ~150+
+байт на строку в set). Для очень длинных сборов можно подключить on-disk
+Bloom-фильтр (mmap): точная таблица держит первые capacity хэшей, всё сверх
+неё уходит только в фильтр, чьи биты живут в page cache, а не в куче.
+После перелива дубликаты определяются с вероятностью ложного срабатывания
+error_rate (новый URL изредка считается дубликатом); до перелива счётчики
+точные.
+"""
+
+import hashlib
+import math
+import mmap
+import os
+from array import array
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+
+_EMPTY = 0
+_MASK64 = (1 << 64) - 1
+
+
+def url_hash64(url: str) -> int:
+    """Стабильный (между процессами) 64-битный хэш URL, никогда не равный 0."""
+    value = int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value or 1
+
+
+class UrlHashSet:
+    """Множество 64-битных хэшей: open addressing + linear probing на array('Q')."""
+
+    MAX_LOAD = 0.5
+
+    def __init__(self, capacity: int = 1024):
+        size = 16
+        while size * self.MAX_LOAD < capacity:
+            size <<= 1
+        self._table = array('Q', bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, value: int) -> bool:
+        table = self._table
+        mask = self._mask
+        idx = value & mask
+        while True:
+            slot = table[idx]
+            if slot == _EMPTY:
+                return False
+            if slot == value:
+                return True
+            idx = (idx + 1) & mask
+
+    def add(self, value: int) -> bool:
+        """Добавляет хэш. Возвращает True если его ещё не было."""
+        if (self._count + 1) > (self._mask + 1) * self.MAX_LOAD:
+            self._grow()
+        table = self._table
+        mask = self._mask
+        idx = value & mask
+        while True:
+            slot = table[idx]
+            if slot == _EMPTY:
+                table[idx] = value
+                self._count += 1
+                return True
+            if slot == value:
+                return False
+            idx = (idx + 1) & mask
+
+    def _grow(self) -> None:
+        old = self._table
+        size = (self._mask + 1) << 1
+        self._table = array('Q', bytes(8 * size))
+        self._mask = size - 1
+        table = self._table
+        mask = self._mask
+        for value in old:
+            if value == _EMPTY:
+                continue
+            idx = value & mask
+            while table[idx] != _EMPTY:
+                idx = (idx + 1) & mask
+            table[idx] = value
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._table.buffer_info()[1] * self._table.itemsize
+
+
+class DiskBloomFilter:
+    """
+    Bloom-фильтр в mmap-файле.
+
+    Биты живут в page cache, а не в куче Python. Файл при открытии
+    создаётся заново: биты прошлого запуска (или фильтра другого размера)
+    дали бы ложные дубликаты. Хэш-функции получаются double hashing из
+    одного 64-битного хэша URL.
+    """
+
+    def __init__(self, path: Union[str, Path], capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.path = Path(path)
+        capacity = max(1, int(capacity))
+        bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self._bits = max(8, bits)
+        self._hashes = max(1, int(round(self._bits / capacity * math.log(2))))
+        size_bytes = (self._bits + 7) // 8
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # Обнуляем: содержимое прежнего файла к этому фильтру не относится
+            os.ftruncate(fd, 0)
+            os.ftruncate(fd, size_bytes)
+            self._mm = mmap.mmap(fd, size_bytes)
+        finally:
+            os.close(fd)
+
+    def _positions(self, value: int) -> Iterable[int]:
+        h1 = value & 0xFFFFFFFF
+        h2 = (value >> 32) | 1
+        bits = self._bits
+        for i in range(self._hashes):
+            yield (h1 + i * h2) % bits
+
+    def __contains__(self, value: int) -> bool:
+        mm = self._mm
+        for pos in self._positions(value):
+            if not mm[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def add(self, value: int) -> None:
+        mm = self._mm
+        for pos in self._positions(value):
+            mm[pos >> 3] |= 1 << (pos & 7)
+
+    def flush(self) -> None:
+        self._mm.flush()
+
+    def close(self) -> None:
+        try:
+            self._mm.flush()
+            self._mm.close()
+        except (ValueError, OSError):
+            pass
+
+
+class UrlDedupSet:
+    """
+    Множество URL для дедупликации: хранит только 64-битные хэши.
+
+    add() возвращает True для нового URL и False для дубликата — так же, как
+    проверка `url in set` + `set.add(url)`, поэтому счётчики дубликатов
+    (global_duplicates_dropped и т.д.) точны, пока таблица не переполнена.
+    С bloom_path в таблице остаются первые capacity хэшей, следующие
+    пишутся только в Bloom-фильтр (spilled).
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        bloom_path: Optional[Union[str, Path]] = None,
+        bloom_capacity: Optional[int] = None,
+    ):
+        self._hashes = UrlHashSet(capacity)
+        self._bloom: Optional[DiskBloomFilter] = None
+        self._exact_limit: Optional[int] = None
+        self.spilled = 0
+        self.bloom_duplicates = 0
+        if bloom_path:
+            self._exact_limit = max(1, int(capacity))
+            self._bloom = DiskBloomFilter(bloom_path, capacity=bloom_capacity or max(capacity, 1_000_000))
+
+    def __len__(self) -> int:
+        return len(self._hashes) + self.spilled
+
+    def __contains__(self, url: str) -> bool:
+        return self.contains_hash(url_hash64(url))
+
+    def contains_hash(self, value: int) -> bool:
+        if value in self._hashes:
+            return True
+        return bool(self.spilled) and value in self._bloom
+
+    def add(self, url: str) -> bool:
+        """Добавляет URL. Возвращает True если URL новый."""
+        return self.add_hash(url_hash64(url))
+
+    def add_hash(self, value: int) -> bool:
+        if self._exact_limit is None or len(self._hashes) < self._exact_limit:
+            return self._hashes.add(value)
+        if value in self._hashes:
+            return False
+        if value in self._bloom:
+            # Вероятный дубликат (ложное срабатывание с вероятностью error_rate)
+            self.bloom_duplicates += 1
+            return False
+        self._bloom.add(value)
+        self.spilled += 1
+        return True
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._hashes.memory_bytes
+
+    def close(self) -> None:
+        if self._bloom is not None:
+            self._bloom.close()
@@ -0,0 +1,119 @@
+# parser/url_normalizer.py
+
+"""
+Общая нормализация URL для сбора ссылок.
+
+Раньше одна и та же логика жила в двух местах (UrlCollector.normalize_url и
+_normalize_for_fingerprint в SupplierAdapter.collect_urls), а _category_key
+разбирал тот же URL ещё раз. Здесь всё считается за один вызов:
+нормализованный URL, ключ категории (без параметра пагинации) и 64-битный
+хэш для дедупликации.
+
+Ссылки на товары обычно без query-строки, для них urlparse/parse_qs/urlencode
+не вызываются вовсе. Результаты кешируются по исходному href — одни и те же
+ссылки встречаются на каждой странице каталога (меню, футер, «похожие»).
+"""
+
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse, parse_qs, urlencode
+
+# Поддержка запуска как модуля и как скрипта (collect_urls.py)
+try:
+    from .url_dedup import url_hash64
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from parser.url_dedup import url_hash64
+
+
+TRACKING_PARAMS = frozenset({
+    'utm_source', 'utm_medium', 'utm_campaign', 'utm_term',
+    'utm_content', 'fbclid', 'gclid', 'yclid', '_ga',
+})
+
+NORMALIZE_CACHE_SIZE = 65536
+
+# Символы, при которых быстрый путь не применяется: query, fragment, ;params
+# (urlparse отрезает их от пути), IPv6-хосты и то, что urlsplit вычищает сам.
+_SLOW_PATH_CHARS = frozenset('?#;[]\t\r\n')
+
+
+class NormalizedUrl(NamedTuple):
+    """Результат нормализации одного href."""
+    url: str           # без трекинговых параметров, якоря и завершающего '/'
+    category_key: str  # URL без параметра пагинации (для fingerprint страниц)
+    url_hash: int      # url_hash64(url)
+
+
+def _split_simple(href: str) -> Optional[tuple]:
+    """Разбирает http(s)-URL без query/fragment без urlparse. None — нужен общий путь."""
+    if href.startswith('https://'):
+        scheme, rest = 'https', href[8:]
+    elif href.startswith('http://'):
+        scheme, rest = 'http', href[7:]
+    else:
+        return None
+    if not _SLOW_PATH_CHARS.isdisjoint(href):
+        return None
+    slash = rest.find('/')
+    if slash < 0:
+        return scheme, rest, ''
+    return scheme, rest[:slash], rest[slash:]
+
+
+def _normalize_slow(href: str, pagination_param: Optional[str]) -> NormalizedUrl:
+    try:
+        parsed = urlparse(href)
+        params = parse_qs(parsed.query, keep_blank_values=True) if parsed.query else {}
+
+        filtered_params = {k: v for k, v in params.items() if k.lower() not in TRACKING_PARAMS}
+        new_query = urlencode(filtered_params, doseq=True) if filtered_params else ''
+        path = parsed.path.rstrip('/') if parsed.path != '/' else '/'
+        normalized = f"{parsed.scheme}://{parsed.netloc}{path}"
+        if new_query:
+            normalized += f"?{new_query}"
+    except Exception:
+        normalized = href
+
+    try:
+        parsed = urlparse(href)
+        params = parse_qs(parsed.query, keep_blank_values=True)
+        if pagination_param and pagination_param in params:
+            params.pop(pagination_param, None)
+        category_query = urlencode(params, doseq=True) if params else ''
+        base = f"{parsed.scheme}://{parsed.netloc}{parsed.path}".rstrip('/')
+        category_key = f"{base}?{category_query}" if category_query else base
+    except Exception:
+        category_key = href
+
+    return NormalizedUrl(normalized, category_key, url_hash64(normalized))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize(href: str, pagination_param: Optional[str] = None) -> NormalizedUrl:
+    """
+    Нормализует href за один вызов.
+
+    Args:
+        href: Абсолютный URL
+        pagination_param: Параметр пагинации, исключаемый из ключа категории
+
+    Returns:
+        NormalizedUrl(url, category_key, url_hash)
+    """
+    parts = _split_simple(href)
+    if parts is None:
+        return _normalize_slow(href, pagination_param)
+
+    scheme, netloc, path = parts
+    base = f"{scheme}://{netloc}"
+    normalized = base + (path.rstrip('/') if path != '/' else '/')
+    category_key = (base + path).rstrip('/')
+    return NormalizedUrl(normalized, category_key, url_hash64(normalized))
+
+
+def normalize_url(href: str) -> str:
+    """Нормализованный URL (без трекинговых параметров, якоря и завершающего '/')."""
+    return normalize(href).url
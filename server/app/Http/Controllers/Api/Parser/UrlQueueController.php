@@ -148,11 +148,17 @@ public function retryReady(Request $request): JsonResponse
      * Сбросить все блокировки, attempts=0, очистить error.
      * 
      * ВАЖНО: вызывается ПОСЛЕ collect, поэтому все URL уже в таблице.
+     *
+     * Потоковый full-scan вызывает reset ДО collect, а после сбора — второй
+     * раз с seen_since (reset_at первого ответа): сбрасываются только done URL,
+     * которые save-urls снова сделал валидными во время сбора (первый reset
+     * их не тронул — is_valid был false), и которые не парсились с тех пор.
      */
     public function fullScanReset(Request $request): JsonResponse
     {
         $validator = Validator::make($request->all(), [
             'supplier_name' => 'required|string|max:255',
+            'seen_since' => 'nullable|date',
         ]);
 
         if ($validator->fails()) {
@@ -163,6 +169,42 @@ public function fullScanReset(Request $request): JsonResponse
         }
 
         $supplierName = $request->input('supplier_name');
+        $resetAt = Carbon::now();
+
+        if ($request->filled('seen_since')) {
+            $seenSince = Carbon::parse($request->input('seen_since'));
+            $resetCount = SupplierUrl::forSupplier($supplierName)
+                ->where('is_valid', true)
+                ->where('status', SupplierUrl::STATUS_DONE)
+                ->where('last_seen_at', '>=', $seenSince)
+                ->where(function ($q) use ($seenSince) {
+                    $q->whereNull('last_parsed_at')
+                      ->orWhere('last_parsed_at', '<', $seenSince);
+                })
+                ->update([
+                    'status' => SupplierUrl::STATUS_PENDING,
+                    'locked_by' => null,
+                    'locked_at' => null,
+                    'next_retry_at' => null,
+                    'last_error_code' => null,
+                    'last_error_message' => null,
+                    'attempts' => 0,
+                ]);
+
+            Log::info('Full scan reset applied (revalidated)', [
+                'supplier' => $supplierName,
+                'seen_since' => $seenSince->toIso8601String(),
+                'reset_count' => $resetCount,
+            ]);
+
+            return response()->json([
+                'success' => true,
+                'reset_count' => $resetCount,
+                'seen_since' => $seenSince->toIso8601String(),
+                'reset_at' => $resetAt->toIso8601String(),
+                'supplier' => $supplierName,
+            ]);
+        }
 
         // Подсчёт по статусам ДО reset
         $baseQuery = SupplierUrl::forSupplier($supplierName)->where('is_valid', true);
@@ -246,6 +288,7 @@ public function fullScanReset(Request $request): JsonResponse
             'after' => [
                 'pending' => $pendingAfter,
             ],
+            'reset_at' => $resetAt->toIso8601String(),
             'supplier' => $supplierName,
         ]);
     }